@@ -0,0 +1,117 @@
+"""Backfill an athlete's Strava activity history into BigQuery
+
+Usage:
+    poetry run python backfill.py [--checkpoint PATH] [--per-page N] [--restart]
+        [--async [--max-in-flight N]]
+
+Progress is checkpointed after every page, so an interrupted backfill can be
+resumed by running the same command again. With `--async` (requires the async
+extra) each page's activities are fetched concurrently on one event loop rather
+than on a thread pool.
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable
+
+from stravabqsync.application.services import (
+    make_backfill_service,
+    open_async_backfill_service,
+)
+from stravabqsync.domain import BackfillCheckpoint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _parse_before(value: str) -> int:
+    """Accept epoch seconds or an ISO 8601 date/datetime"""
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+async def _run_async(
+    args: argparse.Namespace, on_progress: Callable[[int], None] | None
+) -> BackfillCheckpoint:
+    async with open_async_backfill_service(
+        args.checkpoint, per_page=args.per_page, max_in_flight=args.max_in_flight
+    ) as service:
+        return await service.run(
+            restart=args.restart, before=args.before, on_progress=on_progress
+        )
+
+
+def _run(
+    args: argparse.Namespace, on_progress: Callable[[int], None] | None = None
+) -> BackfillCheckpoint:
+    if args.use_async:
+        return asyncio.run(_run_async(args, on_progress))
+    service = make_backfill_service(args.checkpoint, per_page=args.per_page)
+    return service.run(
+        restart=args.restart, before=args.before, on_progress=on_progress
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--checkpoint",
+        default=".backfill_checkpoint.json",
+        help="Path of the checkpoint file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--per-page",
+        type=int,
+        default=200,
+        help="Activities per /athlete/activities page (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--before",
+        type=_parse_before,
+        default=None,
+        help="Only backfill activities started before this epoch or ISO date",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore an existing checkpoint and start from the newest activity",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Fetch activities with asyncio instead of threads (requires httpx)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=100,
+        help="Concurrent activity fetches with --async (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    try:
+        from tqdm import tqdm  # ad-hoc dependency group
+    except ImportError:
+        tqdm = None
+
+    if tqdm is None:
+        checkpoint = _run(args)
+    else:
+        with tqdm(unit="activities", desc="Backfill") as progress:
+            checkpoint = _run(args, progress.update)
+
+    logger.info(
+        "Backfill finished on page %s: %d synced, %d failed %s",
+        checkpoint.page,
+        checkpoint.synced,
+        len(checkpoint.failed_ids),
+        list(checkpoint.failed_ids),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Create the BigQuery tables written by the sync
+
+Usage:
+    poetry run python bootstrap.py [--partition-expiration-days N] [--migrate]
+
+Creates the `activities` table, partitioned by day on `start_date` and
+clustered on `sport_type`, and the `changes` table, partitioned on
+`synced_at`. With GCP_BIGQUERY_LAYOUT=normalized, also creates the child
+tables for efforts, laps and splits and the `segments` table. Existing
+`activities`, `activities_current` and `changes` tables get the columns added
+by later releases; they are otherwise left alone. Pass `--migrate` to rebuild
+an existing, unpartitioned `activities` table with that layout.
+"""
+
+import argparse
+import logging
+
+from stravabqsync.adapters.gcp import (
+    make_activities_repo,
+    make_bigquery_client_wrapper,
+    make_changes_repo,
+)
+from stravabqsync.adapters.gcp._compaction import CompactActivitiesRepo
+from stravabqsync.adapters.gcp._normalized import NormalizedWriteActivitiesRepo
+from stravabqsync.config import get_app_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--partition-expiration-days",
+        type=int,
+        default=None,
+        help="Delete activities this many days after they started (default: never)",
+    )
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Rebuild the existing activities table partitioned and clustered. "
+        "Pause the webhook first.",
+    )
+    args = parser.parse_args()
+
+    activities = make_activities_repo()
+    if args.migrate:
+        backup_id = activities.partition_activities_table(
+            partition_expiration_days=args.partition_expiration_days
+        )
+        logger.info("Migrated activities table; the original is now %s", backup_id)
+    else:
+        activities.create_activities_table(
+            partition_expiration_days=args.partition_expiration_days, exists_ok=True
+        )
+    if isinstance(activities, NormalizedWriteActivitiesRepo):
+        activities.create_child_tables(
+            partition_expiration_days=args.partition_expiration_days, exists_ok=True
+        )
+    changes = make_changes_repo()
+    changes.create_changes_table(exists_ok=True)
+    compaction = CompactActivitiesRepo(
+        make_bigquery_client_wrapper(), dataset_name=get_app_config().bq_dataset
+    )
+    for repo in (activities, changes, compaction):
+        repo.add_missing_columns()
+    logger.info("Tables are ready")
+
+
+if __name__ == "__main__":
+    main()
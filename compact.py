@@ -0,0 +1,35 @@
+"""Bring the activities_current table up to date in BigQuery
+
+Usage:
+    poetry run python compact.py [--settle-seconds N]
+
+Applies the activities and changes written since the previous run, so each
+run only processes the new rows. Schedule it as often as dashboards need
+fresh data.
+"""
+
+import argparse
+import logging
+
+from stravabqsync.adapters.gcp import make_compact_activities
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--settle-seconds",
+        type=int,
+        default=None,
+        help="Leave rows synced this recently for the next run (default: 300)",
+    )
+    args = parser.parse_args()
+
+    make_compact_activities(settle_seconds=args.settle_seconds).compact()
+    logger.info("Compaction finished")
+
+
+if __name__ == "__main__":
+    main()
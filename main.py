@@ -1,32 +1,92 @@
 """Test script for testing Strava webhooks"""
 
 import base64
-import json
 import logging
+import os
+from datetime import datetime, timezone
 
 import functions_framework
 from cloudevents.http import CloudEvent
 
-from stravabqsync.application.services import make_sync_service
+from stravabqsync.application.services import (
+    make_change_log_service,
+    make_sync_service,
+    replay_in_background,
+    warm_up_in_background,
+)
+from stravabqsync.concurrency import LatestDeadline, RecentKeys, retry_deadline
+from stravabqsync.config import get_app_config
 from stravabqsync.domain import WebhookRequest
+from stravabqsync.exceptions import RetryLaterError
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Read from the environment directly: loading the configuration is part of
+# what the warm-up moves off the first event's critical path
+if os.environ.get("STRAVABQSYNC_WARM_UP", "").lower() in ("1", "true", "yes"):
+    warm_up_in_background()
+
+# Pub/Sub push delivery is at-least-once. Remember recently processed events,
+# so redeliveries to this instance are acknowledged without syncing again.
+_processed_events = RecentKeys(maxsize=1024)
+
+# When Strava's rate limit lifts, after a sync raised RetryLaterError. Until
+# then create events fail fast without calling Strava, and Pub/Sub redelivers
+# them later per the subscription's retry policy.
+_retry_at = LatestDeadline()
+
+
+def _raise_if_deferred() -> None:
+    retry_at = _retry_at.get()
+    if retry_at is not None and datetime.now(timezone.utc) < retry_at:
+        raise RetryLaterError(
+            f"Rate limited until {retry_at.isoformat()}", retry_at=retry_at
+        )
+
+
+def _event_key(request: WebhookRequest) -> tuple:
+    return (
+        request.object_type,
+        request.object_id,
+        request.aspect_type,
+        request.event_time,
+        tuple(sorted((key, str(value)) for key, value in request.updates.items())),
+    )
+
 
 @functions_framework.cloud_event
 def stravabqsync_listener(event: CloudEvent) -> dict:
     """main runner"""
     logger.info("Received event: %s", str(event.data))
-    event_data = json.loads(base64.b64decode(event.data["message"]["data"]).decode())
-    parsed_request = WebhookRequest(**event_data)
+    event_data = base64.b64decode(event.data["message"]["data"])
+    parsed_request = WebhookRequest.model_validate_json(event_data)
     logger.info("Parsed event: %s", parsed_request.json())
 
+    event_key = _event_key(parsed_request)
+    if event_key in _processed_events:
+        logger.info("Skipping already processed event: %s", event_key)
+        return parsed_request.json()
+
     if parsed_request.aspect_type == "create":
-        usecase = make_sync_service()
-        usecase.run(parsed_request.object_id)
+        try:
+            _raise_if_deferred()
+            # One retry budget for the whole sync, token refresh included
+            with retry_deadline(get_app_config().strava_api.retry_budget):
+                make_sync_service().run(parsed_request.object_id)
+        except RetryLaterError as e:
+            # Fail instead of waiting, so Pub/Sub redelivers the event later
+            _retry_at.extend(e.retry_at)
+            logger.warning("Deferring event %s: %s", event_key, e)
+            raise
+        logger.info("Finished processing event.")
+        # Drain syncs spooled during an earlier outage
+        replay_in_background()
+    elif parsed_request.object_type == "activity":
+        make_change_log_service().run(parsed_request)
         logger.info("Finished processing event.")
     else:
-        logger.info("Skipping non-create events: %s", parsed_request.updates)
+        logger.info("Skipping %s event: %s", parsed_request.object_type, event_key)
 
+    _processed_events.add(event_key)
     return parsed_request.json()
@@ -0,0 +1,52 @@
+"""Replay syncs spooled while Strava or BigQuery was down
+
+Usage:
+    poetry run python replay.py [--batch-size N] [--max-attempts N]
+
+Reads the spool in STRAVABQSYNC_SPOOL_DIR and syncs its entries in batches,
+stopping early while every sync in a batch still fails. Entries that keep
+failing, or can't succeed, are moved to the dead-letter file `dead.log`.
+"""
+
+import argparse
+import logging
+import sys
+
+from stravabqsync.application.services import make_sync_service
+from stravabqsync.config import get_app_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Entries synced per batch (default: 100)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=5,
+        help="Dead-letter entries after this many failed attempts (default: 5)",
+    )
+    args = parser.parse_args()
+
+    if not get_app_config().spool_dir:
+        sys.exit("STRAVABQSYNC_SPOOL_DIR is not set")
+    result = make_sync_service().replay(
+        batch_size=args.batch_size, max_attempts=args.max_attempts
+    )
+    logger.info(
+        "Replayed %d, re-spooled %d, dead-lettered %d",
+        result.replayed,
+        result.retried,
+        result.dead_lettered,
+    )
+
+
+if __name__ == "__main__":
+    main()
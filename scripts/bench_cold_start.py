@@ -0,0 +1,133 @@
+"""Benchmark cold starts of the webhook listener against a tracked budget
+
+Every run starts a fresh interpreter, like a new Cloud Functions instance,
+and measures:
+
+  import_ms       `import main`, i.e. everything before the first event
+  first_event_ms  handling a first event that needs no Strava or BigQuery call
+                  (an update to a non-activity object)
+  sync_import_ms  importing the adapter modules that the first create event
+                  loads on demand (requests, google-cloud-bigquery)
+
+The median of `--runs` runs is compared with `scripts/cold_start_budget.json`.
+With `--check` the script exits non-zero if any median is over budget; with
+`--update` it rewrites the budget with the current medians plus headroom.
+
+Usage:
+    poetry run python scripts/bench_cold_start.py [--runs N] [--check|--update]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BUDGET = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cold_start_budget.json"
+)
+HEADROOM = 1.5
+MIN_BUDGET_MS = 5
+
+CHILD = r"""
+import base64, json, sys, time
+
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+from cloudevents.http import CloudEvent
+
+event = {
+    "aspect_type": "update",
+    "event_time": 1700000000,
+    "object_id": 1,
+    "object_type": "athlete",
+    "owner_id": 1,
+    "subscription_id": 1,
+    "updates": {"authorized": "false"},
+}
+data = {"message": {"data": base64.b64encode(json.dumps(event).encode()).decode()}}
+attributes = {
+    "type": "google.cloud.pubsub.topic.v1.messagePublished",
+    "source": "bench",
+}
+main.stravabqsync_listener(CloudEvent(attributes, data))
+t2 = time.perf_counter()
+
+import stravabqsync.adapters.gcp._repositories
+import stravabqsync.adapters.strava._repositories
+t3 = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_event_ms": (t2 - t1) * 1000,
+    "sync_import_ms": (t3 - t2) * 1000,
+}))
+"""
+
+# Placeholder settings, so configuration loads without a real .env
+ENV = {
+    "STRAVA_CLIENT_ID": "1",
+    "STRAVA_CLIENT_SECRET": "bench",
+    "STRAVA_REFRESH_TOKEN": "bench",
+    "GCP_PROJECT_ID": "bench",
+    "GCP_BIGQUERY_DATASET": "bench",
+    "STRAVA_SECRETS_PATH": "",
+}
+
+
+def run_once() -> dict[str, float]:
+    env = {**ENV, **os.environ, "PYTHONPATH": ROOT, "PYTHONDONTWRITEBYTECODE": "1"}
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="Fail if over budget")
+    mode.add_argument("--update", action="store_true", help="Rewrite the budget")
+    args = parser.parse_args()
+
+    run_once()  # warm the OS file cache and bytecode caches
+    runs = [run_once() for _ in range(args.runs)]
+    medians = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+    with open(BUDGET, "r", encoding="utf-8") as fin:
+        budget = json.load(fin)
+    over = []
+    print(f"{'metric':<16} {'median ms':>10} {'budget ms':>10}")
+    for key, value in medians.items():
+        limit = budget.get(key)
+        flag = ""
+        if limit is not None and value > limit:
+            over.append(key)
+            flag = "  over budget"
+        print(f"{key:<16} {value:>10.1f} {limit or float('nan'):>10.1f}{flag}")
+
+    if args.update:
+        with open(BUDGET, "w", encoding="utf-8") as fout:
+            budget = {
+                key: max(round(value * HEADROOM), MIN_BUDGET_MS)
+                for key, value in medians.items()
+            }
+            json.dump(budget, fout, indent=2)
+            fout.write("\n")
+        print(f"Updated {os.path.relpath(BUDGET)}")
+    elif args.check and over:
+        sys.exit(f"Cold start over budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark pooled keep-alive sessions against a local stub Strava API
+
+Runs `StravaActivitiesRepo.read_activity_by_id` against a local HTTP/1.1 stub
+server, once with `keep_alive=False` (a new connection per request, like the
+old module-level `requests.get`) and once with the pooled session, both
+sequentially and from a thread pool. The stub counts accepted connections,
+which is the number of TCP handshakes; against strava.com every one of those
+is also a TLS handshake.
+
+Loopback handshakes are nearly free, so the stub charges `--handshake-ms` per
+new connection to model the TCP + TLS round trips to strava.com (50ms is
+roughly three round trips at ~17ms). Pass `--handshake-ms 0` for raw loopback.
+
+Usage:
+    poetry run python scripts/bench_http_pool.py [--requests N] [--workers N]
+        [--handshake-ms MS]
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "activity_1.json"
+)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, payload: bytes, handshake_seconds: float):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.payload = payload
+        self.handshake_seconds = handshake_seconds
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def count_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY, delayed ACKs
+    # stall every keep-alive response by ~40ms
+    disable_nagle_algorithm = True
+    server: StubServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.count_connection()
+        time.sleep(self.server.handshake_seconds)
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.payload)))
+        if self.close_connection:
+            # Echo the client's "Connection: close" like real servers do
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(self.server.payload)
+
+    def log_message(self, format, *args) -> None:  # noqa: A002
+        pass
+
+
+def run(repo, n_requests: int, workers: int) -> float:
+    start = time.perf_counter()
+    if workers == 1:
+        for activity_id in range(n_requests):
+            repo.read_activity_by_id(activity_id)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(repo.read_activity_by_id, range(n_requests)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--handshake-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    from stravabqsync.adapters.strava._rate_limit import StravaRateBudget
+    from stravabqsync.adapters.strava._repositories import StravaActivitiesRepo
+    from stravabqsync.config import StravaApiConfig
+    from stravabqsync.domain import StravaTokenSet
+
+    with open(FIXTURE, "rb") as fin:
+        server = StubServer(fin.read(), args.handshake_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    tokens = StravaTokenSet(
+        client_id=1, client_secret="x", access_token="x", refresh_token="x"
+    )
+
+    print(f"{'mode':<10} {'workers':>7} {'seconds':>8} {'req/s':>8} {'conns':>6}")
+    for workers in (1, args.workers):
+        for mode, keep_alive in (("unpooled", False), ("pooled", True)):
+            config = StravaApiConfig(
+                api_base_url=base_url,
+                keep_alive=keep_alive,
+                pool_maxsize=args.workers,
+            )
+            # Unlimited budget: this measures connection handling, not pacing
+            budget = StravaRateBudget(
+                short_limit=10**9,
+                daily_limit=10**9,
+                burst=10**9,
+                max_concurrency=args.workers,
+            )
+            repo = StravaActivitiesRepo(tokens, config, budget)
+            server.connections = 0
+            elapsed = run(repo, args.requests, workers)
+            print(
+                f"{mode:<10} {workers:>7} {elapsed:>8.3f} "
+                f"{args.requests / elapsed:>8.0f} {server.connections:>6}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark parsing Strava activity responses into StravaActivity
+
+Compares the previous path, `StravaActivity(**json.loads(body))`, against
+`parse_json(body, StravaActivity)`, which validates the response bytes
+directly, on CPU time and on peak memory allocated per parse (tracemalloc).
+
+Responses are built from `tests/fixtures/activity_*.json` with their segment
+effort, split and lap lists scaled up to model long activities.
+
+Usage:
+    poetry run python scripts/bench_parsing.py [--efforts N] [--repeat N]
+"""
+
+import argparse
+import glob
+import json
+import os
+import timeit
+import tracemalloc
+from typing import Callable
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+def scale_up(activity: dict, efforts: int) -> dict:
+    """Repeat the activity's list fields up to roughly `efforts` entries"""
+    for key in ("segment_efforts", "best_efforts", "splits_metric", "laps"):
+        items = activity.get(key) or []
+        if items:
+            activity[key] = (items * (efforts // len(items) + 1))[:efforts]
+    return activity
+
+
+def peak_bytes(func: Callable[[], object]) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--efforts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from stravabqsync.adapters.strava._parsing import parse_json
+    from stravabqsync.domain import StravaActivity
+
+    print(f"{'fixture':<16} {'KiB':>6} {'path':<8} {'ms':>7} {'peak KiB':>9}")
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "activity_*.json"))):
+        with open(path, "r", encoding="utf-8") as fin:
+            body = json.dumps(scale_up(json.load(fin), args.efforts)).encode()
+
+        def dicts() -> StravaActivity:
+            return StravaActivity(**json.loads(body))
+
+        def direct() -> StravaActivity:
+            return parse_json(body, StravaActivity)
+
+        assert dicts() == direct()
+        for name, func in (("dicts", dicts), ("bytes", direct)):
+            best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print(
+                f"{os.path.basename(path):<16} {len(body) / 1024:>6.0f} {name:<8} "
+                f"{best * 1000:>7.2f} {peak_bytes(func) / 1024:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
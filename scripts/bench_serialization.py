@@ -0,0 +1,105 @@
+"""Benchmark activity row serialization for BigQuery streaming inserts
+
+Compares the previous path, `model_dump(mode="json")` followed by the BigQuery
+client's `json.dumps` of the whole insertAll body, against `serialize_row` +
+`build_insert_all_body`, which encode each row once, straight to bytes.
+
+Rows are also checked against `STRAVA_ACTIVITY_SCHEMA` before they are sent.
+`validated` re-validates every serialized row against the schema, as
+`RowEncoder.encode` does for models that don't fit it; `encoded` is what
+`WriteActivitiesRepo` does for activities, which fit the schema and so only
+have their REQUIRED and REPEATED fields checked for null.
+
+Activities are built from `tests/fixtures/activity_1.json` with its segment
+effort, best effort, split and lap lists scaled up to model long rides.
+
+Usage:
+    poetry run python scripts/bench_serialization.py [--efforts N] [--rows N]
+        [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import timeit
+import uuid
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "activity_1.json"
+)
+
+
+def make_activity(efforts: int) -> dict:
+    with open(FIXTURE, "r", encoding="utf-8") as fin:
+        activity = json.load(fin)
+    effort = activity["segment_efforts"][0]
+    activity["segment_efforts"] = [{**effort, "id": i} for i in range(efforts)]
+    activity["best_efforts"] = [{**effort, "id": i} for i in range(efforts // 5)]
+    activity["splits_metric"] = activity["splits_metric"] * (efforts // 5)
+    activity["laps"] = activity["laps"] * (efforts // 10)
+    return activity
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--efforts", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from stravabqsync.adapters.gcp._encoding import compile_encoder
+    from stravabqsync.adapters.gcp._serialization import (
+        build_insert_all_body,
+        serialize_row,
+    )
+    from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+    from stravabqsync.domain import StravaActivity
+
+    activity = StravaActivity(**make_activity(args.efforts))
+    activities = [activity] * args.rows
+    insert_ids = [str(uuid.uuid4()) for _ in activities]
+
+    def dicts() -> bytes:
+        # What WriteActivitiesRepo + Client.insert_rows_json did before
+        rows = [
+            {"insertId": insert_id, "json": a.model_dump(mode="json")}
+            for insert_id, a in zip(insert_ids, activities)
+        ]
+        return json.dumps({"rows": rows}).encode()
+
+    def serialized() -> bytes:
+        return build_insert_all_body([serialize_row(a) for a in activities], insert_ids)
+
+    encoder = compile_encoder(tuple(STRAVA_ACTIVITY_SCHEMA))
+
+    def validated() -> bytes:
+        return build_insert_all_body(
+            [encoder.encode(serialize_row(a)) for a in activities], insert_ids
+        )
+
+    def encoded() -> bytes:
+        return build_insert_all_body(
+            [encoder.encode_model(a) for a in activities], insert_ids
+        )
+
+    assert json.loads(dicts()) == json.loads(serialized())
+    assert json.loads(validated()) == json.loads(encoded()) == json.loads(dicts())
+    size = len(serialized())
+    print(
+        f"{args.rows} rows x {args.efforts} segment efforts, "
+        f"{size / 1024 / 1024:.1f} MiB request body"
+    )
+    print(f"{'path':<12} {'ms/request':>10} {'us/row':>8}")
+    paths = (
+        ("dicts", dicts),
+        ("serialized", serialized),
+        ("validated", validated),
+        ("encoded", encoded),
+    )
+    for name, func in paths:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:<12} {best * 1000:>10.1f} {best / args.rows * 1e6:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Async adapters that run synchronous adapters on worker threads
+
+Token refreshes are too rare, and BigQuery writes too few and too large, for
+a thread per call to matter, so these reuse the synchronous adapters.
+"""
+
+import asyncio
+from typing import Mapping, Sequence
+
+from stravabqsync.domain import StravaActivity, StravaTokenSet
+from stravabqsync.ports.out.read import AsyncReadStravaToken, ReadStravaToken
+from stravabqsync.ports.out.write import AsyncWriteActivities, WriteActivities
+
+
+class ThreadedReadStravaToken(AsyncReadStravaToken):
+    """Refresh tokens with `read_strava_token` on a worker thread"""
+
+    def __init__(self, read_strava_token: ReadStravaToken):
+        self._read_strava_token = read_strava_token
+
+    async def refresh(self, *, force: bool = False) -> StravaTokenSet:
+        return await asyncio.to_thread(self._read_strava_token.refresh, force=force)
+
+
+class ThreadedWriteActivities(AsyncWriteActivities):
+    """Write activities with `write_activities` on a worker thread"""
+
+    def __init__(self, write_activities: WriteActivities):
+        self._write_activities = write_activities
+        self.deferred = write_activities.deferred
+
+    async def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        await asyncio.to_thread(
+            self._write_activities.write_activity, activity, digest=digest
+        )
+
+    async def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        await asyncio.to_thread(
+            self._write_activities.write_activities,
+            activities,
+            digests=digests,
+            serialized=serialized,
+        )
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._write_activities.flush)
+
+    async def warm_up(self) -> None:
+        await asyncio.to_thread(self._write_activities.warm_up)
@@ -1,18 +1,195 @@
-from functools import lru_cache
+"""Google Cloud adapters
 
-from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
-from stravabqsync.adapters.gcp._repositories import WriteActivitiesRepo
-from stravabqsync.config import app_config
-from stravabqsync.ports.out.write import WriteActivities
+google-cloud-bigquery takes longer to import than the rest of the
+application, so the adapter modules are imported by the factories on first
+use rather than here. Events that never write to BigQuery don't pay for it.
+"""
 
+from typing import TYPE_CHECKING
 
-@lru_cache(maxsize=1)
-def make_bigquery_client_wrapper() -> BigQueryClientWrapper:
-    return BigQueryClientWrapper(project_id=app_config.project_id)
+from stravabqsync.adapters._threaded import ThreadedWriteActivities
+from stravabqsync.config import get_app_config
+from stravabqsync.container import container
+from stravabqsync.exceptions import ConfigurationError
+from stravabqsync.ports.out.read import ReadFingerprints
+from stravabqsync.ports.out.state import TokenCache
+from stravabqsync.ports.out.write import (
+    AsyncWriteActivities,
+    CompactActivities,
+    WriteActivities,
+    WriteChanges,
+)
+
+if TYPE_CHECKING:
+    from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+    from stravabqsync.adapters.gcp._repositories import (
+        WriteActivitiesRepo,
+        WriteChangesRepo,
+    )
+
+
+@container.singleton(close=lambda client: client.close())
+def make_bigquery_client_wrapper() -> "BigQueryClientWrapper":
+    from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+
+    return BigQueryClientWrapper(project_id=get_app_config().project_id)
+
+
+def _make_buffer(writer: WriteActivities, *, blocking: bool) -> WriteActivities:
+    """Wrap `writer` in a write buffer, flushed when the container closes"""
+    from stravabqsync.adapters.gcp._buffer import BufferedWriteActivities
+
+    config = get_app_config().bq_write
+    buffer = BufferedWriteActivities(
+        writer,
+        max_rows=config.buffer_max_rows,
+        max_bytes=config.buffer_max_bytes,
+        max_latency=config.buffer_max_latency,
+        blocking=blocking,
+    )
+    container.on_close("write buffer", buffer.close)
+    return buffer
+
+
+def _activities_repo_class() -> "type[WriteActivitiesRepo]":
+    """Activities writer for the configured `bq_write.layout`"""
+    from stravabqsync.adapters.gcp._normalized import (
+        NESTED,
+        NORMALIZED,
+        NormalizedWriteActivitiesRepo,
+    )
+    from stravabqsync.adapters.gcp._repositories import WriteActivitiesRepo
+
+    layout = get_app_config().bq_write.layout
+    if layout == NESTED:
+        return WriteActivitiesRepo
+    if layout == NORMALIZED:
+        return NormalizedWriteActivitiesRepo
+    raise ConfigurationError(
+        f"Invalid GCP_BIGQUERY_LAYOUT {layout!r}, expected {NESTED!r} or {NORMALIZED!r}"
+    )
+
+
+@container.singleton
+def make_activities_repo() -> "WriteActivitiesRepo":
+    app_config = get_app_config()
+    return _activities_repo_class()(
+        client=make_bigquery_client_wrapper(),
+        dataset_name=app_config.bq_dataset,
+        fingerprint_exclude=app_config.bq_write.fingerprint_exclude,
+    )
 
 
-@lru_cache(maxsize=1)
+@container.singleton
 def make_write_activities() -> WriteActivities:
-    return WriteActivitiesRepo(
-        client=make_bigquery_client_wrapper(), dataset_name=app_config.bq_dataset
+    """Writer for the webhook path, micro-batched if `bq_write.buffered`"""
+    if get_app_config().bq_write.buffered:
+        return _make_buffer(make_activities_repo(), blocking=True)
+    return make_activities_repo()
+
+
+@container.singleton
+def make_backfill_write_activities() -> WriteActivities:
+    """Writer for backfills; call `flush()` before recording progress.
+
+    Loads each batch with a load job, or with `bq_write.backfill_method` set to
+    "stream" buffers streaming inserts without blocking.
+    """
+    from stravabqsync.adapters.gcp._repositories import LOAD, STREAM
+
+    app_config = get_app_config()
+    config = app_config.bq_write
+    if config.backfill_method == LOAD:
+        return _activities_repo_class()(
+            client=make_bigquery_client_wrapper(),
+            dataset_name=app_config.bq_dataset,
+            method=LOAD,
+            load_format=config.load_format,
+            fingerprint_exclude=config.fingerprint_exclude,
+        )
+    if config.backfill_method != STREAM:
+        raise ConfigurationError(
+            f"Invalid GCP_BIGQUERY_BACKFILL_METHOD {config.backfill_method!r}, "
+            f"expected {LOAD!r} or {STREAM!r}"
+        )
+    return _make_buffer(make_activities_repo(), blocking=False)
+
+
+def make_async_write_activities() -> AsyncWriteActivities:
+    """`make_write_activities()` for asyncio, writing on worker threads"""
+    return ThreadedWriteActivities(make_write_activities())
+
+
+def make_async_backfill_write_activities() -> AsyncWriteActivities:
+    """`make_backfill_write_activities()` for asyncio, writing on worker
+    threads"""
+    return ThreadedWriteActivities(make_backfill_write_activities())
+
+
+@container.singleton
+def make_read_fingerprints() -> ReadFingerprints:
+    from stravabqsync.adapters.gcp._repositories import ReadFingerprintsRepo
+
+    return ReadFingerprintsRepo(
+        client=make_bigquery_client_wrapper(),
+        dataset_name=get_app_config().bq_dataset,
+    )
+
+
+@container.singleton
+def make_changes_repo() -> "WriteChangesRepo":
+    from stravabqsync.adapters.gcp._repositories import WriteChangesRepo
+
+    return WriteChangesRepo(
+        client=make_bigquery_client_wrapper(),
+        dataset_name=get_app_config().bq_dataset,
+    )
+
+
+@container.singleton
+def make_write_changes() -> WriteChanges:
+    """Change-log writer for the webhook path, coalescing concurrently
+    delivered changes to the same activity"""
+    from stravabqsync.adapters.gcp._buffer import CoalescingWriteChanges
+
+    config = get_app_config().bq_write
+    buffer = CoalescingWriteChanges(
+        make_changes_repo(),
+        window=config.change_window,
+        max_rows=config.buffer_max_rows,
+    )
+    container.on_close("change buffer", buffer.close)
+    return buffer
+
+
+def make_compact_activities(*, settle_seconds: int | None = None) -> CompactActivities:
+    """Compaction job for the `activities_current` table
+
+    Args:
+        settle_seconds: Leave rows synced this recently for the next run.
+            Defaults to five minutes.
+    """
+    from stravabqsync.adapters.gcp._compaction import (
+        DEFAULT_SETTLE_SECONDS,
+        CompactActivitiesRepo,
+    )
+
+    return CompactActivitiesRepo(
+        client=make_bigquery_client_wrapper(),
+        dataset_name=get_app_config().bq_dataset,
+        settle_seconds=(
+            DEFAULT_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        ),
+    )
+
+
+def make_secret_manager_token_cache(secret_id: str) -> TokenCache:
+    from stravabqsync.adapters.gcp._secrets import (
+        SecretManagerStore,
+        SecretStoreTokenCache,
+    )
+
+    return SecretStoreTokenCache(
+        SecretManagerStore(project_id=get_app_config().project_id),
+        secret_id=secret_id,
     )
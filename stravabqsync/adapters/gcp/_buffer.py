@@ -0,0 +1,346 @@
+"""Micro-batching write buffers for BigQuery streaming inserts"""
+
+import logging
+import threading
+import time
+from typing import Mapping, Sequence
+
+from stravabqsync.adapters.gcp._serialization import serialize_row
+from stravabqsync.domain import ActivityChange, StravaActivity
+from stravabqsync.exceptions import BigQueryError, PartialWriteError
+from stravabqsync.ports.out.write import WriteActivities, WriteChanges
+
+logger = logging.getLogger(__name__)
+
+# insertAll rejects requests over 10MB; leave headroom for the request envelope
+MAX_REQUEST_BYTES = 9 * 1024 * 1024
+
+
+class _Pending:
+    """Outcome of one insert, for any writers waiting on it"""
+
+    def __init__(self) -> None:
+        self.error: Exception | None = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def finish(self, error: Exception | None) -> None:
+        self.error = error
+        self._done.set()
+
+    def wait(self) -> list[int]:
+        """Wait for the insert and return the IDs of activities that failed
+        while the rest of the batch was written. Raises the insert error if
+        the whole batch failed."""
+        self._done.wait()
+        if isinstance(self.error, PartialWriteError):
+            return self.error.activity_ids
+        if self.error is not None:
+            raise self.error
+        return []
+
+
+class _Batch(_Pending):
+    """Activities flushed together in one insert, with their serialized rows"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.activities: list[StravaActivity] = []
+        self.rows: list[bytes] = []
+        self.digests: dict[int, str] = {}
+        self.size = 0
+
+    def add(self, activity: StravaActivity, row: bytes, digest: str | None) -> None:
+        self.activities.append(activity)
+        self.rows.append(row)
+        if digest is not None:
+            self.digests[activity.id] = digest
+        self.size += len(row)
+
+
+class _ChangeBatch(_Pending):
+    """Changes flushed together in one insert, at most one per activity"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.changes: dict[int, ActivityChange] = {}
+
+    def add(self, change: ActivityChange) -> None:
+        pending = self.changes.get(change.id)
+        self.changes[change.id] = change if pending is None else pending.merge(change)
+
+
+def _raise_own_failures(batches: Sequence[_Pending], own_ids: set[int]) -> None:
+    """Wait for `batches` and raise PartialWriteError for failed `own_ids`"""
+    failed_ids = [i for batch in batches for i in batch.wait() if i in own_ids]
+    if failed_ids:
+        raise PartialWriteError(
+            f"Failed to write {len(failed_ids)} of {len(own_ids)} rows",
+            activity_ids=failed_ids,
+        )
+
+
+class BufferedWriteActivities(WriteActivities):
+    """Collect activities and write them in batches.
+
+    A batch is written as soon as it reaches `max_rows` rows or `max_bytes` of
+    serialized JSON, or `max_latency` seconds after its first row arrived,
+    whichever comes first. Activities are serialized once, when they are
+    added, unless already given serialized, and passed on to `writer`, which
+    writes those bytes rather than encoding the activities again.
+
+    With `blocking=True` (the webhook path) writers wait until their batch
+    has been written, so concurrent requests share one insert but each still
+    only returns once its row is stored, and sees the insert's error if it
+    failed. A partially failed insert raises PartialWriteError only for the
+    writers whose activities failed. With `blocking=False` (the backfill path)
+    writes return immediately, as `deferred` says, and insert errors are
+    raised by the next `flush()` or `close()`.
+    """
+
+    def __init__(
+        self,
+        writer: WriteActivities,
+        *,
+        max_rows: int = 500,
+        max_bytes: int = MAX_REQUEST_BYTES,
+        max_latency: float = 1.0,
+        blocking: bool = True,
+    ):
+        self._writer = writer
+        self._max_rows = max_rows
+        self._max_bytes = max_bytes
+        self._max_latency = max_latency
+        self._blocking = blocking
+        self.deferred = not blocking
+        self._lock = threading.Lock()
+        self._batch = _Batch()
+        self._timer: threading.Timer | None = None
+        self._errors: list[Exception] = []
+        self._closed = False
+
+    def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        self.write_activities(
+            [activity], digests=None if digest is None else {activity.id: digest}
+        )
+
+    def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        if serialized is not None and len(serialized) != len(activities):
+            raise ValueError(
+                f"Got {len(serialized)} rows for {len(activities)} activities"
+            )
+        digests = digests or {}
+        rows = serialized or [serialize_row(activity) for activity in activities]
+        full: list[_Batch] = []
+        joined: list[_Batch] = []
+        with self._lock:
+            if self._closed:
+                raise BigQueryError("Write buffer is closed")
+            for activity, row in zip(activities, rows):
+                if self._batch.activities and (
+                    len(self._batch.activities) >= self._max_rows
+                    or self._batch.size + len(row) > self._max_bytes
+                ):
+                    full.append(self._detach())
+                self._batch.add(activity, row, digests.get(activity.id))
+                if not joined or joined[-1] is not self._batch:
+                    joined.append(self._batch)
+            if len(self._batch.activities) >= self._max_rows:
+                full.append(self._detach())
+            elif self._batch.activities and self._timer is None:
+                self._timer = threading.Timer(
+                    self._max_latency, self._flush_due, args=(self._batch,)
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+        for batch in full:
+            self._write(batch)
+        if self._blocking:
+            _raise_own_failures(joined, {activity.id for activity in activities})
+
+    def flush(self) -> None:
+        """Write all buffered activities now.
+
+        Raises:
+            PartialWriteError: If inserts since the last flush only failed for
+                some activities, with the IDs of all of them.
+            Exception: The first insert error since the last flush that
+                failed a whole batch.
+        """
+        with self._lock:
+            batch = self._detach() if self._batch.activities else None
+        if batch is not None:
+            self._write(batch)
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if batch is not None and batch.error is not None and self._blocking:
+            errors.append(batch.error)
+        partial: list[PartialWriteError] = []
+        for error in errors:
+            if not isinstance(error, PartialWriteError):
+                raise error
+            partial.append(error)
+        if partial:
+            failed_ids = [i for e in partial for i in e.activity_ids]
+            raise PartialWriteError(
+                f"Failed to write {len(failed_ids)} buffered activities",
+                [row for e in partial for row in e.errors],
+                activity_ids=failed_ids,
+            )
+
+    def warm_up(self) -> None:
+        self._writer.warm_up()
+
+    def close(self) -> None:
+        """Flush and stop accepting writes. Safe to call more than once."""
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._closed = True
+
+    def _detach(self) -> _Batch:
+        """Swap in an empty batch and return the current one (lock held)"""
+        batch, self._batch = self._batch, _Batch()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush_due(self, batch: _Batch) -> None:
+        with self._lock:
+            if batch is not self._batch:
+                return  # already flushed by size or explicitly
+            self._detach()
+        self._write(batch)
+
+    def _write(self, batch: _Batch) -> None:
+        try:
+            self._writer.write_activities(
+                batch.activities, digests=batch.digests, serialized=batch.rows
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to write batch of %d rows", len(batch.activities))
+            if not self._blocking:
+                with self._lock:
+                    self._errors.append(e)
+            batch.finish(e)
+        else:
+            batch.finish(None)
+
+
+class CoalescingWriteChanges(WriteChanges):
+    """Write activity changes, merging changes to the same activity that
+    are delivered concurrently into one row.
+
+    At most one insert is in flight. A writer that finds none writes its
+    changes right away; changes arriving meanwhile are collected and written
+    together, in one insert, as soon as it finishes. Sequential deliveries
+    are therefore written one by one without delay, and only overlapping
+    ones, e.g. redeliveries or a burst of edits to several activities, are
+    coalesced. With a `window`, each insert first waits that many seconds
+    for more changes to join it, trading latency for fewer rows.
+
+    A batch holds changes to at most `max_rows` activities. Writers wait
+    until their changes have been written, and see the insert's error if it
+    failed.
+    """
+
+    def __init__(
+        self,
+        writer: WriteChanges,
+        *,
+        window: float = 0.0,
+        max_rows: int = 500,
+    ):
+        self._writer = writer
+        self._window = window
+        self._max_rows = max_rows
+        self._lock = threading.Condition()
+        self._batch = _ChangeBatch()
+        self._full: list[_ChangeBatch] = []
+        self._writing = False
+        self._closed = False
+
+    def write_changes(self, changes: list[ActivityChange]) -> None:
+        joined: list[_ChangeBatch] = []
+        with self._lock:
+            if self._closed:
+                raise BigQueryError("Change buffer is closed")
+            for change in changes:
+                if (
+                    change.id not in self._batch.changes
+                    and len(self._batch.changes) >= self._max_rows
+                ):
+                    self._full.append(self._batch)
+                    self._batch = _ChangeBatch()
+                self._batch.add(change)
+                if not joined or joined[-1] is not self._batch:
+                    joined.append(self._batch)
+
+        self._commit(joined, linger=True)
+        _raise_own_failures(joined, {change.id for change in changes})
+
+    def flush(self) -> None:
+        """Write all buffered changes now, raising the first insert error"""
+        with self._lock:
+            batches = list(self._full)
+            if self._batch.changes:
+                batches.append(self._batch)
+        self._commit(batches, linger=False)
+        for batch in batches:
+            if batch.error is not None:
+                raise batch.error
+
+    def close(self) -> None:
+        """Flush and stop accepting changes. Safe to call more than once."""
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._closed = True
+
+    def _commit(self, batches: Sequence[_ChangeBatch], *, linger: bool) -> None:
+        """Return once `batches` are written. Whichever waiting writer finds
+        no insert in flight writes the oldest pending batch."""
+        while True:
+            with self._lock:
+                while self._writing and not all(b.done for b in batches):
+                    self._lock.wait()
+                if all(b.done for b in batches):
+                    return
+                self._writing = True
+            try:
+                if linger and self._window > 0:
+                    time.sleep(self._window)
+                with self._lock:
+                    if self._full:
+                        batch = self._full.pop(0)
+                    else:
+                        batch, self._batch = self._batch, _ChangeBatch()
+                self._write(batch)
+            finally:
+                with self._lock:
+                    self._writing = False
+                    self._lock.notify_all()
+
+    def _write(self, batch: _ChangeBatch) -> None:
+        try:
+            self._writer.write_changes(list(batch.changes.values()))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Failed to write batch of %d changes", len(batch.changes))
+            batch.finish(e)
+        else:
+            batch.finish(None)
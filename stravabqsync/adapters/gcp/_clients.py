@@ -1,33 +1,344 @@
+import json
 import logging
+import time
+import uuid
+from typing import IO, Any, Callable, Sequence
 
-from google.cloud.bigquery import Client, SchemaField, Table
+from google.api_core.exceptions import GoogleAPICallError, NotFound
+from google.cloud.bigquery import (
+    Client,
+    LoadJobConfig,
+    SchemaField,
+    SourceFormat,
+    Table,
+    TableReference,
+    TimePartitioning,
+    TimePartitioningType,
+    WriteDisposition,
+)
+from google.cloud.bigquery.format_options import ParquetOptions
+from google.cloud.bigquery.retry import DEFAULT_RETRY, DEFAULT_TIMEOUT
 
+from stravabqsync.adapters.gcp._serialization import build_insert_all_body
 from stravabqsync.exceptions import BigQueryError
 
 logger = logging.getLogger(__name__)
 
+# Row error reasons worth resubmitting. "stopped" marks valid rows that were
+# rejected only because another row in the same request was invalid.
+#   https://cloud.google.com/bigquery/docs/error-messages
+TRANSIENT_INSERT_REASONS = frozenset(
+    {"backendError", "internalError", "rateLimitExceeded", "stopped", "timeout"}
+)
+
+
+def _is_transient(row_error: dict) -> bool:
+    reasons = [e.get("reason") for e in row_error.get("errors", [])]
+    return bool(reasons) and all(r in TRANSIENT_INSERT_REASONS for r in reasons)
+
+
+def _insert_all(
+    client: Client,
+    table_id: str,
+    rows: Sequence[bytes],
+    insert_ids: Sequence[str],
+) -> list[dict]:
+    """Send serialized `rows` to the insertAll API as they are, and return
+    the row errors
+
+    `Client.insert_rows_json` only accepts dicts and would re-encode every
+    row, so the request body is posted with the client's connection, which
+    is private to google-cloud-bigquery. This is the only use of it; it is
+    tested over HTTP against the installed library. Should a release drop
+    `Client._connection.api_request`, rows are decoded and sent with
+    `insert_rows_json` instead.
+    """
+    connection = getattr(client, "_connection", None)
+    api_request = getattr(connection, "api_request", None)
+    if not callable(api_request):
+        logger.warning(
+            "google-cloud-bigquery has no Client._connection.api_request, "
+            "inserting decoded rows"
+        )
+        return list(
+            client.insert_rows_json(
+                table_id, [json.loads(row) for row in rows], row_ids=list(insert_ids)
+            )
+        )
+    response = DEFAULT_RETRY(api_request)(
+        method="POST",
+        path=f"{TableReference.from_string(table_id).path}/insertAll",
+        data=build_insert_all_body(rows, insert_ids),
+        content_type="application/json",
+        timeout=DEFAULT_TIMEOUT,
+    )
+    return [
+        {"index": int(error["index"]), "errors": error["errors"]}
+        for error in response.get("insertErrors", ())
+    ]
+
 
 class BigQueryClientWrapper:
-    def __init__(self, *, project_id: str):
+    def __init__(
+        self,
+        *,
+        project_id: str,
+        max_attempts: int = 3,
+        backoff_seconds: float = 1.0,
+    ):
         self.project_id = project_id
         self._client = Client(project=project_id)
+        self._max_attempts = max_attempts
+        self._backoff_seconds = backoff_seconds
 
     def insert_rows_json(
         self, rows: list[dict], *, dataset_name: str, table_name: str
     ) -> None:
         """Insert each dict in rows as a new row in `dataset.table_name`
         https://cloud.google.com/bigquery/docs/samples/bigquery-table-insert-rows#bigquery_table_insert_rows-python
+
+        Rows rejected for a transient reason are resubmitted on their own, with
+        exponential backoff, up to `max_attempts` requests in total. Rows that
+        were inserted are never sent again.
+
+        Raises:
+            BigQueryError: If the request failed as a whole (`failed_rows` is
+                None), or if some rows failed permanently or ran out of
+                attempts (`failed_rows` holds their indices in `rows`).
+        """
+        table_id = f"{self.project_id}.{dataset_name}.{table_name}"
+        self._insert_with_retries(
+            table_id,
+            len(rows),
+            lambda pending: self._client.insert_rows_json(
+                table_id, [rows[i] for i in pending]
+            ),
+        )
+
+    def insert_serialized_rows(
+        self,
+        rows: Sequence[bytes],
+        *,
+        dataset_name: str,
+        table_name: str,
+        insert_ids: Sequence[str] | None = None,
+    ) -> None:
+        """Insert rows that are already encoded as JSON objects, e.g. by
+        `serialize_row`, into `dataset.table_name`
+
+        Same as `insert_rows_json`, but the request body is assembled from the
+        encoded rows instead of being re-encoded from dicts. Retried rows keep
+        their insert ID, so BigQuery can deduplicate them.
+        https://cloud.google.com/bigquery/docs/reference/rest/v2/tabledata/insertAll
+
+        Raises:
+            BigQueryError: As `insert_rows_json`.
+        """
+        table_id = f"{self.project_id}.{dataset_name}.{table_name}"
+        if insert_ids is None:
+            insert_ids = [str(uuid.uuid4()) for _ in rows]
+        self._insert_with_retries(
+            table_id,
+            len(rows),
+            lambda pending: _insert_all(
+                self._client,
+                table_id,
+                [rows[i] for i in pending],
+                [insert_ids[i] for i in pending],
+            ),
+        )
+
+    def _insert_with_retries(
+        self,
+        table_id: str,
+        n_rows: int,
+        send: Callable[[list[int]], Sequence[dict]],
+    ) -> None:
+        """Call `send` with the indices of the rows to insert until every row
+        is inserted or has failed. `send` returns the insertAll row errors,
+        indexed into the rows it was given."""
+        pending = list(range(n_rows))
+        failed: dict[int, dict] = {}
+        for attempt in range(self._max_attempts):
+            errors = send(pending)
+            if any("index" not in error for error in errors):
+                raise BigQueryError(
+                    f"Failed to insert {n_rows} rows into {table_id}", errors
+                )
+            retry = []
+            for error in errors:
+                row = pending[error["index"]]
+                if _is_transient(error) and attempt < self._max_attempts - 1:
+                    retry.append(row)
+                else:
+                    failed[row] = {**error, "index": row}
+            pending = sorted(retry)
+            if not pending:
+                break
+            delay = self._backoff_seconds * 2**attempt
+            logger.warning(
+                "Retrying %d of %d rows for %s in %.1f seconds (attempt %d/%d)",
+                len(pending),
+                n_rows,
+                table_id,
+                delay,
+                attempt + 1,
+                self._max_attempts,
+            )
+            time.sleep(delay)
+
+        if failed:
+            failed_rows = sorted(failed)
+            raise BigQueryError(
+                f"Failed to insert {len(failed_rows)} of {n_rows} rows into {table_id}",
+                [failed[i] for i in failed_rows],
+                failed_rows=failed_rows,
+            )
+        logger.info("Successfully inserted %s rows into %s.", n_rows, table_id)
+
+    def load_table_from_file(
+        self,
+        file_obj: IO[bytes],
+        *,
+        dataset_name: str,
+        table_name: str,
+        schema: list[SchemaField],
+        source_format: str = SourceFormat.NEWLINE_DELIMITED_JSON,
+    ) -> None:
+        """Append the rows staged in `file_obj` to `dataset.table_name` with a
+        load job, and wait for the job to finish
+        https://cloud.google.com/bigquery/docs/samples/bigquery-load-table-file
+
+        Load jobs are atomic: either every row is loaded or none is.
+
+        Raises:
+            BigQueryError: If the load job failed.
         """
         table_id = f"{self.project_id}.{dataset_name}.{table_name}"
-        errors = self._client.insert_rows_json(table_id, rows)
-        if len(errors) > 0:
+        job_config = LoadJobConfig(
+            schema=schema,
+            source_format=source_format,
+            write_disposition=WriteDisposition.WRITE_APPEND,
+        )
+        if source_format == SourceFormat.PARQUET:
+            parquet_options = ParquetOptions()
+            parquet_options.enable_list_inference = True
+            job_config.parquet_options = parquet_options
+        job = self._client.load_table_from_file(
+            file_obj, table_id, rewind=True, job_config=job_config
+        )
+        try:
+            job.result()
+        except GoogleAPICallError as e:
             raise BigQueryError(
-                f"Failed to insert {len(rows)} rows into {table_id}", errors
+                f"Load job {job.job_id} into {table_id} failed", job.errors
+            ) from e
+        logger.info("Loaded %s rows into %s.", job.output_rows, table_id)
+
+    def run_query(self, sql: str) -> None:
+        """Run a query or multi-statement script and wait for it to finish
+
+        Raises:
+            BigQueryError: If the query job failed.
+        """
+        self._query(sql)
+
+    def fetch_rows(self, sql: str) -> list[dict[str, Any]]:
+        """Run a query and return its rows
+
+        Raises:
+            BigQueryError: If the query job failed.
+        """
+        return [dict(row.items()) for row in self._query(sql)]
+
+    def _query(self, sql: str) -> Any:
+        job = self._client.query(sql)
+        try:
+            rows = job.result()
+        except GoogleAPICallError as e:
+            raise BigQueryError(f"Query job {job.job_id} failed", job.errors) from e
+        logger.info(
+            "Query job %s processed %s bytes.", job.job_id, job.total_bytes_processed
+        )
+        return rows
+
+    def table_columns(self, *, dataset_name: str, table_name: str) -> set[str]:
+        """Names of the top-level columns of `dataset.table_name`. Reading the
+        table's metadata also fetches credentials and opens a connection, so
+        this doubles as a warm-up.
+
+        Raises:
+            google.api_core.exceptions.GoogleAPICallError: If the request
+                fails, e.g. because the table doesn't exist.
+        """
+        table = self._client.get_table(f"{self.project_id}.{dataset_name}.{table_name}")
+        return {field.name for field in table.schema}
+
+    def add_columns(
+        self, table_id: str, *, schema: list[SchemaField], missing_ok: bool = False
+    ) -> list[str]:
+        """Add the top-level columns of `schema` that `table_id` doesn't have
+        yet, e.g. after a release added nullable columns, and return their
+        names. Existing columns are left alone.
+
+        Args:
+            missing_ok: Do nothing if `table_id` doesn't exist.
+        """
+        try:
+            table = self._client.get_table(table_id)
+        except NotFound:
+            if missing_ok:
+                return []
+            raise
+        existing = {field.name for field in table.schema}
+        added = [field for field in schema if field.name not in existing]
+        if added:
+            table.schema = [*table.schema, *added]
+            self._client.update_table(table, ["schema"])
+            logger.info(
+                "Added columns %s to %s.", ", ".join(f.name for f in added), table_id
             )
-        logger.info("Successfully inserted %s rows into %s.", len(rows), table_id)
+        return [field.name for field in added]
+
+    def close(self) -> None:
+        """Close the client's connection pool"""
+        self._client.close()
+
+    def create_table(
+        self,
+        table_id: str,
+        *,
+        schema: list[SchemaField],
+        partition_field: str | None = None,
+        partition_expiration_days: int | None = None,
+        clustering_fields: Sequence[str] = (),
+        exists_ok: bool = False,
+    ) -> Table:
+        """Create BigQuery table
 
-    def create_table(self, table_id: str, *, schema: list[SchemaField]) -> Table:
-        """Create BigQuery table"""
+        Args:
+            partition_field: TIMESTAMP or DATE column to partition the table on
+                by day, so queries filtering on it only scan matching days.
+            partition_expiration_days: Delete partitions this many days after
+                their date. Requires `partition_field`.
+            clustering_fields: Top-level columns, up to four, to sort the
+                storage blocks by, so filters on them skip blocks.
+            exists_ok: Return the existing table instead of failing if
+                `table_id` already exists.
+        """
         table = Table(table_id, schema=schema)
-        table = self._client.create_table(table)
-        return table
+        if partition_field is not None:
+            table.time_partitioning = TimePartitioning(
+                type_=TimePartitioningType.DAY,
+                field=partition_field,
+                expiration_ms=(
+                    partition_expiration_days * 24 * 60 * 60 * 1000
+                    if partition_expiration_days is not None
+                    else None
+                ),
+            )
+        elif partition_expiration_days is not None:
+            raise ValueError("partition_expiration_days requires partition_field")
+        if clustering_fields:
+            table.clustering_fields = list(clustering_fields)
+        return self._client.create_table(table, exists_ok=exists_ok)
@@ -0,0 +1,227 @@
+"""Incremental compaction of activities and changes into current state
+
+The `activities` and `changes` tables are append-only logs. Reading the
+current state of an athlete's activities from them means deduplicating and
+joining both in full on every query. `activities_current` holds that state
+instead, and `compact()` brings it up to date with a single script that only
+applies rows written since the previous run's watermark.
+  https://cloud.google.com/bigquery/docs/reference/standard-sql/dml-syntax#merge_statement
+
+Activity rows are read from the `activities` partitions that the table's
+partition metadata reports as modified since the watermark, and changes from
+the `changes` partitions since then, as that table is partitioned on
+`synced_at`. A run's cost therefore follows the days written to since the
+last run, not the size of the history. The first run reads every partition.
+Streamed rows still in the streaming buffer are applied once BigQuery moves
+them into their partition, which counts as a modification.
+  https://cloud.google.com/bigquery/docs/information-schema-partitions
+"""
+
+from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+from stravabqsync.ports.out.write import CompactActivities
+
+# Rows become visible to queries shortly after a streaming insert returns, and
+# are stamped with `synced_at` before it is sent. Leaving the newest rows for
+# the next run keeps late-arriving rows from falling behind the watermark.
+DEFAULT_SETTLE_SECONDS = 300
+
+# An activity row can be written well after the edit or deletion of that
+# activity was logged, e.g. when a spooled sync is replayed. Edits wait this
+# long for their activity to be compacted, and activity rows are checked
+# against deletions logged this long before the watermark. Activity rows
+# synced longer ago were applied by an earlier run.
+LATE_ROW_DAYS = 7
+
+_SCRIPT = """
+DECLARE since TIMESTAMP;
+DECLARE until TIMESTAMP DEFAULT TIMESTAMP_SUB(
+  CURRENT_TIMESTAMP(), INTERVAL {settle_seconds} SECOND
+);
+DECLARE late_since TIMESTAMP;
+DECLARE changed_days ARRAY<DATE>;
+
+CREATE TABLE IF NOT EXISTS `{current}` LIKE `{activities}`;
+CREATE TABLE IF NOT EXISTS `{watermarks}` (
+  table_name STRING NOT NULL,
+  watermark TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS `{pending}` (
+  id INT64 NOT NULL,
+  event_time TIMESTAMP NOT NULL,
+  title STRING,
+  `type` STRING,
+  `private` BOOL,
+  synced_at TIMESTAMP
+);
+
+SET since = (
+  SELECT IFNULL(MAX(watermark), TIMESTAMP "1970-01-01")
+  FROM `{watermarks}`
+  WHERE table_name = "{current_name}"
+);
+SET late_since = TIMESTAMP_SUB(since, INTERVAL {late_row_days} DAY);
+-- Days of activities written to since the watermark. Rows written while the
+-- script runs modify their partition after it, so the next run reads them.
+SET changed_days = (
+  SELECT ARRAY_AGG(PARSE_DATE("%Y%m%d", partition_id))
+  FROM `{partitions}`
+  WHERE table_name = "{activities_name}"
+    AND partition_id NOT IN ("__NULL__", "__UNPARTITIONED__")
+    AND last_modified_time >= since
+);
+
+BEGIN TRANSACTION;
+
+-- Latest version of each activity in those days. Repeated inserts of the
+-- same activity collapse into one row, and rows applied by an earlier run
+-- change nothing. Rows without `synced_at`, written before that column
+-- existed, are only read by the first run.
+MERGE `{current}` AS t
+USING (
+  SELECT {columns}
+  FROM `{activities}`
+  WHERE DATE(start_date) IN UNNEST(changed_days)
+    AND IFNULL(synced_at, TIMESTAMP "1970-01-01") >= late_since
+    AND id NOT IN (
+      SELECT id
+      FROM `{changes}`
+      WHERE synced_at >= late_since AND synced_at < until AND was_deleted
+    )
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY id ORDER BY synced_at DESC) = 1
+) AS s
+ON t.id = s.id
+WHEN MATCHED AND s.synced_at > IFNULL(t.synced_at, TIMESTAMP "1970-01-01") THEN
+  UPDATE SET {assignments}
+WHEN NOT MATCHED THEN
+  INSERT ({columns}) VALUES ({source_columns});
+
+-- Edits logged since the watermark, and earlier edits still waiting for
+-- their activity
+CREATE TEMP TABLE edits AS
+SELECT id, event_time, title, `type`, `private`, synced_at
+FROM `{changes}`
+WHERE synced_at >= since AND synced_at < until AND NOT was_deleted
+UNION ALL
+SELECT id, event_time, title, `type`, `private`, synced_at
+FROM `{pending}`
+WHERE synced_at >= late_since;
+
+-- Apply the edits, unless the activity was fetched again after them
+UPDATE `{current}` AS t
+SET
+  `name` = IFNULL(c.title, t.`name`),
+  `type` = IFNULL(c.`type`, t.`type`),
+  `private` = IFNULL(c.`private`, t.`private`)
+FROM (
+  SELECT
+    id,
+    ARRAY_AGG(title IGNORE NULLS ORDER BY event_time DESC LIMIT 1)[SAFE_OFFSET(0)]
+      AS title,
+    ARRAY_AGG(`type` IGNORE NULLS ORDER BY event_time DESC LIMIT 1)[SAFE_OFFSET(0)]
+      AS `type`,
+    ARRAY_AGG(`private` IGNORE NULLS ORDER BY event_time DESC LIMIT 1)[
+      SAFE_OFFSET(0)] AS `private`,
+    MAX(synced_at) AS synced_at
+  FROM edits
+  GROUP BY id
+) AS c
+WHERE t.id = c.id AND (t.synced_at IS NULL OR c.synced_at > t.synced_at);
+
+DELETE FROM `{current}`
+WHERE id IN (
+  SELECT id
+  FROM `{changes}`
+  WHERE synced_at >= since AND synced_at < until AND was_deleted
+);
+
+-- Carry edits to activities not compacted yet over to the next run
+DELETE FROM `{pending}` WHERE TRUE;
+INSERT INTO `{pending}` (id, event_time, title, `type`, `private`, synced_at)
+SELECT id, event_time, title, `type`, `private`, synced_at
+FROM edits
+WHERE id NOT IN (SELECT id FROM `{current}`)
+  AND id NOT IN (
+    SELECT id
+    FROM `{changes}`
+    WHERE synced_at >= late_since AND synced_at < until AND was_deleted
+  );
+
+MERGE `{watermarks}` AS w
+USING (SELECT "{current_name}" AS table_name, until AS watermark) AS n
+ON w.table_name = n.table_name
+WHEN MATCHED THEN
+  UPDATE SET watermark = n.watermark
+WHEN NOT MATCHED THEN
+  INSERT ROW;
+
+COMMIT TRANSACTION;
+"""
+
+
+class CompactActivitiesRepo(CompactActivities):
+    """Keep the BigQuery `activities_current` table up to date
+
+    Each `compact()` call merges the newest version of every activity written
+    since the last watermark, applies logged edits, removes deleted
+    activities and advances the watermark, all in one transaction. A failed
+    run leaves the table and watermark unchanged, so the next run retries the
+    same rows. Rows synced less than `settle_seconds` ago are left for the
+    next run. Edits to activities that aren't in `activities_current` yet are
+    kept in `compaction_pending_changes` and applied by a later run, for up
+    to `LATE_ROW_DAYS`.
+    """
+
+    def __init__(
+        self,
+        client: BigQueryClientWrapper,
+        *,
+        dataset_name: str,
+        settle_seconds: int = DEFAULT_SETTLE_SECONDS,
+    ):
+        self._client = client
+        self._dataset_name = dataset_name
+        self._settle_seconds = settle_seconds
+
+    def compact(self) -> None:
+        """Run the compaction script
+
+        Raises:
+            BigQueryError: If the script failed; nothing is applied.
+        """
+        self._client.run_query(self.script())
+
+    def add_missing_columns(self) -> list[str]:
+        """Add the columns of the Strava Activity schema that an existing
+        `activities_current` table doesn't have yet, and return their names.
+        Does nothing before the first run created the table."""
+        return self._client.add_columns(
+            self._table_id("activities_current"),
+            schema=STRAVA_ACTIVITY_SCHEMA,
+            missing_ok=True,
+        )
+
+    def script(self) -> str:
+        """The compaction script for this dataset"""
+        return _SCRIPT.format(
+            activities=self._table_id("activities"),
+            activities_name="activities",
+            partitions=self._table_id("INFORMATION_SCHEMA.PARTITIONS"),
+            changes=self._table_id("changes"),
+            current=self._table_id("activities_current"),
+            current_name="activities_current",
+            watermarks=self._table_id("compaction_watermarks"),
+            pending=self._table_id("compaction_pending_changes"),
+            settle_seconds=int(self._settle_seconds),
+            late_row_days=LATE_ROW_DAYS,
+            columns=", ".join(f"`{field.name}`" for field in STRAVA_ACTIVITY_SCHEMA),
+            source_columns=", ".join(
+                f"s.`{field.name}`" for field in STRAVA_ACTIVITY_SCHEMA
+            ),
+            assignments=", ".join(
+                f"`{field.name}` = s.`{field.name}`" for field in STRAVA_ACTIVITY_SCHEMA
+            ),
+        )
+
+    def _table_id(self, table_name: str) -> str:
+        return f"{self._client.project_id}.{self._dataset_name}.{table_name}"
@@ -0,0 +1,323 @@
+"""Encode rows exactly as a BigQuery table schema expects
+
+`schemas.py` and the domain models are maintained separately, so a row can
+drift from its table, e.g. an INTEGER value for a STRING column or a field the
+table doesn't have. BigQuery only reports such rows after the insert round
+trip. Instead, each schema is compiled once into a pydantic-core validator
+that coerces every row to the column types and rejects rows that can't be,
+before anything is sent.
+
+Validating every row that way costs more than serializing it. Rows built from
+a model are therefore checked against the schema once per model type: if
+every field's type already encodes as its column expects, the model's own
+serialization is used as is, after a per-row check that its REQUIRED and
+REPEATED columns aren't null. Only models that don't fit are validated row by
+row.
+"""
+
+import types
+from datetime import datetime
+from functools import lru_cache
+from typing import (
+    Any,
+    Iterable,
+    Mapping,
+    NamedTuple,
+    Sequence,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from google.cloud.bigquery import SchemaField
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    TypeAdapter,
+    ValidationError,
+    create_model,
+)
+
+from stravabqsync.adapters.gcp._serialization import serialize_row, with_fields
+from stravabqsync.exceptions import DataValidationError
+
+_SCALAR_TYPES: dict[str, Any] = {
+    "STRING": str,
+    "INTEGER": int,
+    "FLOAT": float,
+    "BOOLEAN": bool,
+    "TIMESTAMP": datetime,
+    # Domain models already hold JSON columns as JSON text
+    "JSON": Any,
+}
+
+_ROW_CONFIG = ConfigDict(extra="forbid", coerce_numbers_to_str=True)
+
+# Python types whose values encode as valid values of each column type
+_FITTING_TYPES: dict[str, tuple[type, ...]] = {
+    "STRING": (str,),
+    "INTEGER": (int,),
+    "FLOAT": (float, int),
+    "BOOLEAN": (bool,),
+    "TIMESTAMP": (datetime,),
+}
+
+
+class _Plan(NamedTuple):
+    """How rows of one model type are encoded for a schema
+
+    Attributes:
+      fits: Whether the model's serialization fits the schema as is. If not,
+        rows are validated in full.
+      not_null: Fields of REQUIRED or REPEATED columns, checked for None
+        per row since e.g. `model_copy(update=...)` skips validation
+      required_extra: REQUIRED columns the model lacks, to be given as extra
+        fields
+    """
+
+    fits: bool
+    not_null: tuple[str, ...] = ()
+    required_extra: frozenset[str] = frozenset()
+
+
+class RowEncoder:
+    """Validate and encode rows for one table schema
+
+    Rows are coerced to the column types, e.g. numbers to STRING columns and
+    ints to FLOAT columns. Fields missing from a row are left out of the
+    encoded row rather than sent as nulls, so BigQuery fills them in.
+    """
+
+    def __init__(self, schema: Sequence[SchemaField]):
+        self._model = _record_model("Row", schema)
+        self._columns = {field.name: field for field in schema}
+        self._plans: dict[tuple[type[BaseModel], frozenset[str]], _Plan] = {}
+        self._adapters: dict[str, TypeAdapter] = {}
+
+    def encode_model(
+        self,
+        model: BaseModel,
+        *,
+        exclude: frozenset[str] = frozenset(),
+        extra: Mapping[str, Any] | None = None,
+        serialized: bytes | None = None,
+    ) -> bytes:
+        """Encode `model` without its `exclude`d fields, plus the `extra`
+        ones, as a JSON object
+
+        Args:
+            serialized: `serialize_row(model, exclude=exclude)`, if already
+                at hand, to reuse for a model that fits the schema.
+
+        Raises:
+            DataValidationError: If the row doesn't fit the schema.
+        """
+        extra = extra or {}
+        plan = self._plan(type(model), exclude)
+        if serialized is None:
+            serialized = serialize_row(model, exclude=set(exclude) or None)
+        if not plan.fits:
+            return self.encode(with_fields(serialized, extra))
+        self._check_not_null(model, plan, extra)
+        return with_fields(serialized, self._encode_extra(extra))
+
+    def encode_model_python(
+        self,
+        model: BaseModel,
+        *,
+        exclude: frozenset[str] = frozenset(),
+        extra: Mapping[str, Any] | None = None,
+    ) -> dict:
+        """`encode_model` as a row of Python values
+
+        Raises:
+            DataValidationError: If the row doesn't fit the schema.
+        """
+        extra = extra or {}
+        plan = self._plan(type(model), exclude)
+        row = model.model_dump(exclude=set(exclude) or None)
+        if not plan.fits:
+            return self.encode_python({**row, **extra})
+        self._check_not_null(model, plan, extra)
+        return {**row, **self._encode_extra(extra)}
+
+    def encode(self, row: bytes) -> bytes:
+        """Encode a JSON object, e.g. from `serialize_row`, as a JSON object
+
+        Raises:
+            DataValidationError: If the row doesn't fit the schema.
+        """
+        # model_dump_json() minus its str decode and re-encode
+        return self._model.__pydantic_serializer__.to_json(
+            self._validate(row, self._model.model_validate_json),
+            by_alias=True,
+            exclude_unset=True,
+        )
+
+    def encode_python(self, row: dict) -> dict:
+        """Encode a row of Python values, e.g. from `model_dump()`, as a row of
+        Python values
+
+        Raises:
+            DataValidationError: If the row doesn't fit the schema.
+        """
+        return self._validate(row, self._model.model_validate).model_dump(
+            by_alias=True, exclude_unset=True
+        )
+
+    def _plan(self, model_type: type[BaseModel], exclude: frozenset[str]) -> _Plan:
+        key = (model_type, exclude)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = _compile_plan(model_type, exclude, self._columns)
+        return plan
+
+    @staticmethod
+    def _check_not_null(
+        model: BaseModel, plan: _Plan, extra: Mapping[str, Any]
+    ) -> None:
+        errors = [
+            f"{name}: Input should not be null"
+            for name in plan.not_null
+            if getattr(model, name) is None
+        ]
+        errors.extend(
+            f"{name}: Field required"
+            for name in sorted(plan.required_extra)
+            if extra.get(name) is None
+        )
+        if errors:
+            raise DataValidationError("; ".join(errors))
+
+    def _encode_extra(self, extra: Mapping[str, Any]) -> dict[str, Any]:
+        encoded = {}
+        for name, value in extra.items():
+            adapter = self._adapters.get(name)
+            if adapter is None:
+                if name not in self._columns:
+                    raise DataValidationError(f"{name}: Extra inputs are not permitted")
+                value_type, _ = _field_definition("Row", self._columns[name])
+                adapter = self._adapters[name] = TypeAdapter(
+                    value_type, config=_ROW_CONFIG
+                )
+            encoded[name] = self._validate(value, adapter.validate_python)
+        return encoded
+
+    @staticmethod
+    def _validate(row: Any, validate: Any) -> Any:
+        try:
+            return validate(row)
+        except ValidationError as e:
+            raise DataValidationError(_describe(e.errors())) from e
+
+
+@lru_cache(maxsize=None)
+def compile_encoder(schema: tuple[SchemaField, ...]) -> RowEncoder:
+    """The encoder for `schema`, compiled on first use"""
+    return RowEncoder(schema)
+
+
+def _compile_plan(
+    model_type: type[BaseModel],
+    exclude: frozenset[str],
+    columns: Mapping[str, SchemaField],
+) -> _Plan:
+    """Check the fields of `model_type`, except the `exclude`d ones, against
+    the schema `columns`"""
+    fields = {
+        name: annotation
+        for name, annotation in _annotations(model_type).items()
+        if name not in exclude
+    }
+    if not _fields_fit(fields, columns.values(), top_level=True):
+        return _Plan(fits=False)
+    return _Plan(
+        fits=True,
+        not_null=tuple(
+            name for name in fields if columns[name].mode in ("REQUIRED", "REPEATED")
+        ),
+        required_extra=frozenset(
+            name
+            for name, column in columns.items()
+            if column.mode == "REQUIRED" and name not in fields
+        ),
+    )
+
+
+def _annotations(model_type: type[BaseModel]) -> dict[str, Any]:
+    return {name: info.annotation for name, info in model_type.model_fields.items()}
+
+
+def _fields_fit(
+    fields: Mapping[str, Any],
+    columns: Iterable[SchemaField],
+    *,
+    top_level: bool = False,
+) -> bool:
+    """Whether values of the `fields` annotations always encode as valid rows
+    of `columns`. Top-level fields may be optional where their column isn't,
+    since they are checked for None per row."""
+    by_name = {column.name: column for column in columns}
+    if any(name not in by_name for name in fields):
+        return False
+    if not top_level and any(
+        column.mode == "REQUIRED" and name not in fields
+        for name, column in by_name.items()
+    ):
+        return False
+    return all(
+        _annotation_fits(annotation, by_name[name], nullable=top_level)
+        for name, annotation in fields.items()
+    )
+
+
+def _annotation_fits(annotation: Any, column: SchemaField, *, nullable: bool) -> bool:
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1 or not (nullable or column.mode == "NULLABLE"):
+            return False
+        annotation = args[0]
+    if column.mode == "REPEATED":
+        if get_origin(annotation) is not list:
+            return False
+        (annotation,) = get_args(annotation)
+    if column.field_type == "JSON":
+        return True
+    if column.field_type == "RECORD":
+        return (
+            isinstance(annotation, type)
+            and issubclass(annotation, BaseModel)
+            and _fields_fit(_annotations(annotation), column.fields)
+        )
+    fitting = _FITTING_TYPES.get(column.field_type, ())
+    if annotation is bool and column.field_type != "BOOLEAN":
+        return False
+    return isinstance(annotation, type) and issubclass(annotation, fitting)
+
+
+def _record_model(name: str, fields: Iterable[SchemaField]) -> type[BaseModel]:
+    # Fields are aliased so column names can't shadow BaseModel attributes
+    definitions: dict[str, Any] = {
+        f"f{i}": _field_definition(name, field) for i, field in enumerate(fields)
+    }
+    return create_model(name, __config__=_ROW_CONFIG, **definitions)
+
+
+def _field_definition(parent: str, field: SchemaField) -> tuple[Any, Any]:
+    if field.field_type == "RECORD":
+        value_type: Any = _record_model(f"{parent}_{field.name}", field.fields)
+    else:
+        value_type = _SCALAR_TYPES[field.field_type]
+    if field.mode == "REPEATED":
+        return list[value_type], Field(default_factory=list, alias=field.name)
+    if field.mode == "REQUIRED":
+        return value_type, Field(alias=field.name)
+    return value_type | None, Field(default=None, alias=field.name)
+
+
+def _describe(errors: list[Any]) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in errors
+    )
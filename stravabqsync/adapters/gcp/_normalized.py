@@ -0,0 +1,197 @@
+"""Normalized table layout for Strava activities
+
+The default layout stores segment efforts, best efforts, laps and splits as
+nested repeated records of one wide activity row, and every segment effort
+embeds its full segment. In the normalized layout they are written to child
+tables keyed by activity ID, and segments to a dimension table, so per-effort
+and per-segment queries read narrow rows instead of unnesting every activity.
+"""
+
+from typing import Collection, Mapping, NamedTuple, Sequence
+
+from google.cloud.bigquery import SchemaField
+
+from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+from stravabqsync.adapters.gcp._repositories import (
+    STREAM,
+    Row,
+    TableRows,
+    WriteActivitiesRepo,
+)
+from stravabqsync.adapters.gcp._staging import NDJSON
+from stravabqsync.adapters.gcp.schemas import (
+    LAP_TABLE_SCHEMA,
+    SEGMENT_EFFORT_TABLE_SCHEMA,
+    SEGMENT_TABLE_SCHEMA,
+    SPLIT_TABLE_SCHEMA,
+    STRAVA_ACTIVITY_SCHEMA,
+)
+from stravabqsync.concurrency import RecentKeys
+from stravabqsync.domain import DetailedSegmentEffort, StravaActivity
+
+NESTED = "nested"
+NORMALIZED = "normalized"
+LAYOUTS = (NESTED, NORMALIZED)
+
+# Activity fields moved to child tables
+CHILD_FIELDS = frozenset(
+    ("segment_efforts", "best_efforts", "laps", "splits_metric", "splits_standard")
+)
+_EFFORT_REFERENCES = frozenset(("activity", "athlete", "segment"))
+_LAP_REFERENCES = frozenset(("activity", "athlete"))
+
+
+class ChildTable(NamedTuple):
+    """Schema and storage layout of a normalized table"""
+
+    schema: list[SchemaField]
+    partition_field: str | None
+    clustering_fields: tuple[str, ...]
+
+
+CHILD_TABLES = {
+    "segment_efforts": ChildTable(
+        SEGMENT_EFFORT_TABLE_SCHEMA, "start_date", ("segment_id", "activity_id")
+    ),
+    "best_efforts": ChildTable(
+        SEGMENT_EFFORT_TABLE_SCHEMA, "start_date", ("name", "activity_id")
+    ),
+    "laps": ChildTable(LAP_TABLE_SCHEMA, "start_date", ("activity_id",)),
+    "splits": ChildTable(SPLIT_TABLE_SCHEMA, "start_date", ("activity_id",)),
+    "segments": ChildTable(SEGMENT_TABLE_SCHEMA, None, ("id",)),
+}
+
+
+class NormalizedWriteActivitiesRepo(WriteActivitiesRepo):
+    """Write Strava Activities to BigQuery in the normalized layout
+
+    Each write fans the activities out to the activities table, without their
+    nested records, and one insert or load job per child table. A failed
+    child row marks its activity as failed, so it is retried as a whole.
+
+    Segments are written once per segment and process: IDs of written
+    segments are remembered in `seen_segments`, and repeats within the
+    streaming deduplication window are dropped by their insert ID. The
+    `segments` table may still hold a segment more than once, e.g. written by
+    two instances, so queries should pick one row per `id`.
+    """
+
+    def __init__(
+        self,
+        client: BigQueryClientWrapper,
+        *,
+        dataset_name: str,
+        method: str = STREAM,
+        load_format: str = NDJSON,
+        fingerprint_exclude: Collection[str] = (),
+        seen_segments: RecentKeys | None = None,
+    ):
+        super().__init__(
+            client,
+            dataset_name=dataset_name,
+            method=method,
+            load_format=load_format,
+            fingerprint_exclude=fingerprint_exclude,
+        )
+        self._seen_segments = seen_segments or RecentKeys(maxsize=10_000)
+
+    def _tables(
+        self,
+        activities: list[StravaActivity],
+        digests: Mapping[int, str],
+        serialized: Sequence[bytes] | None = None,
+    ) -> list[TableRows]:
+        # `serialized` rows hold the nested records, which the activities
+        # table leaves out here, so they can't be reused
+        tables = {
+            name: TableRows(name, layout.schema, [])
+            for name, layout in CHILD_TABLES.items()
+        }
+        segments: dict[int, Row] = {}
+        for activity in activities:
+            extra = {"activity_id": activity.id}
+            for name, efforts in (
+                ("segment_efforts", activity.segment_efforts),
+                ("best_efforts", activity.best_efforts),
+            ):
+                tables[name].rows.extend(
+                    _effort_row(activity.id, effort) for effort in efforts
+                )
+            for effort in activity.segment_efforts:
+                segment = effort.segment
+                if segment is not None and segment.id not in self._seen_segments:
+                    segments[segment.id] = Row(
+                        activity.id, segment, insert_key=segment.id
+                    )
+            tables["laps"].rows.extend(
+                Row(activity.id, lap, _LAP_REFERENCES, extra) for lap in activity.laps
+            )
+            for units, splits in (
+                ("metric", activity.splits_metric),
+                ("standard", activity.splits_standard),
+            ):
+                split_extra = {
+                    **extra,
+                    "start_date": activity.start_date,
+                    "units": units,
+                }
+                tables["splits"].rows.extend(
+                    Row(activity.id, split, extra=split_extra) for split in splits
+                )
+        tables["segments"].rows.extend(segments.values())
+        return [
+            TableRows(
+                self._table_name,
+                STRAVA_ACTIVITY_SCHEMA,
+                [
+                    self._activity_row(
+                        activity, CHILD_FIELDS, digest=digests.get(activity.id)
+                    )
+                    for activity in activities
+                ],
+            ),
+            *tables.values(),
+        ]
+
+    def _write_table(self, table: TableRows) -> None:
+        super()._write_table(table)
+        if table.name == "segments":
+            for row in table.rows:
+                self._seen_segments.add(row.insert_key)
+
+    def create_child_tables(
+        self,
+        *,
+        partition_expiration_days: int | None = None,
+        exists_ok: bool = False,
+    ) -> None:
+        """Create the child and segment tables of the normalized layout
+
+        Args:
+            partition_expiration_days: Delete child rows this many days after
+                their activity started. Segments are kept.
+            exists_ok: Skip tables that already exist.
+        """
+        for name, layout in CHILD_TABLES.items():
+            self._client.create_table(
+                self._table_id(name),
+                schema=layout.schema,
+                partition_field=layout.partition_field,
+                partition_expiration_days=(
+                    partition_expiration_days if layout.partition_field else None
+                ),
+                clustering_fields=layout.clustering_fields,
+                exists_ok=exists_ok,
+            )
+
+
+def _effort_row(activity_id: int, effort: DetailedSegmentEffort) -> Row:
+    return Row(
+        activity_id,
+        effort,
+        _EFFORT_REFERENCES,
+        {
+            "activity_id": activity_id,
+            "segment_id": effort.segment.id if effort.segment else None,
+        },
+    )
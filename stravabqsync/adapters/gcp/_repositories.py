@@ -1,26 +1,573 @@
+import tempfile
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Callable, Collection, Mapping, NamedTuple, Sequence, TypeVar
+
+from google.cloud.bigquery import SchemaField, SourceFormat
+from pydantic import BaseModel
+
 from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
-from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
-from stravabqsync.domain import StravaActivity
-from stravabqsync.ports.out.write import WriteActivities
+from stravabqsync.adapters.gcp._encoding import RowEncoder, compile_encoder
+from stravabqsync.adapters.gcp._serialization import (
+    row_insert_id,
+    with_synced_at,
+)
+from stravabqsync.adapters.gcp._staging import (
+    LOAD_FORMATS,
+    NDJSON,
+    PARQUET,
+    stage_json_lines,
+    stage_parquet,
+)
+from stravabqsync.adapters.gcp.schemas import (
+    CHANGE_LOG_SCHEMA,
+    STRAVA_ACTIVITY_SCHEMA,
+)
+from stravabqsync.domain import ActivityChange, StravaActivity
+from stravabqsync.exceptions import (
+    BigQueryError,
+    ConfigurationError,
+    DataValidationError,
+    PartialWriteError,
+)
+from stravabqsync.fingerprint import fingerprint
+from stravabqsync.ports.out.read import ReadFingerprints
+from stravabqsync.ports.out.write import WriteActivities, WriteChanges
+
+STREAM = "stream"
+LOAD = "load"
+WRITE_METHODS = (STREAM, LOAD)
+
+# Dashboards filter on date ranges and sport types. Clustering columns must be
+# top-level, so the nested `athlete.id` can't be one.
+ACTIVITIES_PARTITION_FIELD = "start_date"
+ACTIVITIES_CLUSTERING_FIELDS = ("sport_type",)
+
+# The change log is partitioned on when rows were written, so the compaction
+# job only reads the days since its previous run
+CHANGES_PARTITION_FIELD = "synced_at"
+
+T = TypeVar("T")
+
+
+class Row(NamedTuple):
+    """One row to write, built from `model` minus the `exclude`d fields plus
+    the `extra` ones
+
+    Attributes:
+      activity_id: Activity the row belongs to, reported if the row fails
+      model: Source of the row's fields
+      exclude: Fields of `model` left out of the row
+      extra: Fields added to the row
+      insert_key: Deduplicates the row together with its content. Defaults
+        to `activity_id`.
+      serialized: `model` minus the `exclude`d fields as already encoded by
+        `serialize_row`, to not encode it again
+    """
+
+    activity_id: int
+    model: BaseModel
+    exclude: frozenset[str] = frozenset()
+    extra: Mapping[str, Any] = MappingProxyType({})
+    insert_key: int | str | None = None
+    serialized: bytes | None = None
+
+    def encode(self, encoder: RowEncoder) -> bytes:
+        """The row as a JSON object, checked and coerced by `encoder`"""
+        return encoder.encode_model(
+            self.model,
+            exclude=self.exclude,
+            extra=self.extra,
+            serialized=self.serialized,
+        )
+
+    def encode_python(self, encoder: RowEncoder) -> dict:
+        """`encode` as a row of Python values"""
+        return encoder.encode_model_python(
+            self.model, exclude=self.exclude, extra=self.extra
+        )
+
+
+class TableRows(NamedTuple):
+    """Rows to write to one table"""
+
+    name: str
+    schema: list[SchemaField]
+    rows: list[Row]
+
+
+def _encode_rows(
+    rows: Sequence[Row],
+    schema: list[SchemaField],
+    encode: Callable[[Row, RowEncoder], T],
+) -> tuple[list[tuple[Row, T]], list[tuple[Row, dict]]]:
+    """Encode `rows` for the table `schema`, setting invalid rows aside
+
+    Returns:
+        The rows with their encoding, and the invalid rows with an error in
+        the format of the insertAll API.
+    """
+    encoder = compile_encoder(tuple(schema))
+    encoded: list[tuple[Row, T]] = []
+    invalid: list[tuple[Row, dict]] = []
+    for index, row in enumerate(rows):
+        try:
+            encoded.append((row, encode(row, encoder)))
+        except DataValidationError as e:
+            error = {"reason": "invalid", "message": str(e)}
+            invalid.append((row, {"index": index, "errors": [error]}))
+    return encoded, invalid
+
+
+def _raise_failed(
+    failed: Sequence[tuple[Row, dict]], *, n_rows: int, table_name: str
+) -> None:
+    """Raise a PartialWriteError for the `failed` rows, if any"""
+    if not failed:
+        return
+    raise PartialWriteError(
+        f"Failed to write {len(failed)} of {n_rows} rows to {table_name}",
+        [error for _, error in failed],
+        activity_ids=list(dict.fromkeys(row.activity_id for row, _ in failed)),
+    )
+
+
+def _stream(
+    client: BigQueryClientWrapper,
+    rows: Sequence[Row],
+    *,
+    schema: list[SchemaField],
+    dataset_name: str,
+    table_name: str,
+) -> None:
+    """Insert `rows` with one streaming insert request
+
+    Rows are first encoded for `schema`; rows that don't fit it are left out
+    of the request. Each row is stamped with `synced_at` and sent with an
+    insert ID derived from its insert key and its content, excluding
+    `synced_at`, so writing the same row again, e.g. for a redelivered
+    webhook event, doesn't add a duplicate.
+
+    Raises:
+        PartialWriteError: If only some rows failed or were invalid, with
+            their activity IDs.
+        BigQueryError: If the insert failed as a whole.
+    """
+    encoded, failed = _encode_rows(rows, schema, Row.encode)
+    synced_at = datetime.now(timezone.utc)
+    try:
+        if encoded:
+            client.insert_serialized_rows(
+                [with_synced_at(data, synced_at) for _, data in encoded],
+                dataset_name=dataset_name,
+                table_name=table_name,
+                insert_ids=[
+                    row_insert_id(
+                        row.activity_id if row.insert_key is None else row.insert_key,
+                        data,
+                    )
+                    for row, data in encoded
+                ],
+            )
+    except BigQueryError as e:
+        if e.failed_rows is None:
+            raise
+        # Map the indices of the request back to those of `rows`
+        invalid = {error["index"] for _, error in failed}
+        kept = [i for i in range(len(rows)) if i not in invalid]
+        failed.extend(
+            (encoded[i][0], {**error, "index": kept[i]})
+            for i, error in zip(e.failed_rows, e.errors)
+        )
+    _raise_failed(failed, n_rows=len(rows), table_name=table_name)
+
+
+def _check_columns(
+    client: BigQueryClientWrapper,
+    *,
+    dataset_name: str,
+    table_name: str,
+    schema: list[SchemaField],
+) -> None:
+    """Raise if `dataset.table_name` lacks columns of `schema`, so writes
+    fail once with instructions rather than on every row
+
+    Raises:
+        ConfigurationError: If columns are missing.
+    """
+    columns = client.table_columns(dataset_name=dataset_name, table_name=table_name)
+    missing = [field.name for field in schema if field.name not in columns]
+    if missing:
+        raise ConfigurationError(
+            f"Table {dataset_name}.{table_name} has no column {', '.join(missing)}; "
+            "run bootstrap.py to add it"
+        )
 
 
 class WriteActivitiesRepo(WriteActivities):
-    """Write Strava Activities to BigQuery"""
+    """Write Strava Activities to BigQuery
 
-    def __init__(self, client: BigQueryClientWrapper, *, dataset_name: str):
+    With `method="stream"` activities are written with streaming inserts and
+    are queryable immediately; this suits the webhook's handful of rows. With
+    `method="load"` each `write_activities` call stages the rows as a
+    `load_format` file and appends it with a batch load job, which has no
+    per-row cost or streaming quota; this suits backfills.
+
+    Each row stores the activity's content fingerprint, computed without the
+    `fingerprint_exclude` fields, for `ReadFingerprintsRepo` to read back.
+    """
+
+    def __init__(
+        self,
+        client: BigQueryClientWrapper,
+        *,
+        dataset_name: str,
+        method: str = STREAM,
+        load_format: str = NDJSON,
+        fingerprint_exclude: Collection[str] = (),
+    ):
+        if method not in WRITE_METHODS:
+            raise ConfigurationError(f"Unknown BigQuery write method {method!r}")
+        if load_format not in LOAD_FORMATS:
+            raise ConfigurationError(f"Unknown BigQuery load format {load_format!r}")
         self._client = client
         self._dataset_name = dataset_name
         self._table_name = "activities"
+        self._method = method
+        self._load_format = load_format
+        self._fingerprint_exclude = frozenset(fingerprint_exclude)
+        self._columns_checked = False
+
+    def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        self.write_activities(
+            [activity], digests=None if digest is None else {activity.id: digest}
+        )
+
+    def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        """Insert all `activities` with one streaming insert request or load job
+        per table
+
+        Streamed rows are deduplicated by content, so writing the same
+        activity version again doesn't add a duplicate row.
+
+        Args:
+            digests: Fingerprint digests of `activities`, by ID, already
+                computed without the `fingerprint_exclude` fields, to store
+                instead of fingerprinting the activities again.
+            serialized: `serialize_row(activity)` for each of `activities`,
+                e.g. kept by a write buffer that measured them, to reuse
+                instead of encoding the activities again.
+
+        Raises:
+            PartialWriteError: If only some activities failed, with their IDs.
+            BigQueryError: If an insert or load job failed as a whole.
+            ConfigurationError: If the table lacks columns of the schema.
+        """
+        if not activities:
+            return
+        self._require_columns()
+        partial: list[PartialWriteError] = []
+        error: BigQueryError | None = None
+        if serialized is not None and len(serialized) != len(activities):
+            raise ValueError(
+                f"Got {len(serialized)} rows for {len(activities)} activities"
+            )
+        for table in self._tables(activities, digests or {}, serialized):
+            if not table.rows:
+                continue
+            try:
+                self._write_table(table)
+            except PartialWriteError as e:
+                partial.append(e)
+            except BigQueryError as e:
+                error = error or e
+        if error is not None:
+            raise error
+        if len(partial) == 1:
+            raise partial[0]
+        if partial:
+            failed_ids = list(dict.fromkeys(i for e in partial for i in e.activity_ids))
+            raise PartialWriteError(
+                f"Failed to write {len(failed_ids)} of {len(activities)} activities",
+                [row for e in partial for row in e.errors],
+                activity_ids=failed_ids,
+            )
+
+    def warm_up(self) -> None:
+        """Open a connection to BigQuery and check the table's columns
+
+        Raises:
+            ConfigurationError: If the table lacks columns of the schema.
+        """
+        self._require_columns()
 
-    def write_activity(self, activity: StravaActivity) -> None:
-        activities_dict = [activity.model_dump()]
-        self._client.insert_rows_json(
-            activities_dict,
+    def _require_columns(self) -> None:
+        if self._columns_checked:
+            return
+        _check_columns(
+            self._client,
             dataset_name=self._dataset_name,
             table_name=self._table_name,
+            schema=STRAVA_ACTIVITY_SCHEMA,
         )
+        self._columns_checked = True
 
-    def create_activities_table(self) -> None:
-        """Create the BigQuery activities table with the Strava Activity schema."""
+    def _tables(
+        self,
+        activities: list[StravaActivity],
+        digests: Mapping[int, str],
+        serialized: Sequence[bytes] | None = None,
+    ) -> list[TableRows]:
+        """Rows to write for `activities`, by table, reusing their `digests`
+        and `serialized` rows if given"""
+        rows: Sequence[bytes | None] = serialized or [None] * len(activities)
+        return [
+            TableRows(
+                self._table_name,
+                STRAVA_ACTIVITY_SCHEMA,
+                [
+                    self._activity_row(
+                        activity, digest=digests.get(activity.id), serialized=row
+                    )
+                    for activity, row in zip(activities, rows)
+                ],
+            )
+        ]
+
+    def _activity_row(
+        self,
+        activity: StravaActivity,
+        exclude: frozenset[str] = frozenset(),
+        *,
+        digest: str | None = None,
+        serialized: bytes | None = None,
+    ) -> Row:
+        if digest is None:
+            digest = fingerprint(activity, exclude=self._fingerprint_exclude).digest
+        return Row(
+            activity.id,
+            activity,
+            exclude,
+            {"fingerprint": digest},
+            serialized=serialized,
+        )
+
+    def _write_table(self, table: TableRows) -> None:
+        if self._method == STREAM:
+            _stream(
+                self._client,
+                table.rows,
+                schema=table.schema,
+                dataset_name=self._dataset_name,
+                table_name=table.name,
+            )
+            return
+        synced_at = datetime.now(timezone.utc)
+        with tempfile.TemporaryFile() as staged:
+            if self._load_format == PARQUET:
+                encoded, failed = _encode_rows(
+                    table.rows,
+                    table.schema,
+                    Row.encode_python,
+                )
+                stage_parquet(
+                    ({**data, "synced_at": synced_at} for _, data in encoded),
+                    staged,
+                    schema=table.schema,
+                )
+                source_format = SourceFormat.PARQUET
+            else:
+                lines, failed = _encode_rows(
+                    table.rows,
+                    table.schema,
+                    Row.encode,
+                )
+                stage_json_lines(
+                    (with_synced_at(data, synced_at) for _, data in lines),
+                    staged,
+                )
+                source_format = SourceFormat.NEWLINE_DELIMITED_JSON
+            if len(failed) < len(table.rows):
+                self._client.load_table_from_file(
+                    staged,
+                    dataset_name=self._dataset_name,
+                    table_name=table.name,
+                    schema=table.schema,
+                    source_format=source_format,
+                )
+        _raise_failed(failed, n_rows=len(table.rows), table_name=table.name)
+
+    def create_activities_table(
+        self,
+        *,
+        partition_expiration_days: int | None = None,
+        exists_ok: bool = False,
+    ) -> None:
+        """Create the BigQuery activities table with the Strava Activity schema,
+        partitioned by day on `start_date` and clustered on `sport_type`
+
+        Args:
+            partition_expiration_days: Delete activities this many days after
+                they started. Kept forever by default.
+            exists_ok: Do nothing if the table already exists.
+        """
+        self._client.create_table(
+            self._table_id(),
+            schema=STRAVA_ACTIVITY_SCHEMA,
+            partition_field=ACTIVITIES_PARTITION_FIELD,
+            partition_expiration_days=partition_expiration_days,
+            clustering_fields=ACTIVITIES_CLUSTERING_FIELDS,
+            exists_ok=exists_ok,
+        )
+
+    def add_missing_columns(self) -> list[str]:
+        """Add the columns of the Strava Activity schema that an existing
+        activities table doesn't have yet, e.g. `synced_at` and `fingerprint`,
+        and return their names"""
+        return self._client.add_columns(self._table_id(), schema=STRAVA_ACTIVITY_SCHEMA)
+
+    def partition_activities_table(
+        self, *, partition_expiration_days: int | None = None
+    ) -> str:
+        """Rebuild an existing, unpartitioned activities table with the layout
+        of `create_activities_table`
+
+        The rows are copied into a new partitioned and clustered table, which
+        then replaces the original. The original is kept, renamed to
+        `activities_unpartitioned`, until it is dropped by hand. Pause the
+        webhook while this runs: rows streamed into the original after the
+        copy started end up only in the renamed table, and BigQuery refuses
+        to rename a table while it still has rows in its streaming buffer.
+
+        Returns:
+            The ID of the renamed original table.
+
+        Raises:
+            BigQueryError: If the copy or either rename failed.
+        """
+        table_id = self._table_id()
+        options = (
+            f"OPTIONS (partition_expiration_days = {int(partition_expiration_days)})"
+            if partition_expiration_days is not None
+            else ""
+        )
+        backup_name = f"{self._table_name}_unpartitioned"
+        partitioned_name = f"{self._table_name}_partitioned"
+        partitioned_id = self._table_id(partitioned_name)
+        self._client.run_query(
+            f"""
+CREATE TABLE `{partitioned_id}`
+PARTITION BY DATE({ACTIVITIES_PARTITION_FIELD})
+CLUSTER BY {", ".join(ACTIVITIES_CLUSTERING_FIELDS)}
+{options}
+AS SELECT * FROM `{table_id}`;
+
+ALTER TABLE `{table_id}` RENAME TO `{backup_name}`;
+ALTER TABLE `{partitioned_id}` RENAME TO `{self._table_name}`;
+"""
+        )
+        return self._table_id(backup_name)
+
+    def _table_id(self, table_name: str | None = None) -> str:
+        return (
+            f"{self._client.project_id}.{self._dataset_name}."
+            f"{table_name or self._table_name}"
+        )
+
+
+class WriteChangesRepo(WriteChanges):
+    """Log activity updates and deletions to the BigQuery change-log table
+    with streaming inserts"""
+
+    def __init__(self, client: BigQueryClientWrapper, *, dataset_name: str):
+        self._client = client
+        self._dataset_name = dataset_name
+        self._table_name = "changes"
+        self._columns_checked = False
+
+    def write_changes(self, changes: list[ActivityChange]) -> None:
+        """Insert all `changes` with one streaming insert request
+
+        Raises:
+            PartialWriteError: If only some changes failed, with their
+                activity IDs.
+            BigQueryError: If the insert failed as a whole.
+            ConfigurationError: If the table lacks columns of the schema.
+        """
+        if not changes:
+            return
+        if not self._columns_checked:
+            _check_columns(
+                self._client,
+                dataset_name=self._dataset_name,
+                table_name=self._table_name,
+                schema=CHANGE_LOG_SCHEMA,
+            )
+            self._columns_checked = True
+        _stream(
+            self._client,
+            [Row(change.id, change) for change in changes],
+            schema=CHANGE_LOG_SCHEMA,
+            dataset_name=self._dataset_name,
+            table_name=self._table_name,
+        )
+
+    def create_changes_table(self, *, exists_ok: bool = False) -> None:
+        """Create the BigQuery change-log table, partitioned by day on
+        `synced_at` so the compaction job only reads new changes."""
         table_id = f"{self._client.project_id}.{self._dataset_name}.{self._table_name}"
-        self._client.create_table(table_id, schema=STRAVA_ACTIVITY_SCHEMA)
+        self._client.create_table(
+            table_id,
+            schema=CHANGE_LOG_SCHEMA,
+            partition_field=CHANGES_PARTITION_FIELD,
+            exists_ok=exists_ok,
+        )
+
+    def add_missing_columns(self) -> list[str]:
+        """Add the columns of the change-log schema that an existing table
+        doesn't have yet, e.g. `synced_at`, and return their names"""
+        return self._client.add_columns(
+            f"{self._client.project_id}.{self._dataset_name}.{self._table_name}",
+            schema=CHANGE_LOG_SCHEMA,
+        )
+
+
+class ReadFingerprintsRepo(ReadFingerprints):
+    """Read the fingerprints stored in the BigQuery activities table"""
+
+    def __init__(self, client: BigQueryClientWrapper, *, dataset_name: str):
+        self._client = client
+        self._dataset_name = dataset_name
+        self._table_name = "activities"
+
+    def read_fingerprints(self, limit: int) -> dict[int, str]:
+        """Read the fingerprint of the latest row of each of the `limit` most
+        recently synced activities, from least to most recently synced
+
+        Raises:
+            BigQueryError: If the query failed.
+        """
+        table_id = f"{self._client.project_id}.{self._dataset_name}.{self._table_name}"
+        rows = self._client.fetch_rows(
+            f"""
+SELECT id, fingerprint
+FROM (
+  SELECT id, fingerprint, synced_at
+  FROM `{table_id}`
+  WHERE fingerprint IS NOT NULL
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY id ORDER BY synced_at DESC) = 1
+  ORDER BY synced_at DESC
+  LIMIT {int(limit)}
+)
+ORDER BY synced_at
+"""
+        )
+        return {row["id"]: row["fingerprint"] for row in rows}
@@ -0,0 +1,89 @@
+"""Secret-store backed Strava token cache"""
+
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
+
+from stravabqsync.domain import StravaTokenSet
+from stravabqsync.exceptions import ConfigurationError
+from stravabqsync.ports.out.state import TokenCache
+
+logger = logging.getLogger(__name__)
+
+
+class SecretStore(ABC):
+    """Minimal versioned secret store: read the latest version, add a new one"""
+
+    @abstractmethod
+    def read_latest(self, secret_id: str) -> bytes | None:
+        """Return the latest version of `secret_id`, or None if it has none"""
+
+    @abstractmethod
+    def add_version(self, secret_id: str, data: bytes) -> None:
+        """Store `data` as the new latest version of `secret_id`"""
+
+
+class SecretManagerStore(SecretStore):
+    """Google Secret Manager implementation of SecretStore.
+
+    Requires the optional `google-cloud-secret-manager` package. Every save adds
+    a secret version; configure a version destroy TTL or rotation policy on the
+    secret to keep old versions from accumulating.
+    """
+
+    def __init__(self, *, project_id: str):
+        try:
+            from google.api_core.exceptions import NotFound
+            from google.cloud import secretmanager  # type: ignore[attr-defined]
+        except ImportError as e:
+            raise ConfigurationError(
+                "google-cloud-secret-manager is required for the Secret Manager "
+                "token cache"
+            ) from e
+        self._project_id = project_id
+        self._client = secretmanager.SecretManagerServiceClient()
+        self._not_found = NotFound
+
+    def read_latest(self, secret_id: str) -> bytes | None:
+        name = f"projects/{self._project_id}/secrets/{secret_id}/versions/latest"
+        try:
+            return self._client.access_secret_version(name=name).payload.data
+        except self._not_found:
+            return None
+
+    def add_version(self, secret_id: str, data: bytes) -> None:
+        parent = f"projects/{self._project_id}/secrets/{secret_id}"
+        self._client.add_secret_version(parent=parent, payload={"data": data})
+
+
+class SecretStoreTokenCache(TokenCache):
+    """Cache Strava tokens as a JSON secret in a SecretStore.
+
+    Secret stores have no cross-instance locks, so `lock` only serializes
+    refreshes within this process.
+    """
+
+    def __init__(self, store: SecretStore, *, secret_id: str):
+        self._store = store
+        self._secret_id = secret_id
+        self._lock = threading.Lock()
+
+    def load(self) -> StravaTokenSet | None:
+        data = self._store.read_latest(self._secret_id)
+        if data is None:
+            return None
+        try:
+            return StravaTokenSet(client_secret="", **json.loads(data))
+        except (json.JSONDecodeError, TypeError) as e:
+            logger.warning("Ignoring malformed token cache %s: %s", self._secret_id, e)
+            return None
+
+    def save(self, tokens: StravaTokenSet) -> None:
+        data = tokens._asdict()
+        del data["client_secret"]
+        self._store.add_version(self._secret_id, json.dumps(data).encode())
+
+    def lock(self) -> AbstractContextManager:
+        return self._lock
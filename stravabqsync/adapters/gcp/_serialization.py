@@ -0,0 +1,61 @@
+"""Serialize activities straight to insert-ready JSON bytes
+
+`model_dump(mode="json")` builds a tree of Python dicts that the BigQuery
+client then walks again with `json.dumps`. pydantic-core can encode a model to
+JSON bytes in a single pass instead, and the insertAll request body can be
+assembled from those bytes without decoding them.
+  https://cloud.google.com/bigquery/docs/reference/rest/v2/tabledata/insertAll
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Mapping, Sequence
+
+import pydantic_core
+from pydantic import BaseModel
+
+
+def serialize_row(model: BaseModel, *, exclude: set[str] | None = None) -> bytes:
+    """Encode `model` as a JSON object, the same document
+    `model_dump(mode="json", exclude=exclude)` would produce"""
+    return pydantic_core.to_json(model, exclude=exclude)
+
+
+def with_fields(row: bytes, fields: Mapping[str, Any]) -> bytes:
+    """Add `fields` to a non-empty JSON object from `serialize_row`, without
+    decoding it"""
+    if not fields:
+        return row
+    return b"%s,%s" % (row[:-1], pydantic_core.to_json(dict(fields))[1:])
+
+
+def with_synced_at(row: bytes, synced_at: datetime) -> bytes:
+    """Add a `synced_at` timestamp to a JSON object from `serialize_row`"""
+    return with_fields(row, {"synced_at": synced_at})
+
+
+def row_insert_id(key: int | str, row: bytes) -> str:
+    """Deterministic insert ID for one version of the entity `key`
+
+    Redelivered or retried writes of the same row get the same ID, so
+    BigQuery's best-effort deduplication drops them, while a changed row is
+    inserted as a new version.
+    """
+    return f"{key}-{hashlib.sha256(row).hexdigest()[:32]}"
+
+
+def build_insert_all_body(rows: Sequence[bytes], insert_ids: Sequence[str]) -> bytes:
+    """Assemble an insertAll request body from serialized rows
+
+    Args:
+        rows: JSON objects, as returned by `serialize_row`.
+        insert_ids: One best-effort deduplication ID per row.
+    """
+    if len(rows) != len(insert_ids):
+        raise ValueError(f"Got {len(insert_ids)} insert IDs for {len(rows)} rows")
+    parts = [
+        b'{"insertId":%s,"json":%s}' % (json.dumps(insert_id).encode(), row)
+        for insert_id, row in zip(insert_ids, rows)
+    ]
+    return b'{"rows":[' + b",".join(parts) + b"]}"
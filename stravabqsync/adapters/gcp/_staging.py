@@ -0,0 +1,123 @@
+"""Stage rows as files for BigQuery load jobs
+
+Load jobs read whole files, so rows are written to a local file first:
+gzip-compressed newline-delimited JSON by default, or Parquet when the
+optional `pyarrow` package is installed (the `parquet` extra).
+  https://cloud.google.com/bigquery/docs/batch-loading-data
+"""
+
+import gzip
+import json
+from typing import IO, Any, Iterable
+
+from google.cloud.bigquery import SchemaField
+
+from stravabqsync.exceptions import ConfigurationError
+
+NDJSON = "ndjson"
+PARQUET = "parquet"
+LOAD_FORMATS = (NDJSON, PARQUET)
+
+
+def stage_ndjson(rows: Iterable[dict], file_obj: IO[bytes]) -> int:
+    """Write `rows` to `file_obj` as gzip-compressed NDJSON.
+
+    Rows must already be JSON-serializable, e.g. `model_dump(mode="json")`.
+
+    Returns:
+        int: Number of rows written.
+    """
+    return stage_json_lines(
+        (json.dumps(row, separators=(",", ":")).encode() for row in rows), file_obj
+    )
+
+
+def stage_json_lines(rows: Iterable[bytes], file_obj: IO[bytes]) -> int:
+    """Write `rows`, already encoded as JSON objects, to `file_obj` as
+    gzip-compressed NDJSON.
+
+    Returns:
+        int: Number of rows written.
+    """
+    count = 0
+    with gzip.GzipFile(fileobj=file_obj, mode="wb") as gz:
+        for row in rows:
+            gz.write(row)
+            gz.write(b"\n")
+            count += 1
+    return count
+
+
+def stage_parquet(
+    rows: Iterable[dict], file_obj: IO[bytes], *, schema: list[SchemaField]
+) -> int:
+    """Write `rows` to `file_obj` as a Parquet file typed by `schema`.
+
+    Rows should hold Python values, e.g. `model_dump()`, so timestamps are
+    datetimes. JSON values are serialized to JSON text.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ConfigurationError: If `pyarrow` is not installed.
+    """
+    try:
+        import pyarrow as pa  # type: ignore[import-untyped]
+        import pyarrow.parquet as pq  # type: ignore[import-untyped]
+    except ImportError as e:
+        raise ConfigurationError(
+            "pyarrow is required to stage Parquet files, install the parquet extra"
+        ) from e
+
+    # Arrow can't build JSON extension arrays from Python values directly, so
+    # build JSON columns as strings and cast them to the JSON logical type
+    json_type = getattr(pa, "json_", pa.string)()
+    table = pa.Table.from_pylist(
+        [_encode_json_fields(row, schema) for row in rows],
+        schema=pa.schema([_arrow_field(pa, f, pa.string()) for f in schema]),
+    )
+    table = table.cast(pa.schema([_arrow_field(pa, f, json_type) for f in schema]))
+    pq.write_table(table, file_obj, compression="snappy")
+    return table.num_rows
+
+
+def _arrow_field(pa: Any, field: SchemaField, json_type: Any) -> Any:
+    if field.field_type == "RECORD":
+        arrow_type = pa.struct([_arrow_field(pa, f, json_type) for f in field.fields])
+    elif field.field_type == "JSON":
+        arrow_type = json_type
+    else:
+        arrow_type = {
+            "INTEGER": pa.int64,
+            "FLOAT": pa.float64,
+            "STRING": pa.string,
+            "BOOLEAN": pa.bool_,
+            "TIMESTAMP": lambda: pa.timestamp("us", tz="UTC"),
+        }[field.field_type]()
+    if field.mode == "REPEATED":
+        return pa.field(field.name, pa.list_(arrow_type), nullable=False)
+    return pa.field(field.name, arrow_type, nullable=field.mode != "REQUIRED")
+
+
+def _encode_json_fields(row: dict, schema: list[SchemaField]) -> dict:
+    return {field.name: _encode_value(row.get(field.name), field) for field in schema}
+
+
+def _encode_value(value: Any, field: SchemaField) -> Any:
+    if value is None:
+        return [] if field.mode == "REPEATED" else None
+    if field.mode == "REPEATED":
+        return [_encode_item(item, field) for item in value]
+    return _encode_item(value, field)
+
+
+def _encode_item(value: Any, field: SchemaField) -> Any:
+    if field.field_type == "JSON":
+        return json.dumps(value)
+    if field.field_type == "RECORD":
+        return _encode_json_fields(value, list(field.fields))
+    if field.field_type == "STRING" and not isinstance(value, str):
+        # The JSON loaders coerce scalars into STRING columns, Arrow doesn't
+        return str(value)
+    return value
@@ -43,6 +43,11 @@ def required_timestamp(name: str) -> SchemaField:
     return SchemaField(name, TIMESTAMP, mode=REQUIRED)
 
 
+def nullable_timestamp(name: str) -> SchemaField:
+    """Create a nullable timestamp field."""
+    return SchemaField(name, TIMESTAMP, mode=NULLABLE)
+
+
 def nullable_string(name: str) -> SchemaField:
     """Create a nullable string field."""
     return SchemaField(name, STRING, mode=NULLABLE)
@@ -288,4 +293,56 @@ STRAVA_ACTIVITY_SCHEMA = [
     nullable_float("max_heartrate"),
     repeated_string("available_zones"),
     nullable_string("visibility"),
+    # Not from Strava: content hash, to skip re-writing unchanged activities
+    nullable_string("fingerprint"),
+    # Not from Strava: when the row was written, the compaction watermark
+    nullable_timestamp("synced_at"),
+]
+
+# Change log of activity updates and deletions, one row per coalesced change
+# https://developers.strava.com/docs/webhooks/#event-data
+CHANGE_LOG_SCHEMA = [
+    required_int("id"),
+    required_int("owner_id"),
+    required_timestamp("event_time"),
+    nullable_string("title"),
+    nullable_string("type"),
+    nullable_bool("private"),
+    required_bool("was_deleted"),
+    SchemaField("updates", JSON, mode=NULLABLE),
+    nullable_timestamp("synced_at"),
+]
+
+# Normalized layout: the activities table without its nested repeated
+# records, which go to child tables keyed by activity ID instead. The
+# MetaActivity and MetaAthlete records are replaced by `activity_id`, and
+# efforts reference the `segments` dimension table by `segment_id`.
+_ACTIVITY_REFERENCES = ("activity", "athlete", "segment")
+
+SEGMENT_EFFORT_TABLE_SCHEMA = [
+    required_int("activity_id"),
+    nullable_int("segment_id"),
+    *(f for f in DETAILED_SEGMENT_EFFORT_FIELDS if f.name not in _ACTIVITY_REFERENCES),
+    nullable_timestamp("synced_at"),
+]
+
+LAP_TABLE_SCHEMA = [
+    required_int("activity_id"),
+    *(f for f in LAP_FIELDS if f.name not in _ACTIVITY_REFERENCES),
+    nullable_timestamp("synced_at"),
+]
+
+# Metric and standard splits, told apart by `units`. Splits carry no date of
+# their own, so `start_date` is the activity's.
+SPLIT_TABLE_SCHEMA = [
+    required_int("activity_id"),
+    required_timestamp("start_date"),
+    required_string("units"),
+    *SPLIT_FIELDS,
+    nullable_timestamp("synced_at"),
+]
+
+SEGMENT_TABLE_SCHEMA = [
+    *SUMMARY_SEGMENT_FIELDS,
+    nullable_timestamp("synced_at"),
 ]
@@ -0,0 +1,16 @@
+from stravabqsync.adapters.local._checkpoints import FileBackfillCheckpoints
+from stravabqsync.adapters.local._spool import FileSyncSpool
+from stravabqsync.adapters.local._token_cache import FileTokenCache
+from stravabqsync.ports.out.state import BackfillCheckpoints, SyncSpool, TokenCache
+
+
+def make_backfill_checkpoints(path: str) -> BackfillCheckpoints:
+    return FileBackfillCheckpoints(path)
+
+
+def make_file_token_cache(path: str) -> TokenCache:
+    return FileTokenCache(path)
+
+
+def make_sync_spool(directory: str) -> SyncSpool:
+    return FileSyncSpool(directory)
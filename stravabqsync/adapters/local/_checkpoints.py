@@ -0,0 +1,39 @@
+"""File-backed backfill checkpoints"""
+
+import json
+import logging
+import os
+
+from stravabqsync.adapters.local._files import atomic_write_json
+from stravabqsync.domain import BackfillCheckpoint
+from stravabqsync.ports.out.state import BackfillCheckpoints
+
+logger = logging.getLogger(__name__)
+
+
+class FileBackfillCheckpoints(BackfillCheckpoints):
+    """Store the backfill checkpoint as a JSON file, replaced atomically on
+    every save"""
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def load(self) -> BackfillCheckpoint | None:
+        try:
+            with open(self._path, "r", encoding="utf-8") as fin:
+                data = json.load(fin)
+        except FileNotFoundError:
+            return None
+        data["failed_ids"] = tuple(data.get("failed_ids", ()))
+        checkpoint = BackfillCheckpoint(**data)
+        logger.info("Loaded backfill checkpoint from %s: %s", self._path, checkpoint)
+        return checkpoint
+
+    def save(self, checkpoint: BackfillCheckpoint) -> None:
+        atomic_write_json(self._path, checkpoint._asdict())
+
+    def clear(self) -> None:
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,26 @@
+"""Helpers for durable local files"""
+
+import json
+import os
+import tempfile
+from typing import Any
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """Write `data` as JSON to `path` atomically.
+
+    The JSON goes to a temporary file in the same directory (created with mode
+    0600) that is fsynced and renamed over `path`, so a crash mid-write leaves
+    either the old or the new content, never a torn file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fout:
+            json.dump(data, fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
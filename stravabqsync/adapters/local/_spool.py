@@ -0,0 +1,167 @@
+"""File-backed spool of failed syncs"""
+
+import fcntl
+import json
+import logging
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+from stravabqsync.adapters.local._files import atomic_write_json
+from stravabqsync.domain import SpooledSync
+from stravabqsync.ports.out.state import SyncSpool
+
+logger = logging.getLogger(__name__)
+
+# Payload length and CRC-32, ahead of each JSON payload
+_HEADER = struct.Struct(">II")
+
+
+class FileSyncSpool(SyncSpool):
+    """Queue failed syncs in an append-only record file in `directory`
+
+    `spool.log` holds the queued entries as length-prefixed, checksummed
+    records, appended and fsynced on every `append`. `spool.idx` holds the
+    offset of the first entry not yet popped, so popping never rewrites the
+    log; once every entry is popped the log is truncated. Dead letters are
+    appended to `dead.log` in the same format. A record torn by a crash
+    mid-append is cut off when the spool is opened.
+
+    An exclusive `flock` on `spool.lock` serializes access across threads
+    and processes sharing the directory.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self._log_path = os.path.join(directory, "spool.log")
+        self._index_path = os.path.join(directory, "spool.idx")
+        self._dead_path = os.path.join(directory, "dead.log")
+        self._lock_path = os.path.join(directory, "spool.lock")
+        with self._locked():
+            for path in (self._log_path, self._dead_path):
+                self._recover(path)
+            end = _size(self._log_path)
+            if self._read_offset() > end:
+                self._write_offset(end)
+
+    def append(self, entries: list[SpooledSync]) -> None:
+        if entries:
+            with self._locked():
+                _append(self._log_path, entries)
+
+    def peek(self, limit: int) -> list[SpooledSync]:
+        entries: list[SpooledSync] = []
+        if limit < 1:
+            return entries
+        with self._locked(), _open(self._log_path) as fin:
+            fin.seek(self._read_offset())
+            for _, payload in _records(fin):
+                entries.append(SpooledSync.model_validate_json(payload))
+                if len(entries) >= limit:
+                    break
+        return entries
+
+    def pop(self, count: int) -> None:
+        if count < 1:
+            return
+        with self._locked(), _open(self._log_path) as fin:
+            offset = self._read_offset()
+            fin.seek(offset)
+            for popped, (end, _) in enumerate(_records(fin), start=1):
+                offset = end
+                if popped >= count:
+                    break
+            if offset >= _size(self._log_path):
+                # Drained: start over instead of growing the log forever
+                os.truncate(self._log_path, 0)
+                offset = 0
+            self._write_offset(offset)
+
+    def dead_letter(self, entries: list[SpooledSync]) -> None:
+        if entries:
+            with self._locked():
+                _append(self._dead_path, entries)
+
+    def dead_letters(self) -> list[SpooledSync]:
+        """Read all dead letters, oldest first"""
+        with self._locked(), _open(self._dead_path) as fin:
+            return [
+                SpooledSync.model_validate_json(payload) for _, payload in _records(fin)
+            ]
+
+    def __len__(self) -> int:
+        with self._locked(), _open(self._log_path) as fin:
+            fin.seek(self._read_offset())
+            return sum(1 for _ in _records(fin))
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self._lock_path, "a", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _recover(self, path: str) -> None:
+        with _open(path) as fin:
+            end = 0
+            for end, _ in _records(fin):
+                pass
+        size = _size(path)
+        if end < size:
+            logger.warning(
+                "Truncating %d bytes of torn records from %s", size - end, path
+            )
+            os.truncate(path, end)
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as fin:
+                return int(json.load(fin)["offset"])
+        except FileNotFoundError:
+            return 0
+
+    def _write_offset(self, offset: int) -> None:
+        atomic_write_json(self._index_path, {"offset": offset})
+
+
+def _append(path: str, entries: list[SpooledSync]) -> None:
+    with open(path, "ab") as fout:
+        for entry in entries:
+            payload = entry.model_dump_json().encode()
+            fout.write(_HEADER.pack(len(payload), zlib.crc32(payload)))
+            fout.write(payload)
+        fout.flush()
+        os.fsync(fout.fileno())
+
+
+@contextmanager
+def _open(path: str) -> Iterator[IO[bytes]]:
+    """Open `path` for reading, as an empty file if it doesn't exist"""
+    with open(path, "a+b") as fin:
+        fin.seek(0)
+        yield fin
+
+
+def _records(fin: IO[bytes]) -> Iterator[tuple[int, bytes]]:
+    """Yield `(end_offset, payload)` for each record from the current
+    position, stopping at the end of the file or a torn record"""
+    while True:
+        header = fin.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        length, checksum = _HEADER.unpack(header)
+        payload = fin.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        yield fin.tell(), payload
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,49 @@
+"""File-backed Strava token cache"""
+
+import fcntl
+import json
+import logging
+from contextlib import contextmanager
+from typing import Iterator
+
+from stravabqsync.adapters.local._files import atomic_write_json
+from stravabqsync.domain import StravaTokenSet
+from stravabqsync.ports.out.state import TokenCache
+
+logger = logging.getLogger(__name__)
+
+
+class FileTokenCache(TokenCache):
+    """Cache Strava tokens in a local JSON file.
+
+    `lock` takes an exclusive `flock` on `<path>.lock`, which serializes
+    refreshes across threads and processes sharing the file.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def load(self) -> StravaTokenSet | None:
+        try:
+            with open(self._path, "r", encoding="utf-8") as fin:
+                data = json.load(fin)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Ignoring unreadable token cache %s: %s", self._path, e)
+            return None
+        return StravaTokenSet(client_secret="", **data)
+
+    def save(self, tokens: StravaTokenSet) -> None:
+        data = tokens._asdict()
+        del data["client_secret"]
+        atomic_write_json(self._path, data)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        with open(f"{self._path}.lock", "a", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,19 +1,153 @@
-from functools import lru_cache
+"""Strava API adapters
 
-from stravabqsync.adapters.strava._repositories import (
-    StravaActivitiesRepo,
-    StravaTokenRepo,
-)
-from stravabqsync.config import app_config
+Like the GCP adapters, the adapter modules (and `requests`) are imported by
+the factories on first use.
+"""
+
+from typing import TYPE_CHECKING
+
+from stravabqsync.adapters._threaded import ThreadedReadStravaToken
+from stravabqsync.config import get_app_config
+from stravabqsync.container import container
 from stravabqsync.domain import StravaTokenSet
-from stravabqsync.ports.out.read import ReadActivities
+from stravabqsync.exceptions import ConfigurationError
+from stravabqsync.ports.out.read import (
+    AsyncReadActivities,
+    AsyncReadStravaToken,
+    ReadActivities,
+    ReadStravaToken,
+)
+from stravabqsync.ports.out.state import TokenCache
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+    from stravabqsync.adapters.strava._rate_limit import StravaRateBudget
+    from stravabqsync.retry import CircuitBreaker
+
+# Activity repos kept per access token: the current token and the one it is
+# replacing, which requests still in flight may be using
+_ACTIVITY_REPOS_KEPT = 2
+
+
+@container.singleton
+def make_strava_rate_budget() -> "StravaRateBudget":
+    """Rate budget shared by every Strava adapter in this process"""
+    from stravabqsync.adapters.strava._rate_limit import StravaRateBudget
+
+    return StravaRateBudget.from_config(get_app_config().strava_api)
+
+
+@container.singleton(close=lambda session: session.close())
+def make_strava_session() -> "requests.Session":
+    """Keep-alive connection pool shared by every Strava adapter in this process"""
+    from stravabqsync.adapters.strava._session import make_session
+
+    return make_session(get_app_config().strava_api)
+
+
+@container.keyed()
+def make_strava_circuit_breaker(endpoint: str) -> "CircuitBreaker":
+    """Circuit breaker shared by every call to the Strava `endpoint` URL in
+    this process"""
+    from stravabqsync.adapters.strava._repositories import make_circuit_breaker
+
+    return make_circuit_breaker(endpoint, get_app_config().strava_api)
 
 
-@lru_cache
-def make_read_strava_token():
-    return StravaTokenRepo(app_config.tokens, app_config.strava_api)
+@container.singleton
+def make_token_cache() -> TokenCache | None:
+    """Token cache selected by `app_config.token_cache`, if any"""
+    spec = get_app_config().token_cache
+    if spec is None:
+        return None
+    kind, _, location = spec.partition(":")
+    if kind == "file" and location:
+        from stravabqsync.adapters.local import make_file_token_cache
 
+        return make_file_token_cache(location)
+    if kind == "secretmanager" and location:
+        from stravabqsync.adapters.gcp import make_secret_manager_token_cache
 
-@lru_cache
+        return make_secret_manager_token_cache(location)
+    raise ConfigurationError(
+        f"Invalid STRAVA_TOKEN_CACHE {spec!r}, expected file:<path> or "
+        "secretmanager:<secret id>"
+    )
+
+
+@container.singleton
+def make_read_strava_token() -> ReadStravaToken:
+    from stravabqsync.adapters.strava._repositories import StravaTokenRepo
+
+    app_config = get_app_config()
+    return StravaTokenRepo(
+        app_config.tokens,
+        app_config.strava_api,
+        make_strava_rate_budget(),
+        make_strava_session(),
+        make_token_cache(),
+        make_strava_circuit_breaker(app_config.strava_api.token_url),
+    )
+
+
+@container.keyed(maxsize=_ACTIVITY_REPOS_KEPT)
 def make_read_activities(strava_tokens: StravaTokenSet) -> ReadActivities:
-    return StravaActivitiesRepo(strava_tokens, app_config.strava_api)
+    """Activities repo for `strava_tokens`. Repos for earlier tokens are
+    evicted as tokens are refreshed."""
+    from stravabqsync.adapters.strava._repositories import StravaActivitiesRepo
+
+    api_config = get_app_config().strava_api
+    return StravaActivitiesRepo(
+        strava_tokens,
+        api_config,
+        make_strava_rate_budget(),
+        make_strava_session(),
+        make_strava_circuit_breaker(api_config.api_base_url),
+    )
+
+
+def make_async_strava_client() -> "httpx.AsyncClient":
+    """New HTTP client for the async Strava adapters. Its connections belong
+    to the event loop that uses them, so close it with `aclose()` before the
+    loop ends.
+
+    Raises:
+        ConfigurationError: If `httpx` is not installed.
+    """
+    try:
+        from stravabqsync.adapters.strava._async_repositories import (
+            make_async_client,
+        )
+    except ImportError as e:
+        raise ConfigurationError(
+            "httpx is required for the async Strava adapters, install the async extra"
+        ) from e
+
+    return make_async_client(get_app_config().strava_api)
+
+
+def make_async_read_strava_token() -> AsyncReadStravaToken:
+    """`make_read_strava_token()` for asyncio. Refreshes are rare, so they
+    run on a worker thread and share the token cache with the sync adapters."""
+    return ThreadedReadStravaToken(make_read_strava_token())
+
+
+def make_async_read_activities(
+    strava_tokens: StravaTokenSet, client: "httpx.AsyncClient"
+) -> AsyncReadActivities:
+    """Async activities repo on `client`, sharing the rate budget and circuit
+    breaker with the sync adapters"""
+    from stravabqsync.adapters.strava._async_repositories import (
+        AsyncStravaActivitiesRepo,
+    )
+
+    api_config = get_app_config().strava_api
+    return AsyncStravaActivitiesRepo(
+        strava_tokens,
+        api_config,
+        client,
+        make_strava_rate_budget(),
+        make_strava_circuit_breaker(api_config.api_base_url),
+    )
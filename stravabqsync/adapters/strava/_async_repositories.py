@@ -0,0 +1,123 @@
+"""Strava read repositories for asyncio
+
+Built on the optional `httpx` package, so that hundreds of requests can be in
+flight on one event loop instead of one thread each.
+"""
+
+import logging
+
+import httpx
+
+from stravabqsync.adapters.strava._parsing import parse_json
+from stravabqsync.adapters.strava._rate_limit import StravaRateBudget
+from stravabqsync.adapters.strava._repositories import (
+    make_circuit_breaker,
+    raise_activity_error,
+    raise_summaries_error,
+)
+from stravabqsync.config import StravaApiConfig
+from stravabqsync.domain import StravaActivity, StravaTokenSet, SummaryActivity
+from stravabqsync.ports.out.read import AsyncReadActivities
+from stravabqsync.retry import CircuitBreaker, retry_on_failure
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE = (httpx.HTTPStatusError, httpx.TransportError)
+
+
+def make_async_client(api_config: StravaApiConfig) -> "httpx.AsyncClient":
+    """Create an `httpx.AsyncClient` with a keep-alive connection pool of
+    `pool_maxsize` connections. Close it with `aclose()`."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=api_config.pool_maxsize,
+            max_keepalive_connections=(
+                api_config.pool_maxsize if api_config.keep_alive else 0
+            ),
+        ),
+        timeout=api_config.request_timeout,
+    )
+
+
+class AsyncStravaActivitiesRepo(AsyncReadActivities):
+    """Repository for fetching Strava Activities on an event loop
+
+    Shares the rate budget, circuit breaker and retry policy of
+    StravaActivitiesRepo; only the HTTP client differs.
+    """
+
+    def __init__(
+        self,
+        tokens: StravaTokenSet,
+        api_config: StravaApiConfig,
+        client: "httpx.AsyncClient",
+        rate_budget: StravaRateBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
+        self._tokens = tokens
+        self._api_config = api_config
+        self._client = client
+        self._rate_budget = rate_budget or StravaRateBudget.from_config(api_config)
+        self._circuit_breaker = circuit_breaker or make_circuit_breaker(
+            api_config.api_base_url, api_config
+        )
+        self._headers = {"Authorization": f"Bearer {self._tokens.access_token}"}
+
+    async def _get(
+        self, path: str, params: dict[str, int] | None = None
+    ) -> "httpx.Response":
+        @retry_on_failure(
+            max_attempts=self._api_config.activity_retry_attempts,
+            backoff_seconds=self._api_config.activity_retry_backoff,
+            defer=self._api_config.defer_rate_limits,
+            jitter=self._api_config.retry_jitter,
+            circuit_breaker=self._circuit_breaker,
+            exceptions=_RETRYABLE,
+        )
+        async def _fetch():
+            async with self._rate_budget.request_async():
+                resp = await self._client.get(
+                    f"{self._api_config.api_base_url}{path}",
+                    headers=self._headers,
+                    params=params,
+                )
+                self._rate_budget.update(resp)
+            if resp.status_code == 429 or resp.status_code >= 500:
+                resp.raise_for_status()
+            return resp
+
+        try:
+            return await _fetch()
+        except httpx.HTTPStatusError as e:
+            # Still failing after retries; callers report the status
+            return e.response
+
+    async def warm_up(self) -> None:
+        """Open a pooled connection to the Strava API. Unauthenticated, so it
+        doesn't count against the application's rate limits."""
+        try:
+            await self._client.head(self._api_config.api_base_url)
+        except httpx.HTTPError as e:
+            logger.debug("Connection warm-up to Strava failed: %s", e)
+
+    async def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        resp = await self._get(f"/activities/{activity_id}")
+        if not resp.is_success:
+            raise_activity_error(activity_id, resp.status_code, resp.text)
+        return resp.content
+
+    async def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        params = {"page": page, "per_page": per_page}
+        if before is not None:
+            params["before"] = before
+        resp = await self._get("/athlete/activities", params)
+        if not resp.is_success:
+            raise_summaries_error(page, resp.status_code, resp.text)
+        return parse_json(resp.content, list[SummaryActivity])
+
+    async def read_activity_by_id(self, activity_id: int) -> StravaActivity:
+        return parse_json(
+            await self.read_raw_activity_by_id(activity_id), StravaActivity
+        )
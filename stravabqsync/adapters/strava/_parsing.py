@@ -0,0 +1,35 @@
+"""Validate Strava API responses straight from the response bytes
+
+`StravaActivity(**resp.json())` first decodes the body into Python dicts and
+lists, then walks them again to validate. pydantic-core can validate the JSON
+bytes directly, building the model in one pass without the intermediate
+objects.
+"""
+
+from functools import lru_cache
+from typing import Any, Hashable, TypeVar, cast
+
+from pydantic import TypeAdapter, ValidationError
+
+from stravabqsync.exceptions import DataValidationError
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(type_: Any) -> TypeAdapter:
+    """Validators are expensive to build, so build one per type"""
+    return TypeAdapter(type_)
+
+
+def parse_json(content: bytes, type_: type[T]) -> T:
+    """Validate the JSON document `content` as `type_`
+
+    Raises:
+        DataValidationError: If `content` isn't valid JSON or doesn't match
+            `type_`.
+    """
+    try:
+        return _type_adapter(cast(Hashable, type_)).validate_json(content)
+    except ValidationError as e:
+        raise DataValidationError(f"Invalid {type_} response: {e}") from e
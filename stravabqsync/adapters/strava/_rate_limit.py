@@ -0,0 +1,275 @@
+"""Strava rate-limit budget shared by the Strava adapters
+
+Strava enforces a 15-minute and a daily request limit and reports both on
+every response:
+
+    X-RateLimit-Limit: 200,2000
+    X-RateLimit-Usage: 12,345
+
+Read endpoints additionally report a tighter `X-ReadRateLimit-*` pair.
+  https://developers.strava.com/docs/rate-limits/
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator, Mapping, NamedTuple
+
+import requests
+
+from stravabqsync.config import StravaApiConfig
+from stravabqsync.exceptions import StravaRateLimitError
+
+logger = logging.getLogger(__name__)
+
+SHORT_WINDOW_SECONDS = 15 * 60
+DAILY_WINDOW_SECONDS = 24 * 60 * 60
+_HEADER_PREFIXES = ("X-RateLimit", "X-ReadRateLimit")
+# How often `acquire_async` checks for a free request slot
+_SLOT_POLL_SECONDS = 0.05
+
+
+class RateLimitUsage(NamedTuple):
+    """Limits and usage reported by Strava for the current windows"""
+
+    short_limit: int
+    short_usage: int
+    daily_limit: int
+    daily_usage: int
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> RateLimitUsage | None:
+    """Parse Strava rate-limit headers, returning the tightest reported pair.
+
+    Returns None if the response carries no (valid) rate-limit headers.
+    """
+    parsed: list[RateLimitUsage] = []
+    for prefix in _HEADER_PREFIXES:
+        limit = headers.get(f"{prefix}-Limit")
+        usage = headers.get(f"{prefix}-Usage")
+        if not isinstance(limit, str) or not isinstance(usage, str):
+            continue
+        try:
+            short_limit, daily_limit = (int(v) for v in limit.split(","))
+            short_usage, daily_usage = (int(v) for v in usage.split(","))
+        except ValueError:
+            logger.warning("Malformed %s headers: %s / %s", prefix, limit, usage)
+            continue
+        parsed.append(
+            RateLimitUsage(short_limit, short_usage, daily_limit, daily_usage)
+        )
+    if not parsed:
+        return None
+    return min(parsed, key=lambda u: u.short_limit - u.short_usage)
+
+
+class _Window:
+    """Usage of one fixed, clock-aligned rate-limit window. Strava resets the
+    short window on the quarter hour and the daily window at midnight UTC."""
+
+    def __init__(self, length: int, limit: int):
+        self.length = length
+        self.limit = limit
+        self.usage = 0
+        self.index = -1
+
+    def roll(self, now: float) -> None:
+        index = int(now // self.length)
+        if index != self.index:
+            self.index = index
+            self.usage = 0
+
+    def remaining(self) -> int:
+        return self.limit - self.usage
+
+    def seconds_left(self, now: float) -> float:
+        return (self.index + 1) * self.length - now
+
+
+class StravaRateBudget:
+    """Thread-safe request budget for the Strava API.
+
+    Requests are paced with a token bucket whose refill rate spreads the
+    remaining 15-minute budget over the rest of the window, so sustained load
+    (e.g. a backfill) drains the budget evenly instead of running into 429s.
+    When either window is exhausted, `acquire` waits for the reset, or raises
+    StravaRateLimitError if that is longer than `max_wait`.
+
+    Concurrency adapts additively-increase/multiplicatively-decrease: every
+    429 halves the number of requests allowed in flight, every successful
+    response allows one more, up to `max_concurrency`.
+    """
+
+    def __init__(
+        self,
+        *,
+        short_limit: int = 200,
+        daily_limit: int = 2000,
+        burst: int = 20,
+        max_concurrency: int = 8,
+        max_wait: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._short = _Window(SHORT_WINDOW_SECONDS, short_limit)
+        self._daily = _Window(DAILY_WINDOW_SECONDS, daily_limit)
+        self._burst = burst
+        self._max_concurrency = max_concurrency
+        self._max_wait = max_wait
+        self._clock = clock
+        self._tokens = float(burst)
+        self._last_refill = clock()
+        self._concurrency = max_concurrency
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, api_config: StravaApiConfig) -> "StravaRateBudget":
+        return cls(
+            short_limit=api_config.rate_limit_short,
+            daily_limit=api_config.rate_limit_daily,
+            burst=api_config.rate_limit_burst,
+            max_concurrency=api_config.rate_limit_max_concurrency,
+            max_wait=api_config.rate_limit_max_wait,
+        )
+
+    @property
+    def usage(self) -> RateLimitUsage:
+        with self._cond:
+            self._roll(self._clock())
+            return RateLimitUsage(
+                self._short.limit,
+                self._short.usage,
+                self._daily.limit,
+                self._daily.usage,
+            )
+
+    @property
+    def concurrency(self) -> int:
+        """Number of requests currently allowed in flight"""
+        with self._cond:
+            return self._current_concurrency()
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """Hold a request slot and one budget token for the enclosed call"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent.
+
+        Raises:
+            StravaRateLimitError: If the budget won't allow a request within
+                `max_wait` seconds, with the estimated wait in `retry_after`,
+                or if no request slot was released within `max_wait`.
+        """
+        deadline = self._clock() + self._max_wait
+        with self._cond:
+            while wait := self._try_acquire(deadline):
+                self._cond.wait(timeout=min(wait, deadline - self._clock()))
+
+    @asynccontextmanager
+    async def request_async(self) -> AsyncIterator[None]:
+        """`request` for coroutines, waiting without blocking the event loop"""
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire_async(self) -> None:
+        """`acquire` for coroutines. Waits for a free request slot are
+        polled, as releases can't wake the event loop."""
+        deadline = self._clock() + self._max_wait
+        while True:
+            with self._cond:
+                wait = self._try_acquire(deadline)
+            if not wait:
+                return
+            if wait == math.inf:
+                wait = min(_SLOT_POLL_SECONDS, deadline - self._clock())
+            await asyncio.sleep(wait)
+
+    def _try_acquire(self, deadline: float) -> float:
+        """Take a request slot and a token and return 0, or return how long
+        to wait before trying again: `math.inf` until a slot is released, but
+        no longer than `deadline`. Must hold `_cond`."""
+        now = self._clock()
+        if self._in_flight >= self._current_concurrency():
+            if now >= deadline:
+                raise StravaRateLimitError(
+                    f"No Strava request slot free within {self._max_wait:.0f}s"
+                )
+            return math.inf
+        wait = self._token_wait(now)
+        if wait <= 0:
+            self._tokens -= 1
+            self._short.usage += 1
+            self._daily.usage += 1
+            self._in_flight += 1
+            return 0
+        if now + wait > deadline:
+            raise StravaRateLimitError(
+                f"Strava rate budget exhausted, next request in {wait:.0f}s",
+                retry_after=math.ceil(wait),
+            )
+        logger.debug("Pacing Strava request for %.2f seconds", wait)
+        return wait
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def update(self, resp: requests.Response) -> None:
+        """Reconcile the budget with the rate-limit headers of `resp`, a
+        requests or httpx response"""
+        reported = parse_rate_limit_headers(resp.headers)
+        with self._cond:
+            self._roll(self._clock())
+            if reported is not None:
+                self._short.limit = reported.short_limit
+                self._short.usage = reported.short_usage
+                self._daily.limit = reported.daily_limit
+                self._daily.usage = reported.daily_usage
+            if resp.status_code == 429:
+                self._concurrency = max(1, self._concurrency // 2)
+                logger.warning(
+                    "Strava rate limited, concurrency reduced to %d", self._concurrency
+                )
+            elif resp.status_code < 400:
+                self._concurrency = min(self._max_concurrency, self._concurrency + 1)
+            self._cond.notify_all()
+
+    def _roll(self, now: float) -> None:
+        self._short.roll(now)
+        self._daily.roll(now)
+
+    def _current_concurrency(self) -> int:
+        return max(1, min(self._concurrency, self._short.remaining()))
+
+    def _refill_rate(self, now: float) -> float:
+        """Tokens per second that spread the remaining short budget evenly"""
+        return max(self._short.remaining(), 0) / max(self._short.seconds_left(now), 1)
+
+    def _token_wait(self, now: float) -> float:
+        """Seconds until a request may be sent, refilling the bucket first"""
+        self._roll(now)
+        rate = self._refill_rate(now)
+        elapsed = max(now - self._last_refill, 0)
+        self._tokens = min(float(self._burst), self._tokens + elapsed * rate)
+        self._last_refill = now
+
+        if self._daily.remaining() <= 0:
+            return self._daily.seconds_left(now)
+        if self._short.remaining() <= 0:
+            return self._short.seconds_left(now)
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / rate
@@ -1,34 +1,129 @@
 """Strava read repositories"""
 
 import logging
-from typing import Any
+import time
+from typing import Callable, NoReturn
 
 import requests
 
+from stravabqsync.adapters.strava._parsing import parse_json
+from stravabqsync.adapters.strava._rate_limit import StravaRateBudget
+from stravabqsync.adapters.strava._session import make_session, warm_up_session
 from stravabqsync.config import StravaApiConfig
-from stravabqsync.domain import StravaActivity, StravaTokenSet
+from stravabqsync.domain import StravaActivity, StravaTokenSet, SummaryActivity
 from stravabqsync.exceptions import (
     ActivityNotFoundError,
     StravaApiError,
     StravaTokenError,
 )
 from stravabqsync.ports.out.read import ReadActivities, ReadStravaToken
-from stravabqsync.retry import retry_on_failure
+from stravabqsync.ports.out.state import TokenCache
+from stravabqsync.retry import CircuitBreaker, retry_on_failure
 
 logger = logging.getLogger(__name__)
 
 
-class StravaTokenRepo(ReadStravaToken):
-    """Fetch new access token"""
+def make_circuit_breaker(endpoint: str, api_config: StravaApiConfig) -> CircuitBreaker:
+    """Circuit breaker for calls to the Strava `endpoint` URL"""
+    return CircuitBreaker(
+        endpoint,
+        failure_threshold=api_config.circuit_failure_threshold,
+        reset_timeout=api_config.circuit_reset_timeout,
+    )
+
+
+def raise_activity_error(activity_id: int, status_code: int, text: str) -> NoReturn:
+    """Raise the error for a failed fetch of `activity_id`"""
+    logger.error("Failed to fetch activity %s: %s", activity_id, status_code)
+    if status_code == 404:
+        raise ActivityNotFoundError(activity_id)
+    if status_code == 401:
+        raise StravaTokenError("Access token expired", status_code, activity_id)
+    raise StravaApiError(
+        f"Failed to fetch activity {activity_id}: {text}", status_code, activity_id
+    )
+
+
+def raise_summaries_error(page: int, status_code: int, text: str) -> NoReturn:
+    """Raise the error for a failed fetch of activities page `page`"""
+    logger.error("Failed to list activities page %s: %s", page, status_code)
+    if status_code == 401:
+        raise StravaTokenError("Access token expired", status_code)
+    raise StravaApiError(f"Failed to list activities page {page}: {text}", status_code)
+
+
+def _raise_for_retry(resp: requests.Response) -> None:
+    """Surface 429s and server errors as HTTPError so `retry_on_failure`
+    handles them"""
+    if not resp.ok and (resp.status_code == 429 or resp.status_code >= 500):
+        resp.raise_for_status()
+
 
-    def __init__(self, tokens: StravaTokenSet, api_config: StravaApiConfig):
+def _call(fetch: Callable[[], requests.Response]) -> requests.Response:
+    """Call `fetch`, returning the last response if it still failed with a
+    server error after retrying, for the caller to report"""
+    try:
+        return fetch()
+    except requests.exceptions.HTTPError as e:
+        if e.response is None:
+            raise
+        return e.response
+
+
+class StravaTokenRepo(ReadStravaToken):
+    """Fetch new access token
+
+    With a `token_cache`, a cached access token that is still valid is
+    returned without calling Strava, and every refreshed token set is written
+    back. Strava rotates refresh tokens, so the newest one is always kept in
+    the cache and used for the next refresh.
+    """
+
+    def __init__(
+        self,
+        tokens: StravaTokenSet,
+        api_config: StravaApiConfig,
+        rate_budget: StravaRateBudget | None = None,
+        session: requests.Session | None = None,
+        token_cache: TokenCache | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
         self._tokens = tokens
         self._api_config = api_config
+        self._rate_budget = rate_budget or StravaRateBudget.from_config(api_config)
+        self._session = session or make_session(api_config)
+        self._token_cache = token_cache
+        self._circuit_breaker = circuit_breaker or make_circuit_breaker(
+            api_config.token_url, api_config
+        )
 
-    def refresh(self) -> StravaTokenSet:
+    def refresh(self, *, force: bool = False) -> StravaTokenSet:
+        if self._token_cache is None:
+            return self._refresh()
+        with self._token_cache.lock():
+            cached = self._token_cache.load()
+            if cached is not None and cached.client_id == self._tokens.client_id:
+                cached = cached._replace(client_secret=self._tokens.client_secret)
+                if not force and self._is_fresh(cached):
+                    logger.info("Using cached Strava access token")
+                    return cached
+                self._tokens = self._tokens._replace(refresh_token=cached.refresh_token)
+            tokens = self._refresh()
+            self._token_cache.save(tokens)
+            return tokens
+
+    def _is_fresh(self, tokens: StravaTokenSet) -> bool:
+        return tokens.expires_at is not None and (
+            tokens.expires_at - self._api_config.token_refresh_margin > time.time()
+        )
+
+    def _refresh(self) -> StravaTokenSet:
         @retry_on_failure(
             max_attempts=self._api_config.token_retry_attempts,
             backoff_seconds=self._api_config.token_retry_backoff,
+            defer=self._api_config.defer_rate_limits,
+            jitter=self._api_config.retry_jitter,
+            circuit_breaker=self._circuit_breaker,
         )
         def _refresh():
             payload = {
@@ -37,13 +132,17 @@ class StravaTokenRepo(ReadStravaToken):
                 "refresh_token": self._tokens.refresh_token,
                 "grant_type": "refresh_token",
             }
-            return requests.post(
+            resp = self._session.post(
                 url=self._api_config.token_url,
                 data=payload,
                 timeout=self._api_config.request_timeout,
             )
+            # OAuth calls aren't paced, but their usage headers still count
+            self._rate_budget.update(resp)
+            _raise_for_retry(resp)
+            return resp
 
-        resp = _refresh()
+        resp = _call(_refresh)
 
         if not resp.ok:
             if resp.status_code == 401:
@@ -55,65 +154,100 @@ class StravaTokenRepo(ReadStravaToken):
                     f"Token refresh failed: {resp.text}", resp.status_code
                 )
 
-        access_token = resp.json()["access_token"]
+        body = resp.json()
+        expires_at = body.get("expires_at")
+        if expires_at is None and body.get("expires_in") is not None:
+            expires_at = int(time.time()) + int(body["expires_in"])
+        # Strava may rotate the refresh token; the old one stops working
+        self._tokens = self._tokens._replace(
+            refresh_token=body.get("refresh_token", self._tokens.refresh_token)
+        )
         logger.info("Tokens successfully updated")
-        return StravaTokenSet(
-            client_id=self._tokens.client_id,
-            client_secret=self._tokens.client_secret,
-            access_token=access_token,
-            refresh_token=self._tokens.refresh_token,
+        return self._tokens._replace(
+            access_token=body["access_token"], expires_at=expires_at
         )
 
 
 class StravaActivitiesRepo(ReadActivities):
     """Repository for fetching Strava Activities"""
 
-    def __init__(self, tokens: StravaTokenSet, api_config: StravaApiConfig):
+    def __init__(
+        self,
+        tokens: StravaTokenSet,
+        api_config: StravaApiConfig,
+        rate_budget: StravaRateBudget | None = None,
+        session: requests.Session | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
         # TODO: Document adapter-specific api_config parameter properly.
         # This adapter extends the port interface with additional configuration.
         self._tokens = tokens
         self._api_config = api_config
+        self._rate_budget = rate_budget or StravaRateBudget.from_config(api_config)
+        self._session = session or make_session(api_config)
+        self._circuit_breaker = circuit_breaker or make_circuit_breaker(
+            api_config.api_base_url, api_config
+        )
         self._headers = {"Authorization": f"Bearer {self._tokens.access_token}"}
 
-    def _read_raw_activity_by_id(self, activity_id: int) -> dict[str, Any]:
+    def _get(
+        self, path: str, params: dict[str, int] | None = None
+    ) -> requests.Response:
         @retry_on_failure(
             max_attempts=self._api_config.activity_retry_attempts,
             backoff_seconds=self._api_config.activity_retry_backoff,
+            defer=self._api_config.defer_rate_limits,
+            jitter=self._api_config.retry_jitter,
+            circuit_breaker=self._circuit_breaker,
         )
         def _fetch():
-            activity_endpoint = (
-                f"{self._api_config.api_base_url}/activities/{activity_id}"
-            )
-            return requests.get(
-                url=activity_endpoint,
-                headers=self._headers,
-                timeout=self._api_config.request_timeout,
-            )
+            with self._rate_budget.request():
+                resp = self._session.get(
+                    url=f"{self._api_config.api_base_url}{path}",
+                    headers=self._headers,
+                    params=params,
+                    timeout=self._api_config.request_timeout,
+                )
+                self._rate_budget.update(resp)
+            _raise_for_retry(resp)
+            return resp
+
+        return _call(_fetch)
+
+    def warm_up(self) -> None:
+        """Open a pooled connection to the Strava API. Unauthenticated, so it
+        doesn't count against the application's rate limits."""
+        warm_up_session(
+            self._session,
+            self._api_config.api_base_url,
+            timeout=self._api_config.request_timeout,
+        )
 
-        resp = _fetch()
+    def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        """Fetch an Activity from Strava as the unvalidated JSON bytes of the
+        response body"""
+        resp = self._get(f"/activities/{activity_id}")
         if not resp.ok:
-            logger.error(
-                "Failed to fetch activity %s: %s", activity_id, resp.status_code
-            )
-            if resp.status_code == 404:
-                raise ActivityNotFoundError(activity_id)
-            elif resp.status_code == 401:
-                raise StravaTokenError(
-                    "Access token expired", resp.status_code, activity_id
-                )
-            else:
-                raise StravaApiError(
-                    f"Failed to fetch activity {activity_id}: {resp.text}",
-                    resp.status_code,
-                    activity_id,
-                )
-        return resp.json()
+            raise_activity_error(activity_id, resp.status_code, resp.text)
+        return resp.content
+
+    def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        """Fetch one page of the authenticated athlete's activities:
+        https://developers.strava.com/docs/reference/#api-Activities-getLoggedInAthleteActivities
+        """
+        params = {"page": page, "per_page": per_page}
+        if before is not None:
+            params["before"] = before
+        resp = self._get("/athlete/activities", params)
+        if not resp.ok:
+            raise_summaries_error(page, resp.status_code, resp.text)
+        return parse_json(resp.content, list[SummaryActivity])
 
     def read_activity_by_id(self, activity_id: int) -> StravaActivity:
         """Fetch an Activity from Strava. An activity is roughly Strava's
         DetailedActivity model:
           https://developers.strava.com/docs/reference/#api-models-DetailedActivity
         """
-        resp = self._read_raw_activity_by_id(activity_id)
-        activity = StravaActivity(**resp)
-        return activity
+        return parse_json(self.read_raw_activity_by_id(activity_id), StravaActivity)
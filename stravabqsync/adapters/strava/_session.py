@@ -0,0 +1,45 @@
+"""Pooled HTTP sessions for the Strava API"""
+
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from stravabqsync.config import StravaApiConfig
+
+logger = logging.getLogger(__name__)
+
+
+def make_session(api_config: StravaApiConfig) -> requests.Session:
+    """Create a `requests.Session` with a keep-alive connection pool.
+
+    Reusing pooled connections skips the TCP and TLS handshakes with
+    strava.com on every call after the first one per connection.
+
+    Args:
+        api_config: `pool_connections` is the number of per-host pools kept,
+            `pool_maxsize` the connections kept per host, and `pool_block`
+            whether callers wait for a free connection instead of opening
+            extra, unpooled ones. `keep_alive=False` closes every connection
+            after its response.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=api_config.pool_connections,
+        pool_maxsize=api_config.pool_maxsize,
+        pool_block=api_config.pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not api_config.keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def warm_up_session(session: requests.Session, url: str, *, timeout: float) -> None:
+    """Open a pooled connection to `url`'s host with an unauthenticated HEAD
+    request, so the next call skips the handshakes. Failures are ignored."""
+    try:
+        session.head(url, timeout=timeout).close()
+    except requests.RequestException as e:
+        logger.debug("Connection warm-up to %s failed: %s", url, e)
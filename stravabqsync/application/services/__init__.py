@@ -1,16 +1,75 @@
-from functools import lru_cache
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-from stravabqsync.adapters.gcp import make_write_activities
-from stravabqsync.adapters.strava import make_read_activities, make_read_strava_token
-from stravabqsync.application.services._sync_service import SyncService
+from stravabqsync.adapters.gcp import (
+    make_async_backfill_write_activities,
+    make_async_write_activities,
+    make_backfill_write_activities,
+    make_read_fingerprints,
+    make_write_activities,
+    make_write_changes,
+)
+from stravabqsync.adapters.local import make_backfill_checkpoints, make_sync_spool
+from stravabqsync.adapters.strava import (
+    make_async_read_activities,
+    make_async_read_strava_token,
+    make_async_strava_client,
+    make_read_activities,
+    make_read_strava_token,
+)
+from stravabqsync.application.services._async_sync_service import AsyncSyncService
+from stravabqsync.application.services._backfill_service import (
+    AsyncBackfillService,
+    BackfillService,
+)
+from stravabqsync.application.services._change_service import ChangeLogService
+from stravabqsync.application.services._sync_service import (
+    ReplayResult,
+    SyncResult,
+    SyncService,
+)
+from stravabqsync.application.services._token_manager import (
+    AsyncTokenManager,
+    TokenManager,
+)
+from stravabqsync.config import get_app_config
+from stravabqsync.container import container
+from stravabqsync.fingerprint import FingerprintCache
 
+__all__ = [
+    "AsyncBackfillService",
+    "AsyncSyncService",
+    "AsyncTokenManager",
+    "BackfillService",
+    "ChangeLogService",
+    "ReplayResult",
+    "SyncResult",
+    "SyncService",
+    "TokenManager",
+    "make_backfill_service",
+    "open_async_backfill_service",
+    "open_async_sync_service",
+    "make_change_log_service",
+    "make_sync_service",
+    "replay_in_background",
+    "warm_up_in_background",
+]
 
-@lru_cache(maxsize=1)
+logger = logging.getLogger(__name__)
+
+# Held while a background replay drains the spool
+_replay_lock = threading.Lock()
+
+
+@container.singleton
 def make_sync_service() -> SyncService:
     """Create a configured SyncService instance.
 
     Factory function that wires together all dependencies needed for the
-    sync service. Uses LRU cache to ensure singleton behavior.
+    sync service. The instance is shared by the process; concurrent first
+    calls wait for a single instance to be built.
 
     Returns:
         SyncService: Fully configured sync service instance.
@@ -19,8 +78,146 @@ def make_sync_service() -> SyncService:
         StravaTokenError: If initial token refresh fails.
         ConfigurationError: If required configuration is missing.
     """
+    app_config = get_app_config()
     return SyncService(
         read_strava_token=make_read_strava_token,
         read_activities=make_read_activities,
         write_activities=make_write_activities,
+        parallel_init=app_config.parallel_init,
+        fingerprints=_make_fingerprint_cache(),
+        fingerprint_exclude=app_config.bq_write.fingerprint_exclude,
+        spool=make_sync_spool(app_config.spool_dir) if app_config.spool_dir else None,
+    )
+
+
+@container.singleton
+def _make_fingerprint_cache() -> FingerprintCache | None:
+    """Fingerprints of recently written activities, seeded from the table by
+    `load()`; None if `bq_write.fingerprint_cache_size` is 0"""
+    size = get_app_config().bq_write.fingerprint_cache_size
+    if size <= 0:
+        return None
+    return FingerprintCache(
+        size, load=lambda limit: make_read_fingerprints().read_fingerprints(limit)
     )
+
+
+@container.singleton
+def make_change_log_service() -> ChangeLogService:
+    """Create a ChangeLogService that coalesces and batches its writes.
+
+    Raises:
+        ConfigurationError: If required configuration is missing.
+    """
+    return ChangeLogService(write_changes=make_write_changes)
+
+
+def warm_up_in_background() -> threading.Thread:
+    """Build the sync service and warm up its connections on a daemon
+    thread, so an instance is ready by the time its first event arrives.
+    An event that arrives earlier waits in `make_sync_service`."""
+
+    def warm_up() -> None:
+        try:
+            make_sync_service().warm_up()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Background warm-up failed")
+
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def replay_in_background() -> threading.Thread | None:
+    """Replay the sync service's spool on a daemon thread, e.g. after a sync
+    succeeded and Strava and BigQuery look healthy again. Does nothing while
+    a replay is already running."""
+    if not _replay_lock.acquire(blocking=False):
+        return None
+
+    def replay() -> None:
+        try:
+            make_sync_service().replay()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Background replay failed")
+        finally:
+            _replay_lock.release()
+
+    thread = threading.Thread(target=replay, name="replay", daemon=True)
+    thread.start()
+    return thread
+
+
+def make_backfill_service(
+    checkpoint_path: str, *, per_page: int = 200
+) -> BackfillService:
+    """Create a BackfillService that checkpoints to `checkpoint_path`.
+
+    Raises:
+        StravaTokenError: If initial token refresh fails.
+        ConfigurationError: If required configuration is missing.
+    """
+    sync_service = SyncService(
+        read_strava_token=make_read_strava_token,
+        read_activities=make_read_activities,
+        write_activities=make_backfill_write_activities,
+        fingerprints=_make_fingerprint_cache(),
+        fingerprint_exclude=get_app_config().bq_write.fingerprint_exclude,
+    )
+    # Re-running a backfill skips the activities it already wrote
+    sync_service.load_fingerprints()
+    return BackfillService(
+        sync_service,
+        make_backfill_checkpoints(checkpoint_path),
+        per_page=per_page,
+    )
+
+
+@asynccontextmanager
+async def open_async_sync_service(
+    *, backfill: bool = False, max_in_flight: int = 100
+) -> AsyncIterator[AsyncSyncService]:
+    """Create an AsyncSyncService on a new Strava client, which is closed on
+    exit. With `backfill`, write as backfills do.
+
+    Raises:
+        ConfigurationError: If httpx is not installed or required
+            configuration is missing.
+    """
+    client = make_async_strava_client()
+    try:
+        yield AsyncSyncService(
+            read_strava_token=make_async_read_strava_token(),
+            read_activities=lambda tokens: make_async_read_activities(tokens, client),
+            write_activities=(
+                make_async_backfill_write_activities()
+                if backfill
+                else make_async_write_activities()
+            ),
+            max_in_flight=max_in_flight,
+            fingerprints=_make_fingerprint_cache(),
+            fingerprint_exclude=get_app_config().bq_write.fingerprint_exclude,
+        )
+    finally:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def open_async_backfill_service(
+    checkpoint_path: str, *, per_page: int = 200, max_in_flight: int = 100
+) -> AsyncIterator[AsyncBackfillService]:
+    """Create an AsyncBackfillService that checkpoints to `checkpoint_path`.
+
+    Raises:
+        ConfigurationError: If httpx is not installed or required
+            configuration is missing.
+    """
+    async with open_async_sync_service(
+        backfill=True, max_in_flight=max_in_flight
+    ) as sync_service:
+        await sync_service.load_fingerprints()
+        yield AsyncBackfillService(
+            sync_service,
+            make_backfill_checkpoints(checkpoint_path),
+            per_page=per_page,
+        )
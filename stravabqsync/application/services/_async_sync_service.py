@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Collection, Iterable, Mapping, TypeVar
+
+from stravabqsync.application.services._sync_service import (
+    SyncResult,
+    changed_activities,
+    fingerprint_digests,
+    remember_fingerprints,
+)
+from stravabqsync.application.services._token_manager import AsyncTokenManager
+from stravabqsync.domain import StravaActivity, StravaTokenSet, SummaryActivity
+from stravabqsync.exceptions import PartialWriteError, StravaTokenError
+from stravabqsync.fingerprint import Fingerprint, FingerprintCache
+from stravabqsync.ports.out.read import AsyncReadActivities, AsyncReadStravaToken
+from stravabqsync.ports.out.write import AsyncWriteActivities
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncSyncService:
+    """SyncService for asyncio
+
+    Fetches are coroutines on one event loop rather than tasks on a thread
+    pool, so `run_many` keeps up to `max_in_flight` fetches going at once
+    and scales with network latency instead of thread count. The Strava
+    rate budget still paces the requests themselves. Failed syncs are
+    raised by `run`; there is no spool.
+    """
+
+    def __init__(
+        self,
+        read_strava_token: AsyncReadStravaToken,
+        read_activities: Callable[[StravaTokenSet], AsyncReadActivities],
+        write_activities: AsyncWriteActivities,
+        *,
+        max_in_flight: int = 100,
+        fingerprints: FingerprintCache | None = None,
+        fingerprint_exclude: Collection[str] = (),
+    ):
+        """Initialize the async sync service.
+
+        Args:
+            read_strava_token: Token refresh service. The first token is
+                fetched on first use.
+            read_activities: Factory for an activity reader per access token.
+            write_activities: Activity writer.
+            max_in_flight: Maximum number of concurrent activity fetches in
+                `run_many`.
+            fingerprints: Fingerprints of the activity versions last
+                written. Activities whose fingerprint is unchanged aren't
+                written again. None writes every fetched activity.
+            fingerprint_exclude: Fields left out of fingerprints.
+        """
+        self._token_manager = AsyncTokenManager(read_strava_token)
+        self._make_read_activities = read_activities
+        self._write_activities = write_activities
+        self._max_in_flight = max_in_flight
+        self._fingerprints = fingerprints
+        self._fingerprint_exclude = frozenset(fingerprint_exclude)
+        self._unflushed: dict[int, Fingerprint | None] = {}
+        self._in_flight: dict[int, asyncio.Future[None]] = {}
+
+    async def warm_up(self) -> None:
+        """Open connections to Strava and BigQuery and load the fingerprint
+        cache concurrently. Failures are logged and otherwise ignored."""
+        reader = self._make_read_activities(await self._token_manager.get())
+        steps = {
+            "Strava": reader.warm_up(),
+            "BigQuery": self._write_activities.warm_up(),
+            "Fingerprint": self.load_fingerprints(),
+        }
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        for name, result in zip(steps, results):
+            if isinstance(result, Exception):
+                logger.warning("%s warm-up failed: %s", name, result)
+
+    async def load_fingerprints(self) -> None:
+        """Seed the fingerprint cache, see `SyncService.load_fingerprints`"""
+        # Seeding the cache queries BigQuery; keep it off the event loop
+        if self._fingerprints is not None:
+            await asyncio.to_thread(self._fingerprints.load)
+
+    async def _with_reader(
+        self, read: Callable[[AsyncReadActivities], Awaitable[T]]
+    ) -> T:
+        """Call `read` with a reader for the current access token. If Strava
+        rejects the token, refresh it once and retry."""
+        tokens = await self._token_manager.get()
+        try:
+            return await read(self._make_read_activities(tokens))
+        except StravaTokenError as e:
+            if e.status_code != 401:
+                raise
+            logger.warning("Access token rejected, refreshing and retrying once")
+            tokens = await self._token_manager.invalidate(tokens)
+            return await read(self._make_read_activities(tokens))
+
+    async def _read_activity(self, activity_id: int) -> StravaActivity:
+        return await self._with_reader(
+            lambda reader: reader.read_activity_by_id(activity_id)
+        )
+
+    async def run(self, activity_id: int) -> None:
+        """Sync data for `activity_id` from Strava to BigQuery activities table
+
+        Concurrent calls for the same `activity_id` share a single fetch and
+        write. The write is skipped if the activity is unchanged since it was
+        last written.
+        """
+        sync = self._in_flight.get(activity_id)
+        if sync is None:
+            sync = self._in_flight[activity_id] = asyncio.ensure_future(
+                self._sync(activity_id)
+            )
+            sync.add_done_callback(lambda _: self._in_flight.pop(activity_id, None))
+        # Shielded, so one cancelled caller doesn't cancel the others' sync
+        await asyncio.shield(sync)
+
+    async def _sync(self, activity_id: int) -> None:
+        activity = await self._read_activity(activity_id)
+        changed = await self._changed([activity])
+        if changed:
+            await self._write_activities.write_activity(
+                activity, digest=fingerprint_digests(changed).get(activity.id)
+            )
+            self._remember(changed)
+
+    async def _changed(
+        self, activities: list[StravaActivity]
+    ) -> dict[int, Fingerprint | None]:
+        return changed_activities(
+            self._fingerprints, activities, exclude=self._fingerprint_exclude
+        )
+
+    def _remember(
+        self, written: dict[int, Fingerprint | None], failed: Collection[int] = ()
+    ) -> None:
+        """Record the fingerprints of the `written` activities, except
+        `failed`, or hold them until `flush()` if the writer defers writes"""
+        if not self._write_activities.deferred:
+            remember_fingerprints(self._fingerprints, written, failed)
+            return
+        self._unflushed.update(
+            (i, value) for i, value in written.items() if i not in failed
+        )
+
+    async def flush(self) -> None:
+        """Write any activities still buffered by the writer, then remember
+        the fingerprints of those it stored. See `SyncService.flush`."""
+        written, self._unflushed = self._unflushed, {}
+        try:
+            await self._write_activities.flush()
+        except PartialWriteError as e:
+            remember_fingerprints(self._fingerprints, written, e.activity_ids)
+            raise
+        remember_fingerprints(self._fingerprints, written)
+
+    async def list_activities(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        """List one page of the athlete's activities, newest first"""
+        return await self._with_reader(
+            lambda reader: reader.read_activity_summaries(
+                page=page, per_page=per_page, before=before
+            )
+        )
+
+    async def run_many(
+        self,
+        activity_ids: Iterable[int],
+        *,
+        prefetched: Mapping[int, StravaActivity] | None = None,
+    ) -> list[SyncResult]:
+        """Sync several activities from Strava to the BigQuery activities table.
+
+        Like `SyncService.run_many`: activities are fetched concurrently,
+        up to `max_in_flight` at a time, and written with a single batched
+        write. Failures are captured per activity instead of being raised.
+
+        Args:
+            activity_ids: Strava activity IDs to sync. Duplicates are fetched
+                and written once.
+            prefetched: Activities already fetched, by ID, written without
+                fetching them again.
+
+        Returns:
+            list[SyncResult]: One result per unique activity ID, in input order.
+        """
+        unique_ids = list(dict.fromkeys(activity_ids))
+        if not unique_ids:
+            return []
+
+        prefetched = prefetched or {}
+        fetched = {i: prefetched[i] for i in unique_ids if i in prefetched}
+        errors: dict[int, Exception] = {}
+        slots = asyncio.Semaphore(self._max_in_flight)
+
+        async def fetch(activity_id: int) -> None:
+            async with slots:
+                try:
+                    fetched[activity_id] = await self._read_activity(activity_id)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning("Failed to fetch activity %s: %s", activity_id, e)
+                    errors[activity_id] = e
+
+        await asyncio.gather(*(fetch(i) for i in unique_ids if i not in fetched))
+
+        changed = await self._changed([fetched[i] for i in unique_ids if i in fetched])
+        if changed:
+            try:
+                await self._write_activities.write_activities(
+                    [fetched[i] for i in changed],
+                    digests=fingerprint_digests(changed),
+                )
+            except PartialWriteError as e:
+                logger.error(
+                    "Failed to write %d activities: %s", len(e.activity_ids), e
+                )
+                errors.update({i: e for i in e.activity_ids})
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Failed to write %d activities: %s", len(changed), e)
+                errors.update({i: e for i in changed})
+            self._remember(changed, failed=errors.keys())
+
+        logger.info(
+            "Synced %d of %d activities", len(unique_ids) - len(errors), len(unique_ids)
+        )
+        return [SyncResult(i, errors.get(i)) for i in unique_ids]
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Collection, Iterator
+
+from stravabqsync.application.services._async_sync_service import AsyncSyncService
+from stravabqsync.application.services._sync_service import SyncResult, SyncService
+from stravabqsync.domain import BackfillCheckpoint, SummaryActivity
+from stravabqsync.exceptions import PartialWriteError
+from stravabqsync.ports.out.state import BackfillCheckpoints
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillService:
+    """Load an athlete's activity history into BigQuery, resumably.
+
+    Pages through /athlete/activities, syncs each page with
+    `SyncService.run_many` (bounded concurrent fetches, batched writes) and
+    saves a checkpoint after every page once its writes are flushed. A
+    restarted backfill picks up at the page after the last checkpoint, so at
+    most one page is synced twice.
+    """
+
+    def __init__(
+        self,
+        sync_service: SyncService,
+        checkpoints: BackfillCheckpoints,
+        *,
+        per_page: int = 200,
+    ):
+        """Initialize the backfill service.
+
+        Args:
+            sync_service: Service used to fetch and write each page.
+            checkpoints: Store for backfill progress.
+            per_page: Activities requested per page (Strava allows up to 200).
+        """
+        self._sync_service = sync_service
+        self._checkpoints = checkpoints
+        self._per_page = per_page
+
+    def iter_pages(
+        self, *, before: int, start_page: int = 1
+    ) -> Iterator[tuple[int, list[SummaryActivity]]]:
+        """Lazily yield `(page_number, summaries)` until Strava returns an
+        empty page"""
+        page = start_page
+        while True:
+            summaries = self._sync_service.list_activities(
+                page=page, per_page=self._per_page, before=before
+            )
+            if not summaries:
+                return
+            yield page, summaries
+            page += 1
+
+    def run(
+        self,
+        *,
+        restart: bool = False,
+        before: int | None = None,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> BackfillCheckpoint:
+        """Backfill all activities, resuming from the saved checkpoint.
+
+        Args:
+            restart: Ignore any saved checkpoint and start from the first page.
+            before: Only backfill activities that started before this epoch
+                timestamp. Defaults to now. Ignored when resuming.
+            on_progress: Called with the number of activities handled after
+                each page.
+
+        Returns:
+            BackfillCheckpoint: Final checkpoint of the run.
+        """
+        checkpoint = _start(self._checkpoints, restart=restart, before=before)
+
+        for page, summaries in self.iter_pages(
+            before=checkpoint.before, start_page=checkpoint.page + 1
+        ):
+            results = self._sync_service.run_many(s.id for s in summaries)
+            # Only checkpoint what is durably written. Rows BigQuery rejected
+            # for good are recorded as failed rather than retried forever.
+            try:
+                self._sync_service.flush()
+                rejected: Collection[int] = ()
+            except PartialWriteError as e:
+                logger.error(
+                    "Failed to write %d activities: %s", len(e.activity_ids), e
+                )
+                rejected = e.activity_ids
+            checkpoint = _advance(checkpoint, page, summaries, results, rejected)
+            self._checkpoints.save(checkpoint)
+            if on_progress is not None:
+                on_progress(len(results))
+
+        _log_complete(checkpoint)
+        return checkpoint
+
+
+class AsyncBackfillService:
+    """BackfillService on an AsyncSyncService
+
+    Each page's activities are fetched concurrently on one event loop, and
+    the next page is listed while the current one syncs. Checkpoints are
+    saved as by BackfillService.
+    """
+
+    def __init__(
+        self,
+        sync_service: AsyncSyncService,
+        checkpoints: BackfillCheckpoints,
+        *,
+        per_page: int = 200,
+    ):
+        self._sync_service = sync_service
+        self._checkpoints = checkpoints
+        self._per_page = per_page
+
+    async def run(
+        self,
+        *,
+        restart: bool = False,
+        before: int | None = None,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> BackfillCheckpoint:
+        """Backfill all activities, resuming from the saved checkpoint. See
+        `BackfillService.run`."""
+        checkpoint = _start(self._checkpoints, restart=restart, before=before)
+        page = checkpoint.page + 1
+        summaries = await self._list(page, checkpoint.before)
+        while summaries:
+            listing = asyncio.ensure_future(self._list(page + 1, checkpoint.before))
+            try:
+                results = await self._sync_service.run_many(s.id for s in summaries)
+                try:
+                    await self._sync_service.flush()
+                    rejected: Collection[int] = ()
+                except PartialWriteError as e:
+                    logger.error(
+                        "Failed to write %d activities: %s", len(e.activity_ids), e
+                    )
+                    rejected = e.activity_ids
+            except BaseException:
+                listing.cancel()
+                raise
+            checkpoint = _advance(checkpoint, page, summaries, results, rejected)
+            self._checkpoints.save(checkpoint)
+            if on_progress is not None:
+                on_progress(len(results))
+            summaries = await listing
+            page += 1
+
+        _log_complete(checkpoint)
+        return checkpoint
+
+    async def _list(self, page: int, before: int) -> list[SummaryActivity]:
+        return await self._sync_service.list_activities(
+            page=page, per_page=self._per_page, before=before
+        )
+
+
+def _start(
+    checkpoints: BackfillCheckpoints, *, restart: bool, before: int | None
+) -> BackfillCheckpoint:
+    """The checkpoint to resume from, or a fresh one"""
+    checkpoint = None if restart else checkpoints.load()
+    if checkpoint is None:
+        checkpoint = BackfillCheckpoint(before=before or int(time.time()))
+        logger.info("Starting backfill before %s", checkpoint.before)
+    else:
+        logger.info("Resuming backfill after page %s", checkpoint.page)
+    return checkpoint
+
+
+def _advance(
+    checkpoint: BackfillCheckpoint,
+    page: int,
+    summaries: list[SummaryActivity],
+    results: list[SyncResult],
+    rejected: Collection[int],
+) -> BackfillCheckpoint:
+    """The checkpoint after syncing `page`"""
+    failed = tuple(
+        r.activity_id for r in results if not r.ok or r.activity_id in rejected
+    )
+    logger.info(
+        "Backfilled page %s (%d activities, %d failed)",
+        page,
+        len(results),
+        len(failed),
+    )
+    return checkpoint._replace(
+        page=page,
+        activity_id=summaries[-1].id,
+        synced=checkpoint.synced + len(results) - len(failed),
+        failed_ids=checkpoint.failed_ids + failed,
+    )
+
+
+def _log_complete(checkpoint: BackfillCheckpoint) -> None:
+    logger.info(
+        "Backfill complete: %d synced, %d failed",
+        checkpoint.synced,
+        len(checkpoint.failed_ids),
+    )
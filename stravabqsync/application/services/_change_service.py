@@ -0,0 +1,41 @@
+import logging
+
+from stravabqsync.adapters import Supplier
+from stravabqsync.domain import ActivityChange, WebhookRequest
+from stravabqsync.ports.out.write import WriteChanges
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeLogService:
+    """Log activity updates and deletions from webhook events to the
+    change-log table, which the query-side view joins onto activities"""
+
+    def __init__(self, write_changes: Supplier[WriteChanges]):
+        """Initialize the change-log service.
+
+        Args:
+            write_changes: Factory function for the change-log writer.
+        """
+        self._write_changes = write_changes()
+
+    def run(self, request: WebhookRequest) -> None:
+        """Log the change described by an activity `update` or `delete` event
+
+        Raises:
+            ValueError: If `request` is not an activity update or deletion.
+        """
+        if request.object_type != "activity" or request.aspect_type not in (
+            "update",
+            "delete",
+        ):
+            raise ValueError(
+                f"Not an activity change: {request.object_type} {request.aspect_type}"
+            )
+        change = ActivityChange.from_webhook(request)
+        self._write_changes.write_changes([change])
+        logger.info("Logged %s of activity %s", request.aspect_type, change.id)
+
+    def flush(self) -> None:
+        """Write any changes still buffered by the writer"""
+        self._write_changes.flush()
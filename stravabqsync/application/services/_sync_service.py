@@ -1,10 +1,138 @@
-from typing import Callable
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Collection, Iterable, Mapping, NamedTuple, TypeVar
 
 from stravabqsync.adapters import Supplier
-from stravabqsync.domain import StravaTokenSet
+from stravabqsync.application.services._token_manager import TokenManager
+from stravabqsync.concurrency import SingleFlight
+from stravabqsync.domain import (
+    SpooledSync,
+    StravaActivity,
+    StravaTokenSet,
+    SummaryActivity,
+)
+from stravabqsync.exceptions import (
+    ActivityNotFoundError,
+    BigQueryError,
+    DataValidationError,
+    PartialWriteError,
+    RetryLaterError,
+    StravaApiError,
+    StravaRateLimitError,
+    StravaTokenError,
+)
+from stravabqsync.fingerprint import (
+    Fingerprint,
+    FingerprintCache,
+    changed_fields,
+    fingerprint,
+)
 from stravabqsync.ports.out.read import ReadActivities, ReadStravaToken
+from stravabqsync.ports.out.state import SyncSpool
 from stravabqsync.ports.out.write import WriteActivities
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Failures that retrying can't fix, and failures worth retrying once Strava or
+# BigQuery recover
+PERMANENT_ERRORS = (ActivityNotFoundError, DataValidationError)
+TRANSIENT_ERRORS = (StravaApiError, BigQueryError, OSError)
+
+
+def _not_before(error: Exception | None) -> datetime | None:
+    """When Strava allows retrying after `error`, None unless it's a rate
+    limit"""
+    if isinstance(error, RetryLaterError):
+        return error.retry_at
+    if isinstance(error, StravaRateLimitError) and error.retry_after:
+        return datetime.now(timezone.utc) + timedelta(seconds=error.retry_after)
+    return None
+
+
+def changed_activities(
+    fingerprints: FingerprintCache | None,
+    activities: list[StravaActivity],
+    *,
+    exclude: Collection[str] = (),
+) -> dict[int, Fingerprint | None]:
+    """Fingerprints of the `activities` that changed since they were last
+    written, by ID, logging the fields that changed. Without a fingerprint
+    cache every activity counts as changed."""
+    if fingerprints is None:
+        return {activity.id: None for activity in activities}
+    changed: dict[int, Fingerprint | None] = {}
+    for activity in activities:
+        new = fingerprint(activity, exclude=exclude)
+        old = fingerprints.get(activity.id)
+        if old is None:
+            changed[activity.id] = new
+            continue
+        if old.digest == new.digest:
+            logger.info("Activity %s is unchanged, skipping write", activity.id)
+            continue
+        fields = changed_fields(old, new)
+        logger.info(
+            "Activity %s changed: %s",
+            activity.id,
+            "unknown fields" if fields is None else ", ".join(fields),
+        )
+        changed[activity.id] = new
+    return changed
+
+
+def fingerprint_digests(changed: Mapping[int, Fingerprint | None]) -> dict[int, str]:
+    """Digests of the fingerprints in `changed`, by activity ID, for the
+    writer to store without fingerprinting the activities again"""
+    return {i: value.digest for i, value in changed.items() if value is not None}
+
+
+def remember_fingerprints(
+    fingerprints: FingerprintCache | None,
+    written: dict[int, Fingerprint | None],
+    failed: Collection[int] = (),
+) -> None:
+    """Record the fingerprints of the `written` activities, except `failed`"""
+    if fingerprints is None:
+        return
+    for activity_id, value in written.items():
+        if value is not None and activity_id not in failed:
+            fingerprints.put(activity_id, value)
+
+
+class SyncResult(NamedTuple):
+    """Outcome of syncing a single activity in a batch
+
+    Attributes:
+      activity_id: Strava activity ID
+      error: Exception raised while fetching or writing, None on success
+    """
+
+    activity_id: int
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ReplayResult(NamedTuple):
+    """Outcome of draining the spool
+
+    Attributes:
+      replayed: Entries synced
+      retried: Entries that failed again and went back into the spool
+      dead_lettered: Entries set aside for good
+    """
+
+    replayed: int = 0
+    retried: int = 0
+    dead_lettered: int = 0
+
 
 class SyncService:
     """Receive Webhook message, parse and fetch related activity, and write
@@ -15,6 +143,12 @@ class SyncService:
         read_strava_token: Supplier[ReadStravaToken],
         read_activities: Callable[[StravaTokenSet], ReadActivities],
         write_activities: Supplier[WriteActivities],
+        *,
+        max_workers: int = 8,
+        parallel_init: bool = False,
+        fingerprints: FingerprintCache | None = None,
+        fingerprint_exclude: Collection[str] = (),
+        spool: SyncSpool | None = None,
     ):
         """Initialize the sync service with required dependencies.
 
@@ -22,16 +156,353 @@ class SyncService:
             read_strava_token: Factory function for token refresh service.
             read_activities: Factory function for activity reading service.
             write_activities: Factory function for activity writing service.
+            max_workers: Maximum number of concurrent activity fetches in
+                `run_many`.
+            parallel_init: Refresh the access token and build the writer
+                concurrently. They are independent, and both are mostly
+                network or import latency.
+            fingerprints: Fingerprints of the activity versions last
+                written. Activities whose fingerprint is unchanged aren't
+                written again. None writes every fetched activity.
+            fingerprint_exclude: Fields left out of fingerprints, e.g.
+                volatile counters.
+            spool: Where `run` sets aside failed syncs for `replay`. None
+                raises the failures instead.
 
         Raises:
             StravaTokenError: If initial token refresh fails.
             StravaApiError: If token refresh API call fails.
         """
-        self._tokens = read_strava_token().refresh()
-        self._read_activities = read_activities(self._tokens)
-        self._write_activities = write_activities()
+        self._make_read_activities = read_activities
+        self._max_workers = max_workers
+        self._in_flight: SingleFlight[None] = SingleFlight()
+        self._fingerprints = fingerprints
+        self._fingerprint_exclude = frozenset(fingerprint_exclude)
+        self._unflushed: dict[int, Fingerprint | None] = {}
+        self._unflushed_lock = threading.Lock()
+        self._spool = spool
+        if parallel_init:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                # In the caller's context, to keep its retry deadline
+                tokens = pool.submit(
+                    contextvars.copy_context().run,
+                    self._init_token_manager,
+                    read_strava_token,
+                )
+                writer = pool.submit(write_activities)
+                self._token_manager = tokens.result()
+                self._write_activities = writer.result()
+        else:
+            self._token_manager = self._init_token_manager(read_strava_token)
+            self._write_activities = write_activities()
+
+    @staticmethod
+    def _init_token_manager(
+        read_strava_token: Supplier[ReadStravaToken],
+    ) -> TokenManager:
+        token_manager = TokenManager(read_strava_token())
+        token_manager.get()
+        return token_manager
+
+    def warm_up(self) -> None:
+        """Open connections to Strava and BigQuery and load the fingerprint
+        cache concurrently, so the first sync doesn't pay for the handshakes,
+        credential fetches and lookups. Failures are logged and otherwise
+        ignored."""
+        reader = self._make_read_activities(self._token_manager.get())
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = {
+                pool.submit(reader.warm_up): "Strava",
+                pool.submit(self._write_activities.warm_up): "BigQuery",
+            }
+            futures[pool.submit(self.load_fingerprints)] = "Fingerprint"
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning("%s warm-up failed: %s", futures[future], e)
+
+    def load_fingerprints(self) -> None:
+        """Seed the fingerprint cache with the fingerprints stored in the
+        table, unless that was already done. Until then only activities
+        written by this instance are known to be unchanged."""
+        if self._fingerprints is not None:
+            self._fingerprints.load()
+
+    def _with_reader(self, read: Callable[[ReadActivities], T]) -> T:
+        """Call `read` with a reader for the current access token. If Strava
+        rejects the token, refresh it once and retry."""
+        tokens = self._token_manager.get()
+        try:
+            return read(self._make_read_activities(tokens))
+        except StravaTokenError as e:
+            if e.status_code != 401:
+                raise
+            logger.warning("Access token rejected, refreshing and retrying once")
+            tokens = self._token_manager.invalidate(tokens)
+            return read(self._make_read_activities(tokens))
+
+    def _read_activity(self, activity_id: int) -> StravaActivity:
+        return self._with_reader(lambda reader: reader.read_activity_by_id(activity_id))
 
     def run(self, activity_id: int) -> None:
-        """Sync data for `activity_id` from Strava to BigQuery activities table"""
-        activity = self._read_activities.read_activity_by_id(activity_id)
-        self._write_activities.write_activity(activity)
+        """Sync data for `activity_id` from Strava to BigQuery activities table
+
+        Concurrent calls for the same `activity_id`, e.g. for duplicate
+        webhook deliveries, share a single fetch and write. The write is
+        skipped if the activity is unchanged since it was last written.
+
+        With a spool, a sync that fails while Strava or BigQuery is down is
+        spooled for `replay`, with the activity if it was fetched, instead of
+        raising. A sync that Strava rate limited isn't replayed before the
+        limit lifts. A sync that can't succeed, e.g. for a deleted activity,
+        is dead-lettered.
+        """
+        self._in_flight.do(activity_id, lambda: self._sync(activity_id))
+
+    def _sync(self, activity_id: int) -> None:
+        activity = None
+        try:
+            activity = self._read_activity(activity_id)
+            changed = self._changed([activity])
+            if not changed:
+                return
+            self._write_activities.write_activity(
+                activity, digest=fingerprint_digests(changed).get(activity.id)
+            )
+            self._remember(changed)
+        except (*PERMANENT_ERRORS, *TRANSIENT_ERRORS) as e:
+            if self._spool is None:
+                raise
+            entry = SpooledSync(
+                activity_id=activity_id,
+                activity=activity,
+                error=str(e),
+                not_before=_not_before(e),
+            )
+            if isinstance(e, PERMANENT_ERRORS):
+                logger.error("Dead-lettering activity %s: %s", activity_id, e)
+                self._spool.dead_letter([entry])
+            elif entry.not_before is not None:
+                logger.warning(
+                    "Deferring activity %s until %s: %s",
+                    activity_id,
+                    entry.not_before.isoformat(),
+                    e,
+                )
+                self._spool.append([entry])
+            else:
+                logger.warning("Spooling activity %s for replay: %s", activity_id, e)
+                self._spool.append([entry])
+
+    def replay(self, *, batch_size: int = 100, max_attempts: int = 5) -> ReplayResult:
+        """Sync the spooled activities, `batch_size` entries at a time
+
+        Each batch is synced with `run_many`, writing spooled activities
+        without fetching them again. Entries that fail again go back to the
+        end of the spool, unless they can't succeed or have failed
+        `max_attempts` times, in which case they are dead-lettered. Draining
+        stops at a batch in which every entry failed for a reason worth
+        retrying, as Strava or BigQuery is still down; that batch stays at
+        the front of the spool as it was.
+
+        Entries deferred by a Strava rate limit are skipped until it lifts,
+        and don't count as failed attempts. Draining stops at a batch that
+        is rate limited, or in which every entry is still deferred.
+        """
+        if self._spool is None:
+            return ReplayResult()
+        replayed = retried = dead_lettered = 0
+        while entries := self._spool.peek(batch_size):
+            # Later entries for an activity supersede earlier ones
+            latest = {entry.activity_id: entry for entry in entries}
+            now = datetime.now(timezone.utc)
+            waiting = {
+                i: entry
+                for i, entry in latest.items()
+                if entry.not_before is not None and entry.not_before > now
+            }
+            if len(waiting) == len(latest):
+                logger.info(
+                    "Replay deferred until %s",
+                    min(e.not_before for e in waiting.values() if e.not_before),
+                )
+                break
+            results = self.run_many(
+                (i for i in latest if i not in waiting),
+                prefetched={
+                    i: entry.activity
+                    for i, entry in latest.items()
+                    if entry.activity is not None and i not in waiting
+                },
+            )
+            if all(
+                not r.ok
+                and not isinstance(r.error, PERMANENT_ERRORS)
+                and _not_before(r.error) is None
+                for r in results
+            ):
+                logger.warning("Replay stopped, all %d syncs failed", len(results))
+                break
+            retry, dead = [], []
+            rate_limited = False
+            for result in results:
+                if result.ok:
+                    replayed += 1
+                    continue
+                entry = latest[result.activity_id]
+                not_before = _not_before(result.error)
+                if not_before is not None:
+                    rate_limited = True
+                    retry.append(
+                        entry.model_copy(
+                            update={
+                                "error": str(result.error),
+                                "not_before": not_before,
+                            }
+                        )
+                    )
+                    continue
+                entry = entry.model_copy(
+                    update={"error": str(result.error), "attempts": entry.attempts + 1}
+                )
+                if (
+                    isinstance(result.error, PERMANENT_ERRORS)
+                    or entry.attempts >= max_attempts
+                ):
+                    dead.append(entry)
+                else:
+                    retry.append(entry)
+            # Re-queue before popping, so a crash in between duplicates
+            # entries rather than losing them
+            self._spool.dead_letter(dead)
+            self._spool.append([*waiting.values(), *retry])
+            self._spool.pop(len(entries))
+            retried += len(retry)
+            dead_lettered += len(dead)
+            if rate_limited:
+                logger.warning("Replay stopped, Strava rate limited")
+                break
+        outcome = ReplayResult(replayed, retried, dead_lettered)
+        if any(outcome):
+            logger.info("Replayed spool: %s", outcome)
+        return outcome
+
+    def _changed(
+        self, activities: list[StravaActivity]
+    ) -> dict[int, Fingerprint | None]:
+        return changed_activities(
+            self._fingerprints, activities, exclude=self._fingerprint_exclude
+        )
+
+    def _remember(
+        self, written: dict[int, Fingerprint | None], failed: Collection[int] = ()
+    ) -> None:
+        """Record the fingerprints of the `written` activities, except
+        `failed`. If the writer defers writes, hold them until `flush()`
+        confirms the activities are stored."""
+        if not self._write_activities.deferred:
+            remember_fingerprints(self._fingerprints, written, failed)
+            return
+        with self._unflushed_lock:
+            self._unflushed.update(
+                (i, value) for i, value in written.items() if i not in failed
+            )
+
+    def flush(self) -> None:
+        """Write any activities still buffered by the writer, then remember
+        the fingerprints of those it stored
+
+        Raises:
+            PartialWriteError: If some buffered activities failed; the
+                fingerprints of the rest are remembered.
+            Exception: If the writer failed as a whole; no fingerprints are
+                remembered, so the activities are written again next time.
+        """
+        with self._unflushed_lock:
+            written, self._unflushed = self._unflushed, {}
+        try:
+            self._write_activities.flush()
+        except PartialWriteError as e:
+            remember_fingerprints(self._fingerprints, written, e.activity_ids)
+            raise
+        remember_fingerprints(self._fingerprints, written)
+
+    def list_activities(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        """List one page of the athlete's activities, newest first"""
+        return self._with_reader(
+            lambda reader: reader.read_activity_summaries(
+                page=page, per_page=per_page, before=before
+            )
+        )
+
+    def run_many(
+        self,
+        activity_ids: Iterable[int],
+        *,
+        prefetched: Mapping[int, StravaActivity] | None = None,
+    ) -> list[SyncResult]:
+        """Sync several activities from Strava to the BigQuery activities table.
+
+        Activities are fetched concurrently on a bounded worker pool and all
+        successfully fetched activities are written with a single batched
+        insert. Failures are captured per activity instead of being raised, so
+        one bad ID doesn't abort the rest of the batch. If the insert only
+        fails for some rows, only those activities are marked as failed.
+        Activities unchanged since they were last written are not written
+        again.
+
+        Args:
+            activity_ids: Strava activity IDs to sync. Duplicates are fetched
+                and written once.
+            prefetched: Activities already fetched, by ID, written without
+                fetching them again.
+
+        Returns:
+            list[SyncResult]: One result per unique activity ID, in input order.
+        """
+        unique_ids = list(dict.fromkeys(activity_ids))
+        if not unique_ids:
+            return []
+
+        prefetched = prefetched or {}
+        fetched = {i: prefetched[i] for i in unique_ids if i in prefetched}
+        errors: dict[int, Exception] = {}
+        to_fetch = [i for i in unique_ids if i not in fetched]
+        workers = max(1, min(self._max_workers, len(to_fetch)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(self._read_activity, activity_id): activity_id
+                for activity_id in to_fetch
+            }
+            for future in as_completed(futures):
+                activity_id = futures[future]
+                try:
+                    fetched[activity_id] = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning("Failed to fetch activity %s: %s", activity_id, e)
+                    errors[activity_id] = e
+
+        changed = self._changed([fetched[i] for i in unique_ids if i in fetched])
+        if changed:
+            try:
+                self._write_activities.write_activities(
+                    [fetched[i] for i in changed],
+                    digests=fingerprint_digests(changed),
+                )
+            except PartialWriteError as e:
+                logger.error(
+                    "Failed to write %d activities: %s", len(e.activity_ids), e
+                )
+                errors.update({i: e for i in e.activity_ids})
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Failed to write %d activities: %s", len(changed), e)
+                errors.update({i: e for i in changed})
+            self._remember(changed, failed=errors.keys())
+
+        logger.info(
+            "Synced %d of %d activities", len(unique_ids) - len(errors), len(unique_ids)
+        )
+        return [SyncResult(i, errors.get(i)) for i in unique_ids]
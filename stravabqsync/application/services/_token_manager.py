@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable
+
+from stravabqsync.domain import StravaTokenSet
+from stravabqsync.ports.out.read import AsyncReadStravaToken, ReadStravaToken
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """Hand out a valid Strava access token to concurrent callers.
+
+    Tokens are refreshed `refresh_margin` seconds before their `expires_at`.
+    Refreshes are single-flight: when many threads find the token expired at
+    once, one of them refreshes and the others wait for and reuse its result.
+    """
+
+    def __init__(
+        self,
+        read_strava_token: ReadStravaToken,
+        *,
+        refresh_margin: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Initialize the token manager.
+
+        Args:
+            read_strava_token: Service that performs the OAuth token refresh.
+            refresh_margin: Seconds before expiry at which to refresh.
+            clock: Source of the current epoch time.
+        """
+        self._read_strava_token = read_strava_token
+        self._refresh_margin = refresh_margin
+        self._clock = clock
+        self._tokens: StravaTokenSet | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> StravaTokenSet:
+        """Return the current tokens, refreshing them first if they are
+        missing or about to expire.
+
+        Raises:
+            StravaTokenError: If the token refresh fails.
+            StravaApiError: If the token refresh API call fails.
+        """
+        tokens = self._tokens
+        if tokens is not None and not self._expiring(tokens):
+            return tokens
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._tokens is None or self._expiring(self._tokens):
+                self._tokens = self._refresh()
+            return self._tokens
+
+    def invalidate(self, rejected: StravaTokenSet) -> StravaTokenSet:
+        """Refresh after the API rejected `rejected`, unless another caller
+        already replaced it, and return the current tokens."""
+        with self._lock:
+            if (
+                self._tokens is None
+                or self._tokens.access_token == rejected.access_token
+            ):
+                self._tokens = self._refresh(force=True)
+            return self._tokens
+
+    def _expiring(self, tokens: StravaTokenSet) -> bool:
+        if tokens.expires_at is None:
+            return False
+        return tokens.expires_at - self._refresh_margin <= self._clock()
+
+    def _refresh(self, *, force: bool = False) -> StravaTokenSet:
+        tokens = self._read_strava_token.refresh(force=force)
+        logger.info("Refreshed Strava access token, expires at %s", tokens.expires_at)
+        return tokens
+
+
+class AsyncTokenManager:
+    """TokenManager for asyncio: concurrent coroutines that find the token
+    expired share one refresh."""
+
+    def __init__(
+        self,
+        read_strava_token: AsyncReadStravaToken,
+        *,
+        refresh_margin: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._read_strava_token = read_strava_token
+        self._refresh_margin = refresh_margin
+        self._clock = clock
+        self._tokens: StravaTokenSet | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> StravaTokenSet:
+        """Return the current tokens, refreshing them first if they are
+        missing or about to expire."""
+        tokens = self._tokens
+        if tokens is not None and not self._expiring(tokens):
+            return tokens
+        async with self._lock:
+            if self._tokens is None or self._expiring(self._tokens):
+                self._tokens = await self._refresh()
+            return self._tokens
+
+    async def invalidate(self, rejected: StravaTokenSet) -> StravaTokenSet:
+        """Refresh after the API rejected `rejected`, unless another caller
+        already replaced it, and return the current tokens."""
+        async with self._lock:
+            if (
+                self._tokens is None
+                or self._tokens.access_token == rejected.access_token
+            ):
+                self._tokens = await self._refresh(force=True)
+            return self._tokens
+
+    def _expiring(self, tokens: StravaTokenSet) -> bool:
+        if tokens.expires_at is None:
+            return False
+        return tokens.expires_at - self._refresh_margin <= self._clock()
+
+    async def _refresh(self, *, force: bool = False) -> StravaTokenSet:
+        tokens = await self._read_strava_token.refresh(force=force)
+        logger.info("Refreshed Strava access token, expires at %s", tokens.expires_at)
+        return tokens
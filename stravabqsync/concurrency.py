@@ -0,0 +1,131 @@
+"""Deduplication and coordination helpers for concurrent and repeated work."""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Generic, Hashable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Collapse concurrent calls for the same key into one
+
+    While a call for `key` is in flight, further calls for that key wait for
+    it and receive its result, or its exception, instead of calling `func`
+    again. Once it returns, the next call for `key` runs `func` anew.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future[T]] = {}
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            call.set_result(func())
+        except BaseException as e:
+            call.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return call.result()
+
+
+class RecentKeys:
+    """Thread-safe, bounded set of recently seen keys
+
+    Holds at most `maxsize` keys; adding one more evicts the least recently
+    added or checked key.
+    """
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._keys: OrderedDict[Hashable, None] = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def add(self, key: Hashable) -> None:
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            if len(self._keys) > self._maxsize:
+                self._keys.popitem(last=False)
+
+
+class LatestDeadline:
+    """Thread-safe holder of the latest deadline set so far
+
+    Concurrent `extend` calls keep the later deadline, whichever arrives
+    last, so a shorter deadline never cuts a longer one short.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._deadline: datetime | None = None
+
+    def extend(self, deadline: datetime) -> None:
+        with self._lock:
+            if self._deadline is None or deadline > self._deadline:
+                self._deadline = deadline
+
+    def get(self) -> datetime | None:
+        with self._lock:
+            return self._deadline
+
+
+# `time.monotonic()` past which no retry waits, shared by all calls in a
+# `retry_deadline` block
+_deadline: ContextVar[float | None] = ContextVar("retry_deadline", default=None)
+
+
+@contextmanager
+def retry_deadline(budget: float | None) -> Iterator[None]:
+    """Let all retried calls in the block, e.g. one function invocation,
+    spend at most `budget` seconds from now in total. A retry that would
+    wait past the deadline isn't made. A nested block can only shorten the
+    deadline; None adds none.
+
+    `retry_on_failure` reads it with `get_retry_deadline`. It is a context
+    variable: asyncio tasks inherit it, worker threads only if started with
+    `contextvars.copy_context().run`.
+    """
+    if budget is None:
+        yield
+        return
+    deadline = time.monotonic() + budget
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_retry_deadline() -> float | None:
+    """The `time.monotonic()` deadline of the enclosing `retry_deadline`
+    block, None outside of one"""
+    return _deadline.get()
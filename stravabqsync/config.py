@@ -3,6 +3,7 @@
 import json
 import logging
 import os
+from functools import lru_cache
 from typing import NamedTuple
 
 from dotenv import dotenv_values
@@ -23,6 +24,28 @@ def _get_required_env_var(config: dict[str, str | None], key: str) -> str:
     return value
 
 
+def _get_bool_env_var(config: dict[str, str | None], key: str) -> bool:
+    """Interpret an optional environment variable as a boolean flag"""
+    return (config.get(key) or "").lower() in ("1", "true", "yes")
+
+
+def _get_list_env_var(config: dict[str, str | None], key: str) -> tuple[str, ...]:
+    """Split an optional, comma-separated environment variable"""
+    return tuple(
+        item.strip() for item in (config.get(key) or "").split(",") if item.strip()
+    )
+
+
+def _get_retry_budget(config: dict[str, str | None]) -> float | None:
+    """STRAVA_RETRY_BUDGET, or else half of the Cloud Function's timeout, so
+    retries leave time to write or spool the activity"""
+    budget = config.get("STRAVA_RETRY_BUDGET")
+    if budget:
+        return float(budget)
+    timeout = config.get("FUNCTION_TIMEOUT_SEC")
+    return float(timeout) / 2 if timeout else None
+
+
 class StravaApiConfig(NamedTuple):
     """Strava API configuration"""
 
@@ -33,6 +56,64 @@ class StravaApiConfig(NamedTuple):
     token_retry_backoff: float = 0.5
     activity_retry_attempts: int = 3
     activity_retry_backoff: float = 1.0
+    rate_limit_short: int = 200
+    rate_limit_daily: int = 2000
+    rate_limit_burst: int = 20
+    rate_limit_max_concurrency: int = 8
+    rate_limit_max_wait: float = 30.0
+    pool_connections: int = 2
+    pool_maxsize: int = 16
+    pool_block: bool = True
+    keep_alive: bool = True
+    token_refresh_margin: int = 300
+    # On a 429, raise RetryLaterError instead of sleeping until the limit lifts
+    defer_rate_limits: bool = False
+    # Randomize retry backoff over [0, delay] ("full jitter")
+    retry_jitter: bool = True
+    # Seconds the Strava calls of one webhook invocation may spend retrying,
+    # None for no limit
+    retry_budget: float | None = None
+    # Consecutive failures that open the circuit breaker of an endpoint, and
+    # seconds it stays open before probing again
+    circuit_failure_threshold: int = 5
+    circuit_reset_timeout: float = 30.0
+
+
+class BigQueryWriteConfig(NamedTuple):
+    """BigQuery write path configuration
+
+    Attributes:
+      buffered: Micro-batch webhook writes. Concurrent requests share one
+        insert, each still waiting until its row is written.
+      buffer_max_rows: Flush once a batch has this many rows
+      buffer_max_bytes: Flush before a batch exceeds this many bytes of JSON
+        (insertAll rejects requests over 10MB)
+      buffer_max_latency: Flush this many seconds after a batch's first row
+      backfill_method: How backfills write, "load" (batch load jobs) or
+        "stream" (streaming inserts). The webhook always streams.
+      load_format: File format staged for load jobs, "ndjson" or "parquet"
+        (requires pyarrow)
+      layout: Table layout, "nested" (one wide row per activity) or
+        "normalized" (efforts, laps, splits and segments in child tables)
+      change_window: Seconds each change-log insert waits for concurrently
+        delivered updates and deletions to join it. 0 writes at once and
+        only merges changes that arrive while an insert is in flight.
+      fingerprint_exclude: Activity fields left out of its content
+        fingerprint, so changes to them alone don't cause a write
+      fingerprint_cache_size: Fingerprints of recently written activities
+        to keep for skipping unchanged re-syncs. 0 disables skipping.
+    """
+
+    buffered: bool = False
+    buffer_max_rows: int = 500
+    buffer_max_bytes: int = 9 * 1024 * 1024
+    buffer_max_latency: float = 1.0
+    backfill_method: str = "load"
+    load_format: str = "ndjson"
+    layout: str = "nested"
+    change_window: float = 0.0
+    fingerprint_exclude: tuple[str, ...] = ()
+    fingerprint_cache_size: int = 1024
 
 
 class AppConfig(NamedTuple):
@@ -43,12 +124,23 @@ class AppConfig(NamedTuple):
       project_id: GCP Project ID
       bq_dataset: GCP BigQuery Dataset where tables will be stored
       strava_api: StravaApiConfig
+      token_cache: Where refreshed Strava tokens are persisted, either
+        `file:<path>` or `secretmanager:<secret id>`. None disables the cache.
+      bq_write: BigQueryWriteConfig
+      parallel_init: Refresh the Strava token and build the BigQuery client
+        concurrently when the sync service is created
+      spool_dir: Directory where failed syncs are spooled for replay. None
+        disables the spool, so failed syncs raise.
     """
 
     tokens: StravaTokenSet
     project_id: str
     bq_dataset: str
     strava_api: StravaApiConfig
+    token_cache: str | None = None
+    bq_write: BigQueryWriteConfig = BigQueryWriteConfig()
+    parallel_init: bool = False
+    spool_dir: str | None = None
 
 
 def load_config() -> AppConfig:
@@ -105,9 +197,42 @@ def load_config() -> AppConfig:
         tokens=loaded_tokens,
         project_id=project_id,
         bq_dataset=bq_dataset,
-        strava_api=StravaApiConfig(),
+        strava_api=StravaApiConfig(
+            defer_rate_limits=_get_bool_env_var(config, "STRAVA_DEFER_RATE_LIMITS"),
+            retry_budget=_get_retry_budget(config),
+        ),
+        token_cache=config.get("STRAVA_TOKEN_CACHE") or None,
+        bq_write=BigQueryWriteConfig(
+            buffered=_get_bool_env_var(config, "GCP_BIGQUERY_WRITE_BUFFER"),
+            backfill_method=config.get("GCP_BIGQUERY_BACKFILL_METHOD") or "load",
+            load_format=config.get("GCP_BIGQUERY_LOAD_FORMAT") or "ndjson",
+            layout=config.get("GCP_BIGQUERY_LAYOUT") or "nested",
+            change_window=float(config.get("GCP_BIGQUERY_CHANGE_WINDOW") or 0.0),
+            fingerprint_exclude=_get_list_env_var(
+                config, "GCP_BIGQUERY_FINGERPRINT_EXCLUDE"
+            ),
+            fingerprint_cache_size=int(
+                config.get("GCP_BIGQUERY_FINGERPRINT_CACHE_SIZE") or 1024
+            ),
+        ),
+        parallel_init=_get_bool_env_var(config, "STRAVABQSYNC_PARALLEL_INIT"),
+        spool_dir=config.get("STRAVABQSYNC_SPOOL_DIR") or None,
     )
     return app_config
 
 
-app_config = load_config()
+@lru_cache(maxsize=1)
+def get_app_config() -> AppConfig:
+    """Application configuration, loaded on first use.
+
+    Loading reads the secrets file and dotenv files, so it is deferred until
+    a factory actually needs configuration rather than done at import time.
+    """
+    return load_config()
+
+
+def __getattr__(name: str) -> AppConfig:
+    # `from stravabqsync.config import app_config` predates get_app_config()
+    if name == "app_config":
+        return get_app_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,208 @@
+"""Lazily built, shared services and their lifetimes
+
+The adapter and service factories register here instead of caching their
+results with `functools.lru_cache`. A provider builds its instance on first
+use; concurrent first calls wait for that one build rather than each
+building their own, so a function instance serving many requests at once
+ends up with one BigQuery client and one Strava session. Failed builds are
+not cached.
+
+Two lifetimes are supported:
+
+- `singleton`: one instance per process, e.g. HTTP and BigQuery clients
+- `keyed`: one instance per argument tuple, e.g. a repository per access
+  token. With `maxsize`, the least recently used instance is evicted (and
+  closed) once more are built.
+
+`Container.close()` closes every live instance in the reverse order of
+construction, so write buffers are flushed before the clients they write
+with are closed. The default container is closed at interpreter exit.
+"""
+
+import atexit
+import functools
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Generic, Hashable, Protocol, TypeVar, overload
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Decorator(Protocol):
+    def __call__(self, factory: Callable[..., T], /) -> "Provider[T]": ...
+
+
+class Provider(Generic[T]):
+    """Callable that returns the shared instance built by `factory` for its
+    arguments, building it on first use"""
+
+    def __init__(
+        self,
+        container: "Container",
+        factory: Callable[..., T],
+        *,
+        maxsize: int | None,
+        close: Callable[[Any], None] | None,
+    ):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        functools.update_wrapper(self, factory)
+        self.name = factory.__qualname__
+        self._container = container
+        self._factory = factory
+        self._maxsize = maxsize
+        self._close = close
+        self._lock = threading.Lock()
+        self._instances: OrderedDict[Hashable, Future[T]] = OrderedDict()
+        container.register(self)
+
+    def __call__(self, *args: Any) -> T:
+        with self._lock:
+            instance = self._instances.get(args)
+            builder = instance is None
+            if instance is None:
+                instance = self._instances[args] = Future()
+            self._instances.move_to_end(args)
+        if not builder:
+            return instance.result()
+
+        try:
+            value = self._factory(*args)
+        except BaseException as e:
+            with self._lock:
+                if self._instances.get(args) is instance:
+                    del self._instances[args]
+            instance.set_exception(e)
+            raise
+        instance.set_result(value)
+        if self._close is not None:
+            self._container.on_close(
+                self.name, functools.partial(self._close, value), key=instance
+            )
+        self._evict()
+        return value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._instances)
+
+    def _evict(self) -> None:
+        """Drop and close the least recently used instances beyond `maxsize`.
+        Instances still being built are left for their builder to evict."""
+        if self._maxsize is None:
+            return
+        evicted = []
+        with self._lock:
+            excess = len(self._instances) - self._maxsize
+            for args, instance in list(self._instances.items()):
+                if excess <= 0:
+                    break
+                if instance.done():
+                    del self._instances[args]
+                    evicted.append(instance)
+                    excess -= 1
+        for instance in evicted:
+            logger.debug("Evicting a %s instance", self.name)
+            self._container.close_key(instance)
+
+    def reset(self) -> None:
+        """Forget the built instances without closing them, so the next call
+        builds anew"""
+        with self._lock:
+            self._instances.clear()
+
+
+class Container:
+    """Registry of providers and of the callbacks that close what they built"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._providers: list[Provider] = []
+        self._closers: list[tuple[str, Callable[[], None], object]] = []
+
+    @overload
+    def singleton(self, factory: Callable[[], T]) -> Provider[T]: ...
+
+    @overload
+    def singleton(
+        self, *, close: Callable[[Any], None] | None = None
+    ) -> _Decorator: ...
+
+    def singleton(self, factory=None, *, close=None):
+        """Decorate a factory to build one instance per process.
+
+        Args:
+            close: Called with the instance on `close()`.
+        """
+
+        def decorator(func):
+            return Provider(self, func, maxsize=1, close=close)
+
+        return decorator if factory is None else decorator(factory)
+
+    def keyed(
+        self,
+        *,
+        maxsize: int | None = None,
+        close: Callable[[Any], None] | None = None,
+    ) -> _Decorator:
+        """Decorate a factory to build one instance per argument tuple.
+        Arguments must be hashable.
+
+        Args:
+            maxsize: Number of instances kept, None for no limit. The least
+                recently used instance beyond it is evicted.
+            close: Called with an instance when it is evicted or on `close()`.
+        """
+
+        def decorator(func):
+            return Provider(self, func, maxsize=maxsize, close=close)
+
+        return decorator
+
+    def register(self, provider: Provider) -> None:
+        with self._lock:
+            self._providers.append(provider)
+
+    def on_close(
+        self, name: str, callback: Callable[[], None], *, key: object = None
+    ) -> None:
+        """Call `callback` on `close()`, before the callbacks registered
+        earlier. `key` identifies it for `close_key`."""
+        with self._lock:
+            self._closers.append((name, callback, key))
+
+    def close_key(self, key: object) -> None:
+        """Run the close callbacks registered with `key` now"""
+        with self._lock:
+            found = [c for c in self._closers if c[2] is key]
+            self._closers = [c for c in self._closers if c[2] is not key]
+        for name, callback, _ in found:
+            self._run(name, callback)
+
+    def close(self) -> None:
+        """Forget all instances and close those with a close callback,
+        newest first. Failures are logged and don't stop the others from
+        closing. The container can be used again afterwards."""
+        with self._lock:
+            closers, self._closers = self._closers, []
+            providers = list(self._providers)
+        for provider in providers:
+            provider.reset()
+        for name, callback, _ in reversed(closers):
+            self._run(name, callback)
+
+    @staticmethod
+    def _run(name: str, callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Failed to close %s", name)
+
+
+container = Container()
+atexit.register(container.close)
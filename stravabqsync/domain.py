@@ -1,5 +1,5 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import NamedTuple
 
 from pydantic import BaseModel, Field, field_validator
@@ -125,6 +125,9 @@ class PhotosSummary_primary(BaseModel):
 
     @field_validator("urls", mode="before")
     def transform_to_json_str(cls, value) -> str:
+        # Already JSON text when re-validating a dumped activity
+        if isinstance(value, str):
+            return value
         return json.dumps(value)
 
 
@@ -169,7 +172,7 @@ class StravaActivity(BaseModel):
     manual: bool
     private: bool
     flagged: bool
-    workout_type: int | None = None
+    workout_type: str | None = None
     upload_id_str: str | None = None
     average_speed: float
     max_speed: float
@@ -206,6 +209,93 @@ class StravaActivity(BaseModel):
     available_zones: list[str] = Field(default_factory=list)
     visibility: str | None = None
 
+    @field_validator("workout_type", mode="before")
+    def workout_type_to_str(cls, value) -> str | None:
+        # Strava sends a numeric code, which the table stores as STRING
+        return None if value is None else str(value)
+
+
+class SummaryActivity(BaseModel):
+    """Activity as listed by /athlete/activities, roughly Strava's
+    SummaryActivity model:
+      https://developers.strava.com/docs/reference/#api-models-SummaryActivity
+    """
+
+    id: int
+    name: str
+    sport_type: str
+    start_date: datetime
+
+
+class ActivityChange(BaseModel):
+    """Update to, or deletion of, an activity, as logged to the change-log
+    table. Only the fields an update changed are set.
+      https://developers.strava.com/docs/webhooks/#event-data
+    """
+
+    id: int
+    owner_id: int
+    event_time: datetime
+    title: str | None = None
+    type: str | None = None
+    private: bool | None = None
+    was_deleted: bool = False
+    updates: dict = Field(default_factory=dict)
+
+    @classmethod
+    def from_webhook(cls, request: WebhookRequest) -> "ActivityChange":
+        """Change described by an activity `update` or `delete` event"""
+        return cls(
+            id=request.object_id,
+            owner_id=request.owner_id,
+            event_time=datetime.fromtimestamp(request.event_time, tz=timezone.utc),
+            was_deleted=request.aspect_type == "delete",
+            updates=request.updates,
+            **{
+                key: value
+                for key, value in request.updates.items()
+                if key in ("title", "type", "private")
+            },
+        )
+
+    def merge(self, other: "ActivityChange") -> "ActivityChange":
+        """Combine with a change to the same activity into one change. Fields
+        set by the later of the two win, and a deletion is kept."""
+        if other.id != self.id:
+            raise ValueError(f"Cannot merge changes to {self.id} and {other.id}")
+        earlier, later = sorted((self, other), key=lambda change: change.event_time)
+        return later.model_copy(
+            update={
+                "title": later.title if later.title is not None else earlier.title,
+                "type": later.type if later.type is not None else earlier.type,
+                "private": (
+                    later.private if later.private is not None else earlier.private
+                ),
+                "was_deleted": earlier.was_deleted or later.was_deleted,
+                "updates": {**earlier.updates, **later.updates},
+            }
+        )
+
+
+class SpooledSync(BaseModel):
+    """Sync of an activity that failed, held in the spool for replay
+
+    Attributes:
+      activity_id: Strava activity ID
+      activity: The fetched activity if only writing it failed, so replaying
+        doesn't fetch it again
+      error: Why the last attempt failed
+      attempts: Number of failed attempts
+      not_before: Don't replay before this time, e.g. while Strava rate
+        limits the application
+    """
+
+    activity_id: int
+    activity: StravaActivity | None = None
+    error: str = ""
+    attempts: int = 1
+    not_before: datetime | None = None
+
 
 class StravaTokenSet(NamedTuple):
     """OAuth token set for Strava API authentication.
@@ -218,6 +308,26 @@ class StravaTokenSet(NamedTuple):
     client_secret: str
     access_token: str
     refresh_token: str
+    expires_at: int | None = None  # epoch seconds, None if unknown
+
+
+class BackfillCheckpoint(NamedTuple):
+    """Progress of a historical backfill, persisted after every page.
+
+    Attributes:
+      before: Epoch seconds upper bound fixed when the backfill started, so
+        activities uploaded mid-run don't shift page boundaries
+      page: Last fully synced page of /athlete/activities
+      activity_id: Last activity synced on that page
+      synced: Number of activities synced so far
+      failed_ids: Activity IDs that could not be synced
+    """
+
+    before: int
+    page: int = 0
+    activity_id: int | None = None
+    synced: int = 0
+    failed_ids: tuple[int, ...] = ()
 
 
 class GitHubTokenSet(NamedTuple):
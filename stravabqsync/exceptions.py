@@ -1,5 +1,7 @@
 """Custom exceptions for stravabqsync application."""
 
+import math
+from datetime import datetime, timezone
 from typing import Sequence
 
 
@@ -43,6 +45,24 @@ class StravaRateLimitError(StravaApiError):
         self.retry_after = retry_after
 
 
+class RetryLaterError(StravaRateLimitError):
+    """Raised instead of waiting out a Strava rate limit, so the caller can
+    retry at `retry_at` without blocking."""
+
+    def __init__(self, message: str, retry_at: datetime):
+        wait = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        super().__init__(message, retry_after=max(0, math.ceil(wait)))
+        self.retry_at = retry_at
+
+
+class CircuitOpenError(StravaApiError):
+    """Raised without calling Strava while its circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: int | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class ActivityNotFoundError(StravaApiError):
     """Raised when requested activity doesn't exist."""
 
@@ -52,11 +72,35 @@ class ActivityNotFoundError(StravaApiError):
 
 
 class BigQueryError(StravaBqSyncError):
-    """Raised when BigQuery operations fail."""
+    """Raised when BigQuery operations fail.
 
-    def __init__(self, message: str, errors: Sequence[dict] | None = None):
+    `failed_rows` holds the indices of the rows that failed permanently when
+    the other rows of the request were inserted, or None if the whole request
+    failed.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        errors: Sequence[dict] | None = None,
+        failed_rows: Sequence[int] | None = None,
+    ):
         super().__init__(message)
         self.errors = list(errors) if errors else []
+        self.failed_rows = list(failed_rows) if failed_rows is not None else None
+
+
+class PartialWriteError(BigQueryError):
+    """Raised when some activities could not be written and the rest were."""
+
+    def __init__(
+        self,
+        message: str,
+        errors: Sequence[dict] | None = None,
+        activity_ids: Sequence[int] = (),
+    ):
+        super().__init__(message, errors)
+        self.activity_ids = list(activity_ids)
 
 
 class DataValidationError(StravaBqSyncError):
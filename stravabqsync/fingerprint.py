@@ -0,0 +1,124 @@
+"""Content fingerprints that let re-syncs skip unchanged activities."""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Callable, Collection, Mapping, NamedTuple
+
+import pydantic_core
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class Fingerprint(NamedTuple):
+    """Content fingerprint of one version of an activity
+
+    Attributes:
+      digest: Stable hash of the activity's fields, stored with its row
+      fields: Hash of each field, to tell which fields changed. Only
+        comparable within one process, and empty for a fingerprint read back
+        from the table.
+    """
+
+    digest: str
+    fields: Mapping[str, int] = MappingProxyType({})
+
+
+def fingerprint(model: BaseModel, *, exclude: Collection[str] = ()) -> Fingerprint:
+    """Fingerprint the fields of `model`, except the `exclude`d ones
+
+    Exclude volatile fields, e.g. kudos counts, to not count changes to them
+    as changes to the activity.
+    """
+    digest = hashlib.sha256()
+    fields: dict[str, int] = {}
+    for name in type(model).model_fields:
+        if name in exclude:
+            continue
+        value = pydantic_core.to_json(getattr(model, name))
+        digest.update(b"%s=%s\n" % (name.encode(), value))
+        fields[name] = hash(value)
+    return Fingerprint(digest.hexdigest()[:32], fields)
+
+
+def changed_fields(old: Fingerprint, new: Fingerprint) -> list[str] | None:
+    """Names of the fields that differ between `old` and `new`, or None if
+    `old` doesn't record its fields"""
+    if not old.fields:
+        return None
+    return [name for name, value in new.fields.items() if old.fields.get(name) != value]
+
+
+class FingerprintCache:
+    """Thread-safe, bounded map of activity IDs to the fingerprint of the
+    version last written
+
+    Holds at most `maxsize` fingerprints; adding one more evicts the least
+    recently used. `load()` seeds the cache with `load(maxsize)`, e.g. from
+    the fingerprints stored in the table, so a fresh instance still knows
+    recently written activities. `load` returns digests from least to most
+    recently written. Seeding is left to warm-up, as it can be slow: until
+    it is done, lookups of activities not written by this instance miss, so
+    those activities are written again.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        *,
+        load: Callable[[int], Mapping[int, str]] | None = None,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self._maxsize = maxsize
+        self._load = load
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._fingerprints: OrderedDict[int, Fingerprint] = OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._fingerprints)
+
+    def get(self, activity_id: int) -> Fingerprint | None:
+        with self._lock:
+            found = self._fingerprints.get(activity_id)
+            if found is not None:
+                self._fingerprints.move_to_end(activity_id)
+            return found
+
+    def put(self, activity_id: int, value: Fingerprint) -> None:
+        with self._lock:
+            self._put(activity_id, value)
+
+    def load(self) -> None:
+        """Seed the cache with `load` unless that was already done. Callers
+        arriving meanwhile wait for it; `get` and `put` don't. Fingerprints
+        put in the meantime are newer than the loaded ones and kept."""
+        if self._load is None:
+            return
+        with self._load_lock:
+            if self._load is None:
+                return
+            try:
+                loaded = self._load(self._maxsize)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Failed to load activity fingerprints: %s", e)
+                loaded = {}
+            with self._lock:
+                for activity_id, digest in reversed(list(loaded.items())):
+                    if len(self._fingerprints) >= self._maxsize:
+                        break
+                    if activity_id not in self._fingerprints:
+                        self._fingerprints[activity_id] = Fingerprint(digest)
+                        self._fingerprints.move_to_end(activity_id, last=False)
+            self._load = None
+
+    def _put(self, activity_id: int, value: Fingerprint) -> None:
+        self._fingerprints[activity_id] = value
+        self._fingerprints.move_to_end(activity_id)
+        if len(self._fingerprints) > self._maxsize:
+            self._fingerprints.popitem(last=False)
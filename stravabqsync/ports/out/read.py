@@ -3,15 +3,16 @@
 # pylint: disable=too-few-public-methods
 from abc import ABC, abstractmethod
 
-from stravabqsync.domain import StravaActivity, StravaTokenSet
+from stravabqsync.domain import StravaActivity, StravaTokenSet, SummaryActivity
 
 
 class ReadStravaToken(ABC):
     """Read Strava access token"""
 
     @abstractmethod
-    def refresh(self) -> StravaTokenSet:
-        """Generate a new Strava refresh token"""
+    def refresh(self, *, force: bool = False) -> StravaTokenSet:
+        """Generate a new Strava refresh token. With `force`, skip any cached
+        token and always call the token endpoint."""
 
 
 class ReadActivities(ABC):
@@ -20,3 +21,61 @@ class ReadActivities(ABC):
     @abstractmethod
     def read_activity_by_id(self, activity_id: int) -> StravaActivity:
         """Read a Strava Activity by ID"""
+
+    @abstractmethod
+    def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        """Read a Strava Activity by ID as the source's unvalidated JSON
+        document, e.g. to archive it verbatim"""
+
+    @abstractmethod
+    def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        """Read one page of the athlete's activities, newest first. An empty
+        list means there are no more pages."""
+
+    def warm_up(self) -> None:
+        """Open connections ahead of the first read. Best effort; no-op by
+        default."""
+
+
+class ReadFingerprints(ABC):
+    """Read the content fingerprints stored with written activities"""
+
+    @abstractmethod
+    def read_fingerprints(self, limit: int) -> dict[int, str]:
+        """Read the latest fingerprint digest of each of the `limit` most
+        recently written activities, from least to most recently written"""
+
+
+class AsyncReadStravaToken(ABC):
+    """Read Strava access token, for asyncio"""
+
+    @abstractmethod
+    async def refresh(self, *, force: bool = False) -> StravaTokenSet:
+        """Generate a new Strava refresh token. With `force`, skip any cached
+        token and always call the token endpoint."""
+
+
+class AsyncReadActivities(ABC):
+    """Read Strava activities from generic sources, for asyncio"""
+
+    @abstractmethod
+    async def read_activity_by_id(self, activity_id: int) -> StravaActivity:
+        """Read a Strava Activity by ID"""
+
+    @abstractmethod
+    async def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        """Read a Strava Activity by ID as the source's unvalidated JSON
+        document"""
+
+    @abstractmethod
+    async def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        """Read one page of the athlete's activities, newest first. An empty
+        list means there are no more pages."""
+
+    async def warm_up(self) -> None:
+        """Open connections ahead of the first read. Best effort; no-op by
+        default."""
@@ -0,0 +1,72 @@
+"""Contracts for durable local state"""
+
+# pylint: disable=too-few-public-methods
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager, nullcontext
+
+from stravabqsync.domain import BackfillCheckpoint, SpooledSync, StravaTokenSet
+
+
+class BackfillCheckpoints(ABC):
+    """Persist backfill progress so an interrupted run can resume"""
+
+    @abstractmethod
+    def load(self) -> BackfillCheckpoint | None:
+        """Load the last saved checkpoint, or None if there is none"""
+
+    @abstractmethod
+    def save(self, checkpoint: BackfillCheckpoint) -> None:
+        """Durably store `checkpoint`, replacing any previous one"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove the saved checkpoint"""
+
+
+class TokenCache(ABC):
+    """Persist refreshed Strava tokens across process restarts.
+
+    The client secret is never persisted: `load` returns tokens with an empty
+    `client_secret` for the caller to fill in from configuration.
+    """
+
+    @abstractmethod
+    def load(self) -> StravaTokenSet | None:
+        """Load the cached tokens, or None if nothing is cached"""
+
+    @abstractmethod
+    def save(self, tokens: StravaTokenSet) -> None:
+        """Store `tokens`, replacing any previously cached tokens"""
+
+    def lock(self) -> AbstractContextManager:
+        """Exclusive lock held across load, refresh and save, so concurrent
+        processes don't refresh (and rotate) the same refresh token twice.
+        No-op unless the cache supports locking."""
+        return nullcontext()
+
+
+class SyncSpool(ABC):
+    """Durably queue failed syncs until they can be replayed"""
+
+    @abstractmethod
+    def append(self, entries: list[SpooledSync]) -> None:
+        """Durably add `entries` to the end of the queue"""
+
+    @abstractmethod
+    def peek(self, limit: int) -> list[SpooledSync]:
+        """Read up to `limit` entries from the front of the queue, without
+        removing them"""
+
+    @abstractmethod
+    def pop(self, count: int) -> None:
+        """Remove `count` entries from the front of the queue, once they are
+        replayed"""
+
+    @abstractmethod
+    def dead_letter(self, entries: list[SpooledSync]) -> None:
+        """Durably set aside `entries` that can't succeed, with their
+        `error`, so they are no longer retried"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of queued entries"""
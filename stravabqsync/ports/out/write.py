@@ -2,11 +2,84 @@
 
 # pylint: disable=too-few-public-methods
 from abc import ABC, abstractmethod
+from typing import Mapping, Sequence
 
-from stravabqsync.domain import StravaActivity
+from stravabqsync.domain import ActivityChange, StravaActivity
 
 
 class WriteActivities(ABC):
+    # Writes may return before the activities are stored; they are only
+    # known to be stored, or to have failed, once `flush()` returns
+    deferred: bool = False
+
+    @abstractmethod
+    def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        """Write Strava activity. `digest` is its fingerprint digest, if
+        already computed."""
+
     @abstractmethod
-    def write_activity(self, activity: StravaActivity) -> None:
+    def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        """Write several Strava activities in a single batch. `digests` are
+        the fingerprint digests already computed, by activity ID, and
+        `serialized` the activities already encoded by `serialize_row`, in
+        order. Writers that can't use them may ignore them."""
+
+    def flush(self) -> None:
+        """Write any buffered activities. No-op for unbuffered writers."""
+
+    def warm_up(self) -> None:
+        """Open connections and fetch credentials ahead of the first write.
+        Best effort; no-op by default."""
+
+
+class AsyncWriteActivities(ABC):
+    """WriteActivities for asyncio"""
+
+    deferred: bool = False
+
+    @abstractmethod
+    async def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
         """Write Strava activity"""
+
+    @abstractmethod
+    async def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        """Write several Strava activities in a single batch"""
+
+    async def flush(self) -> None:
+        """Write any buffered activities. No-op for unbuffered writers."""
+
+    async def warm_up(self) -> None:
+        """Open connections and fetch credentials ahead of the first write.
+        Best effort; no-op by default."""
+
+
+class WriteChanges(ABC):
+    @abstractmethod
+    def write_changes(self, changes: list[ActivityChange]) -> None:
+        """Log updates to and deletions of activities"""
+
+    def flush(self) -> None:
+        """Write any buffered changes. No-op for unbuffered writers."""
+
+
+class CompactActivities(ABC):
+    @abstractmethod
+    def compact(self) -> None:
+        """Apply activities and changes written since the last compaction to
+        the current state of the athlete's activities"""
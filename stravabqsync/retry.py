@@ -1,103 +1,335 @@
 """Retry logic for external API calls."""
 
+import asyncio
+import email.utils
+import inspect
 import logging
+import math
+import random
+import threading
 import time
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 from typing import Any, Callable, TypeVar, cast
 
 import requests
 
-from stravabqsync.exceptions import StravaRateLimitError
+from stravabqsync.concurrency import get_retry_deadline
+from stravabqsync.exceptions import (
+    CircuitOpenError,
+    RetryLaterError,
+    StravaRateLimitError,
+)
 
 logger = logging.getLogger(__name__)
 
 F = TypeVar("F", bound=Callable[..., Any])
 
+# Wait used when a 429 carries no usable Retry-After header
+DEFAULT_RETRY_AFTER = 60.0
+
+_RETRYABLE = (
+    requests.exceptions.HTTPError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def parse_retry_after(value: str | None, default: float = DEFAULT_RETRY_AFTER) -> float:
+    """Seconds to wait according to a `Retry-After` header value, given
+    either as a number of seconds or as an HTTP-date. Missing or malformed
+    values give `default`, dates in the past give 0."""
+    if value is None:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning("Malformed Retry-After header: %s", value)
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """Fail fast while an endpoint keeps failing
+
+    After `failure_threshold` consecutive failures the breaker opens, and
+    calls fail with CircuitOpenError without reaching the endpoint. Once
+    `reset_timeout` seconds have passed it is half-open: the next call goes
+    through as a probe. If the probe succeeds the breaker closes, otherwise
+    it stays open for another `reset_timeout`. Only one probe is let through
+    per `reset_timeout`, even if a probe never reports back.
+
+    Thread-safe, so one breaker can be shared by every call to an endpoint.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+
+    @property
+    def state(self) -> str:
+        """The breaker's state: closed, open or half-open"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at < self._reset_timeout:
+                return "open"
+            return "half-open"
+
+    def before_call(self) -> None:
+        """Raises:
+        CircuitOpenError: If the breaker is open. `retry_after` holds the
+            seconds until the next probe.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = self._clock()
+            wait = self._opened_at + self._reset_timeout - now
+            if wait <= 0:
+                logger.info("Circuit %s half-open, probing", self.name)
+                self._opened_at = now
+                return
+        raise CircuitOpenError(
+            f"Circuit {self.name} is open, next probe in {wait:.0f}s",
+            retry_after=math.ceil(wait),
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is None and self._failures < self._failure_threshold:
+                return
+            if self._opened_at is None:
+                logger.warning(
+                    "Circuit %s opened after %d failures", self.name, self._failures
+                )
+            self._opened_at = self._clock()
+
+
+class _Retry:
+    """Retry decisions shared by the sync and async wrappers"""
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int,
+        backoff_seconds: float,
+        exponential_backoff: bool,
+        retry_on_status: tuple[int, ...],
+        defer: bool,
+        jitter: bool,
+        budget: float | None,
+        circuit_breaker: CircuitBreaker | None,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.exponential_backoff = exponential_backoff
+        self.retry_on_status = retry_on_status
+        self.defer = defer
+        self.jitter = jitter
+        self.budget = budget
+        self.breaker = circuit_breaker
+
+    def before_call(self) -> None:
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+    def succeeded(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def failed(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+    def delay(self, error: Exception, attempt: int, started: float) -> float:
+        """Seconds to wait before retrying the `attempt` that failed with
+        `error`. Raises instead if it shouldn't be retried."""
+        # requests' HTTPError and httpx's HTTPStatusError both carry the
+        # response; network errors don't
+        response = getattr(error, "response", None)
+        if response is not None:
+            status_code = response.status_code
+
+            # Handle rate limiting specially
+            if status_code == 429:
+                # The endpoint is up, it just wants fewer requests
+                self.succeeded()
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if self.defer:
+                    retry_at = datetime.now(timezone.utc) + timedelta(
+                        seconds=retry_after
+                    )
+                    raise RetryLaterError(
+                        f"Rate limited until {retry_at.isoformat()}",
+                        retry_at=retry_at,
+                    ) from error
+                if attempt == self.max_attempts - 1:
+                    raise StravaRateLimitError(
+                        f"Rate limit exceeded after {self.max_attempts} attempts",
+                        retry_after=math.ceil(retry_after),
+                    )
+                if not self._within_budget(retry_after, started):
+                    raise StravaRateLimitError(
+                        f"Rate limited for {retry_after:.0f}s, longer than the "
+                        "retry budget allows",
+                        retry_after=math.ceil(retry_after),
+                    )
+                logger.warning(
+                    "Rate limited, waiting %.0f seconds (attempt %d/%d)",
+                    retry_after,
+                    attempt + 1,
+                    self.max_attempts,
+                )
+                return retry_after
+
+            # Don't retry on client errors (except rate limiting) or on
+            # statuses not asked for
+            if status_code < 500 or status_code not in self.retry_on_status:
+                if status_code < 500:
+                    self.succeeded()
+                raise error
+
+        # Server error, or network error without response
+        self.failed()
+        if attempt == self.max_attempts - 1:
+            logger.error("All %d retry attempts failed", self.max_attempts)
+            raise error
+
+        delay = self.backoff_seconds
+        if self.exponential_backoff:
+            delay *= 2**attempt
+        if self.jitter:
+            # Full jitter: spread concurrent callers over the whole interval
+            delay = random.uniform(0, delay)
+        if not self._within_budget(delay, started):
+            logger.error("Retry budget exhausted after %d attempts", attempt + 1)
+            raise error
+
+        logger.warning(
+            "Request failed (attempt %d/%d), retrying in %.1f seconds: %s",
+            attempt + 1,
+            self.max_attempts,
+            delay,
+            str(error),
+        )
+        return delay
+
+    def _within_budget(self, delay: float, started: float) -> bool:
+        """Whether waiting `delay` seconds stays within both this call's
+        budget and the enclosing `retry_deadline`"""
+        now = time.monotonic()
+        if self.budget is not None and now - started + delay > self.budget:
+            return False
+        deadline = get_retry_deadline()
+        return deadline is None or now + delay <= deadline
+
 
 def retry_on_failure(
     max_attempts: int = 3,
     backoff_seconds: float = 1.0,
     exponential_backoff: bool = True,
     retry_on_status: tuple[int, ...] = (429, 500, 502, 503, 504),
+    defer: bool = False,
+    jitter: bool = False,
+    budget: float | None = None,
+    circuit_breaker: CircuitBreaker | None = None,
+    exceptions: tuple[type[Exception], ...] = _RETRYABLE,
 ) -> Callable[[F], F]:
     """Retry decorator for API calls with exponential backoff.
 
+    Decorates both plain and async functions; async ones wait with
+    `asyncio.sleep`.
+
     Args:
         max_attempts: Maximum number of retry attempts
         backoff_seconds: Initial delay between retries
         exponential_backoff: Whether to use exponential backoff
         retry_on_status: HTTP status codes to retry on
+        defer: On a 429, raise RetryLaterError with the time the rate limit
+            lifts instead of sleeping until then
+        jitter: Wait a random time between 0 and the backoff delay, so
+            concurrent callers don't retry in lockstep
+        budget: Seconds a call may take in total, including waits. A retry
+            that would wait past it, or past the enclosing `retry_deadline`,
+            isn't made.
+        circuit_breaker: Breaker shared by all calls to the same endpoint.
+            Server and network errors count as failures; while it is open,
+            attempts fail with CircuitOpenError.
+        exceptions: Errors to retry, by default those of `requests`. Errors
+            with a `response` are retried by its status code, others as
+            network errors.
     """
+    retry = _Retry(
+        max_attempts=max_attempts,
+        backoff_seconds=backoff_seconds,
+        exponential_backoff=exponential_backoff,
+        retry_on_status=retry_on_status,
+        defer=defer,
+        jitter=jitter,
+        budget=budget,
+        circuit_breaker=circuit_breaker,
+    )
 
     def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.monotonic()
+                for attempt in range(max_attempts):
+                    retry.before_call()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except exceptions as e:
+                        delay = retry.delay(e, attempt, started)
+                    else:
+                        retry.succeeded()
+                        return result
+                    await asyncio.sleep(delay)
+
+            return cast(F, async_wrapper)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-
+            started = time.monotonic()
             for attempt in range(max_attempts):
+                retry.before_call()
                 try:
-                    return func(*args, **kwargs)
-
-                except requests.exceptions.HTTPError as e:
-                    if hasattr(e, "response") and e.response is not None:
-                        status_code = e.response.status_code
-
-                        # Handle rate limiting specially
-                        if status_code == 429:
-                            retry_after = int(e.response.headers.get("Retry-After", 60))
-                            if attempt == max_attempts - 1:
-                                raise StravaRateLimitError(
-                                    f"Rate limit exceeded after {max_attempts} "
-                                    "attempts",
-                                    retry_after=retry_after,
-                                )
-                            logger.warning(
-                                "Rate limited, waiting %s seconds (attempt %d/%d)",
-                                retry_after,
-                                attempt + 1,
-                                max_attempts,
-                            )
-                            time.sleep(retry_after)
-                            continue
-
-                        # Don't retry on client errors (except rate limiting)
-                        if status_code < 500 and status_code != 429:
-                            raise
-
-                        # Retry on server errors
-                        if status_code in retry_on_status:
-                            last_exception = e
-                        else:
-                            raise
-                    else:
-                        # Network error without response
-                        last_exception = e
-
-                except (
-                    requests.exceptions.ConnectionError,
-                    requests.exceptions.Timeout,
-                ) as e:
-                    last_exception = e
-
-                # Don't sleep on the last attempt
-                if attempt < max_attempts - 1:
-                    delay = backoff_seconds
-                    if exponential_backoff:
-                        delay *= 2**attempt
-
-                    logger.warning(
-                        "Request failed (attempt %d/%d), retrying in %.1f seconds: %s",
-                        attempt + 1,
-                        max_attempts,
-                        delay,
-                        str(last_exception),
-                    )
-                    time.sleep(delay)
-
-            # All attempts failed
-            logger.error("All %d retry attempts failed", max_attempts)
-            if last_exception:
-                raise last_exception
+                    result = func(*args, **kwargs)
+                except exceptions as e:
+                    delay = retry.delay(e, attempt, started)
+                else:
+                    retry.succeeded()
+                    return result
+                time.sleep(delay)
 
         return cast(F, wrapper)
 
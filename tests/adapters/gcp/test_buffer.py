@@ -0,0 +1,324 @@
+import json
+import threading
+import time
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import pytest
+
+from stravabqsync.adapters.gcp._buffer import (
+    BufferedWriteActivities,
+    CoalescingWriteChanges,
+)
+from stravabqsync.adapters.gcp._repositories import WriteActivitiesRepo
+from stravabqsync.domain import ActivityChange, StravaActivity
+from stravabqsync.exceptions import BigQueryError, PartialWriteError
+from tests.mocks.bigquery_client_wrapper import MockBigQueryClientWrapper
+from tests.mocks.write_activities import MockWriteActivitesRepo
+from tests.mocks.write_changes import MockWriteChangesRepo
+
+
+@pytest.fixture(scope="module")
+def activity():
+    with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+def activities(activity, n, start=0):
+    return [activity.model_copy(update={"id": i}) for i in range(start, start + n)]
+
+
+def ids(batches):
+    return [[a.id for a in batch] for batch in batches]
+
+
+class TestBufferedWriteActivities:
+    def test_flush_on_row_count(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(
+            writer, max_rows=2, max_latency=60, blocking=False
+        )
+
+        buffer.write_activities(activities(activity, 5))
+
+        assert ids(writer.batches) == [[0, 1], [2, 3]]
+        buffer.flush()
+        assert ids(writer.batches) == [[0, 1], [2, 3], [4]]
+
+    def test_flush_on_bytes(self, activity):
+        writer = MockWriteActivitesRepo()
+        row_size = len(activity.model_dump_json())
+        buffer = BufferedWriteActivities(
+            writer, max_bytes=int(row_size * 2.5), max_latency=60, blocking=False
+        )
+
+        buffer.write_activities(activities(activity, 3))
+
+        assert ids(writer.batches) == [[0, 1]]
+
+    def test_flush_reuses_serialized_rows(self, activity):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        buffer = BufferedWriteActivities(
+            WriteActivitiesRepo(client, dataset_name="test-dataset"),
+            max_latency=60,
+            blocking=False,
+        )
+        buffer.write_activities(activities(activity, 2))
+
+        with patch("stravabqsync.adapters.gcp._encoding.serialize_row") as serialize:
+            buffer.flush()
+
+        serialize.assert_not_called()
+        assert [row["id"] for row in client.written_activities] == [0, 1]
+
+    def test_flush_passes_serialized_rows_to_any_writer(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_latency=60, blocking=False)
+
+        buffer.write_activities(activities(activity, 2))
+        buffer.flush()
+
+        assert [json.loads(row)["id"] for row in writer.serialized] == [0, 1]
+
+    def test_given_serialized_rows_are_reused(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_latency=60, blocking=False)
+
+        with patch("stravabqsync.adapters.gcp._buffer.serialize_row") as serialize:
+            buffer.write_activities(activities(activity, 2), serialized=[b"0", b"1"])
+        buffer.flush()
+
+        serialize.assert_not_called()
+        assert writer.serialized == [b"0", b"1"]
+
+    def test_flush_passes_digests(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_latency=60, blocking=False)
+
+        buffer.write_activity(activity.model_copy(update={"id": 1}), digest="a")
+        buffer.write_activities(activities(activity, 2, start=2), digests={3: "b"})
+        buffer.flush()
+
+        assert ids(writer.batches) == [[1, 2, 3]]
+        assert writer.digests == {1: "a", 3: "b"}
+
+    def test_flush_on_latency(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_latency=0.05, blocking=False)
+
+        buffer.write_activity(activity)
+        assert writer.batches == []
+        time.sleep(0.2)
+
+        assert ids(writer.batches) == [[activity.id]]
+
+    def test_blocking_writers_share_one_insert(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_rows=4, max_latency=5)
+        threads = [
+            threading.Thread(target=buffer.write_activity, args=(a,))
+            for a in activities(activity, 4)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=2)
+
+        assert len(writer.batches) == 1
+        assert sorted(ids(writer.batches)[0]) == [0, 1, 2, 3]
+
+    def test_blocking_writer_returns_after_deadline_flush(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_latency=0.05)
+
+        buffer.write_activity(activity)
+
+        assert ids(writer.batches) == [[activity.id]]
+
+    def test_blocking_writers_see_insert_error(self, activity):
+        buffer = BufferedWriteActivities(
+            MockWriteActivitesRepo(fail=True), max_latency=0.01
+        )
+        with pytest.raises(BigQueryError):
+            buffer.write_activity(activity)
+
+    def test_non_blocking_error_raised_on_flush(self, activity):
+        buffer = BufferedWriteActivities(
+            MockWriteActivitesRepo(fail=True), max_rows=1, blocking=False
+        )
+
+        buffer.write_activity(activity)
+
+        with pytest.raises(BigQueryError):
+            buffer.flush()
+        buffer.flush()  # errors are reported once
+
+    def test_only_non_blocking_writes_are_deferred(self):
+        writer = MockWriteActivitesRepo()
+        assert BufferedWriteActivities(writer, blocking=False).deferred
+        assert not BufferedWriteActivities(writer, blocking=True).deferred
+
+    def test_close_flushes_and_rejects_writes(self, activity):
+        writer = MockWriteActivitesRepo()
+        buffer = BufferedWriteActivities(writer, max_latency=60, blocking=False)
+        buffer.write_activity(activity)
+
+        buffer.close()
+        buffer.close()
+
+        assert ids(writer.batches) == [[activity.id]]
+        with pytest.raises(BigQueryError):
+            buffer.write_activity(activity)
+
+    def test_flush_empty_is_noop(self):
+        writer = MockWriteActivitesRepo()
+        BufferedWriteActivities(writer).flush()
+        assert writer.batches == []
+
+    def test_partial_failure_only_raised_for_owning_writer(self, activity):
+        writer = MockWriteActivitesRepo(failed_ids=(1,))
+        buffer = BufferedWriteActivities(writer, max_rows=2, max_latency=5)
+        outcomes = {}
+
+        def write(a):
+            try:
+                buffer.write_activity(a)
+                outcomes[a.id] = None
+            except PartialWriteError as e:
+                outcomes[a.id] = e.activity_ids
+
+        threads = [
+            threading.Thread(target=write, args=(a,)) for a in activities(activity, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=2)
+
+        assert outcomes == {0: None, 1: [1]}
+
+    def test_non_blocking_partial_failures_combined_on_flush(self, activity):
+        writer = MockWriteActivitesRepo(failed_ids=(1, 3))
+        buffer = BufferedWriteActivities(
+            writer, max_rows=2, max_latency=60, blocking=False
+        )
+
+        buffer.write_activities(activities(activity, 4))
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            buffer.flush()
+        assert exc_info.value.activity_ids == [1, 3]
+
+    def test_warm_up_delegates(self):
+        writer = MockWriteActivitesRepo()
+        BufferedWriteActivities(writer).warm_up()
+        assert writer.warm_ups == 1
+
+
+def change(activity_id, second, **fields):
+    return ActivityChange(
+        id=activity_id,
+        owner_id=1,
+        event_time=datetime(2024, 1, 1, 0, 0, second, tzinfo=UTC),
+        **fields,
+    )
+
+
+class BlockingWriteChangesRepo(MockWriteChangesRepo):
+    """Holds its first insert until `release` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def write_changes(self, changes):
+        if not self.started.is_set():
+            self.started.set()
+            assert self.release.wait(timeout=5)
+        super().write_changes(changes)
+
+
+def ids_of(batches):
+    return [[c.id for c in batch] for batch in batches]
+
+
+class TestCoalescingWriteChanges:
+    def test_changes_arriving_during_an_insert_coalesce(self):
+        writer = BlockingWriteChangesRepo()
+        buffer = CoalescingWriteChanges(writer)
+        threads = [
+            threading.Thread(target=buffer.write_changes, args=([c],))
+            for c in (change(2, 0), change(1, 0, title="A"), change(1, 1, type="Run"))
+        ]
+        threads[0].start()
+        assert writer.started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        writer.release.set()
+        for thread in threads:
+            thread.join()
+
+        assert ids_of(writer.batches) == [[2], [1]]
+        [merged] = writer.batches[1]
+        assert (merged.title, merged.type) == ("A", "Run")
+
+    def test_sequential_changes_are_written_without_delay(self):
+        writer = MockWriteChangesRepo()
+        buffer = CoalescingWriteChanges(writer)
+
+        started = time.monotonic()
+        buffer.write_changes([change(1, 0), change(2, 0)])
+        buffer.write_changes([change(1, 1)])
+
+        assert time.monotonic() - started < 0.5
+        assert ids_of(writer.batches) == [[1, 2], [1]]
+
+    def test_window_collects_concurrent_changes(self):
+        writer = MockWriteChangesRepo()
+        buffer = CoalescingWriteChanges(writer, window=0.2)
+        threads = [
+            threading.Thread(target=buffer.write_changes, args=([change(i, 0)],))
+            for i in (1, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(ids_of(writer.batches)[0]) == [1, 2]
+
+    def test_flush_on_row_count(self):
+        writer = MockWriteChangesRepo()
+        buffer = CoalescingWriteChanges(writer, max_rows=2)
+
+        buffer.write_changes([change(1, 0), change(1, 1), change(2, 0), change(3, 0)])
+
+        assert ids_of(writer.batches) == [[1, 2], [3]]
+
+    def test_writers_see_insert_error(self):
+        buffer = CoalescingWriteChanges(MockWriteChangesRepo(fail=True), window=0.01)
+        with pytest.raises(BigQueryError):
+            buffer.write_changes([change(1, 0)])
+
+    def test_partial_failure_only_for_own_changes(self):
+        buffer = CoalescingWriteChanges(
+            MockWriteChangesRepo(failed_ids=(2,)), window=0.01
+        )
+        buffer.write_changes([change(1, 0)])
+        with pytest.raises(PartialWriteError) as exc_info:
+            buffer.write_changes([change(1, 1), change(2, 0)])
+        assert exc_info.value.activity_ids == [2]
+
+    def test_close_rejects_changes(self):
+        writer = MockWriteChangesRepo()
+        buffer = CoalescingWriteChanges(writer)
+
+        buffer.close()
+        buffer.close()
+
+        assert writer.batches == []
+        with pytest.raises(BigQueryError):
+            buffer.write_changes([change(1, 0)])
@@ -1,10 +1,23 @@
+import io
+import json
 from unittest.mock import MagicMock, patch
 
 import pytest
-from google.cloud.bigquery import SchemaField, Table
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud.bigquery import (
+    Client,
+    SchemaField,
+    SourceFormat,
+    Table,
+    WriteDisposition,
+)
 
-from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper, _insert_all
+from stravabqsync.adapters.gcp._staging import stage_ndjson
 from stravabqsync.exceptions import BigQueryError
+from tests.mocks.bigquery_client import FakeBigQueryClient
 
 
 class TestBigQueryClientWrapper:
@@ -97,3 +110,372 @@ class TestBigQueryClientWrapper:
         #  just the table name
         assert created_table_arg.table_id == "test_table"
         assert created_table_arg.schema == test_schema
+        assert created_table_arg.time_partitioning is None
+        assert created_table_arg.clustering_fields is None
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_create_partitioned_clustered_table(self, mock_client_class):
+        mock_client_instance = mock_client_class.return_value
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        wrapper.create_table(
+            "test-project.test_dataset.test_table",
+            schema=[SchemaField("start_date", "TIMESTAMP")],
+            partition_field="start_date",
+            partition_expiration_days=2,
+            clustering_fields=("sport_type",),
+            exists_ok=True,
+        )
+
+        (table,), kwargs = mock_client_instance.create_table.call_args
+        assert table.time_partitioning.type_ == "DAY"
+        assert table.time_partitioning.field == "start_date"
+        assert table.time_partitioning.expiration_ms == 2 * 24 * 60 * 60 * 1000
+        assert table.clustering_fields == ["sport_type"]
+        assert kwargs == {"exists_ok": True}
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_create_table_expiration_requires_partitioning(self, mock_client_class):
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+        with pytest.raises(ValueError):
+            wrapper.create_table(
+                "test-project.test_dataset.test_table",
+                schema=[],
+                partition_expiration_days=2,
+            )
+
+
+def row_error(index, reason):
+    return {"index": index, "errors": [{"reason": reason, "message": reason}]}
+
+
+@pytest.fixture
+def bq_client():
+    with patch("stravabqsync.adapters.gcp._clients.Client") as mock_client_class:
+        yield mock_client_class.return_value
+
+
+@pytest.fixture
+def no_sleep():
+    with patch("stravabqsync.adapters.gcp._clients.time.sleep") as mock_sleep:
+        yield mock_sleep
+
+
+class TestBigQueryClientWrapperPartialFailures:
+    rows = [{"id": 1}, {"id": 2}, {"id": 3}]
+    table_id = "test-project.test_dataset.test_table"
+
+    def insert(self, wrapper):
+        wrapper.insert_rows_json(
+            self.rows, dataset_name="test_dataset", table_name="test_table"
+        )
+
+    def test_resubmits_only_transient_rows(self, bq_client, no_sleep):
+        bq_client.insert_rows_json.side_effect = [
+            [row_error(1, "backendError")],
+            [],
+        ]
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        self.insert(wrapper)
+
+        assert bq_client.insert_rows_json.call_args_list[1].args == (
+            self.table_id,
+            [{"id": 2}],
+        )
+        no_sleep.assert_called_once_with(1.0)
+
+    def test_permanent_rows_are_reported_and_not_retried(self, bq_client, no_sleep):
+        # One invalid row stops the other rows of the request
+        bq_client.insert_rows_json.side_effect = [
+            [row_error(0, "stopped"), row_error(1, "invalid"), row_error(2, "stopped")],
+            [],
+        ]
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        with pytest.raises(BigQueryError) as exc_info:
+            self.insert(wrapper)
+
+        assert exc_info.value.failed_rows == [1]
+        assert exc_info.value.errors[0]["index"] == 1
+        assert bq_client.insert_rows_json.call_args_list[1].args == (
+            self.table_id,
+            [{"id": 1}, {"id": 3}],
+        )
+
+    def test_retried_indices_map_to_original_rows(self, bq_client, no_sleep):
+        bq_client.insert_rows_json.side_effect = [
+            [row_error(0, "timeout"), row_error(2, "timeout")],
+            [row_error(1, "invalid")],
+        ]
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        with pytest.raises(BigQueryError) as exc_info:
+            self.insert(wrapper)
+
+        assert exc_info.value.failed_rows == [2]
+        assert (
+            str(exc_info.value) == f"Failed to insert 1 of 3 rows into {self.table_id}"
+        )
+
+    def test_transient_rows_fail_after_max_attempts(self, bq_client, no_sleep):
+        bq_client.insert_rows_json.return_value = [row_error(0, "internalError")]
+        wrapper = BigQueryClientWrapper(
+            project_id="test-project", max_attempts=3, backoff_seconds=0.5
+        )
+
+        with pytest.raises(BigQueryError) as exc_info:
+            self.insert(wrapper)
+
+        assert exc_info.value.failed_rows == [0]
+        assert bq_client.insert_rows_json.call_count == 3
+        assert [c.args[0] for c in no_sleep.call_args_list] == [0.5, 1.0]
+
+
+class TestBigQueryClientWrapperLoadJobs:
+    def load(self, wrapper, source_format=SourceFormat.NEWLINE_DELIMITED_JSON):
+        staged = io.BytesIO()
+        stage_ndjson([{"id": 1}, {"id": 2}], staged)
+        wrapper.load_table_from_file(
+            staged,
+            dataset_name="test_dataset",
+            table_name="test_table",
+            schema=[SchemaField("id", "INTEGER")],
+            source_format=source_format,
+        )
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_load_appends_with_schema(self, mock_client_class):
+        fake = FakeBigQueryClient()
+        mock_client_class.return_value = fake
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        self.load(wrapper)
+
+        (load,) = fake.loads
+        assert load["table_id"] == "test-project.test_dataset.test_table"
+        assert load["rows"] == [{"id": 1}, {"id": 2}]
+        job_config = load["job_config"]
+        assert job_config.write_disposition == WriteDisposition.WRITE_APPEND
+        assert [f.name for f in job_config.schema] == ["id"]
+        assert job_config.parquet_options is None
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_parquet_load_infers_lists(self, mock_client_class):
+        mock_client = mock_client_class.return_value
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        self.load(wrapper, SourceFormat.PARQUET)
+
+        job_config = mock_client.load_table_from_file.call_args.kwargs["job_config"]
+        assert job_config.source_format == SourceFormat.PARQUET
+        assert job_config.parquet_options.enable_list_inference is True
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_failed_load_raises(self, mock_client_class):
+        errors = [{"reason": "invalid", "message": "bad row"}]
+        mock_client_class.return_value = FakeBigQueryClient(errors=errors)
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        with pytest.raises(BigQueryError) as exc_info:
+            self.load(wrapper)
+
+        assert exc_info.value.errors == errors
+        assert exc_info.value.failed_rows is None
+
+
+class TestBigQueryClientWrapperSerializedRows:
+    rows = [b'{"id":1}', b'{"id":2}', b'{"id":3}']
+
+    def sent_bodies(self, bq_client):
+        return [
+            json.loads(c.kwargs["data"])
+            for c in bq_client._connection.api_request.call_args_list
+        ]
+
+    def test_posts_raw_body(self, bq_client):
+        bq_client._connection.api_request.return_value = {}
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        wrapper.insert_serialized_rows(
+            self.rows,
+            dataset_name="test_dataset",
+            table_name="test_table",
+            insert_ids=["a", "b", "c"],
+        )
+
+        call = bq_client._connection.api_request.call_args
+        assert call.kwargs["method"] == "POST"
+        assert call.kwargs["path"] == (
+            "/projects/test-project/datasets/test_dataset/tables/test_table/insertAll"
+        )
+        assert isinstance(call.kwargs["data"], bytes)
+        assert self.sent_bodies(bq_client) == [
+            {
+                "rows": [
+                    {"insertId": "a", "json": {"id": 1}},
+                    {"insertId": "b", "json": {"id": 2}},
+                    {"insertId": "c", "json": {"id": 3}},
+                ]
+            }
+        ]
+
+    def test_retries_keep_insert_ids(self, bq_client, no_sleep):
+        bq_client._connection.api_request.side_effect = [
+            {"insertErrors": [row_error(2, "backendError")]},
+            {},
+        ]
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        wrapper.insert_serialized_rows(
+            self.rows, dataset_name="test_dataset", table_name="test_table"
+        )
+
+        first, retry = self.sent_bodies(bq_client)
+        assert retry["rows"] == [first["rows"][2]]
+
+    def test_permanent_failures_reported(self, bq_client, no_sleep):
+        bq_client._connection.api_request.return_value = {
+            "insertErrors": [row_error(1, "invalid")]
+        }
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        with pytest.raises(BigQueryError) as exc_info:
+            wrapper.insert_serialized_rows(
+                self.rows, dataset_name="test_dataset", table_name="test_table"
+            )
+
+        assert exc_info.value.failed_rows == [1]
+
+
+class TestInsertAll:
+    """`_insert_all` against the installed google-cloud-bigquery, over HTTP"""
+
+    table_id = "test-project.test_dataset.test_table"
+    url = (
+        "https://bigquery.googleapis.com/bigquery/v2/projects/test-project"
+        "/datasets/test_dataset/tables/test_table/insertAll"
+    )
+
+    @pytest.fixture
+    def client(self):
+        return Client(
+            project="test-project",
+            credentials=AnonymousCredentials(),
+            _http=AuthorizedSession(AnonymousCredentials()),
+        )
+
+    def test_posts_serialized_rows(self, client, requests_mock):
+        requests_mock.post(self.url, json={})
+
+        errors = _insert_all(client, self.table_id, [b'{"id":1}'], ["a"])
+
+        assert errors == []
+        assert requests_mock.last_request.body == (
+            b'{"rows":[{"insertId":"a","json":{"id":1}}]}'
+        )
+
+    def test_returns_row_errors(self, client, requests_mock):
+        requests_mock.post(self.url, json={"insertErrors": [row_error(1, "invalid")]})
+
+        errors = _insert_all(
+            client, self.table_id, [b'{"id":1}', b'{"id":2}'], ["a", "b"]
+        )
+
+        assert errors == [row_error(1, "invalid")]
+
+    def test_falls_back_to_public_api(self):
+        client = MagicMock(spec=["insert_rows_json"])
+        client.insert_rows_json.return_value = []
+
+        _insert_all(client, self.table_id, [b'{"id":1}'], ["a"])
+
+        client.insert_rows_json.assert_called_once_with(
+            self.table_id, [{"id": 1}], row_ids=["a"]
+        )
+
+
+class TestBigQueryClientWrapperColumns:
+    def test_table_columns_reads_table_metadata(self, bq_client):
+        bq_client.get_table.return_value = Table(
+            "test-project.test_dataset.test_table",
+            schema=[SchemaField("id", "INTEGER"), SchemaField("name", "STRING")],
+        )
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        columns = wrapper.table_columns(
+            dataset_name="test_dataset", table_name="test_table"
+        )
+
+        assert columns == {"id", "name"}
+        bq_client.get_table.assert_called_once_with(
+            "test-project.test_dataset.test_table"
+        )
+
+    def test_add_columns_appends_missing_columns(self, bq_client):
+        table = Table("p.d.t", schema=[SchemaField("id", "INTEGER")])
+        bq_client.get_table.return_value = table
+        wrapper = BigQueryClientWrapper(project_id="p")
+
+        added = wrapper.add_columns(
+            "p.d.t",
+            schema=[
+                SchemaField("id", "INTEGER"),
+                SchemaField("synced_at", "TIMESTAMP"),
+            ],
+        )
+
+        assert added == ["synced_at"]
+        assert [field.name for field in table.schema] == ["id", "synced_at"]
+        bq_client.update_table.assert_called_once_with(table, ["schema"])
+
+    def test_add_columns_leaves_complete_table_alone(self, bq_client):
+        bq_client.get_table.return_value = Table(
+            "p.d.t", schema=[SchemaField("id", "INTEGER")]
+        )
+        wrapper = BigQueryClientWrapper(project_id="p")
+
+        assert wrapper.add_columns("p.d.t", schema=[SchemaField("id", "INTEGER")]) == []
+        bq_client.update_table.assert_not_called()
+
+    def test_add_columns_missing_table(self, bq_client):
+        bq_client.get_table.side_effect = NotFound("no table")
+        wrapper = BigQueryClientWrapper(project_id="p")
+
+        assert wrapper.add_columns("p.d.t", schema=[], missing_ok=True) == []
+        with pytest.raises(NotFound):
+            wrapper.add_columns("p.d.t", schema=[])
+
+
+class TestBigQueryClientWrapperQueries:
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_runs_query(self, mock_client_class):
+        fake = FakeBigQueryClient()
+        mock_client_class.return_value = fake
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        wrapper.run_query("SELECT 1")
+
+        assert fake.queries == ["SELECT 1"]
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_failed_query_raises(self, mock_client_class):
+        errors = [{"reason": "invalidQuery", "message": "Syntax error"}]
+        mock_client_class.return_value = FakeBigQueryClient(errors=errors)
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        with pytest.raises(BigQueryError) as exc_info:
+            wrapper.run_query("SELEC 1")
+
+        assert exc_info.value.errors == errors
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_fetch_rows(self, mock_client_class):
+        fake = FakeBigQueryClient(rows=[{"id": 1, "fingerprint": "abc"}])
+        mock_client_class.return_value = fake
+        wrapper = BigQueryClientWrapper(project_id="test-project")
+
+        rows = wrapper.fetch_rows("SELECT id, fingerprint FROM activities")
+
+        assert rows == [{"id": 1, "fingerprint": "abc"}]
+        assert fake.queries == ["SELECT id, fingerprint FROM activities"]
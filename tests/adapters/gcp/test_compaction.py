@@ -0,0 +1,112 @@
+from stravabqsync.adapters.gcp._compaction import CompactActivitiesRepo
+from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+from tests.mocks.bigquery_client_wrapper import MockBigQueryClientWrapper
+
+
+def repo(**kwargs):
+    client = MockBigQueryClientWrapper(project_id="test-project")
+    return CompactActivitiesRepo(client, dataset_name="test-dataset", **kwargs)
+
+
+def statements(script):
+    """Split a script into statements, without comments"""
+    code = "\n".join(
+        line for line in script.splitlines() if not line.lstrip().startswith("--")
+    )
+    return [s.strip() for s in code.split(";") if s.strip()]
+
+
+class TestCompactActivitiesRepo:
+    def test_compact_runs_script_once(self):
+        compactor = repo()
+
+        compactor.compact()
+
+        assert compactor._client.queries == [compactor.script()]
+
+    def test_add_missing_columns_to_current_table(self):
+        compactor = repo()
+
+        compactor.add_missing_columns()
+
+        assert compactor._client.altered_tables == {
+            "test-project.test-dataset.activities_current": STRAVA_ACTIVITY_SCHEMA
+        }
+
+    def test_declarations_come_first(self):
+        declarations = [s.startswith("DECLARE") for s in statements(repo().script())]
+        assert declarations[:4] == [True] * 4
+        assert not any(declarations[4:])
+
+    def test_changes_applied_in_one_transaction(self):
+        script = statements(repo().script())
+        begin = script.index("BEGIN TRANSACTION")
+        commit = script.index("COMMIT TRANSACTION")
+
+        applied = [s.split()[0] for s in script[begin + 1 : commit]]
+
+        assert applied == [
+            "MERGE",
+            "CREATE",
+            "UPDATE",
+            "DELETE",
+            "DELETE",
+            "INSERT",
+            "MERGE",
+        ]
+
+    def test_only_changes_since_watermark_are_applied(self):
+        script = repo().script()
+        # Edits and deletions
+        assert script.count("WHERE synced_at >= since AND synced_at < until") == 2
+
+    def test_activities_read_from_partitions_modified_since_watermark(self):
+        script = statements(repo().script())
+        partitions = "`test-project.test-dataset.INFORMATION_SCHEMA.PARTITIONS`"
+
+        [days] = [s for s in script if s.startswith("SET changed_days")]
+        assert f"FROM {partitions}" in days
+        assert 'table_name = "activities"' in days
+        assert "last_modified_time >= since" in days
+
+        merge = next(s for s in script if "USING (" in s)
+        assert "FROM `test-project.test-dataset.activities`" in merge
+        assert "WHERE DATE(start_date) IN UNNEST(changed_days)" in merge
+        assert "SELECT *" not in merge
+
+    def test_rows_applied_before_change_nothing(self):
+        merge = next(s for s in statements(repo().script()) if "USING (" in s)
+        assert "WHEN MATCHED AND s.synced_at > IFNULL(t.synced_at" in merge
+
+    def test_every_scan_of_changes_is_bounded_by_synced_at(self):
+        script = repo().script()
+        changes = "FROM `test-project.test-dataset.changes`"
+        scans = script.split(changes)[1:]
+
+        assert len(scans) == 4
+        for scan in scans:
+            assert (
+                scan.split("\n")[1]
+                .lstrip()
+                .startswith(
+                    ("WHERE synced_at >= since", "WHERE synced_at >= late_since")
+                )
+            )
+
+    def test_unmatched_edits_are_carried_over(self):
+        script = statements(repo().script())
+        pending = "`test-project.test-dataset.compaction_pending_changes`"
+        current = "`test-project.test-dataset.activities_current`"
+
+        [edits] = [s for s in script if s.startswith("CREATE TEMP TABLE edits")]
+        [carry] = [s for s in script if s.startswith(f"INSERT INTO {pending}")]
+        assert f"FROM {pending}" in edits
+        assert f"NOT IN (SELECT id FROM {current})" in carry
+
+    def test_merge_updates_every_column(self):
+        script = repo().script()
+        for field in STRAVA_ACTIVITY_SCHEMA:
+            assert f"`{field.name}` = s.`{field.name}`" in script
+
+    def test_settle_seconds(self):
+        assert "INTERVAL 60 SECOND" in repo(settle_seconds=60).script()
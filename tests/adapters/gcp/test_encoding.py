@@ -0,0 +1,190 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from google.cloud.bigquery import SchemaField
+from pydantic import BaseModel
+
+from stravabqsync.adapters.gcp._encoding import RowEncoder, compile_encoder
+from stravabqsync.adapters.gcp._serialization import serialize_row
+from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+from stravabqsync.domain import StravaActivity
+from stravabqsync.exceptions import DataValidationError
+
+SCHEMA = [
+    SchemaField("id", "INTEGER", mode="REQUIRED"),
+    SchemaField("name", "STRING"),
+    SchemaField("start_date", "TIMESTAMP", mode="REQUIRED"),
+    SchemaField("urls", "JSON"),
+    SchemaField(
+        "laps",
+        "RECORD",
+        mode="REPEATED",
+        fields=[SchemaField("distance", "FLOAT", mode="REQUIRED")],
+    ),
+]
+
+
+@pytest.fixture
+def encoder():
+    return RowEncoder(SCHEMA)
+
+
+def load_activity(path):
+    with open(path, "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+class TestRowEncoder:
+    def test_encode_coerces_to_column_types(self, encoder):
+        row = b'{"id":1,"name":42,"start_date":"2024-01-01T00:00:00Z",'
+        row += b'"urls":"{}","laps":[{"distance":5}]}'
+
+        assert json.loads(encoder.encode(row)) == {
+            "id": 1,
+            "name": "42",
+            "start_date": "2024-01-01T00:00:00Z",
+            "urls": "{}",
+            "laps": [{"distance": 5.0}],
+        }
+
+    def test_encode_leaves_out_missing_fields(self, encoder):
+        row = b'{"id":1,"start_date":"2024-01-01T00:00:00Z","name":null}'
+        assert json.loads(encoder.encode(row)) == {
+            "id": 1,
+            "start_date": "2024-01-01T00:00:00Z",
+            "name": None,
+        }
+
+    @pytest.mark.parametrize(
+        "row, location",
+        [
+            (b'{"start_date":"2024-01-01T00:00:00Z"}', "id"),
+            (b'{"id":1,"start_date":null}', "start_date"),
+            (b'{"id":"one","start_date":"2024-01-01T00:00:00Z"}', "id"),
+            (b'{"id":1,"start_date":"2024-01-01T00:00:00Z","laps":[{}]}', "laps.0"),
+            (b'{"id":1,"start_date":"2024-01-01T00:00:00Z","extra":1}', "extra"),
+        ],
+    )
+    def test_encode_rejects_invalid_rows(self, encoder, row, location):
+        with pytest.raises(DataValidationError, match=f"^{location}"):
+            encoder.encode(row)
+
+    def test_encode_python(self, encoder):
+        start_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        row = encoder.encode_python({"id": 1, "start_date": start_date, "name": 2})
+        assert row == {"id": 1, "start_date": start_date, "name": "2"}
+
+    def test_encode_python_rejects_invalid_rows(self, encoder):
+        with pytest.raises(DataValidationError):
+            encoder.encode_python({"id": 1})
+
+
+class Lap(BaseModel):
+    distance: float
+
+
+class Fitting(BaseModel):
+    id: int
+    name: str | None = None
+    start_date: datetime | None = None
+    laps: list[Lap] = []
+
+
+class NotFitting(BaseModel):
+    id: int
+    name: int | None = None
+    start_date: datetime
+
+
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class TestEncodeModel:
+    def test_fitting_model_is_serialized_as_is(self, encoder):
+        model = Fitting(id=1, name="a", start_date=START_DATE)
+
+        with patch.object(RowEncoder, "encode") as encode:
+            encoded = encoder.encode_model(model)
+
+        encode.assert_not_called()
+        assert encoded == serialize_row(model)
+
+    def test_reuses_serialized_row(self, encoder):
+        model = Fitting(id=1, start_date=START_DATE)
+        serialized = serialize_row(model)
+        assert encoder.encode_model(model, serialized=serialized) is serialized
+
+    def test_rejects_null_required_fields(self, encoder):
+        with pytest.raises(DataValidationError, match="^start_date"):
+            encoder.encode_model(Fitting(id=1))
+
+    def test_encodes_extra_fields(self, encoder):
+        model = Fitting(id=1, start_date=START_DATE)
+        encoded = encoder.encode_model(
+            model, exclude=frozenset({"name"}), extra={"name": 2}
+        )
+        assert json.loads(encoded)["name"] == "2"
+
+    def test_rejects_unknown_extra_fields(self, encoder):
+        model = Fitting(id=1, start_date=START_DATE)
+        with pytest.raises(DataValidationError, match="^extra"):
+            encoder.encode_model(model, extra={"extra": 1})
+
+    def test_required_fields_may_come_as_extra(self, encoder):
+        model = Fitting(id=1)
+        with pytest.raises(DataValidationError, match="^start_date"):
+            encoder.encode_model(model, exclude=frozenset({"start_date"}))
+        encoded = encoder.encode_model(
+            model, exclude=frozenset({"start_date"}), extra={"start_date": START_DATE}
+        )
+        assert json.loads(encoded)["start_date"] == "2024-01-01T00:00:00Z"
+
+    def test_validates_models_that_dont_fit(self, encoder):
+        model = NotFitting(id=1, name=2, start_date=START_DATE)
+        assert json.loads(encoder.encode_model(model))["name"] == "2"
+
+    def test_encode_model_python(self, encoder):
+        assert encoder.encode_model_python(Fitting(id=1, start_date=START_DATE)) == {
+            "id": 1,
+            "name": None,
+            "start_date": START_DATE,
+            "laps": [],
+        }
+        row = encoder.encode_model_python(
+            NotFitting(id=1, name=2, start_date=START_DATE)
+        )
+        assert row == {"id": 1, "name": "2", "start_date": START_DATE}
+
+
+class TestActivitySchema:
+    @pytest.mark.parametrize(
+        "path", ["tests/fixtures/activity_1.json", "tests/fixtures/activity_2.json"]
+    )
+    def test_activities_fit_schema(self, path):
+        activity = load_activity(path)
+        row = serialize_row(activity)
+
+        encoded = compile_encoder(tuple(STRAVA_ACTIVITY_SCHEMA)).encode(row)
+
+        assert json.loads(encoded) == json.loads(row)
+
+    def test_workout_type_is_a_string(self):
+        activity = load_activity("tests/fixtures/activity_1.json")
+        assert activity.workout_type == "10"
+
+    def test_activities_skip_validation(self):
+        activity = load_activity("tests/fixtures/activity_1.json")
+        encoder = compile_encoder(tuple(STRAVA_ACTIVITY_SCHEMA))
+        serialized = serialize_row(activity)
+
+        with patch.object(RowEncoder, "encode") as encode:
+            encoded = encoder.encode_model(activity, serialized=serialized)
+
+        encode.assert_not_called()
+        assert encoded is serialized
+
+    def test_compiled_once(self):
+        schema = tuple(STRAVA_ACTIVITY_SCHEMA)
+        assert compile_encoder(schema) is compile_encoder(schema)
@@ -1,11 +1,27 @@
 from unittest.mock import patch
 
+import pytest
+
 from stravabqsync.adapters.gcp import (
+    make_backfill_write_activities,
     make_bigquery_client_wrapper,
+    make_compact_activities,
     make_write_activities,
+    make_write_changes,
+)
+from stravabqsync.adapters.gcp._buffer import (
+    BufferedWriteActivities,
+    CoalescingWriteChanges,
 )
 from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
-from stravabqsync.adapters.gcp._repositories import WriteActivitiesRepo
+from stravabqsync.adapters.gcp._compaction import CompactActivitiesRepo
+from stravabqsync.adapters.gcp._normalized import NormalizedWriteActivitiesRepo
+from stravabqsync.adapters.gcp._repositories import (
+    WriteActivitiesRepo,
+    WriteChangesRepo,
+)
+from stravabqsync.config import get_app_config
+from stravabqsync.exceptions import ConfigurationError
 
 
 class TestGcpAdapterFactories:
@@ -24,7 +40,7 @@ class TestGcpAdapterFactories:
 
     @patch("stravabqsync.adapters.gcp._clients.Client")
     def test_make_bigquery_client_wrapper_caching(self, mock_client):
-        # Test that @lru_cache returns the same instance
+        # Test that the container returns the same instance
         first_call = make_bigquery_client_wrapper()
         second_call = make_bigquery_client_wrapper()
         assert first_call is second_call
@@ -44,7 +60,88 @@ class TestGcpAdapterFactories:
 
     @patch("stravabqsync.adapters.gcp._clients.Client")
     def test_make_write_activities_caching(self, mock_client):
-        # Test that @lru_cache returns the same instance
+        # Test that the container returns the same instance
         first_call = make_write_activities()
         second_call = make_write_activities()
         assert first_call is second_call
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_backfill_write_activities_uses_load_jobs(self, mock_client):
+        make_backfill_write_activities.reset()
+        writer = make_backfill_write_activities()
+        assert isinstance(writer, WriteActivitiesRepo)
+        assert writer._method == "load"
+        assert writer._load_format == "ndjson"
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_backfill_write_activities_streaming_is_buffered(self, mock_client):
+        app_config = get_app_config()
+        config = app_config._replace(
+            bq_write=app_config.bq_write._replace(backfill_method="stream")
+        )
+        make_backfill_write_activities.reset()
+        try:
+            with patch("stravabqsync.adapters.gcp.get_app_config", return_value=config):
+                writer = make_backfill_write_activities()
+        finally:
+            make_backfill_write_activities.reset()
+        assert isinstance(writer, BufferedWriteActivities)
+        assert writer._writer is make_write_activities()
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_backfill_write_activities_invalid_method(self, mock_client):
+        app_config = get_app_config()
+        config = app_config._replace(
+            bq_write=app_config.bq_write._replace(backfill_method="bulk")
+        )
+        make_backfill_write_activities.reset()
+        with patch("stravabqsync.adapters.gcp.get_app_config", return_value=config):
+            with pytest.raises(ConfigurationError):
+                make_backfill_write_activities()
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_write_changes_coalesces(self, mock_client):
+        writer = make_write_changes()
+        assert isinstance(writer, CoalescingWriteChanges)
+        assert isinstance(writer._writer, WriteChangesRepo)
+        assert writer._window == get_app_config().bq_write.change_window
+        assert make_write_changes() is writer
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_compact_activities(self, mock_client):
+        compactor = make_compact_activities(settle_seconds=30)
+        assert isinstance(compactor, CompactActivitiesRepo)
+        assert compactor._settle_seconds == 30
+        assert make_compact_activities()._settle_seconds == 300
+
+    @pytest.mark.parametrize(
+        "layout,expected",
+        [
+            ("nested", WriteActivitiesRepo),
+            ("normalized", NormalizedWriteActivitiesRepo),
+        ],
+    )
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_backfill_write_activities_layout(self, mock_client, layout, expected):
+        app_config = get_app_config()
+        config = app_config._replace(
+            bq_write=app_config.bq_write._replace(layout=layout)
+        )
+        make_backfill_write_activities.reset()
+        try:
+            with patch("stravabqsync.adapters.gcp.get_app_config", return_value=config):
+                writer = make_backfill_write_activities()
+        finally:
+            make_backfill_write_activities.reset()
+        assert type(writer) is expected
+
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_make_backfill_write_activities_invalid_layout(self, mock_client):
+        app_config = get_app_config()
+        config = app_config._replace(
+            bq_write=app_config.bq_write._replace(layout="flat")
+        )
+        make_backfill_write_activities.reset()
+        with patch("stravabqsync.adapters.gcp.get_app_config", return_value=config):
+            with pytest.raises(ConfigurationError):
+                make_backfill_write_activities()
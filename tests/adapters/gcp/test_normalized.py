@@ -0,0 +1,136 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+from stravabqsync.adapters.gcp._normalized import (
+    CHILD_FIELDS,
+    CHILD_TABLES,
+    NormalizedWriteActivitiesRepo,
+)
+from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+from stravabqsync.domain import StravaActivity
+from stravabqsync.exceptions import PartialWriteError
+from tests.mocks.bigquery_client import FakeBigQueryClient
+from tests.mocks.bigquery_client_wrapper import MockBigQueryClientWrapper
+
+
+def load_activity(name):
+    with open(f"tests/fixtures/{name}", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+@pytest.fixture
+def activity():
+    # One segment effort, one lap and one metric split
+    return load_activity("activity_1.json")
+
+
+@pytest.fixture
+def client():
+    return MockBigQueryClientWrapper(project_id="test-project")
+
+
+@pytest.fixture
+def repo(client):
+    return NormalizedWriteActivitiesRepo(client, dataset_name="test-dataset")
+
+
+def schema_names(table_name):
+    if table_name == "activities":
+        return {f.name for f in STRAVA_ACTIVITY_SCHEMA} - CHILD_FIELDS
+    return {f.name for f in CHILD_TABLES[table_name].schema}
+
+
+class TestNormalizedWriteActivitiesRepo:
+    def test_fans_out_to_child_tables(self, repo, client, activity):
+        repo.write_activity(activity)
+
+        assert {name: len(rows) for name, rows in client.inserts.items()} == {
+            "activities": 1,
+            "segment_efforts": 1,
+            "laps": 1,
+            "splits": 1,
+            "segments": 1,
+        }
+
+    def test_rows_match_table_schemas(self, repo, client, activity):
+        repo.write_activities([activity, load_activity("activity_2.json")])
+
+        for table_name, rows in client.inserts.items():
+            for row in rows:
+                assert set(row) == schema_names(table_name), table_name
+
+    def test_child_rows_reference_activity(self, repo, client, activity):
+        repo.write_activity(activity)
+
+        [effort] = client.inserts["segment_efforts"]
+        [segment] = client.inserts["segments"]
+        [split] = client.inserts["splits"]
+        assert effort["activity_id"] == activity.id
+        assert effort["segment_id"] == segment["id"]
+        assert split["units"] == "metric"
+        assert client.inserts["laps"][0]["activity_id"] == activity.id
+
+    def test_segments_written_once(self, repo, client, activity):
+        repo.write_activities([activity, activity.model_copy(update={"id": 1})])
+        repo.write_activity(activity.model_copy(update={"id": 2}))
+
+        assert len(client.inserts["segments"]) == 1
+        assert len(client.inserts["segment_efforts"]) == 3
+
+    def test_failed_child_row_fails_activity(self, activity):
+        client = MockBigQueryClientWrapper(
+            project_id="test-project", failed_rows=[0], failed_table="segments"
+        )
+        repo = NormalizedWriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_activity(activity)
+        assert exc_info.value.activity_ids == [activity.id]
+
+        # The segment wasn't recorded as written, so it is retried
+        client.failed_rows = None
+        repo.write_activity(activity)
+        assert len(client.inserts["segments"]) == 2
+
+    def test_create_child_tables(self, repo, client):
+        repo.create_child_tables(partition_expiration_days=30, exists_ok=True)
+
+        created = client.created_tables
+        assert set(created) == {
+            f"test-project.test-dataset.{name}" for name in CHILD_TABLES
+        }
+        laps = created["test-project.test-dataset.laps"]
+        assert laps["partition_field"] == "start_date"
+        assert laps["partition_expiration_days"] == 30
+        segments = created["test-project.test-dataset.segments"]
+        assert segments["partition_field"] is None
+        assert segments["partition_expiration_days"] is None
+
+
+class TestNormalizedLoadJobs:
+    @patch("stravabqsync.adapters.gcp._clients.Client")
+    def test_one_load_job_per_table(self, mock_client_class, activity):
+        fake = FakeBigQueryClient()
+        mock_client_class.return_value = fake
+        repo = NormalizedWriteActivitiesRepo(
+            BigQueryClientWrapper(project_id="test-project"),
+            dataset_name="test-dataset",
+            method="load",
+        )
+
+        repo.write_activity(activity)
+
+        loaded = {load["table_id"].rsplit(".", 1)[1]: load for load in fake.loads}
+        assert set(loaded) == {
+            "activities",
+            "segment_efforts",
+            "laps",
+            "splits",
+            "segments",
+        }
+        assert loaded["splits"]["job_config"].schema == CHILD_TABLES["splits"].schema
+        assert loaded["splits"]["rows"][0]["activity_id"] == activity.id
+        assert "laps" not in loaded["activities"]["rows"][0]
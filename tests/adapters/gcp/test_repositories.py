@@ -1,10 +1,21 @@
 import json
+from datetime import UTC, datetime
 from functools import lru_cache
+from unittest.mock import patch
 
 import pytest
 
-from stravabqsync.adapters.gcp._repositories import WriteActivitiesRepo
-from stravabqsync.domain import StravaActivity
+from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+from stravabqsync.adapters.gcp._repositories import (
+    ReadFingerprintsRepo,
+    WriteActivitiesRepo,
+    WriteChangesRepo,
+)
+from stravabqsync.adapters.gcp.schemas import CHANGE_LOG_SCHEMA, STRAVA_ACTIVITY_SCHEMA
+from stravabqsync.domain import ActivityChange, StravaActivity
+from stravabqsync.exceptions import ConfigurationError, PartialWriteError
+from stravabqsync.fingerprint import fingerprint
+from tests.mocks.bigquery_client import FakeBigQueryClient
 from tests.mocks.bigquery_client_wrapper import MockBigQueryClientWrapper
 
 
@@ -44,3 +55,394 @@ class TestWriteActivitiesRepo:
         write_activities_repo.create_activities_table()
         expected_table_id = "test-project.test-dataset.activities"
         assert write_activities_repo._client.table_id == expected_table_id
+
+    def test_create_activities_table_layout(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        repo.create_activities_table(partition_expiration_days=30, exists_ok=True)
+
+        assert client.table_options == {
+            "partition_field": "start_date",
+            "partition_expiration_days": 30,
+            "clustering_fields": ("sport_type",),
+            "exists_ok": True,
+        }
+
+    def test_partition_activities_table(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        backup_id = repo.partition_activities_table(partition_expiration_days=30)
+
+        assert backup_id == "test-project.test-dataset.activities_unpartitioned"
+        [script] = client.queries
+        assert (
+            "CREATE TABLE `test-project.test-dataset.activities_partitioned`" in script
+        )
+        assert "PARTITION BY DATE(start_date)" in script
+        assert "CLUSTER BY sport_type" in script
+        assert "partition_expiration_days = 30" in script
+        assert "AS SELECT * FROM `test-project.test-dataset.activities`" in script
+        assert script.index("RENAME TO `activities_unpartitioned`") < script.index(
+            "RENAME TO `activities`"
+        )
+
+    def test_write_activities_single_insert(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        second = activity2.model_copy(update={"id": 1})
+
+        repo.write_activities([activity2, second])
+
+        assert [row["id"] for row in client.written_activities] == [8726373550, 1]
+        # Rows must be JSON-serializable for the streaming insert API
+        assert isinstance(client.written_activities[0]["start_date"], str)
+        json.dumps(client.written_activities)
+
+    def test_write_activities_insert_ids_are_stable(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        second = activity2.model_copy(update={"id": 1})
+
+        repo.write_activities([activity2, second])
+        first_ids = client.insert_ids
+        repo.write_activity(activity2)
+
+        assert len(set(first_ids)) == 2
+        assert client.insert_ids == [first_ids[0]]
+
+    def test_write_activities_reuses_serialized_rows(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        with patch("stravabqsync.adapters.gcp._encoding.serialize_row") as serialize:
+            repo.write_activities(
+                [activity2], serialized=[activity2.model_dump_json().encode()]
+            )
+
+        serialize.assert_not_called()
+        [row] = client.written_activities
+        assert row["id"] == activity2.id
+
+    def test_write_activities_serialized_rows_must_match(self, activity2):
+        repo = WriteActivitiesRepo(
+            MockBigQueryClientWrapper(project_id="test-project"),
+            dataset_name="test-dataset",
+        )
+
+        with pytest.raises(ValueError):
+            repo.write_activities([activity2], serialized=[])
+
+    def test_write_activities_stamps_synced_at(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        repo.write_activity(activity2)
+
+        [row] = client.written_activities
+        synced_at = datetime.fromisoformat(row.pop("synced_at"))
+        assert synced_at.tzinfo is not None
+        assert row.pop("fingerprint") == fingerprint(activity2).digest
+        assert row == activity2.model_dump(mode="json")
+
+    def test_write_activities_fingerprint_exclude(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(
+            client, dataset_name="test-dataset", fingerprint_exclude={"kudos_count"}
+        )
+
+        repo.write_activities(
+            [activity2, activity2.model_copy(update={"kudos_count": 99})]
+        )
+
+        first, second = client.written_activities
+        assert first["fingerprint"] == second["fingerprint"]
+        assert first["fingerprint"] != fingerprint(activity2).digest
+
+    def test_write_activities_stores_given_digests(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        other = activity2.model_copy(update={"id": 8})
+
+        with patch(
+            "stravabqsync.adapters.gcp._repositories.fingerprint",
+            wraps=fingerprint,
+        ) as fingerprint_mock:
+            repo.write_activities([activity2, other], digests={activity2.id: "given"})
+
+        assert [row["fingerprint"] for row in client.written_activities] == [
+            "given",
+            fingerprint(other).digest,
+        ]
+        fingerprint_mock.assert_called_once_with(other, exclude=frozenset())
+
+    def test_warm_up_reads_activities_table(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        WriteActivitiesRepo(client, dataset_name="test-dataset").warm_up()
+        assert client.warmed_up_table == "test-project.test-dataset.activities"
+
+    def test_missing_columns_fail_before_writing(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        client.columns = {
+            "activities": {
+                f.name for f in STRAVA_ACTIVITY_SCHEMA if f.name != "fingerprint"
+            }
+        }
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        with pytest.raises(ConfigurationError, match="no column fingerprint"):
+            repo.write_activities([activity2])
+        with pytest.raises(ConfigurationError):
+            repo.warm_up()
+        assert client.written_activities is None
+
+    def test_columns_checked_once(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        repo.write_activities([activity2])
+        client.columns = {"activities": set()}
+
+        repo.write_activities([activity2])
+
+        assert len(client.inserts["activities"]) == 2
+
+    def test_add_missing_columns(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        repo.add_missing_columns()
+
+        assert client.altered_tables == {
+            "test-project.test-dataset.activities": STRAVA_ACTIVITY_SCHEMA
+        }
+
+    def test_write_activities_empty_is_noop(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        repo.write_activities([])
+
+        assert client.written_activities is None
+
+    def test_write_activities_partial_failure_reports_activity_ids(self, activity2):
+        client = MockBigQueryClientWrapper(
+            project_id="test-project", failed_rows=[1], failed_table="activities"
+        )
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        activities = [activity2.model_copy(update={"id": i}) for i in (7, 8, 9)]
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_activities(activities)
+
+        assert exc_info.value.activity_ids == [8]
+
+    def test_write_activities_encodes_rows_for_schema(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        activity = StravaActivity(**{**activity2.model_dump(), "workout_type": 1})
+        repo.write_activity(activity)
+
+        assert client.written_activities[0]["workout_type"] == "1"
+
+    def test_write_activities_skips_invalid_rows(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        invalid = activity2.model_copy(update={"id": 7, "start_date": None})
+        valid = activity2.model_copy(update={"id": 8})
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_activities([invalid, valid])
+
+        assert exc_info.value.activity_ids == [7]
+        [error] = exc_info.value.errors
+        assert error["index"] == 0
+        assert error["errors"][0]["message"].startswith("start_date")
+        assert [row["id"] for row in client.written_activities] == [8]
+
+    def test_write_activities_all_invalid_sends_nothing(self, activity2):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_activity(activity2.model_copy(update={"start_date": None}))
+
+        assert exc_info.value.activity_ids == [activity2.id]
+        assert client.written_activities is None
+
+    def test_write_activities_reports_invalid_and_failed_rows(self, activity2):
+        client = MockBigQueryClientWrapper(
+            project_id="test-project", failed_rows=[1], failed_table="activities"
+        )
+        repo = WriteActivitiesRepo(client, dataset_name="test-dataset")
+        activities = [activity2.model_copy(update={"id": i}) for i in (7, 8, 9)]
+        activities[0] = activities[0].model_copy(update={"start_date": None})
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_activities(activities)
+
+        assert exc_info.value.activity_ids == [7, 9]
+        assert [e["index"] for e in exc_info.value.errors] == [0, 2]
+
+
+@pytest.fixture
+def fake_client():
+    with patch("stravabqsync.adapters.gcp._clients.Client") as mock_client_class:
+        mock_client_class.return_value = FakeBigQueryClient()
+        yield BigQueryClientWrapper(project_id="test-project")
+
+
+class TestWriteActivitiesRepoLoadJobs:
+    def test_load_stages_ndjson(self, fake_client, activity2):
+        repo = WriteActivitiesRepo(
+            fake_client, dataset_name="test-dataset", method="load"
+        )
+        activities = [activity2, activity2.model_copy(update={"id": 1})]
+
+        repo.write_activities(activities)
+
+        (load,) = fake_client._client.loads
+        assert load["table_id"] == "test-project.test-dataset.activities"
+        assert load["job_config"].schema == STRAVA_ACTIVITY_SCHEMA
+        synced_at = {row.pop("synced_at") for row in load["rows"]}
+        assert [row.pop("fingerprint") for row in load["rows"]] == [
+            fingerprint(a).digest for a in activities
+        ]
+        assert load["rows"] == [a.model_dump(mode="json") for a in activities]
+        assert len(synced_at) == 1
+
+    def test_load_stages_parquet(self, fake_client, activity2):
+        pytest.importorskip("pyarrow")
+        repo = WriteActivitiesRepo(
+            fake_client,
+            dataset_name="test-dataset",
+            method="load",
+            load_format="parquet",
+        )
+
+        repo.write_activities([activity2])
+
+        (load,) = fake_client._client.loads
+        assert load["job_config"].source_format == "PARQUET"
+        assert [row["id"] for row in load["rows"]] == [activity2.id]
+        assert load["rows"][0]["start_date"] == activity2.start_date
+
+    def test_load_skips_invalid_rows(self, fake_client, activity2):
+        repo = WriteActivitiesRepo(
+            fake_client, dataset_name="test-dataset", method="load"
+        )
+        invalid = activity2.model_copy(update={"id": 1, "start_date": None})
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_activities([activity2, invalid])
+
+        assert exc_info.value.activity_ids == [1]
+        (load,) = fake_client._client.loads
+        assert [row["id"] for row in load["rows"]] == [activity2.id]
+
+    def test_load_parquet_skips_invalid_rows(self, fake_client, activity2):
+        pytest.importorskip("pyarrow")
+        repo = WriteActivitiesRepo(
+            fake_client,
+            dataset_name="test-dataset",
+            method="load",
+            load_format="parquet",
+        )
+
+        with pytest.raises(PartialWriteError):
+            repo.write_activity(activity2.model_copy(update={"start_date": None}))
+
+        assert fake_client._client.loads == []
+
+    def test_load_empty_is_noop(self, fake_client):
+        repo = WriteActivitiesRepo(
+            fake_client, dataset_name="test-dataset", method="load"
+        )
+
+        repo.write_activities([])
+
+        assert fake_client._client.loads == []
+
+    @pytest.mark.parametrize(
+        "options", [{"method": "bulk"}, {"method": "load", "load_format": "avro"}]
+    )
+    def test_invalid_options(self, options):
+        with pytest.raises(ConfigurationError):
+            WriteActivitiesRepo(bq_client(), dataset_name="test-dataset", **options)
+
+
+class TestWriteChangesRepo:
+    def change(self, activity_id, **fields):
+        return ActivityChange(
+            id=activity_id,
+            owner_id=1,
+            event_time=datetime(2024, 1, 1, tzinfo=UTC),
+            **fields,
+        )
+
+    def test_write_changes_single_insert(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        repo = WriteChangesRepo(client, dataset_name="test-dataset")
+
+        repo.write_changes([self.change(1, title="A"), self.change(2)])
+
+        assert client.table_name == "changes"
+        assert [row["id"] for row in client.written_activities] == [1, 2]
+        assert client.written_activities[0]["title"] == "A"
+        assert client.written_activities[0]["event_time"] == "2024-01-01T00:00:00Z"
+        assert len(set(client.insert_ids)) == 2
+
+    def test_write_changes_partial_failure(self):
+        client = MockBigQueryClientWrapper(project_id="test-project", failed_rows=[0])
+        repo = WriteChangesRepo(client, dataset_name="test-dataset")
+
+        with pytest.raises(PartialWriteError) as exc_info:
+            repo.write_changes([self.change(5), self.change(6)])
+
+        assert exc_info.value.activity_ids == [5]
+
+    def test_write_changes_empty_is_noop(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        WriteChangesRepo(client, dataset_name="test-dataset").write_changes([])
+        assert client.written_activities is None
+
+    def test_create_changes_table(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        WriteChangesRepo(client, dataset_name="test-dataset").create_changes_table()
+        assert client.table_id == "test-project.test-dataset.changes"
+        assert client.schema == CHANGE_LOG_SCHEMA
+        assert client.table_options["partition_field"] == "synced_at"
+
+    def test_missing_synced_at_fails_before_writing(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        client.columns = {"changes": {"id", "owner_id", "event_time"}}
+        repo = WriteChangesRepo(client, dataset_name="test-dataset")
+
+        with pytest.raises(ConfigurationError, match="synced_at"):
+            repo.write_changes([self.change(1)])
+        assert client.written_activities is None
+
+    def test_add_missing_columns(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        WriteChangesRepo(client, dataset_name="test-dataset").add_missing_columns()
+        assert client.altered_tables == {
+            "test-project.test-dataset.changes": CHANGE_LOG_SCHEMA
+        }
+
+
+class TestReadFingerprintsRepo:
+    def test_read_fingerprints(self):
+        client = MockBigQueryClientWrapper(project_id="test-project")
+        client.query_rows = [
+            {"id": 2, "fingerprint": "old"},
+            {"id": 1, "fingerprint": "new"},
+        ]
+        repo = ReadFingerprintsRepo(client, dataset_name="test-dataset")
+
+        fingerprints = repo.read_fingerprints(100)
+
+        assert list(fingerprints.items()) == [(2, "old"), (1, "new")]
+        [sql] = client.queries
+        assert "FROM `test-project.test-dataset.activities`" in sql
+        assert "LIMIT 100" in sql
@@ -0,0 +1,74 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from stravabqsync.adapters.gcp._secrets import (
+    SecretManagerStore,
+    SecretStore,
+    SecretStoreTokenCache,
+)
+from stravabqsync.domain import StravaTokenSet
+from stravabqsync.exceptions import ConfigurationError
+
+
+class InMemorySecretStore(SecretStore):
+    def __init__(self):
+        self.versions: dict[str, list[bytes]] = {}
+
+    def read_latest(self, secret_id: str) -> bytes | None:
+        versions = self.versions.get(secret_id)
+        return versions[-1] if versions else None
+
+    def add_version(self, secret_id: str, data: bytes) -> None:
+        self.versions.setdefault(secret_id, []).append(data)
+
+
+@pytest.fixture
+def tokens():
+    return StravaTokenSet(
+        client_id=1,
+        client_secret="secret",
+        access_token="access",
+        refresh_token="refresh",
+        expires_at=1700000000,
+    )
+
+
+class TestSecretStoreTokenCache:
+    def test_load_empty(self):
+        cache = SecretStoreTokenCache(InMemorySecretStore(), secret_id="tokens")
+        assert cache.load() is None
+
+    def test_roundtrip_without_client_secret(self, tokens):
+        store = InMemorySecretStore()
+        cache = SecretStoreTokenCache(store, secret_id="tokens")
+
+        cache.save(tokens)
+
+        assert b"secret" not in store.versions["tokens"][0]
+        assert cache.load() == tokens._replace(client_secret="")
+
+    def test_load_latest_version(self, tokens):
+        cache = SecretStoreTokenCache(InMemorySecretStore(), secret_id="tokens")
+        cache.save(tokens)
+        cache.save(tokens._replace(access_token="newer"))
+
+        assert cache.load().access_token == "newer"
+
+    def test_load_malformed(self):
+        store = InMemorySecretStore()
+        store.add_version("tokens", b"not json")
+        assert SecretStoreTokenCache(store, secret_id="tokens").load() is None
+
+    def test_lock(self):
+        cache = SecretStoreTokenCache(InMemorySecretStore(), secret_id="tokens")
+        with cache.lock():
+            pass
+
+
+class TestSecretManagerStore:
+    def test_missing_optional_dependency(self):
+        with patch.dict(sys.modules, {"google.cloud.secretmanager": None}):
+            with pytest.raises(ConfigurationError):
+                SecretManagerStore(project_id="test-project")
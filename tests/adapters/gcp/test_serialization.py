@@ -0,0 +1,76 @@
+import json
+from datetime import UTC, datetime
+
+import pytest
+
+from stravabqsync.adapters.gcp._serialization import (
+    build_insert_all_body,
+    row_insert_id,
+    serialize_row,
+    with_synced_at,
+)
+from stravabqsync.domain import StravaActivity
+
+
+@pytest.fixture(params=["activity_1.json", "activity_2.json"])
+def activity(request):
+    with open(f"tests/fixtures/{request.param}", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+class TestSerializeRow:
+    def test_matches_json_mode_dump(self, activity):
+        assert json.loads(serialize_row(activity)) == activity.model_dump(mode="json")
+
+    def test_returns_bytes(self, activity):
+        assert isinstance(serialize_row(activity), bytes)
+
+
+class TestWithSyncedAt:
+    def test_adds_field(self, activity):
+        synced_at = datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=UTC)
+
+        row = json.loads(with_synced_at(serialize_row(activity), synced_at))
+
+        assert datetime.fromisoformat(row.pop("synced_at")) == synced_at
+        assert row == activity.model_dump(mode="json")
+
+
+class TestRowInsertId:
+    def test_deterministic(self, activity):
+        row = serialize_row(activity)
+        assert row_insert_id(activity.id, row) == row_insert_id(activity.id, row)
+
+    def test_prefixed_with_key(self, activity):
+        insert_id = row_insert_id(activity.id, serialize_row(activity))
+        assert insert_id.startswith(f"{activity.id}-")
+        assert len(insert_id) <= 128
+
+    def test_changes_with_content(self, activity):
+        renamed = activity.model_copy(update={"name": "Renamed"})
+        assert row_insert_id(activity.id, serialize_row(activity)) != row_insert_id(
+            activity.id, serialize_row(renamed)
+        )
+
+
+class TestBuildInsertAllBody:
+    def test_body_wraps_rows(self, activity):
+        body = build_insert_all_body([serialize_row(activity), b'{"id":1}'], ["a", "b"])
+
+        assert json.loads(body) == {
+            "rows": [
+                {"insertId": "a", "json": activity.model_dump(mode="json")},
+                {"insertId": "b", "json": {"id": 1}},
+            ]
+        }
+
+    def test_insert_ids_are_escaped(self):
+        body = build_insert_all_body([b"{}"], ['quo"te'])
+        assert json.loads(body)["rows"][0]["insertId"] == 'quo"te'
+
+    def test_empty(self):
+        assert json.loads(build_insert_all_body([], [])) == {"rows": []}
+
+    def test_mismatched_insert_ids(self):
+        with pytest.raises(ValueError):
+            build_insert_all_body([b"{}"], [])
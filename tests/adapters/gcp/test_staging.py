@@ -0,0 +1,95 @@
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+from google.cloud.bigquery import SchemaField
+
+from stravabqsync.adapters.gcp._staging import stage_ndjson, stage_parquet
+from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+from stravabqsync.domain import StravaActivity
+
+SCHEMA = [
+    SchemaField("id", "INTEGER", mode="REQUIRED"),
+    SchemaField("name", "STRING"),
+    SchemaField("start_date", "TIMESTAMP", mode="REQUIRED"),
+    SchemaField("urls", "JSON"),
+    SchemaField(
+        "laps",
+        "RECORD",
+        mode="REPEATED",
+        fields=[SchemaField("distance", "FLOAT", mode="REQUIRED")],
+    ),
+]
+
+
+@pytest.fixture
+def activity():
+    with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+class TestStageNdjson:
+    def test_rows_are_gzipped_json_lines(self):
+        staged = io.BytesIO()
+
+        count = stage_ndjson([{"id": 1}, {"id": 2, "name": "b"}], staged)
+
+        assert count == 2
+        lines = gzip.decompress(staged.getvalue()).decode().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"id": 1},
+            {"id": 2, "name": "b"},
+        ]
+
+
+class TestStageParquet:
+    @pytest.fixture(autouse=True)
+    def pyarrow(self):
+        return pytest.importorskip("pyarrow")
+
+    def test_columns_follow_bigquery_schema(self, pyarrow):
+        import pyarrow.parquet as pq
+
+        staged = io.BytesIO()
+        start = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        row = {
+            "id": 1,
+            "name": 42,
+            "start_date": start,
+            "urls": {"100": "https://example.com"},
+            "laps": [{"distance": 1}],
+        }
+
+        stage_parquet([row], staged, schema=SCHEMA)
+
+        table = pq.read_table(io.BytesIO(staged.getvalue()))
+        assert table.schema.field("start_date").type == pyarrow.timestamp(
+            "us", tz="UTC"
+        )
+        assert table.to_pylist() == [
+            {
+                "id": 1,
+                "name": "42",
+                "start_date": start,
+                "urls": '{"100": "https://example.com"}',
+                "laps": [{"distance": 1.0}],
+            }
+        ]
+
+    def test_activity_matches_activity_schema(self, activity):
+        import pyarrow.parquet as pq
+
+        staged = io.BytesIO()
+
+        assert (
+            stage_parquet(
+                [activity.model_dump()], staged, schema=STRAVA_ACTIVITY_SCHEMA
+            )
+            == 1
+        )
+
+        table = pq.read_table(io.BytesIO(staged.getvalue()))
+        assert table.column_names == [f.name for f in STRAVA_ACTIVITY_SCHEMA]
+        assert table.column("id").to_pylist() == [activity.id]
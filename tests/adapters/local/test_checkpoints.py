@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from stravabqsync.adapters.local import make_backfill_checkpoints
+from stravabqsync.adapters.local._checkpoints import FileBackfillCheckpoints
+from stravabqsync.domain import BackfillCheckpoint
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return str(tmp_path / "checkpoint.json")
+
+
+class TestFileBackfillCheckpoints:
+    def test_load_missing_file(self, checkpoint_path):
+        assert FileBackfillCheckpoints(checkpoint_path).load() is None
+
+    def test_save_load_roundtrip(self, checkpoint_path):
+        store = FileBackfillCheckpoints(checkpoint_path)
+        checkpoint = BackfillCheckpoint(
+            before=1700000000, page=3, activity_id=42, synced=600, failed_ids=(7, 8)
+        )
+
+        store.save(checkpoint)
+
+        assert FileBackfillCheckpoints(checkpoint_path).load() == checkpoint
+
+    def test_save_replaces_without_temp_files(self, checkpoint_path, tmp_path):
+        store = FileBackfillCheckpoints(checkpoint_path)
+        store.save(BackfillCheckpoint(before=1, page=1))
+        store.save(BackfillCheckpoint(before=1, page=2))
+
+        assert store.load().page == 2
+        assert os.listdir(tmp_path) == ["checkpoint.json"]
+
+    def test_clear(self, checkpoint_path):
+        store = FileBackfillCheckpoints(checkpoint_path)
+        store.save(BackfillCheckpoint(before=1))
+        store.clear()
+        store.clear()
+
+        assert store.load() is None
+
+    def test_factory(self, checkpoint_path):
+        assert isinstance(
+            make_backfill_checkpoints(checkpoint_path), FileBackfillCheckpoints
+        )
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+
+import pytest
+
+from stravabqsync.adapters.local import make_sync_spool
+from stravabqsync.adapters.local._spool import FileSyncSpool
+from stravabqsync.domain import SpooledSync, StravaActivity
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    return str(tmp_path / "spool")
+
+
+@pytest.fixture
+def activity():
+    with open("tests/fixtures/activity_1.json", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+def entries(*activity_ids):
+    return [
+        SpooledSync(activity_id=i, error="Service Unavailable") for i in activity_ids
+    ]
+
+
+class TestFileSyncSpool:
+    def test_empty(self, spool_dir):
+        spool = FileSyncSpool(spool_dir)
+        assert spool.peek(10) == []
+        assert len(spool) == 0
+
+    def test_append_peek_pop(self, spool_dir):
+        spool = FileSyncSpool(spool_dir)
+        spool.append(entries(1, 2))
+        spool.append(entries(3))
+
+        assert [e.activity_id for e in spool.peek(2)] == [1, 2]
+        spool.pop(2)
+        assert [e.activity_id for e in spool.peek(10)] == [3]
+        assert len(spool) == 1
+
+    def test_survives_reopening(self, spool_dir, activity):
+        FileSyncSpool(spool_dir).append(
+            [SpooledSync(activity_id=activity.id, activity=activity)]
+        )
+        spool = FileSyncSpool(spool_dir)
+        spool.append(entries(2))
+        spool.pop(1)
+
+        [entry] = FileSyncSpool(spool_dir).peek(10)
+        assert entry.activity_id == 2
+
+    def test_spooled_activity_roundtrip(self, spool_dir, activity):
+        spool = FileSyncSpool(spool_dir)
+        spool.append([SpooledSync(activity_id=activity.id, activity=activity)])
+
+        [entry] = spool.peek(1)
+
+        assert entry.activity == activity
+
+    def test_drained_log_is_truncated(self, spool_dir):
+        spool = FileSyncSpool(spool_dir)
+        spool.append(entries(1, 2))
+
+        spool.pop(2)
+
+        assert os.path.getsize(os.path.join(spool_dir, "spool.log")) == 0
+        spool.append(entries(3))
+        assert [e.activity_id for e in spool.peek(10)] == [3]
+
+    def test_torn_record_is_cut_off(self, spool_dir):
+        FileSyncSpool(spool_dir).append(entries(1, 2))
+        log_path = os.path.join(spool_dir, "spool.log")
+        os.truncate(log_path, os.path.getsize(log_path) - 3)
+
+        spool = FileSyncSpool(spool_dir)
+        spool.append(entries(3))
+
+        assert [e.activity_id for e in spool.peek(10)] == [1, 3]
+
+    def test_dead_letters(self, spool_dir):
+        spool = FileSyncSpool(spool_dir)
+        spool.dead_letter([SpooledSync(activity_id=1, error="Activity 1 not found")])
+
+        assert len(spool) == 0
+        [entry] = FileSyncSpool(spool_dir).dead_letters()
+        assert entry.error == "Activity 1 not found"
+
+    def test_concurrent_appends(self, spool_dir):
+        spool = FileSyncSpool(spool_dir)
+        threads = [
+            threading.Thread(target=spool.append, args=(entries(i, i + 100),))
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ids = [e.activity_id for e in spool.peek(100)]
+        assert sorted(ids) == sorted([*range(20), *range(100, 120)])
+
+    def test_factory(self, spool_dir):
+        assert isinstance(make_sync_spool(spool_dir), FileSyncSpool)
@@ -0,0 +1,54 @@
+import fcntl
+import json
+
+import pytest
+
+from stravabqsync.adapters.local import make_file_token_cache
+from stravabqsync.adapters.local._token_cache import FileTokenCache
+from stravabqsync.domain import StravaTokenSet
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "tokens.json")
+
+
+@pytest.fixture
+def tokens():
+    return StravaTokenSet(
+        client_id=1,
+        client_secret="secret",
+        access_token="access",
+        refresh_token="refresh",
+        expires_at=1700000000,
+    )
+
+
+class TestFileTokenCache:
+    def test_load_missing(self, cache_path):
+        assert FileTokenCache(cache_path).load() is None
+
+    def test_roundtrip_without_client_secret(self, cache_path, tokens):
+        cache = FileTokenCache(cache_path)
+        cache.save(tokens)
+
+        with open(cache_path, "r", encoding="utf-8") as fin:
+            assert "client_secret" not in json.load(fin)
+        assert cache.load() == tokens._replace(client_secret="")
+
+    def test_load_corrupt_file(self, cache_path):
+        with open(cache_path, "w", encoding="utf-8") as fout:
+            fout.write("{ not json")
+        assert FileTokenCache(cache_path).load() is None
+
+    def test_lock_is_exclusive(self, cache_path):
+        cache = FileTokenCache(cache_path)
+        with cache.lock():
+            with open(f"{cache_path}.lock", "a", encoding="utf-8") as other:
+                with pytest.raises(BlockingIOError):
+                    fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with open(f"{cache_path}.lock", "a", encoding="utf-8") as other:
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def test_factory(self, cache_path):
+        assert isinstance(make_file_token_cache(cache_path), FileTokenCache)
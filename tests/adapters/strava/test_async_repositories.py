@@ -0,0 +1,97 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+# pylint: disable=wrong-import-position
+from stravabqsync.adapters.strava._async_repositories import (  # noqa: E402
+    AsyncStravaActivitiesRepo,
+)
+from stravabqsync.config import StravaApiConfig  # noqa: E402
+from stravabqsync.domain import StravaTokenSet  # noqa: E402
+from stravabqsync.exceptions import (  # noqa: E402
+    ActivityNotFoundError,
+    StravaApiError,
+    StravaTokenError,
+)
+
+ACTIVITY_ID = 12345678987654321
+
+
+@pytest.fixture
+def activity_json():
+    with open("tests/fixtures/activity_1.json", "r", encoding="utf-8") as fin:
+        return json.load(fin)
+
+
+def fetch(handler, call):
+    """Run `call(repo)` against a repo whose requests are answered by
+    `handler`"""
+    tokens = StravaTokenSet(
+        client_id=1, client_secret="foo", refresh_token="bar", access_token="baz"
+    )
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            repo = AsyncStravaActivitiesRepo(tokens, StravaApiConfig(), client)
+            return await call(repo)
+
+    return asyncio.run(main())
+
+
+class TestAsyncStravaActivitiesRepo:
+    def test_read_activity_by_id(self, activity_json):
+        def handler(request):
+            assert request.headers["Authorization"] == "Bearer baz"
+            assert request.url.path.endswith(f"/activities/{ACTIVITY_ID}")
+            return httpx.Response(200, json=activity_json)
+
+        activity = fetch(handler, lambda repo: repo.read_activity_by_id(ACTIVITY_ID))
+
+        assert activity.id == ACTIVITY_ID
+
+    def test_read_activity_summaries(self, activity_json):
+        def handler(request):
+            assert request.url.params["page"] == "2"
+            assert request.url.params["before"] == "100"
+            return httpx.Response(200, json=[activity_json])
+
+        summaries = fetch(
+            handler,
+            lambda repo: repo.read_activity_summaries(page=2, per_page=50, before=100),
+        )
+
+        assert [s.id for s in summaries] == [ACTIVITY_ID]
+
+    @pytest.mark.parametrize(
+        "status_code, error",
+        [(401, StravaTokenError), (404, ActivityNotFoundError), (400, StravaApiError)],
+    )
+    def test_client_errors_are_not_retried(self, status_code, error):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(status_code, text="nope")
+
+        with pytest.raises(error):
+            fetch(handler, lambda repo: repo.read_activity_by_id(ACTIVITY_ID))
+
+        assert len(requests) == 1
+
+    def test_server_errors_are_retried(self, activity_json):
+        responses = [httpx.Response(503), httpx.Response(200, json=activity_json)]
+
+        def handler(request):
+            return responses.pop(0)
+
+        with patch("asyncio.sleep", new_callable=AsyncMock):
+            activity = fetch(
+                handler, lambda repo: repo.read_activity_by_id(ACTIVITY_ID)
+            )
+
+        assert activity.id == ACTIVITY_ID
+        assert responses == []
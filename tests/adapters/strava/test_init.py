@@ -1,11 +1,24 @@
+import sys
+from unittest.mock import patch
+
 import pytest
 
-from stravabqsync.adapters.strava import make_read_activities, make_read_strava_token
+from stravabqsync.adapters.local._token_cache import FileTokenCache
+from stravabqsync.adapters.strava import (
+    make_async_strava_client,
+    make_read_activities,
+    make_read_strava_token,
+    make_strava_rate_budget,
+    make_strava_session,
+    make_token_cache,
+)
 from stravabqsync.adapters.strava._repositories import (
     StravaActivitiesRepo,
     StravaTokenRepo,
 )
+from stravabqsync.config import get_app_config
 from stravabqsync.domain import StravaTokenSet
+from stravabqsync.exceptions import ConfigurationError
 
 
 @pytest.fixture
@@ -28,13 +41,13 @@ class TestStravaAdapterFactories:
         assert isinstance(result, StravaActivitiesRepo)
 
     def test_make_read_strava_token_caching(self):
-        # Test that @lru_cache returns the same instance
+        # Test that the container returns the same instance
         first_call = make_read_strava_token()
         second_call = make_read_strava_token()
         assert first_call is second_call
 
     def test_make_read_activities_caching_same_tokens(self, sample_tokens):
-        # Test that @lru_cache returns same instance for same tokens
+        # Test that the container returns the same instance for the same tokens
         first_call = make_read_activities(sample_tokens)
         second_call = make_read_activities(sample_tokens)
         assert first_call is second_call
@@ -58,6 +71,14 @@ class TestStravaAdapterFactories:
         result2 = make_read_activities(tokens2)
         assert result1 is not result2
 
+    def test_make_read_activities_evicts_repos_for_old_tokens(self, sample_tokens):
+        first = make_read_activities(sample_tokens)
+        for token in ("second", "third"):
+            make_read_activities(sample_tokens._replace(access_token=token))
+
+        assert len(make_read_activities) == 2
+        assert make_read_activities(sample_tokens) is not first
+
     def test_make_read_strava_token_uses_app_config(self):
         # Test that factory uses app_config values
         repo = make_read_strava_token()
@@ -71,3 +92,54 @@ class TestStravaAdapterFactories:
         assert hasattr(repo, "_tokens")
         assert hasattr(repo, "_api_config")
         assert repo._tokens == sample_tokens
+
+    def test_repos_share_session_and_rate_budget(self, sample_tokens):
+        token_repo = make_read_strava_token()
+        activities_repo = make_read_activities(sample_tokens)
+
+        assert token_repo._session is activities_repo._session is make_strava_session()
+        assert (
+            token_repo._rate_budget
+            is activities_repo._rate_budget
+            is make_strava_rate_budget()
+        )
+
+    def test_repos_share_circuit_breakers_per_endpoint(self, sample_tokens):
+        token_repo = make_read_strava_token()
+        first = make_read_activities(sample_tokens)
+        second = make_read_activities(sample_tokens._replace(access_token="other"))
+
+        assert first._circuit_breaker is second._circuit_breaker
+        assert token_repo._circuit_breaker is not first._circuit_breaker
+        assert first._circuit_breaker.name == get_app_config().strava_api.api_base_url
+
+
+class TestMakeTokenCache:
+    def make(self, spec):
+        make_token_cache.reset()
+        try:
+            with patch(
+                "stravabqsync.adapters.strava.get_app_config",
+                return_value=get_app_config()._replace(token_cache=spec),
+            ):
+                return make_token_cache()
+        finally:
+            make_token_cache.reset()
+
+    def test_disabled_by_default(self):
+        assert self.make(None) is None
+
+    def test_file_cache(self, tmp_path):
+        assert isinstance(self.make(f"file:{tmp_path}/tokens.json"), FileTokenCache)
+
+    @pytest.mark.parametrize("spec", ["file:", "redis:tokens", "tokens.json"])
+    def test_invalid_spec(self, spec):
+        with pytest.raises(ConfigurationError):
+            self.make(spec)
+
+
+def test_make_async_strava_client_requires_httpx():
+    with patch.dict(sys.modules, {"httpx": None}):
+        sys.modules.pop("stravabqsync.adapters.strava._async_repositories", None)
+        with pytest.raises(ConfigurationError, match="httpx"):
+            make_async_strava_client()
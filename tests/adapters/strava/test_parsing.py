@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from stravabqsync.adapters.strava._parsing import _type_adapter, parse_json
+from stravabqsync.domain import StravaActivity, SummaryActivity
+from stravabqsync.exceptions import DataValidationError
+
+
+@pytest.fixture(params=["activity_1.json", "activity_2.json"])
+def activity_bytes(request):
+    with open(f"tests/fixtures/{request.param}", "rb") as fin:
+        return fin.read()
+
+
+class TestParseJson:
+    def test_matches_dict_validation(self, activity_bytes):
+        parsed = parse_json(activity_bytes, StravaActivity)
+        assert parsed == StravaActivity(**json.loads(activity_bytes))
+
+    def test_list_of_models(self, activity_bytes):
+        body = b"[" + activity_bytes + b"]"
+        parsed = parse_json(body, list[SummaryActivity])
+        assert [type(s) for s in parsed] == [SummaryActivity]
+
+    def test_validators_are_cached(self):
+        assert _type_adapter(StravaActivity) is _type_adapter(StravaActivity)
+
+    @pytest.mark.parametrize("body", [b"{not json", b"{}"])
+    def test_invalid_payload(self, body):
+        with pytest.raises(DataValidationError):
+            parse_json(body, StravaActivity)
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from stravabqsync.adapters.strava._rate_limit import (
+    RateLimitUsage,
+    StravaRateBudget,
+    parse_rate_limit_headers,
+)
+from stravabqsync.config import StravaApiConfig
+from stravabqsync.exceptions import StravaRateLimitError
+
+# 10 seconds into a 15-minute window, far from midnight UTC
+NOW = 1_700_000_000 - (1_700_000_000 % 900) + 10
+
+
+class FakeClock:
+    def __init__(self, now: float = NOW):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def response(status_code=200, limit="200,2000", usage="10,100", **extra):
+    resp = Mock()
+    resp.status_code = status_code
+    resp.ok = status_code < 400
+    resp.headers = {"X-RateLimit-Limit": limit, "X-RateLimit-Usage": usage, **extra}
+    return resp
+
+
+class TestParseRateLimitHeaders:
+    def test_parse(self):
+        headers = {"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "12,345"}
+        assert parse_rate_limit_headers(headers) == RateLimitUsage(200, 12, 2000, 345)
+
+    def test_missing_headers(self):
+        assert parse_rate_limit_headers({}) is None
+
+    def test_malformed_headers(self):
+        headers = {"X-RateLimit-Limit": "200", "X-RateLimit-Usage": "12,345"}
+        assert parse_rate_limit_headers(headers) is None
+
+    def test_tightest_of_overall_and_read_limits(self):
+        headers = {
+            "X-RateLimit-Limit": "200,2000",
+            "X-RateLimit-Usage": "100,500",
+            "X-ReadRateLimit-Limit": "100,1000",
+            "X-ReadRateLimit-Usage": "90,400",
+        }
+        assert parse_rate_limit_headers(headers) == RateLimitUsage(100, 90, 1000, 400)
+
+
+class TestStravaRateBudget:
+    def test_from_config(self):
+        budget = StravaRateBudget.from_config(StravaApiConfig())
+        assert budget.usage == RateLimitUsage(200, 0, 2000, 0)
+        assert budget.concurrency == 8
+
+    def test_request_counts_usage(self):
+        budget = StravaRateBudget(clock=FakeClock())
+        with budget.request():
+            pass
+        assert budget.usage == RateLimitUsage(200, 1, 2000, 1)
+
+    def test_update_from_headers(self):
+        budget = StravaRateBudget(clock=FakeClock())
+        budget.update(response(usage="150,1500"))
+        assert budget.usage == RateLimitUsage(200, 150, 2000, 1500)
+
+    def test_burst_then_paced(self):
+        budget = StravaRateBudget(burst=2, max_wait=0, clock=FakeClock())
+        budget.acquire()
+        budget.acquire()
+        with pytest.raises(StravaRateLimitError) as exc_info:
+            budget.acquire()
+        # 198 requests left over 890 seconds: one token every ~4.5 seconds
+        assert exc_info.value.retry_after == 5
+
+    def test_refill_over_time(self):
+        clock = FakeClock()
+        budget = StravaRateBudget(burst=1, max_wait=0, clock=clock)
+        budget.acquire()
+        clock.now += 5
+        budget.acquire()
+
+    def test_exhausted_window_waits_for_reset(self):
+        budget = StravaRateBudget(max_wait=60, clock=FakeClock())
+        budget.update(response(usage="200,300"))
+        with pytest.raises(StravaRateLimitError) as exc_info:
+            budget.acquire()
+        assert exc_info.value.retry_after == 890
+
+    def test_exhausted_daily_budget(self):
+        budget = StravaRateBudget(max_wait=60, clock=FakeClock())
+        budget.update(response(usage="10,2000"))
+        with pytest.raises(StravaRateLimitError) as exc_info:
+            budget.acquire()
+        assert exc_info.value.retry_after > 900
+
+    def test_window_rollover_resets_usage(self):
+        clock = FakeClock()
+        budget = StravaRateBudget(max_wait=0, clock=clock)
+        budget.update(response(usage="200,300"))
+        clock.now += 900
+        budget.acquire()
+        assert budget.usage.short_usage == 1
+
+    def test_slot_wait_is_bounded_by_max_wait(self):
+        budget = StravaRateBudget(max_concurrency=1, max_wait=0.05)
+        budget.acquire()
+
+        start = time.monotonic()
+        with pytest.raises(StravaRateLimitError, match="slot"):
+            budget.acquire()
+
+        assert 0.04 < time.monotonic() - start < 1
+        budget.release()
+        budget.acquire()
+
+    def test_rate_limited_response_halves_concurrency(self):
+        budget = StravaRateBudget(max_concurrency=8, clock=FakeClock())
+        budget.update(response(status_code=429, usage="10,100"))
+        assert budget.concurrency == 4
+        budget.update(response(status_code=429, usage="10,100"))
+        budget.update(response(status_code=429, usage="10,100"))
+        budget.update(response(status_code=429, usage="10,100"))
+        assert budget.concurrency == 1
+
+    def test_successful_response_grows_concurrency(self):
+        budget = StravaRateBudget(max_concurrency=8, clock=FakeClock())
+        budget.update(response(status_code=429, usage="10,100"))
+        budget.update(response(usage="10,100"))
+        assert budget.concurrency == 5
+
+    def test_concurrency_capped_by_remaining_budget(self):
+        budget = StravaRateBudget(max_concurrency=8, clock=FakeClock())
+        budget.update(response(usage="197,300"))
+        assert budget.concurrency == 3
+
+
+class TestStravaRateBudgetAsync:
+    def test_request_async_caps_in_flight(self):
+        budget = StravaRateBudget(max_concurrency=2, clock=FakeClock())
+        in_flight = peak = 0
+
+        async def call():
+            nonlocal in_flight, peak
+            async with budget.request_async():
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.01)
+                in_flight -= 1
+
+        async def main():
+            await asyncio.gather(*(call() for _ in range(6)))
+
+        asyncio.run(main())
+
+        assert peak == 2
+        assert budget.usage.short_usage == 6
+
+    def test_acquire_async_slot_wait_is_bounded_by_max_wait(self):
+        budget = StravaRateBudget(max_concurrency=1, max_wait=0.05)
+        budget.acquire()
+
+        with pytest.raises(StravaRateLimitError, match="slot"):
+            asyncio.run(budget.acquire_async())
+
+    def test_acquire_async_exhausted(self):
+        budget = StravaRateBudget(max_wait=60, clock=FakeClock())
+        budget.update(response(usage="200,300"))
+        with pytest.raises(StravaRateLimitError) as exc_info:
+            asyncio.run(budget.acquire_async())
+        assert exc_info.value.retry_after == 890
@@ -1,8 +1,11 @@
 import json
+import time
+from unittest.mock import Mock, patch
 
 import pytest
 from requests_mock import Mocker
 
+from stravabqsync.adapters.strava._rate_limit import StravaRateBudget
 from stravabqsync.adapters.strava._repositories import (
     StravaActivitiesRepo,
     StravaTokenRepo,
@@ -11,9 +14,14 @@ from stravabqsync.config import StravaApiConfig
 from stravabqsync.domain import StravaActivity, StravaTokenSet
 from stravabqsync.exceptions import (
     ActivityNotFoundError,
+    CircuitOpenError,
+    DataValidationError,
+    RetryLaterError,
     StravaApiError,
+    StravaRateLimitError,
     StravaTokenError,
 )
+from stravabqsync.ports.out.state import TokenCache
 
 
 @pytest.fixture
@@ -53,6 +61,23 @@ class TestStravaTokenRepo:
             expected = token_repo.refresh()
             assert expected.access_token == "baz"
 
+    def test_refresh_records_expires_at(self, token_repo):
+        with Mocker() as m:
+            m.post(
+                token_repo._api_config.token_url,
+                json={"access_token": "baz", "expires_at": 1700021600},
+            )
+            assert token_repo.refresh().expires_at == 1700021600
+
+    def test_refresh_expires_in_fallback(self, token_repo):
+        with Mocker() as m:
+            m.post(
+                token_repo._api_config.token_url,
+                json={"access_token": "baz", "expires_in": 21600},
+            )
+            with patch("time.time", return_value=1700000000):
+                assert token_repo.refresh().expires_at == 1700021600
+
     def test_failed_request(self, token_repo):
         with Mocker() as m:
             m.post(token_repo._api_config.token_url, status_code=401)
@@ -61,13 +86,15 @@ class TestStravaTokenRepo:
                 token_repo.refresh()
 
     def test_failed_request_non_401(self, token_repo):
-        with Mocker() as m:
+        with Mocker() as m, patch("time.sleep"):
             m.post(
                 token_repo._api_config.token_url, status_code=500, text="Server Error"
             )
 
-            with pytest.raises(StravaApiError):
+            with pytest.raises(StravaApiError) as exc_info:
                 token_repo.refresh()
+            assert m.call_count == token_repo._api_config.token_retry_attempts
+        assert exc_info.value.status_code == 500
 
 
 class TestStravaActivitiesRepo:
@@ -93,6 +120,36 @@ class TestStravaActivitiesRepo:
 
         assert isinstance(resp, StravaActivity)
 
+    def test_warm_up_opens_unauthenticated_connection(self, activities_repo):
+        with Mocker() as m:
+            m.head(activities_repo._api_config.api_base_url, status_code=401)
+            activities_repo.warm_up()
+            request = m.last_request
+
+        assert "Authorization" not in request.headers
+
+    def test_read_raw_activity_by_id(self, activities_repo, activity_json):
+        activity_id = 12345678987654321
+        body = json.dumps(activity_json).encode()
+        with Mocker() as m:
+            endpoint = (
+                f"{activities_repo._api_config.api_base_url}/activities/{activity_id}"
+            )
+            m.get(endpoint, content=body)
+            resp = activities_repo.read_raw_activity_by_id(activity_id)
+
+        assert resp == body
+
+    def test_read_activity_invalid_payload(self, activities_repo, activity_json):
+        activity_id = 12345678987654321
+        with Mocker() as m:
+            endpoint = (
+                f"{activities_repo._api_config.api_base_url}/activities/{activity_id}"
+            )
+            m.get(endpoint, json={**activity_json, "start_date": "yesterday"})
+            with pytest.raises(DataValidationError):
+                activities_repo.read_activity_by_id(activity_id)
+
     def test_read_activity_not_found(self, activities_repo, activity_json):
         activity_id = -10
         with Mocker() as m:
@@ -120,5 +177,225 @@ class TestStravaActivitiesRepo:
                 f"{activities_repo._api_config.api_base_url}/activities/{activity_id}"
             )
             m.get(endpoint, status_code=500, text="Server Error")
-            with pytest.raises(StravaApiError):
+            with patch("time.sleep"), pytest.raises(StravaApiError) as exc_info:
                 _ = activities_repo.read_activity_by_id(activity_id)
+            assert m.call_count == activities_repo._api_config.activity_retry_attempts
+        assert exc_info.value.status_code == 500
+
+    def test_read_activity_server_error_is_retried(
+        self, activities_repo, activity_json
+    ):
+        with Mocker() as m, patch("time.sleep"):
+            m.get(
+                f"{activities_repo._api_config.api_base_url}/activities/1",
+                [{"status_code": 503}, {"json": activity_json}],
+            )
+            assert activities_repo.read_activity_by_id(1).id == activity_json["id"]
+
+    def test_open_circuit_fails_fast(self, tokenset):
+        api_config = StravaApiConfig(
+            activity_retry_attempts=1, circuit_failure_threshold=2
+        )
+        repo = StravaActivitiesRepo(tokenset._replace(access_token="baz"), api_config)
+        with Mocker() as m:
+            m.get(f"{api_config.api_base_url}/activities/1", status_code=503)
+            for _ in range(2):
+                with pytest.raises(StravaApiError):
+                    repo.read_activity_by_id(1)
+            with pytest.raises(CircuitOpenError):
+                repo.read_activity_by_id(1)
+            assert m.call_count == 2
+
+    def test_read_activity_summaries(self, activities_repo, activity_json):
+        summaries = [activity_json, {**activity_json, "id": 1}]
+        with Mocker() as m:
+            endpoint = f"{activities_repo._api_config.api_base_url}/athlete/activities"
+            m.get(endpoint, json=summaries)
+            resp = activities_repo.read_activity_summaries(
+                page=2, per_page=50, before=1700000000
+            )
+            query = m.last_request.qs
+
+        assert [summary.id for summary in resp] == [12345678987654321, 1]
+        assert query == {"page": ["2"], "per_page": ["50"], "before": ["1700000000"]}
+
+    def test_read_activity_summaries_token_expired(self, activities_repo):
+        with Mocker() as m:
+            endpoint = f"{activities_repo._api_config.api_base_url}/athlete/activities"
+            m.get(endpoint, status_code=401)
+            with pytest.raises(StravaTokenError):
+                activities_repo.read_activity_summaries(page=1, per_page=50)
+
+    def test_read_activity_updates_rate_budget(self, activities_repo, activity_json):
+        activity_id = 12345678987654321
+        with Mocker() as m:
+            endpoint = (
+                f"{activities_repo._api_config.api_base_url}/activities/{activity_id}"
+            )
+            m.get(
+                endpoint,
+                json=activity_json,
+                headers={
+                    "X-RateLimit-Limit": "200,2000",
+                    "X-RateLimit-Usage": "42,420",
+                },
+            )
+            activities_repo.read_activity_by_id(activity_id)
+
+        assert activities_repo._rate_budget.usage.short_usage == 42
+        assert activities_repo._rate_budget.usage.daily_usage == 420
+
+    def test_read_activity_rate_limited_is_retried(
+        self, activities_repo, activity_json
+    ):
+        activity_id = 12345678987654321
+        with Mocker() as m, patch("time.sleep") as mock_sleep:
+            endpoint = (
+                f"{activities_repo._api_config.api_base_url}/activities/{activity_id}"
+            )
+            m.get(
+                endpoint,
+                [
+                    {"status_code": 429, "headers": {"Retry-After": "3"}},
+                    {"json": activity_json},
+                ],
+            )
+            resp = activities_repo.read_activity_by_id(activity_id)
+
+        assert resp.id == activity_id
+        mock_sleep.assert_called_once_with(3)
+
+    def test_read_activity_rate_limited_is_deferred(self, tokenset, activity_json):
+        repo = StravaActivitiesRepo(
+            tokenset._replace(access_token="baz"),
+            StravaApiConfig(defer_rate_limits=True),
+        )
+        with Mocker() as m, patch("time.sleep") as mock_sleep:
+            m.get(
+                f"{repo._api_config.api_base_url}/activities/1",
+                [
+                    {"status_code": 429, "headers": {"Retry-After": "120"}},
+                    {"json": activity_json},
+                ],
+            )
+            with pytest.raises(RetryLaterError) as exc_info:
+                repo.read_activity_by_id(1)
+            assert m.call_count == 1
+
+        mock_sleep.assert_not_called()
+        assert exc_info.value.retry_after in (119, 120)
+
+    def test_read_activity_rate_budget_exhausted(self, tokenset, api_config):
+        budget = StravaRateBudget(max_wait=0)
+        budget.update(
+            Mock(
+                status_code=200,
+                ok=True,
+                headers={
+                    "X-RateLimit-Limit": "200,2000",
+                    "X-RateLimit-Usage": "200,420",
+                },
+            )
+        )
+        repo = StravaActivitiesRepo(
+            tokenset._replace(access_token="baz"), api_config, budget
+        )
+        with Mocker() as m:
+            with pytest.raises(StravaRateLimitError):
+                repo.read_activity_by_id(1)
+            assert not m.called
+
+
+class InMemoryTokenCache(TokenCache):
+    def __init__(self, tokens: StravaTokenSet | None = None):
+        self.tokens = tokens
+        self.saved: list[StravaTokenSet] = []
+
+    def load(self) -> StravaTokenSet | None:
+        return self.tokens
+
+    def save(self, tokens: StravaTokenSet) -> None:
+        self.tokens = tokens._replace(client_secret="")
+        self.saved.append(tokens)
+
+
+class TestStravaTokenRepoCache:
+    def cached(self, tokenset, expires_at):
+        return tokenset._replace(
+            client_secret="",
+            access_token="cached",
+            refresh_token="rotated",
+            expires_at=expires_at,
+        )
+
+    def test_fresh_cached_token_skips_refresh(self, tokenset, api_config):
+        cache = InMemoryTokenCache(self.cached(tokenset, int(time.time()) + 3600))
+        repo = StravaTokenRepo(tokenset, api_config, token_cache=cache)
+
+        with Mocker() as m:
+            tokens = repo.refresh()
+            assert not m.called
+
+        assert tokens.access_token == "cached"
+        assert tokens.client_secret == "foo"
+
+    def test_expired_cached_token_refreshes_with_cached_refresh_token(
+        self, tokenset, api_config
+    ):
+        cache = InMemoryTokenCache(self.cached(tokenset, int(time.time()) + 60))
+        repo = StravaTokenRepo(tokenset, api_config, token_cache=cache)
+
+        with Mocker() as m:
+            m.post(
+                api_config.token_url,
+                json={
+                    "access_token": "new",
+                    "refresh_token": "rotated-again",
+                    "expires_at": int(time.time()) + 21600,
+                },
+            )
+            tokens = repo.refresh()
+            sent = m.last_request.text
+
+        assert "refresh_token=rotated&" in sent
+        assert tokens.access_token == "new"
+        assert tokens.refresh_token == "rotated-again"
+        assert cache.saved == [tokens]
+
+    def test_force_bypasses_fresh_cache(self, tokenset, api_config):
+        cache = InMemoryTokenCache(self.cached(tokenset, int(time.time()) + 3600))
+        repo = StravaTokenRepo(tokenset, api_config, token_cache=cache)
+
+        with Mocker() as m:
+            m.post(api_config.token_url, json={"access_token": "forced"})
+            tokens = repo.refresh(force=True)
+
+        assert tokens.access_token == "forced"
+        assert tokens.refresh_token == "rotated"
+
+    def test_cache_for_other_client_is_ignored(self, tokenset, api_config):
+        other = self.cached(tokenset, int(time.time()) + 3600)._replace(client_id=2)
+        repo = StravaTokenRepo(
+            tokenset, api_config, token_cache=InMemoryTokenCache(other)
+        )
+
+        with Mocker() as m:
+            m.post(api_config.token_url, json={"access_token": "new"})
+            tokens = repo.refresh()
+            sent = m.last_request.text
+
+        assert tokens.access_token == "new"
+        assert "refresh_token=bar&" in sent
+
+    def test_rotated_refresh_token_used_without_cache(self, token_repo):
+        with Mocker() as m:
+            m.post(
+                token_repo._api_config.token_url,
+                json={"access_token": "a", "refresh_token": "rotated"},
+            )
+            first = token_repo.refresh()
+            token_repo.refresh()
+            sent = m.last_request.text
+
+        assert first.refresh_token == "rotated"
+        assert "refresh_token=rotated&" in sent
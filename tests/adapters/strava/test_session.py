@@ -0,0 +1,52 @@
+import requests
+from requests_mock import Mocker
+
+from stravabqsync.adapters.strava._session import make_session, warm_up_session
+from stravabqsync.config import StravaApiConfig
+
+
+class TestMakeSession:
+    def test_pool_settings(self):
+        session = make_session(
+            StravaApiConfig(pool_connections=3, pool_maxsize=7, pool_block=False)
+        )
+        adapter = session.get_adapter("https://www.strava.com/api/v3")
+
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 7
+        assert adapter._pool_block is False
+
+    def test_same_adapter_for_all_strava_urls(self):
+        session = make_session(StravaApiConfig())
+        config = StravaApiConfig()
+
+        assert session.get_adapter(config.token_url) is session.get_adapter(
+            config.api_base_url
+        )
+
+    def test_keep_alive_default(self):
+        session = make_session(StravaApiConfig())
+        assert session.headers.get("Connection") != "close"
+
+    def test_keep_alive_disabled(self):
+        session = make_session(StravaApiConfig(keep_alive=False))
+        assert session.headers["Connection"] == "close"
+
+
+class TestWarmUpSession:
+    def test_head_request_to_url(self):
+        session = make_session(StravaApiConfig())
+        with Mocker() as m:
+            m.head("https://www.strava.com/api/v3", status_code=401)
+            warm_up_session(session, "https://www.strava.com/api/v3", timeout=1)
+
+            assert m.call_count == 1
+
+    def test_failures_are_ignored(self):
+        session = make_session(StravaApiConfig())
+        with Mocker() as m:
+            m.head(
+                "https://www.strava.com/api/v3",
+                exc=requests.exceptions.ConnectTimeout,
+            )
+            warm_up_session(session, "https://www.strava.com/api/v3", timeout=1)
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import threading
+
+from stravabqsync.adapters._threaded import (
+    ThreadedReadStravaToken,
+    ThreadedWriteActivities,
+)
+from stravabqsync.domain import StravaActivity
+from tests.mocks.read_token_repo import MockCountingTokenRepo
+from tests.mocks.write_activities import MockWriteActivitesRepo
+
+
+class ThreadRecordingWriteRepo(MockWriteActivitesRepo):
+    def __init__(self):
+        super().__init__()
+        self.threads: set[int] = set()
+
+    def write_activities(self, activities: list[StravaActivity], **options) -> None:
+        self.threads.add(threading.get_ident())
+        super().write_activities(activities, **options)
+
+
+def test_threaded_read_strava_token():
+    repo = MockCountingTokenRepo()
+    tokens = asyncio.run(ThreadedReadStravaToken(repo).refresh(force=True))
+    assert tokens.access_token == "token-1"
+
+
+def test_threaded_write_activities_off_event_loop():
+    with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+        activity = StravaActivity(**json.load(fin))
+    repo = ThreadRecordingWriteRepo()
+    writer = ThreadedWriteActivities(repo)
+
+    async def main():
+        await writer.write_activities([activity])
+        await writer.flush()
+
+    asyncio.run(main())
+
+    assert repo.batches == [[activity]]
+    assert repo.flushes == 1
+    assert threading.get_ident() not in repo.threads
+
+
+def test_threaded_write_activities_defers_like_its_writer():
+    assert ThreadedWriteActivities(MockWriteActivitesRepo(deferred=True)).deferred
+    assert not ThreadedWriteActivities(MockWriteActivitesRepo()).deferred
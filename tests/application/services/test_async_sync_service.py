@@ -0,0 +1,236 @@
+import asyncio
+import json
+
+import pytest
+
+from stravabqsync.application.services._async_sync_service import AsyncSyncService
+from stravabqsync.domain import StravaActivity, StravaTokenSet
+from stravabqsync.exceptions import (
+    ActivityNotFoundError,
+    BigQueryError,
+    PartialWriteError,
+    StravaTokenError,
+)
+from stravabqsync.fingerprint import FingerprintCache
+from tests.mocks.read_activities_repo import MockAsyncReadActivitiesByIdRepo
+from tests.mocks.read_token_repo import MockAsyncCountingTokenRepo
+from tests.mocks.write_activities import MockAsyncWriteActivitiesRepo
+
+
+@pytest.fixture
+def activity():
+    with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+def make_service(read_repo, write_repo, token_repo=None, **options):
+    return AsyncSyncService(
+        read_strava_token=token_repo or MockAsyncCountingTokenRepo(),
+        read_activities=lambda tokens: read_repo,
+        write_activities=write_repo,
+        **options,
+    )
+
+
+class TestAsyncSyncServiceRun:
+    def test_run_writes_activity(self, activity):
+        write_repo = MockAsyncWriteActivitiesRepo()
+        service = make_service(MockAsyncReadActivitiesByIdRepo(activity), write_repo)
+
+        asyncio.run(service.run(42))
+
+        assert write_repo.repo.activity.id == 42
+
+    def test_concurrent_runs_share_one_fetch(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity, delay=0.05)
+        service = make_service(read_repo, MockAsyncWriteActivitiesRepo())
+
+        async def main():
+            await asyncio.gather(*(service.run(42) for _ in range(10)))
+            await service.run(42)
+
+        asyncio.run(main())
+
+        assert read_repo.requested_ids == [42, 42]
+
+    def test_run_raises_fetch_errors(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity, missing_ids={42})
+        service = make_service(read_repo, MockAsyncWriteActivitiesRepo())
+
+        with pytest.raises(ActivityNotFoundError):
+            asyncio.run(service.run(42))
+
+    def test_unchanged_activity_is_not_written_again(self, activity):
+        write_repo = MockAsyncWriteActivitiesRepo()
+        service = make_service(
+            MockAsyncReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(10),
+        )
+
+        async def main():
+            await service.run(5)
+            write_repo.repo.activity = None
+            await service.run(5)
+
+        asyncio.run(main())
+
+        assert write_repo.repo.activity is None
+
+
+class TestAsyncSyncServiceRunMany:
+    def test_run_many_fetches_concurrently(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity, delay=0.05)
+        write_repo = MockAsyncWriteActivitiesRepo()
+        service = make_service(read_repo, write_repo, max_in_flight=50)
+
+        results = asyncio.run(service.run_many(range(200)))
+
+        assert all(r.ok for r in results)
+        assert read_repo.max_in_flight == 50
+        assert len(write_repo.repo.batches) == 1
+        assert len(write_repo.repo.batches[0]) == 200
+
+    def test_run_many_per_id_fetch_failures(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity, missing_ids={2})
+        write_repo = MockAsyncWriteActivitiesRepo()
+        service = make_service(read_repo, write_repo)
+
+        results = asyncio.run(service.run_many([1, 2, 3, 1]))
+
+        assert [(r.activity_id, r.ok) for r in results] == [
+            (1, True),
+            (2, False),
+            (3, True),
+        ]
+        assert isinstance(results[1].error, ActivityNotFoundError)
+        assert [a.id for a in write_repo.repo.batches[0]] == [1, 3]
+
+    def test_run_many_write_failure_marks_fetched_ids(self, activity):
+        service = make_service(
+            MockAsyncReadActivitiesByIdRepo(activity, missing_ids={2}),
+            MockAsyncWriteActivitiesRepo(fail=True),
+        )
+
+        results = asyncio.run(service.run_many([1, 2, 3]))
+
+        assert not any(r.ok for r in results)
+        assert isinstance(results[0].error, BigQueryError)
+        assert isinstance(results[1].error, ActivityNotFoundError)
+
+    def test_run_many_partial_write_failure_marks_failed_ids(self, activity):
+        service = make_service(
+            MockAsyncReadActivitiesByIdRepo(activity),
+            MockAsyncWriteActivitiesRepo(failed_ids=(2,)),
+        )
+
+        results = asyncio.run(service.run_many([1, 2, 3]))
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, PartialWriteError)
+
+    def test_run_many_empty(self, activity):
+        service = make_service(
+            MockAsyncReadActivitiesByIdRepo(activity), MockAsyncWriteActivitiesRepo()
+        )
+
+        assert asyncio.run(service.run_many([])) == []
+
+
+class MockAsyncRejectingReadActivitiesRepo(MockAsyncReadActivitiesByIdRepo):
+    """Reject every access token except `valid_token` with a 401"""
+
+    def __init__(self, activity, tokens: StravaTokenSet, valid_token: str):
+        super().__init__(activity)
+        self.tokens = tokens
+        self.valid_token = valid_token
+
+    async def read_activity_by_id(self, activity_id: int) -> StravaActivity:
+        if self.tokens.access_token != self.valid_token:
+            raise StravaTokenError("Access token expired", 401, activity_id)
+        return await super().read_activity_by_id(activity_id)
+
+
+class TestAsyncSyncServiceTokens:
+    def test_rejected_token_is_refreshed_and_retried(self, activity):
+        token_repo = MockAsyncCountingTokenRepo()
+        write_repo = MockAsyncWriteActivitiesRepo()
+        service = AsyncSyncService(
+            read_strava_token=token_repo,
+            read_activities=lambda tokens: MockAsyncRejectingReadActivitiesRepo(
+                activity, tokens, valid_token="token-2"
+            ),
+            write_activities=write_repo,
+        )
+
+        asyncio.run(service.run(42))
+
+        assert write_repo.repo.activity.id == 42
+        assert token_repo.refresh_count == 2
+
+    def test_concurrent_rejections_share_one_refresh(self, activity):
+        token_repo = MockAsyncCountingTokenRepo(delay=0.05)
+        service = AsyncSyncService(
+            read_strava_token=token_repo,
+            read_activities=lambda tokens: MockAsyncRejectingReadActivitiesRepo(
+                activity, tokens, valid_token="token-2"
+            ),
+            write_activities=MockAsyncWriteActivitiesRepo(),
+        )
+
+        results = asyncio.run(service.run_many(range(20)))
+
+        assert all(r.ok for r in results)
+        assert token_repo.refresh_count == 2
+
+
+class TestAsyncSyncServiceWarmUp:
+    def test_deferred_writes_remembered_once_flushed(self, activity):
+        fingerprints = FingerprintCache(10)
+        service = make_service(
+            MockAsyncReadActivitiesByIdRepo(activity),
+            MockAsyncWriteActivitiesRepo(deferred=True, flush_failed_ids=(6,)),
+            fingerprints=fingerprints,
+        )
+
+        async def main():
+            await service.run_many([5, 6])
+            assert len(fingerprints) == 0
+            with pytest.raises(PartialWriteError):
+                await service.flush()
+
+        asyncio.run(main())
+
+        assert fingerprints.get(5) is not None
+        assert fingerprints.get(6) is None
+
+    def test_warm_up_reader_writer_and_fingerprints(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity)
+        write_repo = MockAsyncWriteActivitiesRepo()
+        loads = []
+
+        def load(limit):
+            loads.append(limit)
+            return {}
+
+        service = make_service(
+            read_repo, write_repo, fingerprints=FingerprintCache(10, load=load)
+        )
+
+        asyncio.run(service.warm_up())
+
+        assert read_repo.warm_ups == 1
+        assert write_repo.repo.warm_ups == 1
+        assert loads == [10]
+
+    def test_warm_up_failures_are_ignored(self, activity):
+        def fail(limit):
+            raise BigQueryError("unavailable")
+
+        service = make_service(
+            MockAsyncReadActivitiesByIdRepo(activity),
+            MockAsyncWriteActivitiesRepo(),
+            fingerprints=FingerprintCache(10, load=fail),
+        )
+
+        asyncio.run(service.warm_up())
@@ -0,0 +1,221 @@
+import asyncio
+import json
+
+import pytest
+
+from stravabqsync.adapters.gcp._buffer import BufferedWriteActivities
+from stravabqsync.application.services._async_sync_service import AsyncSyncService
+from stravabqsync.application.services._backfill_service import (
+    AsyncBackfillService,
+    BackfillService,
+)
+from stravabqsync.application.services._sync_service import SyncService
+from stravabqsync.domain import BackfillCheckpoint, StravaActivity, StravaTokenSet
+from stravabqsync.exceptions import BigQueryError
+from tests.mocks.checkpoints import MockBackfillCheckpoints
+from tests.mocks.read_activities_repo import (
+    MockAsyncReadActivitiesByIdRepo,
+    MockReadActivitiesByIdRepo,
+)
+from tests.mocks.read_token_repo import MockAsyncCountingTokenRepo, MockStravaTokenRepo
+from tests.mocks.write_activities import (
+    MockAsyncWriteActivitiesRepo,
+    MockWriteActivitesRepo,
+)
+
+
+@pytest.fixture
+def activity():
+    with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+def make_service(read_repo, write_repo, checkpoints, per_page=2):
+    tokens = StravaTokenSet(
+        client_id=1, client_secret="foo", refresh_token="bar", access_token="baz"
+    )
+    sync_service = SyncService(
+        read_strava_token=lambda: MockStravaTokenRepo(tokens),
+        read_activities=lambda tokens: read_repo,
+        write_activities=lambda: write_repo,
+    )
+    return BackfillService(sync_service, checkpoints, per_page=per_page)
+
+
+class TestBackfillService:
+    def test_iter_pages_stops_on_empty_page(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[1, 2, 3])
+        service = make_service(
+            read_repo, MockWriteActivitesRepo(), MockBackfillCheckpoints()
+        )
+
+        pages = [
+            (page, [s.id for s in summaries])
+            for page, summaries in service.iter_pages(before=100)
+        ]
+
+        assert pages == [(1, [1, 2]), (2, [3])]
+        assert read_repo.requested_pages == [1, 2, 3]
+
+    def test_run_writes_one_batch_per_page_and_checkpoints(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        write_repo = MockWriteActivitesRepo()
+        checkpoints = MockBackfillCheckpoints()
+        service = make_service(read_repo, write_repo, checkpoints)
+
+        result = service.run(before=100)
+
+        assert [[a.id for a in batch] for batch in write_repo.batches] == [
+            [5, 4],
+            [3],
+        ]
+        assert [c.page for c in checkpoints.saved] == [1, 2]
+        assert result == BackfillCheckpoint(
+            before=100, page=2, activity_id=3, synced=3, failed_ids=()
+        )
+
+    def test_run_records_failed_ids(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(
+            activity, missing_ids={4}, summary_ids=[5, 4, 3]
+        )
+        service = make_service(
+            read_repo, MockWriteActivitesRepo(), MockBackfillCheckpoints()
+        )
+
+        result = service.run(before=100)
+
+        assert result.synced == 2
+        assert result.failed_ids == (4,)
+
+    def test_run_resumes_after_checkpoint(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        write_repo = MockWriteActivitesRepo()
+        checkpoints = MockBackfillCheckpoints(
+            BackfillCheckpoint(before=100, page=1, activity_id=4, synced=2)
+        )
+        service = make_service(read_repo, write_repo, checkpoints)
+
+        result = service.run(before=999)
+
+        assert read_repo.requested_pages == [2, 3]
+        assert sorted(read_repo.requested_ids) == [3]
+        assert result.before == 100
+        assert result.synced == 3
+
+    def test_run_restart_ignores_checkpoint(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5])
+        checkpoints = MockBackfillCheckpoints(
+            BackfillCheckpoint(before=100, page=7, activity_id=4, synced=2)
+        )
+        service = make_service(read_repo, MockWriteActivitesRepo(), checkpoints)
+
+        result = service.run(restart=True, before=200)
+
+        assert read_repo.requested_pages[0] == 1
+        assert result == BackfillCheckpoint(before=200, page=1, activity_id=5, synced=1)
+
+    def test_run_reports_progress(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        service = make_service(
+            read_repo, MockWriteActivitesRepo(), MockBackfillCheckpoints()
+        )
+        progress: list[int] = []
+
+        service.run(before=100, on_progress=progress.append)
+
+        assert progress == [2, 1]
+
+    def test_run_flushes_before_each_checkpoint(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        write_repo = MockWriteActivitesRepo()
+        service = make_service(read_repo, write_repo, MockBackfillCheckpoints())
+
+        service.run(before=100)
+
+        assert write_repo.flushes == 2
+
+    def test_run_failed_flush_keeps_previous_checkpoint(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        checkpoints = MockBackfillCheckpoints()
+        service = make_service(
+            read_repo, MockWriteActivitesRepo(fail_flush=True), checkpoints
+        )
+
+        with pytest.raises(BigQueryError):
+            service.run(before=100)
+
+        assert checkpoints.saved == []
+
+    def test_run_records_rows_rejected_on_flush(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        buffer = BufferedWriteActivities(
+            MockWriteActivitesRepo(failed_ids=(4,)), blocking=False
+        )
+        checkpoints = MockBackfillCheckpoints()
+        service = make_service(read_repo, buffer, checkpoints)
+
+        result = service.run(before=100)
+
+        assert result.failed_ids == (4,)
+        assert result.synced == 2
+        assert [c.page for c in checkpoints.saved] == [1, 2]
+
+
+def make_async_service(read_repo, write_repo, checkpoints, per_page=2):
+    sync_service = AsyncSyncService(
+        read_strava_token=MockAsyncCountingTokenRepo(),
+        read_activities=lambda tokens: read_repo,
+        write_activities=write_repo,
+    )
+    return AsyncBackfillService(sync_service, checkpoints, per_page=per_page)
+
+
+class TestAsyncBackfillService:
+    def test_run_writes_one_batch_per_page_and_checkpoints(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        write_repo = MockAsyncWriteActivitiesRepo()
+        checkpoints = MockBackfillCheckpoints()
+        service = make_async_service(read_repo, write_repo, checkpoints)
+
+        result = asyncio.run(service.run(before=100))
+
+        assert [[a.id for a in batch] for batch in write_repo.repo.batches] == [
+            [5, 4],
+            [3],
+        ]
+        assert read_repo.requested_pages == [1, 2, 3]
+        assert [c.page for c in checkpoints.saved] == [1, 2]
+        assert write_repo.repo.flushes == 2
+        assert result == BackfillCheckpoint(
+            before=100, page=2, activity_id=3, synced=3, failed_ids=()
+        )
+
+    def test_run_resumes_after_checkpoint(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(
+            activity, missing_ids={3}, summary_ids=[5, 4, 3]
+        )
+        checkpoints = MockBackfillCheckpoints(
+            BackfillCheckpoint(before=100, page=1, activity_id=4, synced=2)
+        )
+        service = make_async_service(
+            read_repo, MockAsyncWriteActivitiesRepo(), checkpoints
+        )
+
+        result = asyncio.run(service.run(before=999))
+
+        assert read_repo.requested_pages == [2, 3]
+        assert result.before == 100
+        assert result.synced == 2
+        assert result.failed_ids == (3,)
+
+    def test_run_failed_flush_keeps_previous_checkpoint(self, activity):
+        read_repo = MockAsyncReadActivitiesByIdRepo(activity, summary_ids=[5, 4, 3])
+        checkpoints = MockBackfillCheckpoints()
+        service = make_async_service(
+            read_repo, MockAsyncWriteActivitiesRepo(fail_flush=True), checkpoints
+        )
+
+        with pytest.raises(BigQueryError):
+            asyncio.run(service.run(before=100))
+
+        assert checkpoints.saved == []
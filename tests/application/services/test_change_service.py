@@ -0,0 +1,61 @@
+import pytest
+
+from stravabqsync.application.services._change_service import ChangeLogService
+from stravabqsync.domain import WebhookRequest
+from tests.mocks.write_changes import MockWriteChangesRepo
+
+
+def webhook(**overrides) -> WebhookRequest:
+    fields = {
+        "aspect_type": "update",
+        "event_time": 1700000000,
+        "object_id": 42,
+        "object_type": "activity",
+        "owner_id": 1,
+        "subscription_id": 2,
+        "updates": {"title": "Evening Run"},
+    }
+    fields.update(overrides)
+    return WebhookRequest(**fields)
+
+
+@pytest.fixture
+def writer():
+    return MockWriteChangesRepo()
+
+
+@pytest.fixture
+def service(writer):
+    return ChangeLogService(write_changes=lambda: writer)
+
+
+class TestChangeLogService:
+    def test_logs_update(self, service, writer):
+        service.run(webhook())
+
+        [[change]] = writer.batches
+        assert change.id == 42
+        assert change.title == "Evening Run"
+        assert change.was_deleted is False
+
+    def test_logs_delete(self, service, writer):
+        service.run(webhook(aspect_type="delete", updates={}))
+
+        [[change]] = writer.batches
+        assert change.was_deleted is True
+
+    @pytest.mark.parametrize(
+        "overrides",
+        [
+            {"aspect_type": "create"},
+            {"object_type": "athlete", "updates": {"authorized": "false"}},
+        ],
+    )
+    def test_rejects_other_events(self, service, writer, overrides):
+        with pytest.raises(ValueError):
+            service.run(webhook(**overrides))
+        assert writer.batches == []
+
+    def test_flush_delegates(self, service, writer):
+        service.flush()
+        assert writer.flushes == 1
@@ -1,15 +1,27 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
-from stravabqsync.application.services import make_sync_service
+from stravabqsync.application.services import (
+    _make_fingerprint_cache,
+    make_sync_service,
+    replay_in_background,
+    warm_up_in_background,
+)
 from stravabqsync.application.services._sync_service import SyncService
+from stravabqsync.config import get_app_config
+from stravabqsync.exceptions import StravaTokenError
+from stravabqsync.fingerprint import FingerprintCache
 
 
 class TestApplicationServicesFactories:
     @patch("stravabqsync.adapters.gcp._clients.Client")
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_make_sync_service_returns_correct_type(self, mock_post, mock_client):
         # Mock successful token refresh response
         mock_post.return_value.ok = True
+        mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"access_token": "test_token"}
 
         # This test covers line 10: SyncService instantiation
@@ -17,25 +29,27 @@ class TestApplicationServicesFactories:
         assert isinstance(result, SyncService)
 
     @patch("stravabqsync.adapters.gcp._clients.Client")
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_make_sync_service_has_required_dependencies(self, mock_post, mock_client):
         # Mock successful token refresh response
         mock_post.return_value.ok = True
+        mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"access_token": "test_token"}
 
         # Test that factory injects all required dependencies
         service = make_sync_service()
-        assert hasattr(service, "_tokens")
-        assert hasattr(service, "_read_activities")
+        assert hasattr(service, "_token_manager")
+        assert hasattr(service, "_make_read_activities")
         assert hasattr(service, "_write_activities")
 
     @patch("stravabqsync.adapters.gcp._clients.Client")
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_make_sync_service_multiple_calls_same_instance(
         self, mock_post, mock_client
     ):
         # Mock successful token refresh response
         mock_post.return_value.ok = True
+        mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = {"access_token": "test_token"}
 
         # Test that multiple calls return the same instance (if cached)
@@ -45,3 +59,88 @@ class TestApplicationServicesFactories:
         # Both should be valid SyncService instances
         assert isinstance(first_call, SyncService)
         assert isinstance(second_call, SyncService)
+
+
+class TestSyncServiceSingleton:
+    def setup_method(self):
+        make_sync_service.reset()
+
+    def teardown_method(self):
+        make_sync_service.reset()
+
+    def test_concurrent_first_calls_build_one_service(self):
+        def slow_service(**kwargs):
+            time.sleep(0.05)
+            return object()
+
+        with patch(
+            "stravabqsync.application.services.SyncService", side_effect=slow_service
+        ) as mock_service:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                services = list(pool.map(lambda _: make_sync_service(), range(4)))
+
+        assert mock_service.call_count == 1
+        assert all(service is services[0] for service in services)
+
+    def test_warm_up_in_background(self):
+        with patch(
+            "stravabqsync.application.services.make_sync_service"
+        ) as mock_make_sync_service:
+            warm_up_in_background().join(timeout=2)
+
+        mock_make_sync_service.return_value.warm_up.assert_called_once_with()
+
+    def test_warm_up_in_background_failure_is_logged(self, caplog):
+        with patch(
+            "stravabqsync.application.services.make_sync_service",
+            side_effect=StravaTokenError("Failed to refresh token"),
+        ):
+            warm_up_in_background().join(timeout=2)
+
+        assert "Background warm-up failed" in caplog.text
+
+    def test_replay_in_background(self):
+        with patch(
+            "stravabqsync.application.services.make_sync_service"
+        ) as mock_make_sync_service:
+            replay_in_background().join(timeout=2)
+
+        mock_make_sync_service.return_value.replay.assert_called_once_with()
+
+    def test_replay_in_background_runs_one_replay_at_a_time(self):
+        release = threading.Event()
+        with patch(
+            "stravabqsync.application.services.make_sync_service"
+        ) as mock_make_sync_service:
+            mock_make_sync_service.return_value.replay.side_effect = lambda: (
+                release.wait(timeout=2)
+            )
+            running = replay_in_background()
+            assert replay_in_background() is None
+            release.set()
+            running.join(timeout=2)
+
+        mock_make_sync_service.return_value.replay.assert_called_once_with()
+
+
+class TestFingerprintCacheFactory:
+    def setup_method(self):
+        _make_fingerprint_cache.reset()
+
+    def teardown_method(self):
+        _make_fingerprint_cache.reset()
+
+    def test_sized_from_config(self):
+        cache = _make_fingerprint_cache()
+        assert isinstance(cache, FingerprintCache)
+        assert cache is _make_fingerprint_cache()
+
+    def test_disabled_by_zero_size(self):
+        app_config = get_app_config()
+        config = app_config._replace(
+            bq_write=app_config.bq_write._replace(fingerprint_cache_size=0)
+        )
+        with patch(
+            "stravabqsync.application.services.get_app_config", return_value=config
+        ):
+            assert _make_fingerprint_cache() is None
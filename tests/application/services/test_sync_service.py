@@ -1,12 +1,29 @@
 import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from functools import lru_cache
 
 import pytest
 
 from stravabqsync.application.services._sync_service import SyncService
-from stravabqsync.domain import StravaActivity, StravaTokenSet
-from tests.mocks.read_activities_repo import MockReadActivitiesRepo
-from tests.mocks.read_token_repo import MockStravaTokenRepo
+from stravabqsync.concurrency import get_retry_deadline, retry_deadline
+from stravabqsync.domain import SpooledSync, StravaActivity, StravaTokenSet
+from stravabqsync.exceptions import (
+    ActivityNotFoundError,
+    BigQueryError,
+    PartialWriteError,
+    RetryLaterError,
+    StravaApiError,
+    StravaTokenError,
+)
+from stravabqsync.fingerprint import FingerprintCache, fingerprint
+from tests.mocks.read_activities_repo import (
+    MockReadActivitiesByIdRepo,
+    MockReadActivitiesRepo,
+)
+from tests.mocks.read_token_repo import MockCountingTokenRepo, MockStravaTokenRepo
+from tests.mocks.sync_spool import MockSyncSpool
 from tests.mocks.write_activities import MockWriteActivitesRepo
 
 
@@ -49,5 +66,610 @@ def service():
 
 class TestSyncService:
     def test_usage(self, service, activity):
-        service.run(activity)
+        service.run(activity.id)
         assert service._write_activities.activity.id == 8726373550
+
+
+class BlockingReadActivitiesRepo(MockReadActivitiesByIdRepo):
+    """Block reads until `release` is set"""
+
+    def __init__(self, activity):
+        super().__init__(activity)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def read_activity_by_id(self, activity_id):
+        self.started.set()
+        self.release.wait(timeout=5)
+        return super().read_activity_by_id(activity_id)
+
+
+class TestSyncServiceRun:
+    def test_concurrent_runs_share_one_fetch(self, activity):
+        read_repo = BlockingReadActivitiesRepo(activity)
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(read_repo, write_repo)
+
+        first = threading.Thread(target=service.run, args=(5,))
+        first.start()
+        assert read_repo.started.wait(timeout=5)
+        second = threading.Thread(target=service.run, args=(5,))
+        second.start()
+        time.sleep(0.05)
+        read_repo.release.set()
+        first.join()
+        second.join()
+
+        assert read_repo.requested_ids == [5]
+        assert write_repo.activity.id == 5
+
+    def test_sequential_runs_fetch_again(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        service = many_service(read_repo, MockWriteActivitesRepo())
+
+        service.run(5)
+        service.run(5)
+
+        assert read_repo.requested_ids == [5, 5]
+
+
+def many_service(read_repo, write_repo, max_workers=4, **options):
+    return SyncService(
+        read_strava_token=mock_token_repo,
+        read_activities=lambda tokens: read_repo,
+        write_activities=lambda: write_repo,
+        max_workers=max_workers,
+        **options,
+    )
+
+
+class UnavailableReadActivitiesRepo(MockReadActivitiesByIdRepo):
+    """Fail every read with a 503"""
+
+    def read_activity_by_id(self, activity_id):
+        self.requested_ids.append(activity_id)
+        raise StravaApiError("Service Unavailable", 503, activity_id)
+
+
+class RateLimitedReadActivitiesRepo(MockReadActivitiesByIdRepo):
+    """Defer every read for 15 minutes"""
+
+    def read_activity_by_id(self, activity_id):
+        self.requested_ids.append(activity_id)
+        raise RetryLaterError("Rate limited", retry_at=_in(900))
+
+
+def _in(seconds):
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+class TestSyncServiceSpool:
+    def test_failed_fetch_is_spooled(self, activity):
+        spool = MockSyncSpool()
+        service = many_service(
+            UnavailableReadActivitiesRepo(activity),
+            MockWriteActivitesRepo(),
+            spool=spool,
+        )
+
+        service.run(5)
+
+        [entry] = spool.entries
+        assert entry.activity_id == 5
+        assert entry.activity is None
+        assert entry.error == "Service Unavailable"
+
+    def test_failed_write_spools_fetched_activity(self, activity):
+        spool = MockSyncSpool()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            MockWriteActivitesRepo(fail=True),
+            spool=spool,
+        )
+
+        service.run(5)
+
+        [entry] = spool.entries
+        assert entry.activity.id == 5
+
+    def test_missing_activity_is_dead_lettered(self, activity):
+        spool = MockSyncSpool()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity, missing_ids={5}),
+            MockWriteActivitesRepo(),
+            spool=spool,
+        )
+
+        service.run(5)
+
+        assert spool.entries == []
+        assert spool.dead[0].error == "Activity 5 not found"
+
+    def test_failures_raise_without_spool(self, activity):
+        service = many_service(
+            UnavailableReadActivitiesRepo(activity), MockWriteActivitesRepo()
+        )
+        with pytest.raises(StravaApiError):
+            service.run(5)
+
+    def test_replay_writes_spooled_activities_without_fetching(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, missing_ids={3})
+        write_repo = MockWriteActivitesRepo()
+        spool = MockSyncSpool(
+            [
+                SpooledSync(
+                    activity_id=1, activity=activity.model_copy(update={"id": 1})
+                ),
+                SpooledSync(activity_id=2),
+                SpooledSync(activity_id=3),
+            ]
+        )
+        service = many_service(read_repo, write_repo, spool=spool)
+
+        result = service.replay(batch_size=2)
+
+        assert result == (2, 0, 1)
+        assert read_repo.requested_ids == [2, 3]
+        assert [[a.id for a in batch] for batch in write_repo.batches] == [[1, 2]]
+        assert spool.entries == []
+        assert [entry.activity_id for entry in spool.dead] == [3]
+
+    def test_replay_stops_while_dependencies_are_down(self, activity):
+        entries = [SpooledSync(activity_id=i) for i in (1, 2, 3)]
+        spool = MockSyncSpool(entries)
+        service = many_service(
+            UnavailableReadActivitiesRepo(activity),
+            MockWriteActivitesRepo(),
+            spool=spool,
+        )
+
+        assert service.replay(batch_size=2) == (0, 0, 0)
+        assert spool.entries == entries
+
+    def test_replay_requeues_and_dead_letters_repeated_failures(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        spool = MockSyncSpool(
+            [
+                SpooledSync(activity_id=1),
+                SpooledSync(activity_id=2, attempts=1),
+                SpooledSync(activity_id=3, attempts=4),
+            ]
+        )
+        service = many_service(
+            read_repo, MockWriteActivitesRepo(failed_ids=(2, 3)), spool=spool
+        )
+
+        result = service.replay(batch_size=3, max_attempts=5)
+
+        assert result == (1, 1, 1)
+        [retry] = spool.entries
+        assert (retry.activity_id, retry.attempts) == (2, 2)
+        assert [(e.activity_id, e.attempts) for e in spool.dead] == [(3, 5)]
+
+    def test_rate_limited_fetch_is_deferred(self, activity):
+        spool = MockSyncSpool()
+        service = many_service(
+            RateLimitedReadActivitiesRepo(activity),
+            MockWriteActivitesRepo(),
+            spool=spool,
+        )
+
+        service.run(5)
+
+        [entry] = spool.entries
+        assert _in(890) < entry.not_before <= _in(900)
+
+    def test_replay_skips_deferred_entries(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        waiting = SpooledSync(activity_id=1, not_before=_in(600))
+        spool = MockSyncSpool([waiting, SpooledSync(activity_id=2, not_before=_in(-1))])
+        service = many_service(read_repo, MockWriteActivitesRepo(), spool=spool)
+
+        assert service.replay(batch_size=2) == (1, 0, 0)
+        assert read_repo.requested_ids == [2]
+        assert spool.entries == [waiting]
+
+        # Only deferred entries left
+        assert service.replay(batch_size=2) == (0, 0, 0)
+        assert read_repo.requested_ids == [2]
+        assert spool.entries == [waiting]
+
+    def test_replay_defers_rate_limited_entries(self, activity):
+        read_repo = RateLimitedReadActivitiesRepo(activity)
+        spool = MockSyncSpool([SpooledSync(activity_id=i) for i in (1, 2, 3)])
+        service = many_service(read_repo, MockWriteActivitesRepo(), spool=spool)
+
+        assert service.replay(batch_size=2) == (0, 2, 0)
+
+        # Stops at the rate limit rather than fetching the next batch
+        assert sorted(read_repo.requested_ids) == [1, 2]
+        assert [e.activity_id for e in spool.entries] == [3, 1, 2]
+        assert spool.entries[0].not_before is None
+        for entry in spool.entries[1:]:
+            assert entry.attempts == 1
+            assert entry.not_before > _in(890)
+
+    def test_replay_without_spool(self, service):
+        assert service.replay() == (0, 0, 0)
+
+
+class TestSyncServiceFingerprints:
+    def test_unchanged_activity_is_not_written_again(self, activity):
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(10),
+        )
+
+        service.run(5)
+        write_repo.activity = None
+        service.run(5)
+
+        assert write_repo.activity is None
+
+    def test_changed_activity_is_written_with_diff(self, activity, caplog):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(read_repo, write_repo, fingerprints=FingerprintCache(10))
+
+        service.run(5)
+        read_repo.activity = activity.model_copy(update={"name": "Evening Run"})
+        with caplog.at_level("INFO"):
+            service.run(5)
+
+        assert write_repo.activity.name == "Evening Run"
+        assert "Activity 5 changed: name" in caplog.text
+
+    def test_excluded_fields_do_not_count_as_changes(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(
+            read_repo,
+            write_repo,
+            fingerprints=FingerprintCache(10),
+            fingerprint_exclude={"kudos_count"},
+        )
+
+        service.run(5)
+        write_repo.activity = None
+        read_repo.activity = activity.model_copy(update={"kudos_count": 99})
+        service.run(5)
+
+        assert write_repo.activity is None
+
+    def test_seeded_fingerprint_skips_write(self, activity):
+        stored = fingerprint(activity.model_copy(update={"id": 5})).digest
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(10, load=lambda limit: {5: stored}),
+        )
+
+        service.load_fingerprints()
+        service.run(5)
+
+        assert write_repo.activity is None
+
+    def test_unseeded_cache_writes_without_loading(self, activity):
+        stored = fingerprint(activity.model_copy(update={"id": 5})).digest
+        loads = []
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(
+                10, load=lambda limit: loads.append(limit) or {5: stored}
+            ),
+        )
+
+        service.run(5)
+
+        assert write_repo.activity.id == 5
+        assert loads == []
+
+    def test_writer_gets_computed_digests(self, activity):
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(10),
+        )
+
+        service.run(5)
+        service.run_many([6, 7])
+
+        expected = {
+            i: fingerprint(activity.model_copy(update={"id": i})).digest
+            for i in (5, 6, 7)
+        }
+        assert write_repo.digests == expected
+
+    def test_deferred_writes_remembered_once_flushed(self, activity):
+        fingerprints = FingerprintCache(10)
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            MockWriteActivitesRepo(deferred=True),
+            fingerprints=fingerprints,
+        )
+
+        service.run_many([5, 6])
+        assert len(fingerprints) == 0
+        service.flush()
+
+        assert fingerprints.get(5) is not None
+        assert fingerprints.get(6) is not None
+
+    def test_deferred_writes_failed_on_flush_are_not_remembered(self, activity):
+        fingerprints = FingerprintCache(10)
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            MockWriteActivitesRepo(deferred=True, flush_failed_ids=(6,)),
+            fingerprints=fingerprints,
+        )
+
+        service.run_many([5, 6])
+        with pytest.raises(PartialWriteError):
+            service.flush()
+
+        assert fingerprints.get(5) is not None
+        assert fingerprints.get(6) is None
+
+    def test_deferred_writes_not_remembered_if_flush_fails(self, activity):
+        write_repo = MockWriteActivitesRepo(deferred=True, fail_flush=True)
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(10),
+        )
+
+        service.run_many([5])
+        with pytest.raises(BigQueryError):
+            service.flush()
+        write_repo.fail_flush = False
+        service.run_many([5])
+
+        assert [[a.id for a in batch] for batch in write_repo.batches] == [[5], [5]]
+
+    def test_run_many_writes_only_changed(self, activity):
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            write_repo,
+            fingerprints=FingerprintCache(10),
+        )
+        service.run_many([1, 2])
+
+        results = service.run_many([1, 2, 3])
+
+        assert all(r.ok for r in results)
+        assert [[a.id for a in batch] for batch in write_repo.batches] == [
+            [1, 2],
+            [3],
+        ]
+
+    def test_run_many_failed_writes_are_retried(self, activity):
+        cache = FingerprintCache(10)
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        many_service(
+            read_repo, MockWriteActivitesRepo(failed_ids=(2,)), fingerprints=cache
+        ).run_many([1, 2])
+        write_repo = MockWriteActivitesRepo()
+
+        many_service(read_repo, write_repo, fingerprints=cache).run_many([1, 2])
+
+        assert [a.id for a in write_repo.batches[0]] == [2]
+
+
+class TestSyncServiceRunMany:
+    def test_run_many_single_batched_write(self, activity):
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(MockReadActivitiesByIdRepo(activity), write_repo)
+
+        results = service.run_many([1, 2, 3])
+
+        assert [r.activity_id for r in results] == [1, 2, 3]
+        assert all(r.ok for r in results)
+        assert len(write_repo.batches) == 1
+        assert [a.id for a in write_repo.batches[0]] == [1, 2, 3]
+
+    def test_run_many_per_id_fetch_failures(self, activity):
+        write_repo = MockWriteActivitesRepo()
+        read_repo = MockReadActivitiesByIdRepo(activity, missing_ids={2})
+        service = many_service(read_repo, write_repo)
+
+        results = service.run_many([1, 2, 3])
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, ActivityNotFoundError)
+        assert [a.id for a in write_repo.batches[0]] == [1, 3]
+
+    def test_run_many_write_failure_marks_fetched_ids(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity, missing_ids={2})
+        service = many_service(read_repo, MockWriteActivitesRepo(fail=True))
+
+        results = service.run_many([1, 2, 3])
+
+        assert not any(r.ok for r in results)
+        assert isinstance(results[0].error, BigQueryError)
+        assert isinstance(results[1].error, ActivityNotFoundError)
+
+    def test_run_many_partial_write_failure_marks_failed_ids(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        service = many_service(read_repo, MockWriteActivitesRepo(failed_ids=(2,)))
+
+        results = service.run_many([1, 2, 3])
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, PartialWriteError)
+
+    def test_run_many_deduplicates_ids(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        service = many_service(read_repo, MockWriteActivitesRepo())
+
+        results = service.run_many([5, 5, 6])
+
+        assert [r.activity_id for r in results] == [5, 6]
+        assert sorted(read_repo.requested_ids) == [5, 6]
+
+    def test_run_many_empty(self, activity):
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(MockReadActivitiesByIdRepo(activity), write_repo)
+
+        assert service.run_many([]) == []
+        assert write_repo.batches == []
+
+
+class MockRejectingReadActivitiesRepo(MockReadActivitiesByIdRepo):
+    """Reject every access token except `valid_token` with a 401"""
+
+    def __init__(self, activity, tokens: StravaTokenSet, valid_token: str):
+        super().__init__(activity)
+        self.tokens = tokens
+        self.valid_token = valid_token
+
+    def read_activity_by_id(self, activity_id: int) -> StravaActivity:
+        if self.tokens.access_token != self.valid_token:
+            raise StravaTokenError("Access token expired", 401, activity_id)
+        return super().read_activity_by_id(activity_id)
+
+
+class TestSyncServiceTokens:
+    def test_rejected_token_is_refreshed_and_retried(self, activity):
+        token_repo = MockCountingTokenRepo()
+        write_repo = MockWriteActivitesRepo()
+        service = SyncService(
+            read_strava_token=lambda: token_repo,
+            read_activities=lambda tokens: MockRejectingReadActivitiesRepo(
+                activity, tokens, valid_token="token-2"
+            ),
+            write_activities=lambda: write_repo,
+        )
+
+        service.run(42)
+
+        assert write_repo.activity.id == 42
+        assert token_repo.refresh_count == 2
+
+    def test_rejected_refreshed_token_raises(self, activity):
+        token_repo = MockCountingTokenRepo()
+        service = SyncService(
+            read_strava_token=lambda: token_repo,
+            read_activities=lambda tokens: MockRejectingReadActivitiesRepo(
+                activity, tokens, valid_token="never"
+            ),
+            write_activities=MockWriteActivitesRepo,
+        )
+
+        with pytest.raises(StravaTokenError):
+            service.run(42)
+        assert token_repo.refresh_count == 2
+
+    def test_concurrent_rejections_share_one_refresh(self, activity):
+        token_repo = MockCountingTokenRepo(delay=0.02)
+        service = SyncService(
+            read_strava_token=lambda: token_repo,
+            read_activities=lambda tokens: MockRejectingReadActivitiesRepo(
+                activity, tokens, valid_token="token-2"
+            ),
+            write_activities=MockWriteActivitesRepo,
+            max_workers=8,
+        )
+
+        results = service.run_many(range(16))
+
+        assert all(r.ok for r in results)
+        assert token_repo.refresh_count == 2
+
+
+class FailingWarmUpWriteRepo(MockWriteActivitesRepo):
+    def warm_up(self) -> None:
+        raise BigQueryError("Not found: Table activities")
+
+
+class TestSyncServiceInit:
+    def make(self, token_delay, writer_delay, parallel_init):
+        def write_activities():
+            time.sleep(writer_delay)
+            return MockWriteActivitesRepo()
+
+        return SyncService(
+            read_strava_token=lambda: MockCountingTokenRepo(delay=token_delay),
+            read_activities=lambda tokens: MockReadActivitiesByIdRepo(_activity()),
+            write_activities=write_activities,
+            parallel_init=parallel_init,
+        )
+
+    def test_parallel_init_overlaps_steps(self):
+        start = time.perf_counter()
+        service = self.make(0.2, 0.2, parallel_init=True)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.35
+        assert service._token_manager.get().access_token == "token-1"
+        assert isinstance(service._write_activities, MockWriteActivitesRepo)
+
+    def test_serial_init_by_default(self):
+        start = time.perf_counter()
+        self.make(0.1, 0.1, parallel_init=False)
+        assert time.perf_counter() - start >= 0.2
+
+    def test_parallel_init_refreshes_token_within_retry_deadline(self):
+        deadlines = []
+
+        def read_strava_token():
+            deadlines.append(get_retry_deadline())
+            return MockCountingTokenRepo()
+
+        with retry_deadline(30):
+            SyncService(
+                read_strava_token=read_strava_token,
+                read_activities=mock_read_activities_repo,
+                write_activities=MockWriteActivitesRepo,
+                parallel_init=True,
+            )
+
+        assert deadlines[0] is not None
+
+    def test_parallel_init_raises_token_errors(self):
+        def failing_token_repo():
+            raise StravaTokenError("Failed to refresh token", 400)
+
+        with pytest.raises(StravaTokenError):
+            SyncService(
+                read_strava_token=failing_token_repo,
+                read_activities=mock_read_activities_repo,
+                write_activities=MockWriteActivitesRepo,
+                parallel_init=True,
+            )
+
+    def test_warm_up_reader_and_writer(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        write_repo = MockWriteActivitesRepo()
+        service = many_service(read_repo, write_repo)
+
+        service.warm_up()
+
+        assert read_repo.warm_ups == 1
+        assert write_repo.warm_ups == 1
+
+    def test_warm_up_seeds_fingerprints(self, activity):
+        cache = FingerprintCache(10, load=lambda limit: {1: "a"})
+        service = many_service(
+            MockReadActivitiesByIdRepo(activity),
+            MockWriteActivitesRepo(),
+            fingerprints=cache,
+        )
+
+        service.warm_up()
+
+        assert len(cache) == 1
+
+    def test_warm_up_failures_are_ignored(self, activity):
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        service = many_service(read_repo, FailingWarmUpWriteRepo())
+
+        service.warm_up()
+
+        assert read_repo.warm_ups == 1
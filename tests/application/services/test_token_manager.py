@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+from stravabqsync.application.services._token_manager import (
+    AsyncTokenManager,
+    TokenManager,
+)
+from tests.mocks.read_token_repo import (
+    MockAsyncCountingTokenRepo,
+    MockCountingTokenRepo,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenManager:
+    def test_get_refreshes_once_while_valid(self):
+        repo = MockCountingTokenRepo()
+        manager = TokenManager(repo)
+
+        assert manager.get().access_token == "token-1"
+        assert manager.get().access_token == "token-1"
+        assert repo.refresh_count == 1
+
+    def test_get_refreshes_ahead_of_expiry(self):
+        repo = MockCountingTokenRepo(expires_in=3600)
+        tokens = TokenManager(repo).get()
+        clock = FakeClock(tokens.expires_at - 301)
+        manager = TokenManager(repo, refresh_margin=300, clock=clock)
+
+        first = manager.get()
+        clock.now += 2
+        second = manager.get()
+
+        assert first.access_token != second.access_token
+
+    def test_unknown_expiry_is_not_refreshed(self):
+        repo = MockCountingTokenRepo(expires_in=None)
+        manager = TokenManager(repo)
+
+        manager.get()
+        manager.get()
+
+        assert repo.refresh_count == 1
+
+    def test_concurrent_expired_callers_share_one_refresh(self):
+        repo = MockCountingTokenRepo(delay=0.05)
+        manager = TokenManager(repo)
+        barrier = threading.Barrier(16)
+        seen: list[str] = []
+
+        def worker():
+            barrier.wait()
+            seen.append(manager.get().access_token)
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert repo.refresh_count == 1
+        assert set(seen) == {"token-1"}
+
+    def test_invalidate_refreshes_rejected_token_once(self):
+        repo = MockCountingTokenRepo()
+        manager = TokenManager(repo)
+        rejected = manager.get()
+
+        first = manager.invalidate(rejected)
+        second = manager.invalidate(rejected)
+
+        assert first.access_token == second.access_token == "token-2"
+        assert repo.refresh_count == 2
+
+
+class TestAsyncTokenManager:
+    def test_concurrent_callers_share_one_refresh(self):
+        repo = MockAsyncCountingTokenRepo(delay=0.05)
+        manager = AsyncTokenManager(repo)
+
+        async def main():
+            return await asyncio.gather(*(manager.get() for _ in range(16)))
+
+        seen = asyncio.run(main())
+
+        assert repo.refresh_count == 1
+        assert {tokens.access_token for tokens in seen} == {"token-1"}
+
+    def test_invalidate_refreshes_rejected_token_once(self):
+        repo = MockAsyncCountingTokenRepo()
+        manager = AsyncTokenManager(repo)
+
+        async def main():
+            rejected = await manager.get()
+            return await asyncio.gather(
+                manager.invalidate(rejected), manager.invalidate(rejected)
+            )
+
+        first, second = asyncio.run(main())
+
+        assert first.access_token == second.access_token == "token-2"
+        assert repo.refresh_count == 2
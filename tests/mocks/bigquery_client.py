@@ -0,0 +1,68 @@
+import gzip
+import io
+import json
+
+from google.api_core.exceptions import BadRequest
+from google.cloud.bigquery import SourceFormat, Table
+
+from stravabqsync.adapters.gcp.schemas import STRAVA_ACTIVITY_SCHEMA
+
+
+class FakeLoadJob:
+    def __init__(self, job_id: str, output_rows: int, errors: list[dict] | None):
+        self.job_id = job_id
+        self.output_rows = output_rows
+        self.errors = errors
+
+    def result(self):
+        if self.errors:
+            raise BadRequest("Load job failed", errors=self.errors)
+        return self
+
+
+class FakeQueryJob(FakeLoadJob):
+    total_bytes_processed = 1024
+
+    def __init__(self, job_id: str, rows: list[dict], errors: list[dict] | None):
+        super().__init__(job_id, len(rows), errors)
+        self.rows = rows
+
+    def result(self):
+        super().result()
+        return self.rows
+
+
+class FakeBigQueryClient:
+    """Local stand-in for `google.cloud.bigquery.Client` load jobs that decodes
+    and keeps the staged files"""
+
+    def __init__(
+        self, errors: list[dict] | None = None, rows: list[dict] | None = None
+    ):
+        self.errors = errors
+        self.rows = rows or []
+        self.loads: list[dict] = []
+        self.queries: list[str] = []
+
+    def get_table(self, table_id: str) -> Table:
+        return Table(table_id, schema=STRAVA_ACTIVITY_SCHEMA)
+
+    def load_table_from_file(self, file_obj, destination, *, rewind, job_config):
+        if rewind:
+            file_obj.seek(0)
+        data = file_obj.read()
+        if job_config.source_format == SourceFormat.PARQUET:
+            import pyarrow.parquet as pq
+
+            rows = pq.read_table(io.BytesIO(data)).to_pylist()
+        else:
+            lines = gzip.decompress(data).decode().splitlines()
+            rows = [json.loads(line) for line in lines]
+        self.loads.append(
+            {"table_id": destination, "job_config": job_config, "rows": rows}
+        )
+        return FakeLoadJob(f"job-{len(self.loads)}", len(rows), self.errors)
+
+    def query(self, sql):
+        self.queries.append(sql)
+        return FakeQueryJob(f"job-{len(self.queries)}", self.rows, self.errors)
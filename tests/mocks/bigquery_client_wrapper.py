@@ -1,15 +1,35 @@
+import json
+from typing import Sequence
+
 from google.cloud.bigquery import SchemaField
 
 from stravabqsync.adapters.gcp._clients import BigQueryClientWrapper
+from stravabqsync.adapters.gcp.schemas import CHANGE_LOG_SCHEMA, STRAVA_ACTIVITY_SCHEMA
+from stravabqsync.exceptions import BigQueryError
+
+_ALL_COLUMNS = {field.name for field in [*STRAVA_ACTIVITY_SCHEMA, *CHANGE_LOG_SCHEMA]}
 
 
 class MockBigQueryClientWrapper(BigQueryClientWrapper):
-    def __init__(self, *, project_id: str):
+    """Record inserts, and fail `failed_rows` of every insert, or only of
+    inserts into `failed_table` if set"""
+
+    def __init__(
+        self,
+        *,
+        project_id: str,
+        failed_rows: list[int] | None = None,
+        failed_table: str | None = None,
+    ):
         self.project_id = project_id
+        self.failed_rows = failed_rows
+        self.failed_table = failed_table
         self.table_name = None
         self.dataset_name = None
         self.written_activities = None
         self.table_id = None
+        self.inserts: dict[str, list[dict]] = {}
+        self.created_tables: dict[str, dict] = {}
 
     def insert_rows_json(
         self, rows: list[dict], *, dataset_name: str, table_name: str
@@ -17,7 +37,51 @@ class MockBigQueryClientWrapper(BigQueryClientWrapper):
         self.written_activities = rows
         self.table_name = table_name
         self.dataset_name = dataset_name
+        self.inserts.setdefault(table_name, []).extend(rows)
+        if self.failed_rows and self.failed_table in (None, table_name):
+            raise BigQueryError(
+                f"Failed to insert {len(self.failed_rows)} of {len(rows)} rows",
+                [
+                    {"index": i, "errors": [{"reason": "invalid"}]}
+                    for i in self.failed_rows
+                ],
+                failed_rows=self.failed_rows,
+            )
+
+    def insert_serialized_rows(
+        self,
+        rows: Sequence[bytes],
+        *,
+        dataset_name: str,
+        table_name: str,
+        insert_ids: Sequence[str] | None = None,
+    ) -> None:
+        self.insert_ids = insert_ids
+        self.insert_rows_json(
+            [json.loads(row) for row in rows],
+            dataset_name=dataset_name,
+            table_name=table_name,
+        )
+
+    def run_query(self, sql: str) -> None:
+        self.queries = [*getattr(self, "queries", []), sql]
+
+    def fetch_rows(self, sql: str) -> list[dict]:
+        self.run_query(sql)
+        return getattr(self, "query_rows", [])
+
+    def table_columns(self, *, dataset_name: str, table_name: str) -> set[str]:
+        self.warmed_up_table = f"{self.project_id}.{dataset_name}.{table_name}"
+        return getattr(self, "columns", {}).get(table_name, _ALL_COLUMNS)
+
+    def add_columns(
+        self, table_id: str, *, schema: list[SchemaField], missing_ok: bool = False
+    ) -> list[str]:
+        self.altered_tables = {**getattr(self, "altered_tables", {}), table_id: schema}
+        return []
 
-    def create_table(self, table_id: str, *, schema: list[SchemaField]):
+    def create_table(self, table_id: str, *, schema: list[SchemaField], **options):
         self.table_id = table_id
         self.schema = schema
+        self.table_options = options
+        self.created_tables[table_id] = {"schema": schema, **options}
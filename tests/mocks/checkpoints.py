@@ -0,0 +1,18 @@
+from stravabqsync.domain import BackfillCheckpoint
+from stravabqsync.ports.out.state import BackfillCheckpoints
+
+
+class MockBackfillCheckpoints(BackfillCheckpoints):
+    def __init__(self, checkpoint: BackfillCheckpoint | None = None):
+        self.checkpoint = checkpoint
+        self.saved: list[BackfillCheckpoint] = []
+
+    def load(self) -> BackfillCheckpoint | None:
+        return self.checkpoint
+
+    def save(self, checkpoint: BackfillCheckpoint) -> None:
+        self.checkpoint = checkpoint
+        self.saved.append(checkpoint)
+
+    def clear(self) -> None:
+        self.checkpoint = None
@@ -1,5 +1,8 @@
-from stravabqsync.domain import StravaActivity
-from stravabqsync.ports.out.read import ReadActivities
+import asyncio
+
+from stravabqsync.domain import StravaActivity, SummaryActivity
+from stravabqsync.exceptions import ActivityNotFoundError
+from stravabqsync.ports.out.read import AsyncReadActivities, ReadActivities
 
 
 class MockReadActivitiesRepo(ReadActivities):
@@ -8,3 +11,107 @@ class MockReadActivitiesRepo(ReadActivities):
 
     def read_activity_by_id(self, activity_id: int) -> StravaActivity:
         return self.activity
+
+    def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        return self.activity.model_dump_json().encode()
+
+    def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        return []
+
+
+class MockReadActivitiesByIdRepo(ReadActivities):
+    """Return a copy of `activity` with the requested ID, or raise
+    ActivityNotFoundError for IDs in `missing_ids`. `summary_ids` are served
+    page by page from `read_activity_summaries`."""
+
+    def __init__(
+        self,
+        activity: StravaActivity,
+        missing_ids: set[int] | None = None,
+        summary_ids: list[int] | None = None,
+    ):
+        self.activity = activity
+        self.missing_ids = missing_ids or set()
+        self.summary_ids = summary_ids or []
+        self.requested_ids: list[int] = []
+        self.requested_pages: list[int] = []
+        self.warm_ups = 0
+
+    def read_activity_by_id(self, activity_id: int) -> StravaActivity:
+        self.requested_ids.append(activity_id)
+        if activity_id in self.missing_ids:
+            raise ActivityNotFoundError(activity_id)
+        return self.activity.model_copy(update={"id": activity_id})
+
+    def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        return self.read_activity_by_id(activity_id).model_dump_json().encode()
+
+    def warm_up(self) -> None:
+        self.warm_ups += 1
+
+    def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        self.requested_pages.append(page)
+        ids = self.summary_ids[(page - 1) * per_page : page * per_page]
+        return [
+            SummaryActivity(
+                id=activity_id,
+                name=self.activity.name,
+                sport_type=self.activity.sport_type,
+                start_date=self.activity.start_date,
+            )
+            for activity_id in ids
+        ]
+
+
+class MockAsyncReadActivitiesByIdRepo(AsyncReadActivities):
+    """MockReadActivitiesByIdRepo for asyncio. Each read takes `delay`
+    seconds; `max_in_flight` records the most reads in progress at once."""
+
+    def __init__(
+        self,
+        activity: StravaActivity,
+        missing_ids: set[int] | None = None,
+        summary_ids: list[int] | None = None,
+        delay: float = 0.0,
+    ):
+        self._repo = MockReadActivitiesByIdRepo(activity, missing_ids, summary_ids)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.warm_ups = 0
+
+    @property
+    def requested_ids(self) -> list[int]:
+        return self._repo.requested_ids
+
+    @property
+    def requested_pages(self) -> list[int]:
+        return self._repo.requested_pages
+
+    async def read_activity_by_id(self, activity_id: int) -> StravaActivity:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return self._repo.read_activity_by_id(activity_id)
+        finally:
+            self.in_flight -= 1
+
+    async def read_raw_activity_by_id(self, activity_id: int) -> bytes:
+        activity = await self.read_activity_by_id(activity_id)
+        return activity.model_dump_json().encode()
+
+    async def warm_up(self) -> None:
+        self.warm_ups += 1
+
+    async def read_activity_summaries(
+        self, *, page: int, per_page: int, before: int | None = None
+    ) -> list[SummaryActivity]:
+        await asyncio.sleep(self.delay)
+        return self._repo.read_activity_summaries(
+            page=page, per_page=per_page, before=before
+        )
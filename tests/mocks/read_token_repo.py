@@ -1,10 +1,57 @@
+import asyncio
+import threading
+import time
+
 from stravabqsync.domain import StravaTokenSet
-from stravabqsync.ports.out.read import ReadStravaToken
+from stravabqsync.ports.out.read import AsyncReadStravaToken, ReadStravaToken
 
 
 class MockStravaTokenRepo(ReadStravaToken):
     def __init__(self, token: StravaTokenSet):
         self.token = token
 
-    def refresh(self):
+    def refresh(self, *, force: bool = False):
         return self.token
+
+
+class MockCountingTokenRepo(ReadStravaToken):
+    """Issue a new access token ("token-1", "token-2", ...) on every refresh"""
+
+    def __init__(self, expires_in: int | None = 21600, delay: float = 0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.refresh_count = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, *, force: bool = False) -> StravaTokenSet:
+        time.sleep(self.delay)
+        with self._lock:
+            self.refresh_count += 1
+            count = self.refresh_count
+        return StravaTokenSet(
+            client_id=1,
+            client_secret="foo",
+            access_token=f"token-{count}",
+            refresh_token="bar",
+            expires_at=(
+                int(time.time()) + self.expires_in
+                if self.expires_in is not None
+                else None
+            ),
+        )
+
+
+class MockAsyncCountingTokenRepo(AsyncReadStravaToken):
+    """MockCountingTokenRepo for asyncio"""
+
+    def __init__(self, expires_in: int | None = 21600, delay: float = 0.0):
+        self._repo = MockCountingTokenRepo(expires_in)
+        self.delay = delay
+
+    @property
+    def refresh_count(self) -> int:
+        return self._repo.refresh_count
+
+    async def refresh(self, *, force: bool = False) -> StravaTokenSet:
+        await asyncio.sleep(self.delay)
+        return self._repo.refresh(force=force)
@@ -0,0 +1,23 @@
+from stravabqsync.domain import SpooledSync
+from stravabqsync.ports.out.state import SyncSpool
+
+
+class MockSyncSpool(SyncSpool):
+    def __init__(self, entries: list[SpooledSync] | None = None):
+        self.entries = list(entries or [])
+        self.dead: list[SpooledSync] = []
+
+    def append(self, entries: list[SpooledSync]) -> None:
+        self.entries.extend(entries)
+
+    def peek(self, limit: int) -> list[SpooledSync]:
+        return self.entries[:limit]
+
+    def pop(self, count: int) -> None:
+        del self.entries[:count]
+
+    def dead_letter(self, entries: list[SpooledSync]) -> None:
+        self.dead.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
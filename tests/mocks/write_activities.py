@@ -1,10 +1,94 @@
+from typing import Mapping, Sequence
+
 from stravabqsync.domain import StravaActivity
-from stravabqsync.ports.out.write import WriteActivities
+from stravabqsync.exceptions import BigQueryError, PartialWriteError
+from stravabqsync.ports.out.write import AsyncWriteActivities, WriteActivities
 
 
 class MockWriteActivitesRepo(WriteActivities):
-    def __init__(self):
+    def __init__(
+        self,
+        fail: bool = False,
+        fail_flush: bool = False,
+        failed_ids: tuple[int, ...] = (),
+        deferred: bool = False,
+        flush_failed_ids: tuple[int, ...] = (),
+    ):
         self.activity = None
+        self.batches: list[list[StravaActivity]] = []
+        self.digests: dict[int, str] = {}
+        self.fail = fail
+        self.failed_ids = failed_ids
+        self.fail_flush = fail_flush
+        self.deferred = deferred
+        self.flush_failed_ids = flush_failed_ids
+        self.flushes = 0
+        self.warm_ups = 0
 
-    def write_activity(self, activity: StravaActivity) -> None:
+    def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        if self.fail:
+            raise BigQueryError("Failed to insert 1 rows")
         self.activity = activity
+        if digest is not None:
+            self.digests[activity.id] = digest
+
+    def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        if self.fail:
+            raise BigQueryError(f"Failed to insert {len(activities)} rows")
+        self.batches.append([a for a in activities if a.id not in self.failed_ids])
+        self.digests.update(digests or {})
+        self.serialized = serialized
+        failed = [a.id for a in activities if a.id in self.failed_ids]
+        if failed:
+            raise PartialWriteError(
+                f"Failed to insert {len(failed)} rows", activity_ids=failed
+            )
+
+    def flush(self) -> None:
+        self.flushes += 1
+        if self.fail_flush:
+            raise BigQueryError("Failed to flush buffered rows")
+        if self.flush_failed_ids:
+            raise PartialWriteError(
+                f"Failed to write {len(self.flush_failed_ids)} buffered rows",
+                activity_ids=list(self.flush_failed_ids),
+            )
+
+    def warm_up(self) -> None:
+        self.warm_ups += 1
+
+
+class MockAsyncWriteActivitiesRepo(AsyncWriteActivities):
+    """MockWriteActivitesRepo for asyncio; its state is on `repo`"""
+
+    def __init__(self, **options):
+        self.repo = MockWriteActivitesRepo(**options)
+        self.deferred = self.repo.deferred
+
+    async def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        self.repo.write_activity(activity, digest=digest)
+
+    async def write_activities(
+        self,
+        activities: list[StravaActivity],
+        *,
+        digests: Mapping[int, str] | None = None,
+        serialized: Sequence[bytes] | None = None,
+    ) -> None:
+        self.repo.write_activities(activities, digests=digests, serialized=serialized)
+
+    async def flush(self) -> None:
+        self.repo.flush()
+
+    async def warm_up(self) -> None:
+        self.repo.warm_up()
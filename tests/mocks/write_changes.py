@@ -0,0 +1,24 @@
+from stravabqsync.domain import ActivityChange
+from stravabqsync.exceptions import BigQueryError, PartialWriteError
+from stravabqsync.ports.out.write import WriteChanges
+
+
+class MockWriteChangesRepo(WriteChanges):
+    def __init__(self, fail: bool = False, failed_ids: tuple[int, ...] = ()):
+        self.batches: list[list[ActivityChange]] = []
+        self.fail = fail
+        self.failed_ids = failed_ids
+        self.flushes = 0
+
+    def write_changes(self, changes: list[ActivityChange]) -> None:
+        if self.fail:
+            raise BigQueryError(f"Failed to insert {len(changes)} rows")
+        self.batches.append([c for c in changes if c.id not in self.failed_ids])
+        failed = [c.id for c in changes if c.id in self.failed_ids]
+        if failed:
+            raise PartialWriteError(
+                f"Failed to insert {len(failed)} rows", activity_ids=failed
+            )
+
+    def flush(self) -> None:
+        self.flushes += 1
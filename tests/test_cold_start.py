@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+# Runs in a fresh interpreter: this process has already imported everything
+CHILD = """
+import json, sys
+import main
+from stravabqsync.config import get_app_config
+
+print(json.dumps({
+    "modules": sorted(sys.modules),
+    "config_loaded": get_app_config.cache_info().currsize > 0,
+}))
+"""
+
+DEFERRED_MODULES = [
+    "google.cloud.bigquery",
+    "requests",
+    "stravabqsync.adapters.gcp._clients",
+    "stravabqsync.adapters.strava._repositories",
+]
+
+
+def import_main() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+class TestColdStart:
+    def test_importing_main_defers_config_and_heavy_imports(self):
+        result = import_main()
+
+        assert result["config_loaded"] is False
+        assert [m for m in DEFERRED_MODULES if m in result["modules"]] == []
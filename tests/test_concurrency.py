@@ -0,0 +1,103 @@
+"""Tests for deduplication and coordination helpers."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from stravabqsync.concurrency import LatestDeadline, RecentKeys, SingleFlight
+
+
+class TestSingleFlight:
+    def test_returns_result(self):
+        assert SingleFlight().do("a", lambda: 42) == 42
+
+    def test_concurrent_calls_share_one_call(self):
+        flight: SingleFlight[int] = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        results = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return len(calls)
+
+        def call():
+            results.append(flight.do("a", slow))
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        threads[0].start()
+        assert started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [1]
+        assert results == [1, 1, 1, 1]
+
+    def test_exception_is_shared_and_not_cached(self):
+        flight: SingleFlight[int] = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            flight.do("a", fail)
+        assert flight.do("a", lambda: 1) == 1
+
+    def test_keys_are_independent(self):
+        flight: SingleFlight[str] = SingleFlight()
+        assert flight.do("a", lambda: "a") == "a"
+        assert flight.do("b", lambda: "b") == "b"
+
+
+class TestRecentKeys:
+    def test_add_and_contains(self):
+        keys = RecentKeys(maxsize=2)
+        keys.add("a")
+        assert "a" in keys
+        assert "b" not in keys
+
+    def test_evicts_least_recently_used(self):
+        keys = RecentKeys(maxsize=2)
+        keys.add("a")
+        keys.add("b")
+        assert "a" in keys
+        keys.add("c")
+
+        assert "a" in keys
+        assert "b" not in keys
+        assert len(keys) == 2
+
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            RecentKeys(maxsize=0)
+
+
+class TestLatestDeadline:
+    def test_keeps_later_deadline(self):
+        now = datetime.now(timezone.utc)
+        deadline = LatestDeadline()
+        assert deadline.get() is None
+
+        deadline.extend(now + timedelta(seconds=600))
+        deadline.extend(now + timedelta(seconds=60))
+
+        assert deadline.get() == now + timedelta(seconds=600)
+
+    def test_concurrent_extends_keep_latest(self):
+        now = datetime.now(timezone.utc)
+        deadline = LatestDeadline()
+        deadlines = [now + timedelta(seconds=i) for i in range(1000)]
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(deadline.extend, reversed(deadlines)))
+
+        assert deadline.get() == deadlines[-1]
@@ -5,10 +5,12 @@ from unittest.mock import patch
 
 import pytest
 
+from stravabqsync import config as config_module
 from stravabqsync.config import (
     AppConfig,
     StravaApiConfig,
     _get_required_env_var,
+    get_app_config,
     load_config,
 )
 from stravabqsync.exceptions import ConfigurationError
@@ -44,6 +46,17 @@ class TestStravaApiConfig:
         assert config.token_retry_backoff == 0.5
         assert config.activity_retry_attempts == 3
         assert config.activity_retry_backoff == 1.0
+        assert config.rate_limit_short == 200
+        assert config.rate_limit_daily == 2000
+        assert config.rate_limit_burst == 20
+        assert config.rate_limit_max_concurrency == 8
+        assert config.rate_limit_max_wait == 30.0
+        assert config.token_refresh_margin == 300
+        assert config.defer_rate_limits is False
+        assert config.retry_jitter is True
+        assert config.retry_budget is None
+        assert config.circuit_failure_threshold == 5
+        assert config.circuit_reset_timeout == 30.0
 
 
 class TestLoadConfig:
@@ -70,6 +83,70 @@ class TestLoadConfig:
         assert config.project_id == "project"
         assert config.bq_dataset == "dataset"
         assert isinstance(config.strava_api, StravaApiConfig)
+        assert config.token_cache is None
+        assert config.bq_write.buffered is False
+        assert config.parallel_init is False
+        assert config.bq_write.fingerprint_exclude == ()
+        assert config.bq_write.fingerprint_cache_size == 1024
+        assert config.spool_dir is None
+
+    @patch("stravabqsync.config.dotenv_values")
+    @patch.dict(
+        os.environ,
+        {
+            "STRAVA_CLIENT_ID": "123",
+            "STRAVA_CLIENT_SECRET": "secret",
+            "STRAVA_REFRESH_TOKEN": "refresh",
+            "GCP_PROJECT_ID": "project",
+            "GCP_BIGQUERY_DATASET": "dataset",
+            "STRAVA_TOKEN_CACHE": "file:/tmp/strava_tokens.json",
+            "GCP_BIGQUERY_WRITE_BUFFER": "true",
+            "GCP_BIGQUERY_BACKFILL_METHOD": "stream",
+            "GCP_BIGQUERY_LOAD_FORMAT": "parquet",
+            "STRAVABQSYNC_PARALLEL_INIT": "1",
+            "GCP_BIGQUERY_CHANGE_WINDOW": "2.5",
+            "GCP_BIGQUERY_LAYOUT": "normalized",
+            "GCP_BIGQUERY_FINGERPRINT_EXCLUDE": "kudos_count, comment_count",
+            "GCP_BIGQUERY_FINGERPRINT_CACHE_SIZE": "0",
+            "STRAVABQSYNC_SPOOL_DIR": "/var/spool/stravabqsync",
+            "STRAVA_DEFER_RATE_LIMITS": "true",
+            "STRAVA_RETRY_BUDGET": "20",
+            "FUNCTION_TIMEOUT_SEC": "60",
+        },
+        clear=True,
+    )
+    def test_load_config_optional_settings(self, mock_dotenv_values):
+        mock_dotenv_values.return_value = {}
+        config = load_config()
+        assert config.token_cache == "file:/tmp/strava_tokens.json"
+        assert config.bq_write.buffered is True
+        assert config.bq_write.backfill_method == "stream"
+        assert config.bq_write.load_format == "parquet"
+        assert config.parallel_init is True
+        assert config.bq_write.change_window == 2.5
+        assert config.bq_write.layout == "normalized"
+        assert config.bq_write.fingerprint_exclude == ("kudos_count", "comment_count")
+        assert config.bq_write.fingerprint_cache_size == 0
+        assert config.spool_dir == "/var/spool/stravabqsync"
+        assert config.strava_api.defer_rate_limits is True
+        assert config.strava_api.retry_budget == 20.0
+
+    @patch("stravabqsync.config.dotenv_values")
+    @patch.dict(
+        os.environ,
+        {
+            "STRAVA_CLIENT_ID": "123",
+            "STRAVA_CLIENT_SECRET": "secret",
+            "STRAVA_REFRESH_TOKEN": "refresh",
+            "GCP_PROJECT_ID": "project",
+            "GCP_BIGQUERY_DATASET": "dataset",
+            "FUNCTION_TIMEOUT_SEC": "60",
+        },
+        clear=True,
+    )
+    def test_retry_budget_defaults_to_half_the_timeout(self, mock_dotenv_values):
+        mock_dotenv_values.return_value = {}
+        assert load_config().strava_api.retry_budget == 30.0
 
     @patch("stravabqsync.config.dotenv_values")
     @patch.dict(os.environ, {}, clear=True)
@@ -240,3 +317,22 @@ class TestLoadConfig:
                 # Restore permissions before cleanup
                 os.chmod(temp_file.name, 0o644)
                 os.unlink(temp_file.name)
+
+
+class TestGetAppConfig:
+    def test_loaded_once(self):
+        get_app_config.cache_clear()
+        with patch("stravabqsync.config.load_config") as mock_load_config:
+            first = get_app_config()
+            second = get_app_config()
+        get_app_config.cache_clear()
+
+        assert first is second
+        mock_load_config.assert_called_once_with()
+
+    def test_app_config_attribute(self):
+        assert config_module.app_config is get_app_config()
+
+    def test_unknown_attribute(self):
+        with pytest.raises(AttributeError):
+            _ = config_module.missing
@@ -0,0 +1,164 @@
+"""Tests for the service container."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from stravabqsync.container import Container
+
+
+class Resource:
+    def __init__(self, name: str, closed: list[str]):
+        self.name = name
+        self._closed = closed
+
+    def close(self) -> None:
+        self._closed.append(self.name)
+
+
+class TestSingleton:
+    def test_builds_once(self):
+        container = Container()
+        calls = []
+
+        @container.singleton
+        def make():
+            calls.append(1)
+            return object()
+
+        assert make() is make()
+        assert calls == [1]
+
+    def test_concurrent_first_calls_build_once(self):
+        container = Container()
+        calls = []
+
+        @container.singleton
+        def make():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            instances = list(pool.map(lambda _: make(), range(16)))
+
+        assert calls == [1]
+        assert all(instance is instances[0] for instance in instances)
+
+    def test_failed_build_is_shared_and_not_cached(self):
+        container = Container()
+        calls = []
+        started, release = threading.Event(), threading.Event()
+
+        @container.singleton
+        def make():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                release.wait(timeout=5)
+                raise ValueError("boom")
+            return "ok"
+
+        errors = []
+
+        def call():
+            try:
+                make()
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        threads[0].start()
+        assert started.wait(timeout=5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 4
+        assert make() == "ok"
+        assert len(calls) == 2
+
+    def test_reset_builds_anew(self):
+        container = Container()
+
+        @container.singleton
+        def make():
+            return object()
+
+        first = make()
+        make.reset()
+        assert make() is not first
+
+
+class TestKeyed:
+    def test_one_instance_per_key(self):
+        container = Container()
+
+        @container.keyed()
+        def make(key):
+            return [key]
+
+        assert make("a") is make("a")
+        assert make("a") is not make("b")
+
+    def test_least_recently_used_instance_is_evicted_and_closed(self):
+        container = Container()
+        closed: list[str] = []
+
+        @container.keyed(maxsize=2, close=Resource.close)
+        def make(key):
+            return Resource(key, closed)
+
+        first = make("a")
+        make("b")
+        make("a")
+        make("c")
+
+        assert closed == ["b"]
+        assert len(make) == 2
+        assert make("a") is first
+
+    def test_maxsize_must_be_positive(self):
+        with pytest.raises(ValueError):
+            Container().keyed(maxsize=0)(lambda key: key)
+
+
+class TestClose:
+    def test_closes_newest_first_and_can_be_reused(self):
+        container = Container()
+        closed: list[str] = []
+
+        @container.singleton(close=Resource.close)
+        def make_client():
+            return Resource("client", closed)
+
+        @container.singleton(close=Resource.close)
+        def make_buffer():
+            make_client()
+            return Resource("buffer", closed)
+
+        first = make_buffer()
+        container.close()
+
+        assert closed == ["buffer", "client"]
+        assert make_buffer() is not first
+
+    def test_failures_are_logged_and_do_not_stop_others(self, caplog):
+        container = Container()
+        closed: list[str] = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        container.on_close("first", lambda: closed.append("first"))
+        container.on_close("failing", fail)
+
+        container.close()
+
+        assert closed == ["first"]
+        assert "Failed to close failing" in caplog.text
@@ -1,8 +1,9 @@
 import json
+from datetime import UTC, datetime
 
 import pytest
 
-from stravabqsync.domain import StravaActivity
+from stravabqsync.domain import ActivityChange, StravaActivity, WebhookRequest
 
 
 @pytest.fixture
@@ -29,3 +30,72 @@ class TestStravaActivity:
         activity = StravaActivity(**activity_json_2)
 
         assert activity.id == 8726373550
+
+    def test_json_roundtrip(self, activity_json_1):
+        activity = StravaActivity(**activity_json_1)
+
+        roundtrip = StravaActivity.model_validate_json(activity.model_dump_json())
+
+        assert roundtrip == activity
+
+
+def webhook(**overrides) -> WebhookRequest:
+    fields = {
+        "aspect_type": "update",
+        "event_time": 1700000000,
+        "object_id": 42,
+        "object_type": "activity",
+        "owner_id": 1,
+        "subscription_id": 2,
+        "updates": {},
+    }
+    fields.update(overrides)
+    return WebhookRequest(**fields)
+
+
+class TestActivityChange:
+    def test_from_update(self):
+        change = ActivityChange.from_webhook(
+            webhook(updates={"title": "Morning Ride", "private": "true"})
+        )
+        assert change.id == 42
+        assert change.owner_id == 1
+        assert change.event_time == datetime(2023, 11, 14, 22, 13, 20, tzinfo=UTC)
+        assert change.title == "Morning Ride"
+        assert change.private is True
+        assert change.type is None
+        assert change.was_deleted is False
+        assert change.updates == {"title": "Morning Ride", "private": "true"}
+
+    def test_from_delete(self):
+        change = ActivityChange.from_webhook(webhook(aspect_type="delete"))
+        assert change.was_deleted is True
+        assert change.title is None
+
+    def test_merge_later_fields_win(self):
+        first = ActivityChange.from_webhook(
+            webhook(event_time=1, updates={"title": "A", "type": "Ride"})
+        )
+        second = ActivityChange.from_webhook(
+            webhook(event_time=2, updates={"title": "B"})
+        )
+
+        for merged in (first.merge(second), second.merge(first)):
+            assert merged.title == "B"
+            assert merged.type == "Ride"
+            assert merged.event_time == second.event_time
+            assert merged.updates == {"title": "B", "type": "Ride"}
+
+    def test_merge_keeps_deletion(self):
+        deleted = ActivityChange.from_webhook(
+            webhook(event_time=1, aspect_type="delete")
+        )
+        updated = ActivityChange.from_webhook(
+            webhook(event_time=2, updates={"title": "B"})
+        )
+        assert deleted.merge(updated).was_deleted is True
+
+    def test_merge_other_activity(self):
+        change = ActivityChange.from_webhook(webhook())
+        with pytest.raises(ValueError):
+            change.merge(ActivityChange.from_webhook(webhook(object_id=43)))
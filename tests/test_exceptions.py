@@ -1,8 +1,11 @@
+from datetime import datetime, timedelta, timezone
+
 from stravabqsync.exceptions import (
     ActivityNotFoundError,
     BigQueryError,
     ConfigurationError,
     DataValidationError,
+    RetryLaterError,
     StravaApiError,
     StravaBqSyncError,
     StravaRateLimitError,
@@ -64,6 +67,19 @@ class TestStravaRateLimitError:
         assert error.retry_after == 300
 
 
+class TestRetryLaterError:
+    def test_retry_later_error(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+        error = RetryLaterError("Rate limited", retry_at=retry_at)
+        assert isinstance(error, StravaRateLimitError)
+        assert error.retry_at == retry_at
+        assert error.retry_after in (89, 90)
+
+    def test_retry_later_error_in_the_past(self):
+        retry_at = datetime.now(timezone.utc) - timedelta(seconds=90)
+        assert RetryLaterError("Rate limited", retry_at=retry_at).retry_after == 0
+
+
 class TestActivityNotFoundError:
     def test_activity_not_found_error(self):
         error = ActivityNotFoundError(12345)
@@ -0,0 +1,144 @@
+"""Tests for activity content fingerprints."""
+
+import json
+import threading
+
+import pytest
+
+from stravabqsync.domain import StravaActivity
+from stravabqsync.fingerprint import (
+    Fingerprint,
+    FingerprintCache,
+    changed_fields,
+    fingerprint,
+)
+
+
+@pytest.fixture
+def activity():
+    with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+        return StravaActivity(**json.load(fin))
+
+
+class TestFingerprint:
+    def test_equal_content_equal_digest(self, activity):
+        assert fingerprint(activity) == fingerprint(activity.model_copy())
+
+    def test_changed_content_changes_digest(self, activity):
+        renamed = activity.model_copy(update={"name": "Evening Run"})
+        assert fingerprint(renamed).digest != fingerprint(activity).digest
+
+    def test_excluded_fields_are_ignored(self, activity):
+        more_kudos = activity.model_copy(update={"kudos_count": 99})
+        assert (
+            fingerprint(more_kudos, exclude={"kudos_count"}).digest
+            == fingerprint(activity, exclude={"kudos_count"}).digest
+        )
+        assert (
+            "kudos_count" not in fingerprint(activity, exclude={"kudos_count"}).fields
+        )
+
+    def test_changed_fields(self, activity):
+        changed = activity.model_copy(update={"name": "Evening Run", "kudos_count": 9})
+        assert changed_fields(fingerprint(activity), fingerprint(changed)) == [
+            "name",
+            "kudos_count",
+        ]
+
+    def test_changed_fields_unknown_without_field_hashes(self, activity):
+        assert changed_fields(Fingerprint("abc"), fingerprint(activity)) is None
+
+
+class TestFingerprintCache:
+    def test_get_and_put(self):
+        cache = FingerprintCache(2)
+        cache.put(1, Fingerprint("a"))
+        assert cache.get(1) == Fingerprint("a")
+        assert cache.get(2) is None
+
+    def test_evicts_least_recently_used(self):
+        cache = FingerprintCache(2)
+        cache.put(1, Fingerprint("a"))
+        cache.put(2, Fingerprint("b"))
+        cache.get(1)
+        cache.put(3, Fingerprint("c"))
+
+        assert cache.get(2) is None
+        assert cache.get(1) == Fingerprint("a")
+        assert len(cache) == 2
+
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            FingerprintCache(0)
+
+    def test_not_seeded_on_use(self):
+        calls = []
+        cache = FingerprintCache(2, load=lambda limit: calls.append(limit) or {1: "a"})
+
+        cache.put(2, Fingerprint("b"))
+
+        assert cache.get(1) is None
+        assert calls == []
+
+    def test_seeded_once(self):
+        limits = []
+
+        def load(limit):
+            limits.append(limit)
+            return {1: "old", 2: "new"}
+
+        cache = FingerprintCache(10, load=load)
+        cache.load()
+        cache.load()
+
+        assert cache.get(2) == Fingerprint("new")
+        assert cache.get(1) == Fingerprint("old")
+        assert limits == [10]
+
+    def test_seed_keeps_fingerprints_put_before(self):
+        cache = FingerprintCache(2, load=lambda limit: {1: "old", 2: "b"})
+        cache.put(1, Fingerprint("newer"))
+        cache.load()
+
+        assert cache.get(1) == Fingerprint("newer")
+        # Loaded fingerprints are older, so evicted first
+        cache.put(3, Fingerprint("c"))
+        assert cache.get(2) is None
+
+    def test_seed_keeps_most_recent(self):
+        cache = FingerprintCache(2, load=lambda limit: {1: "a", 2: "b", 3: "c"})
+        cache.load()
+        assert [cache.get(i) for i in (1, 2, 3)] == [
+            None,
+            Fingerprint("b"),
+            Fingerprint("c"),
+        ]
+
+    def test_failed_seed_starts_empty(self):
+        def load(limit):
+            raise RuntimeError("Not found: Table activities")
+
+        cache = FingerprintCache(2, load=load)
+        cache.load()
+
+        assert cache.get(1) is None
+        assert len(cache) == 0
+
+    def test_lookups_during_seed_miss_without_waiting(self):
+        started, release = threading.Event(), threading.Event()
+
+        def load(limit):
+            started.set()
+            release.wait(timeout=5)
+            return {1: "a"}
+
+        cache = FingerprintCache(2, load=load)
+        thread = threading.Thread(target=cache.load)
+        thread.start()
+        assert started.wait(timeout=5)
+
+        assert cache.get(1) is None
+
+        release.set()
+        thread.join()
+        assert cache.get(1) == Fingerprint("a")
@@ -0,0 +1,252 @@
+"""Tests for the Pub/Sub listener."""
+
+import base64
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from cloudevents.http import CloudEvent
+
+import main
+from stravabqsync.application import services as app_services
+from stravabqsync.concurrency import LatestDeadline, RecentKeys, get_retry_deadline
+from stravabqsync.config import get_app_config
+from stravabqsync.container import Container
+from stravabqsync.domain import StravaActivity
+from stravabqsync.exceptions import RetryLaterError
+from tests.mocks.read_activities_repo import MockReadActivitiesByIdRepo
+from tests.mocks.read_token_repo import MockCountingTokenRepo
+from tests.mocks.write_activities import MockWriteActivitesRepo
+from tests.mocks.write_changes import MockWriteChangesRepo
+
+
+def make_event(**overrides) -> CloudEvent:
+    webhook = {
+        "aspect_type": "create",
+        "event_time": 1700000000,
+        "object_id": 42,
+        "object_type": "activity",
+        "owner_id": 1,
+        "subscription_id": 2,
+        "updates": {},
+    }
+    webhook.update(overrides)
+    data = base64.b64encode(json.dumps(webhook).encode()).decode()
+    return CloudEvent(
+        {"type": "google.cloud.pubsub.topic.v1.messagePublished", "source": "test"},
+        {"message": {"data": data}},
+    )
+
+
+@pytest.fixture
+def services():
+    with (
+        patch.object(main, "_processed_events", RecentKeys(maxsize=8)),
+        patch.object(main, "_retry_at", LatestDeadline()),
+        patch.object(main, "make_sync_service") as make_sync_service,
+        patch.object(main, "make_change_log_service") as make_change_log_service,
+        patch.object(main, "replay_in_background"),
+    ):
+        yield make_sync_service.return_value, make_change_log_service.return_value
+
+
+@pytest.fixture
+def sync_service(services):
+    return services[0]
+
+
+@pytest.fixture
+def change_log_service(services):
+    return services[1]
+
+
+class TestListener:
+    def test_create_event_is_synced(self, sync_service):
+        main.stravabqsync_listener(make_event())
+        sync_service.run.assert_called_once_with(42)
+
+    def test_create_event_is_synced_within_one_retry_deadline(self, sync_service):
+        deadlines = []
+        sync_service.run.side_effect = lambda _: deadlines.append(get_retry_deadline())
+        config = get_app_config()
+        strava_api = config.strava_api._replace(retry_budget=30.0)
+
+        with (
+            patch.object(main, "get_app_config") as get_config,
+            patch("time.monotonic", return_value=100.0),
+        ):
+            get_config.return_value = config._replace(strava_api=strava_api)
+            main.stravabqsync_listener(make_event())
+
+        assert deadlines == [130.0]
+        assert get_retry_deadline() is None
+
+    def test_create_event_replays_spool(self, sync_service):
+        main.stravabqsync_listener(make_event())
+        main.replay_in_background.assert_called_once_with()
+
+    def test_redelivered_event_is_skipped(self, sync_service):
+        main.stravabqsync_listener(make_event())
+        main.stravabqsync_listener(make_event())
+        sync_service.run.assert_called_once_with(42)
+
+    def test_distinct_events_are_synced(self, sync_service):
+        main.stravabqsync_listener(make_event())
+        main.stravabqsync_listener(make_event(object_id=43))
+        assert sync_service.run.call_count == 2
+
+    def test_failed_event_is_retried(self, sync_service):
+        sync_service.run.side_effect = [RuntimeError("boom"), None]
+        with pytest.raises(RuntimeError):
+            main.stravabqsync_listener(make_event())
+        main.stravabqsync_listener(make_event())
+        assert sync_service.run.call_count == 2
+
+    def test_rate_limited_event_is_deferred(self, sync_service):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=600)
+        sync_service.run.side_effect = RetryLaterError("Slow down", retry_at)
+        with pytest.raises(RetryLaterError):
+            main.stravabqsync_listener(make_event())
+
+        # Redeliveries and other events fail fast until the limit lifts
+        with pytest.raises(RetryLaterError) as exc_info:
+            main.stravabqsync_listener(make_event(object_id=43))
+        assert exc_info.value.retry_at == retry_at
+        sync_service.run.assert_called_once_with(42)
+        main.replay_in_background.assert_not_called()
+
+    def test_shorter_rate_limit_does_not_shorten_deferral(self, sync_service):
+        later = datetime.now(timezone.utc) + timedelta(seconds=600)
+        sync_service.run.side_effect = RetryLaterError("Slow down", later)
+        with pytest.raises(RetryLaterError):
+            main.stravabqsync_listener(make_event())
+        # Another sync deferred concurrently, with an earlier deadline
+        main._retry_at.extend(datetime.now(timezone.utc) - timedelta(seconds=1))
+
+        with pytest.raises(RetryLaterError) as exc_info:
+            main.stravabqsync_listener(make_event(object_id=43))
+        assert exc_info.value.retry_at == later
+
+    def test_events_are_synced_once_rate_limit_lifts(self, sync_service):
+        retry_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        sync_service.run.side_effect = [RetryLaterError("Slow down", retry_at), None]
+        with pytest.raises(RetryLaterError):
+            main.stravabqsync_listener(make_event())
+
+        main.stravabqsync_listener(make_event())
+        assert sync_service.run.call_count == 2
+
+    @pytest.mark.parametrize("aspect_type", ["update", "delete"])
+    def test_activity_changes_are_logged(
+        self, sync_service, change_log_service, aspect_type
+    ):
+        main.stravabqsync_listener(
+            make_event(aspect_type=aspect_type, updates={"title": "A"})
+        )
+
+        [request], _ = change_log_service.run.call_args
+        assert request.aspect_type == aspect_type
+        assert request.object_id == 42
+        sync_service.run.assert_not_called()
+
+    def test_successive_updates_are_not_deduplicated(self, change_log_service):
+        main.stravabqsync_listener(make_event(aspect_type="update", updates={"a": 1}))
+        main.stravabqsync_listener(make_event(aspect_type="update", updates={"b": 2}))
+        assert change_log_service.run.call_count == 2
+
+    def test_athlete_events_are_skipped(self, sync_service, change_log_service):
+        main.stravabqsync_listener(
+            make_event(
+                object_type="athlete",
+                aspect_type="update",
+                updates={"authorized": "false"},
+            )
+        )
+        sync_service.run.assert_not_called()
+        change_log_service.run.assert_not_called()
+
+
+class RecordingWriteActivitiesRepo(MockWriteActivitesRepo):
+    def __init__(self):
+        super().__init__()
+        self.written: list[int] = []
+        self._lock = threading.Lock()
+
+    def write_activity(
+        self, activity: StravaActivity, *, digest: str | None = None
+    ) -> None:
+        with self._lock:
+            self.written.append(activity.id)
+
+
+class TestListenerConcurrency:
+    """Many concurrent events on one instance, with the real services wired
+    to fake adapters"""
+
+    def test_concurrent_events_share_one_set_of_services(self):
+        with open("tests/fixtures/activity_2.json", "r", encoding="utf-8") as fin:
+            activity = StravaActivity(**json.load(fin))
+        fakes = Container()
+        builds: list[str] = []
+        read_repo = MockReadActivitiesByIdRepo(activity)
+        write_repo = RecordingWriteActivitiesRepo()
+        changes_repo = MockWriteChangesRepo()
+
+        def build(name, instance):
+            builds.append(name)
+            # Widen the window for concurrent first calls
+            time.sleep(0.02)
+            return instance
+
+        @fakes.singleton
+        def make_read_strava_token():
+            return build("tokens", MockCountingTokenRepo(delay=0.01))
+
+        @fakes.keyed(maxsize=2)
+        def make_read_activities(tokens):
+            return build("reader", read_repo)
+
+        @fakes.singleton
+        def make_write_activities():
+            return build("writer", write_repo)
+
+        @fakes.singleton
+        def make_write_changes():
+            return build("changes", changes_repo)
+
+        events = [make_event(object_id=i) for i in range(100)]
+        events += [make_event(object_id=i) for i in range(50)]  # redeliveries
+        events += [
+            make_event(aspect_type="update", object_id=i, updates={"title": "A"})
+            for i in range(50)
+        ]
+
+        app_services.make_sync_service.reset()
+        app_services.make_change_log_service.reset()
+        try:
+            with (
+                patch.object(main, "_processed_events", RecentKeys(maxsize=1024)),
+                patch.object(main, "_retry_at", LatestDeadline()),
+                patch.multiple(
+                    app_services,
+                    make_read_strava_token=make_read_strava_token,
+                    make_read_activities=make_read_activities,
+                    make_write_activities=make_write_activities,
+                    make_write_changes=make_write_changes,
+                    _make_fingerprint_cache=lambda: None,
+                ),
+                ThreadPoolExecutor(max_workers=32) as pool,
+            ):
+                list(pool.map(main.stravabqsync_listener, events))
+        finally:
+            app_services.make_sync_service.reset()
+            app_services.make_change_log_service.reset()
+            fakes.close()
+
+        assert sorted(builds) == ["changes", "reader", "tokens", "writer"]
+        assert sorted(set(write_repo.written)) == list(range(100))
+        assert sum(len(batch) for batch in changes_repo.batches) == 50
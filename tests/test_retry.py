@@ -1,12 +1,49 @@
 """Tests for retry logic."""
 
-from unittest.mock import Mock, patch
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 import requests
 
-from stravabqsync.exceptions import StravaRateLimitError
-from stravabqsync.retry import retry_on_failure
+from stravabqsync.concurrency import get_retry_deadline, retry_deadline
+from stravabqsync.exceptions import (
+    CircuitOpenError,
+    RetryLaterError,
+    StravaRateLimitError,
+)
+from stravabqsync.retry import (
+    CircuitBreaker,
+    parse_retry_after,
+    retry_on_failure,
+)
+
+
+def rate_limited(retry_after: str | None) -> requests.exceptions.HTTPError:
+    response = Mock()
+    response.status_code = 429
+    response.headers = {} if retry_after is None else {"Retry-After": retry_after}
+    error = requests.exceptions.HTTPError("Rate limited")
+    error.response = response
+    return error
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after("120") == 120
+
+    def test_http_date(self):
+        when = datetime.now(timezone.utc) + timedelta(seconds=90)
+        assert 85 <= parse_retry_after(format_datetime(when, usegmt=True)) <= 90
+
+    def test_http_date_in_the_past(self):
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+    @pytest.mark.parametrize("value", [None, "", "soon", "-5"])
+    def test_missing_or_malformed_uses_default(self, value):
+        assert parse_retry_after(value, default=30) == 30
 
 
 class TestRetryOnFailure:
@@ -289,3 +326,285 @@ class TestRetryOnFailure:
 
         # Should log error about all attempts failing
         mock_logger.error.assert_called_once_with("All %d retry attempts failed", 2)
+
+    def test_rate_limit_429_with_http_date(self):
+        """Test rate limiting with an HTTP-date Retry-After header."""
+        when = datetime.now(timezone.utc) + timedelta(seconds=30)
+        responses = [rate_limited(format_datetime(when, usegmt=True)), None]
+
+        @retry_on_failure(max_attempts=2)
+        def func():
+            error = responses.pop(0)
+            if error:
+                raise error
+            return "success"
+
+        with patch("time.sleep") as mock_sleep:
+            assert func() == "success"
+        (delay,), _ = mock_sleep.call_args
+        assert 25 <= delay <= 30
+
+    def test_deferred_rate_limit_raises_without_sleeping(self):
+        """Test deferral mode raises the wake-up time instead of waiting."""
+        call_count = 0
+
+        @retry_on_failure(max_attempts=3, defer=True)
+        def func():
+            nonlocal call_count
+            call_count += 1
+            raise rate_limited("600")
+
+        before = datetime.now(timezone.utc)
+        with patch("time.sleep") as mock_sleep, pytest.raises(RetryLaterError) as e:
+            func()
+
+        mock_sleep.assert_not_called()
+        assert call_count == 1
+        assert (
+            before + timedelta(seconds=600)
+            <= e.value.retry_at
+            <= datetime.now(timezone.utc) + timedelta(seconds=600)
+        )
+        assert 599 <= e.value.retry_after <= 600
+
+    def test_deferral_still_retries_server_errors(self):
+        """Test deferral mode only changes how rate limits are handled."""
+        response = Mock()
+        response.status_code = 503
+        error = requests.exceptions.HTTPError("Unavailable")
+        error.response = response
+        responses = [error, None]
+
+        @retry_on_failure(max_attempts=2, backoff_seconds=0.01, defer=True)
+        def func():
+            error = responses.pop(0)
+            if error:
+                raise error
+            return "success"
+
+        with patch("time.sleep"):
+            assert func() == "success"
+
+
+def server_error() -> requests.exceptions.HTTPError:
+    response = Mock()
+    response.status_code = 503
+    error = requests.exceptions.HTTPError("Unavailable")
+    error.response = response
+    return error
+
+
+class TestRetryJitterAndBudget:
+    def test_full_jitter(self):
+        """Test jittered delays stay within the exponential backoff."""
+
+        @retry_on_failure(max_attempts=3, backoff_seconds=1.0, jitter=True)
+        def always_failing():
+            raise requests.exceptions.ConnectionError("Down")
+
+        with (
+            patch("random.uniform", side_effect=lambda a, b: b / 4) as mock_uniform,
+            patch("time.sleep") as mock_sleep,
+            pytest.raises(requests.exceptions.ConnectionError),
+        ):
+            always_failing()
+
+        assert [c.args for c in mock_uniform.call_args_list] == [(0, 1.0), (0, 2.0)]
+        assert [c.args for c in mock_sleep.call_args_list] == [(0.25,), (0.5,)]
+
+    def test_budget_stops_retries(self):
+        """Test no retry is made that would wait past the budget."""
+        call_count = 0
+        now = [0.0]
+
+        @retry_on_failure(max_attempts=5, backoff_seconds=1.0, budget=2.5)
+        def always_failing():
+            nonlocal call_count
+            call_count += 1
+            now[0] += 0.1
+            raise requests.exceptions.ConnectionError("Down")
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        with (
+            patch("time.monotonic", side_effect=lambda: now[0]),
+            patch("time.sleep", side_effect=sleep) as mock_sleep,
+            pytest.raises(requests.exceptions.ConnectionError),
+        ):
+            always_failing()
+
+        # Waits 1s, then another 2s would exceed the budget
+        assert call_count == 2
+        mock_sleep.assert_called_once_with(1.0)
+
+    def test_deadline_is_shared_by_calls(self):
+        """Test calls in one retry_deadline block draw on one budget."""
+        calls = []
+        now = [0.0]
+
+        @retry_on_failure(max_attempts=5, backoff_seconds=1.0)
+        def always_failing(name):
+            calls.append(name)
+            raise requests.exceptions.ConnectionError("Down")
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        with (
+            patch("time.monotonic", side_effect=lambda: now[0]),
+            patch("time.sleep", side_effect=sleep),
+            retry_deadline(4.0),
+        ):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                always_failing("token")
+            with pytest.raises(requests.exceptions.ConnectionError):
+                always_failing("activity")
+
+        # The first call waits 1s and 2s; the second may only wait 1s more
+        assert calls == ["token"] * 3 + ["activity"] * 2
+
+    def test_nested_deadline_cannot_extend(self):
+        with patch("time.monotonic", return_value=0.0):
+            with retry_deadline(10), retry_deadline(60):
+                assert get_retry_deadline() == 10
+            with retry_deadline(None):
+                assert get_retry_deadline() is None
+
+    def test_budget_caps_rate_limit_waits(self):
+        """Test a Retry-After longer than the budget raises right away."""
+
+        @retry_on_failure(max_attempts=3, budget=10)
+        def func():
+            raise rate_limited("60")
+
+        with (
+            patch("time.sleep") as mock_sleep,
+            pytest.raises(StravaRateLimitError) as e,
+        ):
+            func()
+
+        mock_sleep.assert_not_called()
+        assert e.value.retry_after == 60
+
+
+class TestCircuitBreaker:
+    def make(self):
+        self.now = 0.0
+        return CircuitBreaker(
+            "strava", failure_threshold=2, reset_timeout=30, clock=lambda: self.now
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.make()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        self.now = 10
+        with pytest.raises(CircuitOpenError) as e:
+            breaker.before_call()
+        assert e.value.retry_after == 20
+
+    def test_half_open_probe_closes(self):
+        breaker = self.make()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        self.now = 30
+        assert breaker.state == "half-open"
+        breaker.before_call()
+        # One probe at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        breaker.before_call()
+
+    def test_failed_probe_reopens(self):
+        breaker = self.make()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        self.now = 30
+        breaker.before_call()
+        breaker.record_failure()
+        self.now = 59
+        assert breaker.state == "open"
+        self.now = 60
+        assert breaker.state == "half-open"
+
+    def test_shared_across_calls(self):
+        """Test an open breaker fails calls fast without calling them."""
+        breaker = CircuitBreaker("strava", failure_threshold=2)
+        calls = []
+
+        @retry_on_failure(max_attempts=1, circuit_breaker=breaker)
+        def fetch(path):
+            calls.append(path)
+            raise server_error()
+
+        for path in ("/a", "/b"):
+            with pytest.raises(requests.exceptions.HTTPError):
+                fetch(path)
+        with pytest.raises(CircuitOpenError):
+            fetch("/c")
+        assert calls == ["/a", "/b"]
+
+    def test_client_errors_and_rate_limits_are_not_failures(self):
+        breaker = CircuitBreaker("strava", failure_threshold=1)
+        response = Mock()
+        response.status_code = 404
+        not_found = requests.exceptions.HTTPError("Not found")
+        not_found.response = response
+        errors = [not_found, rate_limited("1")]
+
+        @retry_on_failure(max_attempts=1, circuit_breaker=breaker)
+        def fetch():
+            raise errors.pop(0)
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            fetch()
+        with pytest.raises(StravaRateLimitError):
+            fetch()
+        assert breaker.state == "closed"
+
+
+class TestRetryAsync:
+    def test_async_retries_with_asyncio_sleep(self):
+        responses = [server_error(), None]
+
+        @retry_on_failure(max_attempts=2, backoff_seconds=0.5)
+        async def fetch():
+            error = responses.pop(0)
+            if error:
+                raise error
+            return "success"
+
+        assert asyncio.iscoroutinefunction(fetch)
+        with (
+            patch("asyncio.sleep", new=AsyncMock()) as mock_sleep,
+            patch("time.sleep") as mock_time_sleep,
+        ):
+            assert asyncio.run(fetch()) == "success"
+        mock_sleep.assert_awaited_once_with(0.5)
+        mock_time_sleep.assert_not_called()
+
+    def test_async_gives_up(self):
+        @retry_on_failure(max_attempts=2, backoff_seconds=0)
+        async def fetch():
+            raise requests.exceptions.Timeout("Slow")
+
+        with pytest.raises(requests.exceptions.Timeout):
+            asyncio.run(fetch())
+
+    def test_async_defers_rate_limits(self):
+        @retry_on_failure(max_attempts=3, defer=True)
+        async def fetch():
+            raise rate_limited("30")
+
+        with pytest.raises(RetryLaterError):
+            asyncio.run(fetch())